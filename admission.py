@@ -0,0 +1,188 @@
+"""Admission control and priority-aware load shedding for Sensor Logger ingest.
+
+After a connectivity gap a whole fleet flushes its Sensor Logger backlog at once. Queued
+behind thousands of IMU readings, the next position fix would wait for all of them.
+Every Sensor Logger sensor and every subject therefore belongs to a priority class:
+
+    0 position      location_fix and its accuracy
+    1 navigation    speed and course over ground, heading
+    2 motion        IMU, orientation, barometer and anything unlisted
+    3 housekeeping  battery, DOP, satellite count
+
+Sensors are classed by what they are (SENSOR_PRIORITY), not by the best subject they
+map to: the ~100 Hz orientation sensor also yields a yaw, but it is motion data. Before
+a request is mapped its entries are grouped by class. Each class may fill the publish
+queue up to its own limit (CLASS_LIMITS, a fraction of the queue size), counting the
+samples already waiting in the time alignment (`pending`). Classes are admitted
+best-first while the messages they would add fit; the rest of the request is shed. A
+request whose position entries do not fit is refused with 429, so the device retries it
+later. The same happens when more than `max_inflight` requests are already being
+handled.
+
+Samples released by the time alignment were admitted earlier, when the queue may have
+had more room. `shed_items()` applies the same limits to them per subject, so a full queue
+drops their motion and housekeeping messages rather than the position fixes.
+"""
+
+
+PRIORITY_CLASSES = ("position", "navigation", "motion", "housekeeping")
+
+SUBJECT_PRIORITY = {
+    "location_fix": 0,
+    "location_fix_accuracy_horizontal_m": 0,
+    "location_fix_accuracy_vertical_m": 0,
+    "altitude_above_msl_m": 0,
+    "location_fix_filtered": 0,
+    "speed_over_ground_knots": 1,
+    "course_over_ground_deg": 1,
+    "heading_true_north_deg": 1,
+    "speed_over_ground_filtered_knots": 1,
+    "course_over_ground_filtered_deg": 1,
+    "geofence_entered": 1,
+    "geofence_exited": 1,
+    "geofence_dwell": 1,
+    "battery_state_of_charge_pct": 3,
+    "battery_is_charging": 3,
+    "location_fix_hdop": 3,
+    "location_fix_vdop": 3,
+    "location_fix_pdop": 3,
+    "location_fix_satellites_used": 3,
+}
+DEFAULT_PRIORITY = 2
+
+# Sensor Logger sensors; unlisted ones are motion
+SENSOR_PRIORITY = {
+    "location": 0,
+    "accelerometer": 2,
+    "gyroscope": 2,
+    "magnetometer": 2,
+    "gravity": 2,
+    "totalacceleration": 2,
+    "orientation": 2,
+    "barometer": 2,
+    "battery": 3,
+}
+
+# Highest publish queue fill each class may push it to
+CLASS_LIMITS = (1.0, 0.9, 0.7, 0.5)
+
+
+def sensor_priorities(registry):
+    """{sensor name: (priority, messages per entry)} for a mapping registry."""
+    return {name: (SENSOR_PRIORITY.get(name, DEFAULT_PRIORITY), len(rules)) for name, rules in registry.items()}
+
+
+class AdmissionRejected(Exception):
+    """Not even the request's highest-priority entries can be accepted."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, queue, priorities, max_inflight=64, limits=CLASS_LIMITS, retry_after=1.0, pending=None):
+        self.queue = queue
+        self.priorities = priorities
+        # Messages on their way to the queue, e.g. held by the time alignment
+        self.pending = pending
+        self.max_inflight = max_inflight
+        self.limits = limits
+        self.retry_after = retry_after
+        self.inflight = 0
+        self.accepted = [0] * len(PRIORITY_CLASSES)
+        self.shed = [0] * len(PRIORITY_CLASSES)
+        self.shed_released = [0] * len(PRIORITY_CLASSES)
+        self.rejected = {"inflight": 0, "queue": 0}
+
+    def enter(self):
+        """Count a request in; raises AdmissionRejected above `max_inflight`."""
+        if self.max_inflight and self.inflight >= self.max_inflight:
+            self.rejected["inflight"] += 1
+            raise AdmissionRejected("inflight", self.retry_after)
+        self.inflight += 1
+
+    def leave(self):
+        self.inflight -= 1
+
+    def admit(self, entries):
+        """Return (accepted entries, accepted per class, shed per class), dropping the
+        classes that would push the queue past their limit.
+
+        Unknown sensors cost nothing and are passed through (they are counted as
+        unmapped later). Raises AdmissionRejected if position entries do not fit.
+        """
+        classes = [[] for _ in PRIORITY_CLASSES]
+        messages = [0] * len(PRIORITY_CLASSES)
+        accepted = []
+        priorities = self.priorities
+        for entry in entries:
+            known = priorities.get(entry.get("name"))
+            if known is None:
+                accepted.append(entry)
+                continue
+            priority, cost = known
+            classes[priority].append(entry)
+            messages[priority] += cost
+
+        queued = self.queue.depth()
+        if self.pending is not None:
+            queued += self.pending()
+        maxsize = self.queue.maxsize
+        admitted = [0] * len(PRIORITY_CLASSES)
+        shed = [0] * len(PRIORITY_CLASSES)
+        for priority, members in enumerate(classes):
+            if not members:
+                continue
+            # An empty queue always takes position entries, or a backlog larger than the
+            # queue could never get in
+            fits = queued + messages[priority] <= maxsize * self.limits[priority]
+            if fits or (priority == 0 and queued == 0):
+                queued += messages[priority]
+                accepted.extend(members)
+                admitted[priority] = len(members)
+                self.accepted[priority] += len(members)
+            elif priority == 0:
+                self.rejected["queue"] += 1
+                raise AdmissionRejected("queue", self.retry_after)
+            else:
+                shed[priority] = len(members)
+                self.shed[priority] += len(members)
+        return accepted, admitted, shed
+
+    def shed_items(self, items):
+        """Return (kept, shed per class) for publish queue items about to be queued, dropping
+        the classes (by subject) that would push the queue past their limit. Position items
+        are always kept: they were admitted already and cannot be refused any more. The kept
+        items stay in their order."""
+        priorities = [SUBJECT_PRIORITY.get(item[1], DEFAULT_PRIORITY) for item in items]
+        counts = [0] * len(PRIORITY_CLASSES)
+        for priority in priorities:
+            counts[priority] += 1
+
+        queued = self.queue.depth()
+        maxsize = self.queue.maxsize
+        shed = [0] * len(PRIORITY_CLASSES)
+        for priority, count in enumerate(counts):
+            if not count:
+                continue
+            if priority == 0 or queued + count <= maxsize * self.limits[priority]:
+                queued += count
+            else:
+                shed[priority] = count
+                self.shed_released[priority] += count
+        if not any(shed):
+            return items, shed
+        return [item for item, priority in zip(items, priorities) if not shed[priority]], shed
+
+    def stats(self):
+        return {
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "limits": dict(zip(PRIORITY_CLASSES, self.limits)),
+            "accepted": dict(zip(PRIORITY_CLASSES, self.accepted)),
+            "shed": dict(zip(PRIORITY_CLASSES, self.shed)),
+            "shed_released": dict(zip(PRIORITY_CLASSES, self.shed_released)),
+            "rejected": dict(self.rejected),
+        }
@@ -0,0 +1,154 @@
+"""Benchmark: a synthetic backlog flood against Sensor Logger admission control.
+
+Several "reconnected" devices post large backlogs as fast as they can while one live
+device posts a single position fix every --interval seconds. The Zenoh session is a
+fake whose puts take 1/--rate seconds, so the publish queue fills up. The same flood
+runs with admission control off and on:
+
+    python benchmarks/bench_admission.py [--flooders 8] [--entries 1000] [--duration 5]
+
+Reported per run: live position posts answered 200 / 429 / 503, their HTTP latency and
+the delay until their location_fix was put, plus accepted and shed backlog entries.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_ingest import FakePublisher, FakeSession, load_app  # noqa: E402
+from payloads import sensorlogger_batch  # noqa: E402
+
+
+class SlowPublisher(FakePublisher):
+    def put(self, payload):
+        time.sleep(self.session.put_seconds)
+        super().put(payload)
+        if self.session.watch in str(self.key_expr):
+            self.session.delivered.append(time.perf_counter())
+
+
+class SlowSession(FakeSession):
+    put_seconds = 0.0
+    watch = "/live/pubsub/location_fix/"
+
+    def __init__(self):
+        super().__init__()
+        self.delivered = []
+
+    def declare_publisher(self, key_expr):
+        return SlowPublisher(self, key_expr)
+
+
+def live_body(seq):
+    return {
+        "messageId": seq,
+        "sessionId": "live",
+        "deviceId": "live",
+        "payload": [{
+            "name": "location",
+            "time": 1742503647834000000 + seq * 1_000_000_000,
+            "values": {"latitude": 57.7, "longitude": 11.9, "altitude": 12.0, "speed": 3.0, "bearing": 90.0},
+        }],
+    }
+
+
+async def run_flood(main, client, args):
+    statuses = {}
+    latencies = []
+    posted = []
+    totals = {"accepted": 0, "shed": 0, "rejected": 0, "busy": 0}
+    deadline = time.perf_counter() + args.duration
+    main.zenoh_session.delivered.clear()
+
+    async def flooder(idx):
+        seq = 0
+        while time.perf_counter() < deadline:
+            body = sensorlogger_batch(args.entries, seed=seq, message_id=f"{idx}-{seq}", device_id=f"flood-{idx}")
+            response = await client.post("/sensorlogger/flood", content=json.dumps(body).encode())
+            seq += 1
+            if response.status_code == 200:
+                result = response.json()
+                totals["accepted"] += result.get("accepted", result["received"])
+                totals["shed"] += result.get("shed", 0)
+            elif response.status_code == 429:
+                totals["rejected"] += 1
+                await asyncio.sleep(float(response.headers.get("retry-after", "1")))
+            else:
+                totals["busy"] += 1
+            await asyncio.sleep(0)
+
+    async def live():
+        seq = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.post("/sensorlogger/live", content=json.dumps(live_body(seq)).encode())
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 200:
+                posted.append(start)
+            seq += 1
+            await asyncio.sleep(args.interval)
+
+    await asyncio.gather(live(), *(flooder(idx) for idx in range(args.flooders)))
+    main.PUBLISH_QUEUE.flush()
+    delivered = main.zenoh_session.delivered
+    delays = [done - start for start, done in zip(posted, delivered)]
+    latencies.sort()
+    return {
+        "live": statuses,
+        "live_p50_ms": statistics.median(latencies) * 1e3,
+        "live_max_ms": latencies[-1] * 1e3,
+        "fix_delay_p50_ms": statistics.median(delays) * 1e3 if delays else None,
+        "fix_delay_max_ms": max(delays) * 1e3 if delays else None,
+        **totals,
+    }
+
+
+async def run(args):
+    import httpx
+
+    os.environ.setdefault("PUBLISH_QUEUE_SIZE", str(args.queue))
+    SlowSession.put_seconds = 1.0 / args.rate
+    main = load_app("fake")
+    main.open_zenoh_session = SlowSession
+    controller = main.ADMISSION
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        while main.zenoh_session is None:
+            await asyncio.sleep(0.01)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for name, admission in (("admission off", None), ("admission on", controller)):
+                main.ADMISSION = admission
+                results[name] = await run_flood(main, client, args)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flooders", type=int, default=8, help="Devices posting backlogs")
+    parser.add_argument("--entries", type=int, default=1000, help="Entries per backlog post")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per run")
+    parser.add_argument("--interval", type=float, default=0.1, help="Seconds between live position posts")
+    parser.add_argument("--rate", type=float, default=5000, help="Zenoh puts per second the fake router takes")
+    parser.add_argument("--queue", type=int, default=5000, help="PUBLISH_QUEUE_SIZE")
+    args = parser.parse_args()
+
+    for name, r in asyncio.run(run(args)).items():
+        delay = "n/a" if r["fix_delay_p50_ms"] is None else f"{r['fix_delay_p50_ms']:.0f} / {r['fix_delay_max_ms']:.0f} ms"
+        print(f"{name}:")
+        print(f"  live posts by status    : {r['live']}")
+        print(f"  live HTTP p50 / max     : {r['live_p50_ms']:.1f} / {r['live_max_ms']:.1f} ms")
+        print(f"  fix put delay p50 / max : {delay}")
+        print(f"  backlog entries accepted: {r['accepted']}  shed: {r['shed']}")
+        print(f"  backlog posts 429 / 503 : {r['rejected']} / {r['busy']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark: Sensor Logger body decoding and Content-Encoding on large batches.
+
+Times the stdlib json path against orjson and msgspec (whichever are installed) on
+Sensor Logger bodies with --unknown percent of entries from sensors that are not
+mapped, and reports traced peak memory per decode. Then compares upload size and
+decompression time for gzip, deflate and zstd:
+
+    python benchmarks/bench_decoding.py [--entries 1000 10000 50000] [--unknown 10]
+
+Peak memory is what tracemalloc sees: Python objects built by all three decoders,
+plus the decompressed body.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import decoding  # noqa: E402
+from mapping import SENSORLOGGER_MAPPINGS  # noqa: E402
+from payloads import sensorlogger_batch  # noqa: E402
+
+
+def make_body(entries, unknown_pct, seed=1):
+    body = sensorlogger_batch(entries, seed=seed)
+    rnd = random.Random(seed)
+    for entry in body["payload"]:
+        if rnd.random() * 100 < unknown_pct:
+            entry["name"] = "wifi"
+            entry["values"] = {"ssid": "vessel-net", "rssi": rnd.randint(-90, -30), "bssids": ["aa:bb", "cc:dd"]}
+    return json.dumps(body).encode()
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def peak_kib(fn):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    del result
+    return peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--unknown", type=float, default=10.0, help="Percent of entries from unmapped sensors")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    decoders = {kind: decoding.sensorlogger_decoder(SENSORLOGGER_MAPPINGS, kind)[0] for kind in decoding.available_decoders()}
+    codecs = {
+        "gzip": (gzip.compress, "gzip"),
+        "deflate": (zlib.compress, "deflate"),
+    }
+    if decoding.zstandard is not None:
+        codecs["zstd"] = (decoding.zstandard.ZstdCompressor().compress, "zstd")
+
+    print(f"{'entries':>8} {'decoder':<9}{'ms':>9}{'peak KiB':>11}{'vs json':>9}")
+    for entries in args.entries:
+        raw = make_body(entries, args.unknown)
+        baseline = None
+        for kind, decode in decoders.items():
+            ms = timed(lambda: decode(raw), args.repeat)
+            peak = peak_kib(lambda: decode(raw))
+            baseline = baseline or ms
+            print(f"{entries:>8} {kind:<9}{ms:>9.2f}{peak:>11.0f}{baseline / ms:>8.2f}x")
+
+    raw = make_body(args.entries[-1], args.unknown)
+    print(f"\n{len(raw) / 1024:.0f} KiB body, {args.entries[-1]} entries")
+    print(f"{'encoding':<9}{'KiB':>9}{'ratio':>8}{'inflate ms':>12}")
+    for name, (compress, header) in codecs.items():
+        data = compress(raw)
+        ms = timed(lambda: decoding.decompress(data, header, 1 << 30), args.repeat)
+        print(f"{name:<9}{len(data) / 1024:>9.0f}{len(raw) / len(data):>8.1f}{ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
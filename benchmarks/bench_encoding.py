@@ -0,0 +1,157 @@
+"""Benchmark: per-message protobuf construction and enveloping.
+
+Compares the original path (fresh message, FromNanoseconds, SerializeToString,
+keelson.enclose) with the template path in encoding.py (per-thread message reuse,
+cached timestamp split, direct Envelope encoding) on the benchmark payloads:
+
+    python benchmarks/bench_encoding.py [--entries 1000] [--repeat 20]
+
+Reported per message: best wall time. Allocations are not measured: upb allocates
+messages in its own arenas, out of tracemalloc's view. Per value the original path
+allocates two messages (payload, Envelope) and three bytes objects (serialized
+payload, copied payload, envelope); the template path allocates no message and two
+bytes objects (serialized payload, envelope).
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import keelson  # noqa: E402
+from keelson.payloads.foxglove.LocationFix_pb2 import LocationFix  # noqa: E402
+from keelson.payloads.Primitives_pb2 import TimestampedBool, TimestampedFloat, TimestampedInt  # noqa: E402
+from keelson.payloads.Decomposed3DVector_pb2 import Decomposed3DVector  # noqa: E402
+
+import encoding  # noqa: E402
+from gpslogger import parse_gpslogger  # noqa: E402
+from mapping import GPSLOGGER_HANDLER, SENSORLOGGER_HANDLERS  # noqa: E402
+from payloads import GPSLOGGER_BODIES, sensorlogger_entries  # noqa: E402
+
+
+# --- Original construction (fresh message per value), kept for comparison ---------
+def fresh_float(ts_ns, value):
+    payload = TimestampedFloat()
+    payload.timestamp.FromNanoseconds(ts_ns)
+    payload.value = value
+    return keelson.enclose(payload.SerializeToString())
+
+
+def fresh_scalar(cls, ts_ns, value):
+    payload = cls()
+    payload.timestamp.FromNanoseconds(ts_ns)
+    payload.value = value
+    return keelson.enclose(payload.SerializeToString())
+
+
+def fresh_vector3(ts_ns, x, y, z, frame_id):
+    payload = Decomposed3DVector()
+    payload.timestamp.FromNanoseconds(ts_ns)
+    payload.frame_id = frame_id
+    payload.vector.x = x
+    payload.vector.y = y
+    payload.vector.z = z
+    return keelson.enclose(payload.SerializeToString())
+
+
+def fresh_location(ts_ns, lat, lon, alt):
+    payload = LocationFix()
+    payload.timestamp.FromNanoseconds(ts_ns)
+    payload.latitude = lat
+    payload.longitude = lon
+    payload.altitude = alt
+    return keelson.enclose(payload.SerializeToString())
+
+
+def run_fresh_gpslogger(fixes):
+    count = 0
+    for fix in fixes:
+        ts = fix.time_ns
+        fresh_location(ts, fix.lat, fix.lon, fix.alt)
+        for value in (fix.acc, fix.hdop, fix.vdop, fix.pdop, fix.dir, fix.spd * 1.94384, fix.batt):
+            fresh_float(ts, value)
+        fresh_scalar(TimestampedInt, ts, fix.sat)
+        fresh_scalar(TimestampedBool, ts, fix.ischarging)
+        count += 10
+    return count
+
+
+def run_fresh_sensorlogger(entries):
+    count = 0
+    for entry in entries:
+        values = entry["values"]
+        if "x" in values:
+            fresh_vector3(int(entry["time"]), float(values["x"]), float(values["y"]), float(values["z"]), "dev")
+            count += 1
+        elif "pressure" in values:
+            fresh_float(int(entry["time"]), float(values["pressure"]) * 100.0)
+            count += 1
+    return count
+
+
+# --- Template path via the compiled mapping handlers ------------------------------------
+def _encoding_publish(counter):
+    def publish(entity_id, subject, source_id, payload):
+        encoding.enclose(payload.SerializeToString())
+        counter[0] += 1
+
+    return publish
+
+
+def run_template_gpslogger(fixes):
+    counter = [0]
+    publish = _encoding_publish(counter)
+    for fix in fixes:
+        GPSLOGGER_HANDLER("bench", "gpslogger", fix.time_ns, fix, publish)
+    return counter[0]
+
+
+def run_template_sensorlogger(entries):
+    counter = [0]
+    publish = _encoding_publish(counter)
+    for entry in entries:
+        values = entry["values"]
+        if "x" in values or "pressure" in values:
+            SENSORLOGGER_HANDLERS[entry["name"]]("bench", "dev", int(entry["time"]), values, publish)
+    return counter[0]
+
+
+def measure(fn, data, repeat):
+    best = float("inf")
+    messages = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        messages = fn(data)
+        best = min(best, time.perf_counter() - start)
+    return best / messages * 1e6, messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    fixes = [parse_gpslogger(GPSLOGGER_BODIES[idx % len(GPSLOGGER_BODIES)]) for idx in range(args.entries // 10)]
+    # Vector and scalar sensors only: the subset both paths above build identically
+    entries = [
+        entry for entry in sensorlogger_entries(args.entries, seed=1)
+        if "x" in entry["values"] or "pressure" in entry["values"]
+    ]
+
+    print(f"{'payloads':<14}{'path':<10}{'us/msg':>9}{'messages':>10}")
+    for name, fresh, templated, data in (
+        ("gpslogger", run_fresh_gpslogger, run_template_gpslogger, fixes),
+        ("sensorlogger", run_fresh_sensorlogger, run_template_sensorlogger, entries),
+    ):
+        before = measure(fresh, data, args.repeat)
+        after = measure(templated, data, args.repeat)
+        for path, (us, messages) in (("fresh", before), ("template", after)):
+            print(f"{name:<14}{path:<10}{us:>9.2f}{messages:>10}")
+        print(f"{'':<14}{'speedup':<10}{before[0] / after[0]:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark: geofence index build and per-fix zone checks.
+
+Scatters --fences star-shaped polygons (up to --vertices each) over a coastal area,
+moves --devices vessels through it and times one fix per vessel per step:
+
+- engine: GeofenceEngine.locate, with per-source cell/candidate state (what ingest runs)
+- tree: an R-tree point query plus polygon tests for every fix, no state
+- scan: box check and polygon test against every fence (the baseline without an index)
+
+    python benchmarks/bench_geofence.py [--fences 5000] [--vertices 200] [--devices 2000]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from geofence import Fence, GeofenceEngine, GeofenceIndex  # noqa: E402
+
+# Skagerrak / Kattegat
+AREA = (10.0, 56.0, 13.0, 59.0)
+
+
+def make_rings(count, max_vertices, rnd):
+    rings = []
+    for _ in range(count):
+        cx = rnd.uniform(AREA[0], AREA[2])
+        cy = rnd.uniform(AREA[1], AREA[3])
+        radius = rnd.uniform(0.002, 0.03)
+        n = rnd.randint(4, max_vertices)
+        ring = [
+            (cx + radius * rnd.uniform(0.8, 1.0) * math.cos(2 * math.pi * k / n),
+             cy + radius * rnd.uniform(0.8, 1.0) * math.sin(2 * math.pi * k / n))
+            for k in range(n)
+        ]
+        ring.append(ring[0])
+        rings.append(ring)
+    return rings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fences", type=int, default=5000)
+    parser.add_argument("--vertices", type=int, default=200, help="Max vertices per fence")
+    parser.add_argument("--devices", type=int, default=2000)
+    parser.add_argument("--steps", type=int, default=20, help="Fixes per device")
+    parser.add_argument("--cell", type=float, default=0.01, help="Grid cell size in degrees")
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    rings = make_rings(args.fences, args.vertices, rnd)
+    start = time.perf_counter()
+    fences = [Fence(f"zone-{idx}", f"Zone {idx}", [[ring]]) for idx, ring in enumerate(rings)]
+    polygons = time.perf_counter() - start
+    start = time.perf_counter()
+    index = GeofenceIndex(fences, cell_deg=args.cell)
+    build = time.perf_counter() - start
+
+    # 1 Hz fixes of vessels doing 5-20 kn on a steady course
+    devices = []
+    for _ in range(args.devices):
+        speed = rnd.uniform(5, 20) * 1852 / 3600 / 111_000
+        course = rnd.uniform(0, 2 * math.pi)
+        devices.append([rnd.uniform(AREA[0], AREA[2]), rnd.uniform(AREA[1], AREA[3]),
+                        speed * math.cos(course), speed * math.sin(course)])
+    fixes = []
+    for step in range(args.steps):
+        for idx, device in enumerate(devices):
+            device[0] += device[2]
+            device[1] += device[3]
+            fixes.append((f"vessel-{idx}", device[1], device[0], step * 1_000_000_000))
+
+    engine = GeofenceEngine(index)
+    start = time.perf_counter()
+    for entity_id, lat, lon, ts in fixes:
+        engine.locate(entity_id, "gnss", lat, lon, ts)
+    per_fix_engine = (time.perf_counter() - start) / len(fixes) * 1e6
+
+    start = time.perf_counter()
+    for _, lat, lon, _ in fixes:
+        index.containing(lat, lon)
+    per_fix_tree = (time.perf_counter() - start) / len(fixes) * 1e6
+
+    sample = fixes[:max(1, min(len(fixes), 200_000 // max(1, args.fences)))]
+    start = time.perf_counter()
+    for _, lat, lon, _ in sample:
+        [
+            fence for fence in fences
+            if fence.bbox[0] <= lon <= fence.bbox[2] and fence.bbox[1] <= lat <= fence.bbox[3]
+            and fence.contains(lon, lat)
+        ]
+    per_fix_scan = (time.perf_counter() - start) / len(sample) * 1e6
+
+    stats = engine.stats()
+    print(f"fences={args.fences} vertices={stats['vertices']} tree height={stats['tree_height']} "
+          f"devices={args.devices} fixes={len(fixes)} cell={args.cell} deg")
+    print(f"build polygons     : {polygons * 1e3:8.1f} ms")
+    print(f"build index        : {build * 1e3:8.1f} ms")
+    print(f"engine per fix     : {per_fix_engine:8.2f} us  ({1e6 / per_fix_engine:,.0f} fixes/s)")
+    print(f"tree per fix       : {per_fix_tree:8.2f} us")
+    print(f"scan per fix       : {per_fix_scan:8.2f} us")
+    print(f"polygon tests      : {stats['polygon_tests']} ({stats['polygon_tests'] / len(fixes):.3f} per fix), "
+          f"cells cached {stats['cells_cached']}, events {stats['events']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark: gpslogger.parse_gpslogger vs. the original split/strptime parsing.
+
+Uses the sample GPSLogger bodies from the README.
+
+    python benchmarks/bench_gpslogger.py [--number 20000]
+"""
+import argparse
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from gpslogger import parse_gpslogger  # noqa: E402
+from payloads import GPSLOGGER_BODIES as BODIES  # noqa: E402
+
+
+def legacy_parse(body):
+    # Original log_post parsing, including the float()/int() conversions it performed
+    data = body.decode("utf-8").split("&")
+    parsed_data = {}
+    for item in data:
+        if "=" in item:
+            key, value = item.split("=", 1)
+            parsed_data[key] = value
+    datetime_fix = datetime.datetime.strptime(parsed_data.get("time"), "%Y-%m-%dT%H:%M:%S.%fZ")
+    for key in ("lat", "lon", "alt", "acc", "hdop", "vdop", "pdop", "dir", "spd", "batt"):
+        float(parsed_data.get(key))
+    int(parsed_data.get("sat"))
+    return parsed_data, datetime_fix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    for body in BODIES:
+        fix = parse_gpslogger(body)
+        _, datetime_fix = legacy_parse(body)
+        expected = int(datetime_fix.replace(tzinfo=datetime.timezone.utc).timestamp()) * 10**9
+        expected += datetime_fix.microsecond * 1000
+        assert fix.time_ns == expected, (fix.time_ns, expected)
+
+    def run(fn):
+        return min(
+            timeit.repeat(lambda: [fn(body) for body in BODIES], number=args.number, repeat=5)
+        ) / (args.number * len(BODIES))
+
+    legacy = run(legacy_parse)
+    fast = run(parse_gpslogger)
+    print(f"legacy split + strptime : {legacy * 1e6:7.2f} us/body")
+    print(f"parse_gpslogger         : {fast * 1e6:7.2f} us/body")
+    print(f"speedup                 : {legacy / fast:7.2f}x")
+    print(f"profile decoded as      : {parse_gpslogger(BODIES[0]).profile!r}")
+
+
+if __name__ == "__main__":
+    main()
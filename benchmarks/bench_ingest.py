@@ -0,0 +1,220 @@
+"""End-to-end ingest benchmark for /log_all and /sensorlogger.
+
+Drives `main.app` in-process over ASGI, with its default configuration (time alignment,
+duplicate suppression and publish policies on), and replaces the Zenoh router with either
+a counting fake session (default) or a local peer-mode Zenoh session:
+
+    python benchmarks/bench_ingest.py                      # all scenarios, fake Zenoh
+    python benchmarks/bench_ingest.py --zenoh peer         # real local Zenoh peer
+    python benchmarks/bench_ingest.py --save baseline.json
+    python benchmarks/bench_ingest.py --compare baseline.json
+
+Every request carries new sample times and message ids, as a live phone's would, so
+nothing is dropped as a retry or a late sample. Reported per scenario: requests/s,
+p50/p99 latency, traced allocation peak per request and CPU time per published message.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from payloads import gpslogger_bodies, sensorlogger_batch  # noqa: E402
+
+
+class FakePublisher:
+    def __init__(self, session, key_expr):
+        self.session = session
+        self.key_expr = key_expr
+
+    def put(self, payload):
+        self.session.puts += 1
+        self.session.bytes += len(payload)
+
+    def undeclare(self):
+        pass
+
+
+class FakeQueryable:
+    def undeclare(self):
+        pass
+
+
+class FakeSession:
+    """Stand-in for a zenoh.Session that only counts what would have been put."""
+
+    def __init__(self):
+        self.puts = 0
+        self.bytes = 0
+
+    def declare_publisher(self, key_expr):
+        return FakePublisher(self, key_expr)
+
+    def put(self, key_expr, payload):
+        self.puts += 1
+        self.bytes += len(payload)
+
+    def declare_queryable(self, key_expr, handler):
+        return FakeQueryable()
+
+    def close(self):
+        pass
+
+
+def load_app(mode):
+    # Never reach for the production router from a benchmark
+    os.environ["ZENOH_CONNECT"] = ""
+    import main
+
+    if mode == "fake":
+        main.open_zenoh_session = FakeSession
+    return main
+
+
+WARMUP_REQUESTS = 5
+ALLOC_REQUESTS = 20
+
+
+def scenarios(requests):
+    """(name, path, request count, bodies); one body per request of the warm-up, timed
+    and allocation passes."""
+    bodies = gpslogger_bodies(WARMUP_REQUESTS + requests + ALLOC_REQUESTS)
+    yield "gpslogger", "/log_all/bench", requests, [
+        {"content": body, "headers": {"content-type": "application/x-www-form-urlencoded"}} for body in bodies
+    ]
+    t0 = 1742503647834000000
+    for size in (10, 100, 1000):
+        count = requests if size < 1000 else max(1, requests // 10)
+        yield f"sensorlogger_{size}", "/sensorlogger/bench", count, [
+            {"content": json.dumps(sensorlogger_batch(
+                size, seed=idx % 4, message_id=f"{size}-{idx}", device_id=f"bench-{size}",
+                t0=t0 + idx * size * 10_000_000)).encode(),
+             "headers": {"content-type": "application/json"}}
+            for idx in range(WARMUP_REQUESTS + count + ALLOC_REQUESTS)
+        ]
+
+
+async def run_scenario(main, client, path, bodies, requests, concurrency):
+    latencies = []
+    remaining = iter(bodies)
+
+    async def one(idx):
+        body = next(remaining)
+        start = time.perf_counter()
+        response = await client.post(path, **body)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} answered {response.status_code}: {response.text}")
+
+    async def drain():
+        if main.ALIGNER is not None:
+            await main.release_aligned(flush=True)
+        main.PUBLISH_QUEUE.flush()
+
+    # Warm up caches (publishers, compiled handlers, JSON decoder)
+    for idx in range(WARMUP_REQUESTS):
+        await one(idx)
+    await drain()
+    latencies.clear()
+
+    published_before = main.PUBLISH_QUEUE.stats()["published"]
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for offset in range(0, requests, concurrency):
+        await asyncio.gather(*(one(idx) for idx in range(offset, min(offset + concurrency, requests))))
+    await drain()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    published = main.PUBLISH_QUEUE.stats()["published"] - published_before
+
+    # Allocation profile on a separate, smaller pass: tracemalloc distorts timing
+    tracemalloc.start()
+    peaks = []
+    for idx in range(ALLOC_REQUESTS):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        await one(idx)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    await drain()
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "published": published,
+        "requests_per_s": requests / wall,
+        "messages_per_s": published / wall,
+        "p50_ms": statistics.median(latencies) * 1e3,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e3,
+        "alloc_peak_kib_per_request": statistics.mean(peaks) / 1024,
+        "cpu_us_per_message": cpu / published * 1e6 if published else None,
+    }
+
+
+async def run(args):
+    import httpx
+
+    main = load_app(args.zenoh)
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        while main.zenoh_session is None:
+            await asyncio.sleep(0.01)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, path, requests, bodies in scenarios(args.requests):
+                if args.only and name not in args.only:
+                    continue
+                results[name] = await run_scenario(main, client, path, bodies, requests, args.concurrency)
+    return results
+
+
+def print_results(results, baseline=None):
+    header = f"{'scenario':<18}{'req/s':>10}{'msg/s':>11}{'p50 ms':>9}{'p99 ms':>9}{'KiB/req':>9}{'CPU us/msg':>12}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        print(
+            f"{name:<18}{r['requests_per_s']:>10.0f}{r['messages_per_s']:>11.0f}{r['p50_ms']:>9.2f}"
+            f"{r['p99_ms']:>9.2f}{r['alloc_peak_kib_per_request']:>9.1f}{r['cpu_us_per_message'] or 0:>12.2f}"
+        )
+        if baseline and name in baseline:
+            b = baseline[name]
+            print(
+                f"{'  vs baseline':<18}{r['requests_per_s'] / b['requests_per_s']:>9.2f}x"
+                f"{r['messages_per_s'] / b['messages_per_s']:>10.2f}x"
+                f"{r['p50_ms'] / b['p50_ms']:>8.2f}x{r['p99_ms'] / b['p99_ms']:>8.2f}x"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--zenoh", choices=["fake", "peer"], default="fake")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--only", action="append", help="Run only the named scenario(s)")
+    parser.add_argument("--save", metavar="FILE", help="Write results as baseline JSON")
+    parser.add_argument("--compare", metavar="FILE", help="Compare against a saved baseline")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)["results"]
+    print_results(results, baseline)
+
+    if args.save:
+        with open(args.save, "w") as fh:
+            json.dump({"zenoh": args.zenoh, "results": results}, fh, indent=2)
+        print(f"Saved results to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
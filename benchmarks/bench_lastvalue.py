@@ -0,0 +1,84 @@
+"""Benchmark: late-joiner gets answered from the last-value cache over local Zenoh peers.
+
+Fills a LastValueCache with --entities vessels x the GPSLogger subjects, declares its
+queryable on one peer session and times `get` round trips from a second peer session
+connected over loopback TCP, for an exact key, one vessel and the whole fleet:
+
+    python benchmarks/bench_lastvalue.py [--entities 1000] [--port 7450]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import keelson  # noqa: E402
+import zenoh  # noqa: E402
+
+from lastvalue import LastValueCache  # noqa: E402
+from mapping import GPSLOGGER_MAPPING  # noqa: E402
+
+
+def open_peer(listen=None, connect=None):
+    conf = zenoh.Config()
+    conf.insert_json5("scouting/multicast/enabled", "false")
+    if listen:
+        conf.insert_json5("listen/endpoints", json.dumps([listen]))
+    if connect:
+        conf.insert_json5("connect/endpoints", json.dumps([connect]))
+    return zenoh.open(conf)
+
+
+def key_expr(entity_id, subject, source_id):
+    return keelson.construct_pubsub_key(base_path="rise", entity_id=entity_id, subject=subject, source_id=source_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, default=1000)
+    parser.add_argument("--port", type=int, default=7450)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    cache = LastValueCache(key_expr)
+    subjects = [rule["subject"] for rule in GPSLOGGER_MAPPING]
+    envelope = keelson.enclose(b"\x00" * 40)
+    start = time.perf_counter()
+    for idx in range(args.entities):
+        for subject in subjects:
+            cache.update(f"vessel-{idx}", subject, "gpslogger", envelope)
+    update = (time.perf_counter() - start) / (args.entities * len(subjects)) * 1e6
+
+    endpoint = f"tcp/127.0.0.1:{args.port}"
+    server = open_peer(listen=endpoint)
+    queryable = server.declare_queryable("rise/@v0/**", cache.reply)
+    client = open_peer(connect=endpoint)
+    time.sleep(1.0)
+
+    print(f"keys={len(cache)} update={update:.2f} us")
+    print(f"{'selector':<50}{'replies':>8}{'match us':>10}{'get ms':>9}")
+    for selector, repeat in (
+        ("rise/@v0/vessel-7/pubsub/location_fix/gpslogger", args.repeat),
+        ("rise/@v0/vessel-7/**", args.repeat),
+        ("rise/@v0/*/pubsub/location_fix/*", max(1, args.repeat // 10)),
+    ):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            cache.match(selector)
+        match = (time.perf_counter() - start) / repeat * 1e6
+        replies = 0
+        start = time.perf_counter()
+        for _ in range(repeat):
+            replies = sum(1 for reply in client.get(selector, timeout=5.0) if reply.ok)
+        get = (time.perf_counter() - start) / repeat * 1e3
+        print(f"{selector:<50}{replies:>8}{match:>10.1f}{get:>9.3f}")
+
+    queryable.undeclare()
+    client.close()
+    server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark: logging cost of one GPSLogger request, before and after logconfig.py.
+
+Replays the log calls of one /log_all request (the request line, the parsed fix and
+one line per queued subject) under four setups:
+
+- sync f-string: the former setup, basicConfig(level=DEBUG) writing from the caller
+  with every message built eagerly as an f-string
+- queue DEBUG: configure_logging at DEBUG, %-style calls formatted on the listener
+- queue DEBUG, sampled: as above with LOG_SAMPLE="gnss.publish=100"
+- queue INFO: the default level; debug calls return at the level check
+
+    python benchmarks/bench_logging.py [--requests 20000] [--output /dev/null]
+
+Reported: microseconds per request spent in the calling thread (what the event loop
+pays), total time until the listener drained the queue, and bytes written per request.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from gpslogger import parse_gpslogger  # noqa: E402
+from logconfig import TEXT_FORMAT, category_logger, configure_logging  # noqa: E402
+from mapping import GPSLOGGER_MAPPING  # noqa: E402
+from payloads import GPSLOGGER_BODIES  # noqa: E402
+
+FIX = parse_gpslogger(GPSLOGGER_BODIES[0])
+SUBJECTS = [rule["subject"] for rule in GPSLOGGER_MAPPING]
+ENTITY, SOURCE = "bench", "Default Profile"
+
+
+def request_fstring():
+    time_param = None
+    logging.debug(f"Received POST LOGG at time: {time_param}")
+    logging.debug(f"Parsed data: {FIX.as_dict()}")
+    for subject in SUBJECTS:
+        logging.debug(f"Queued {subject} for Zenoh with key: {ENTITY}/{subject}/{SOURCE}")
+
+
+ingest_log = category_logger("gnss.ingest")
+publish_log = category_logger("gnss.publish")
+
+
+def request_lazy():
+    ingest_log.debug("Received POST LOGG at time: %s", None)
+    if ingest_log.isEnabledFor(logging.DEBUG):
+        ingest_log.debug("Parsed data: %s", FIX.as_dict())
+    if publish_log.isEnabledFor(logging.DEBUG):
+        for subject in SUBJECTS:
+            publish_log.debug("Queued %s for Zenoh with key: %s/%s/%s", subject, ENTITY, subject, SOURCE)
+
+
+def reset_root():
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def run_sync(args, output):
+    reset_root()
+    logging.basicConfig(format=TEXT_FORMAT, level=logging.DEBUG, stream=output)
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        request_fstring()
+    elapsed = time.perf_counter() - start
+    output.flush()
+    return elapsed, elapsed
+
+
+def run_queue(args, output, level, sample=None):
+    reset_root()
+    pipeline = configure_logging(level=level, sample=sample, stream=output)
+    # The queue holds at most 10000 records; pace the producer so none overflow
+    start = time.perf_counter()
+    caller = 0.0
+    for idx in range(args.requests):
+        begin = time.perf_counter()
+        request_lazy()
+        caller += time.perf_counter() - begin
+        if idx % 500 == 499:
+            while pipeline.handler.queue.qsize() > 5000:
+                time.sleep(0.001)
+    pipeline.stop()
+    output.flush()
+    assert pipeline.handler.overflowed == 0
+    return caller, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000, help="Simulated requests per setup")
+    parser.add_argument("--output", default=None, help="Log destination (default: a temporary file)")
+    args = parser.parse_args()
+
+    path = args.output or os.path.join(os.environ.get("TMPDIR", "/tmp"), "bench_logging.log")
+    setups = (
+        ("sync f-string", lambda output: run_sync(args, output)),
+        ("queue DEBUG", lambda output: run_queue(args, output, "DEBUG")),
+        ("queue DEBUG, sampled", lambda output: run_queue(args, output, "DEBUG", {"gnss.publish": 100})),
+        ("queue INFO", lambda output: run_queue(args, output, "INFO")),
+    )
+    print(f"{'setup':<22} {'caller us/req':>13} {'total us/req':>13} {'bytes/req':>10}")
+    for name, run in setups:
+        with open(path, "w") as output:
+            caller, total = run(output)
+            written = output.tell()
+        print(f"{name:<22} {caller / args.requests * 1e6:>13.1f} {total / args.requests * 1e6:>13.1f} "
+              f"{written / args.requests:>10.0f}")
+    if not args.output:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
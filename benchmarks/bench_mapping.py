@@ -0,0 +1,183 @@
+"""Benchmark: compiled mapping registry vs. the original if/elif dispatch chain.
+
+Runs the original chain, the per-entry registry handlers and the NumPy batch path
+over the same mixed SensorLogger batch with a no-op publish, so the numbers only
+cover dispatch and payload construction.
+
+    python benchmarks/bench_mapping.py [--entries 1000] [--repeat 20]
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from keelson.payloads.foxglove.LocationFix_pb2 import LocationFix  # noqa: E402
+from keelson.payloads.Primitives_pb2 import (  # noqa: E402
+    TimestampedFloat,
+    TimestampedBool,
+    TimestampedQuaternion,
+)
+from keelson.payloads.Decomposed3DVector_pb2 import Decomposed3DVector  # noqa: E402
+
+from mapping import (  # noqa: E402
+    BATCH_MIN_ENTRIES,
+    SENSORLOGGER_BATCH_HANDLERS,
+    SENSORLOGGER_HANDLERS,
+)
+from payloads import sensorlogger_entries  # noqa: E402
+
+
+def make_batch(n, seed=0):
+    # The original chain predates the gravity sensor, keep the comparison like for like
+    return [entry for entry in sensorlogger_entries(n, seed=seed) if entry["name"] != "gravity"]
+
+
+# --- Original dispatch chain (pre-registry), kept verbatim apart from publish ---
+def legacy_dispatch(entityid, source, entry, publish_payload):
+    def publish_float(entity_id, subject, source_id, value, ts_ns):
+        payload = TimestampedFloat()
+        payload.timestamp.FromNanoseconds(ts_ns)
+        payload.value = float(value)
+        publish_payload(entity_id, subject, source_id, payload)
+
+    def publish_bool(entity_id, subject, source_id, value, ts_ns):
+        payload = TimestampedBool()
+        payload.timestamp.FromNanoseconds(ts_ns)
+        payload.value = bool(value)
+        publish_payload(entity_id, subject, source_id, payload)
+
+    def publish_vector3(entity_id, subject, source_id, x, y, z, ts_ns, frame_id=None):
+        payload = Decomposed3DVector()
+        payload.timestamp.FromNanoseconds(ts_ns)
+        if frame_id:
+            payload.frame_id = frame_id
+        payload.vector.x = float(x)
+        payload.vector.y = float(y)
+        payload.vector.z = float(z)
+        publish_payload(entity_id, subject, source_id, payload)
+
+    name = entry.get("name")
+    ts = int(entry["time"])
+    values = entry.get("values", {}) or {}
+
+    if name == "location":
+        fix = LocationFix()
+        fix.timestamp.FromNanoseconds(ts)
+        fix.latitude = float(values["latitude"])
+        fix.longitude = float(values["longitude"])
+        if values.get("altitude") is not None:
+            fix.altitude = float(values["altitude"])
+        publish_payload(entityid, "location_fix", source, fix)
+        if values.get("horizontalAccuracy") is not None:
+            publish_float(entityid, "location_fix_accuracy_horizontal_m", source, values["horizontalAccuracy"], ts)
+        if values.get("verticalAccuracy") is not None:
+            publish_float(entityid, "location_fix_accuracy_vertical_m", source, values["verticalAccuracy"], ts)
+        if values.get("speed") is not None:
+            publish_float(entityid, "speed_over_ground_knots", source, float(values["speed"]) * 1.94384, ts)
+        if values.get("bearing") is not None:
+            publish_float(entityid, "course_over_ground_deg", source, values["bearing"], ts)
+        if values.get("altitudeAboveMeanSeaLevel") is not None:
+            publish_float(entityid, "altitude_above_msl_m", source, values["altitudeAboveMeanSeaLevel"], ts)
+    elif name == "accelerometer":
+        publish_vector3(entityid, "linear_acceleration_mpss", source, values["x"], values["y"], values["z"], ts, frame_id=source)
+    elif name == "gyroscope":
+        publish_vector3(entityid, "angular_velocity_radps", source, values["x"], values["y"], values["z"], ts, frame_id=source)
+    elif name == "magnetometer":
+        publish_vector3(entityid, "magnetic_field_gauss", source, values["x"] / 100.0, values["y"] / 100.0, values["z"] / 100.0, ts, frame_id=source)
+    elif name == "orientation":
+        if all(k in values for k in ("qx", "qy", "qz", "qw")):
+            quat = TimestampedQuaternion()
+            quat.timestamp.FromNanoseconds(ts)
+            quat.value.x = float(values["qx"])
+            quat.value.y = float(values["qy"])
+            quat.value.z = float(values["qz"])
+            quat.value.w = float(values["qw"])
+            publish_payload(entityid, "orientation_quaternion", source, quat)
+        if values.get("roll") is not None:
+            publish_float(entityid, "roll_deg", source, math.degrees(values["roll"]), ts)
+        if values.get("pitch") is not None:
+            publish_float(entityid, "pitch_deg", source, math.degrees(values["pitch"]), ts)
+        if values.get("yaw") is not None:
+            publish_float(entityid, "yaw_deg", source, math.degrees(values["yaw"]), ts)
+    elif name == "barometer":
+        if values.get("pressure") is not None:
+            publish_float(entityid, "air_pressure_pa", source, float(values["pressure"]) * 100.0, ts)
+    elif name == "battery":
+        if values.get("level") is not None:
+            level = float(values["level"])
+            publish_float(entityid, "battery_state_of_charge_pct", source, level * 100.0 if level <= 1.0 else level, ts)
+        if values.get("state") is not None:
+            publish_bool(entityid, "battery_is_charging", source, str(values["state"]).lower() in ("charging", "full", "2"), ts)
+
+
+def run_legacy(entries, publish):
+    for entry in entries:
+        legacy_dispatch("bench", "dev", entry, publish)
+
+
+def run_registry(entries, publish):
+    handlers = SENSORLOGGER_HANDLERS
+    for entry in entries:
+        handler = handlers.get(entry.get("name"))
+        if handler is not None:
+            handler("bench", "dev", int(entry["time"]), entry.get("values", {}) or {}, publish)
+
+
+def run_batched(entries, publish):
+    # Same grouping as sensorlogger_post
+    groups = {}
+    singles = []
+    for entry in entries:
+        name = entry.get("name")
+        if name in SENSORLOGGER_BATCH_HANDLERS:
+            groups.setdefault(name, []).append(entry)
+        else:
+            singles.append(entry)
+    for name, group in groups.items():
+        if not (len(group) >= BATCH_MIN_ENTRIES and SENSORLOGGER_BATCH_HANDLERS[name]("bench", "dev", group, publish)):
+            singles.extend(group)
+    run_registry(singles, publish)
+
+
+def best_of(fn, entries, repeat):
+    published = []
+
+    def publish(entity_id, subject, source_id, payload):
+        published.append(subject)
+
+    best = float("inf")
+    for _ in range(repeat):
+        published.clear()
+        start = time.perf_counter()
+        fn(entries, publish)
+        best = min(best, time.perf_counter() - start)
+    return best, len(published)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    entries = make_batch(args.entries)
+    legacy, legacy_msgs = best_of(run_legacy, entries, args.repeat)
+    registry, registry_msgs = best_of(run_registry, entries, args.repeat)
+    batched, batched_msgs = best_of(run_batched, entries, args.repeat)
+    assert legacy_msgs == registry_msgs == batched_msgs, (legacy_msgs, registry_msgs, batched_msgs)
+
+    per_entry = 1e6 / args.entries
+    print(f"entries={args.entries} messages={registry_msgs}")
+    print(f"legacy if/elif chain : {legacy * per_entry:8.2f} us/entry")
+    print(f"compiled registry    : {registry * per_entry:8.2f} us/entry")
+    print(f"batched (NumPy)      : {batched * per_entry:8.2f} us/entry")
+    print(f"speedup registry     : {legacy / registry:8.2f}x")
+    print(f"speedup batched      : {legacy / batched:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark: motion filter cost per sample and state size per source.
+
+Drives --sources vessels on gently turning courses with 1 Hz noisy fixes and --imu-hz
+gyroscope/accelerometer/gravity samples, feeds everything through
+MotionEstimator.observe (what ingest runs with MOTION_FILTER=true) and reports the time
+per fix and per IMU sample, the state size and the filtered vs. raw position error:
+
+    python benchmarks/bench_motion.py [--sources 2000] [--seconds 60] [--imu-hz 5]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from keelson.payloads.Decomposed3DVector_pb2 import Decomposed3DVector  # noqa: E402
+from keelson.payloads.foxglove.LocationFix_pb2 import LocationFix  # noqa: E402
+from keelson.payloads.Primitives_pb2 import TimestampedFloat  # noqa: E402
+
+from motion import METERS_PER_DEGREE, MotionEstimator  # noqa: E402
+
+START_S = 1_700_000_000
+
+
+def stamp(payload, t):
+    seconds = int(t)
+    payload.timestamp.seconds = seconds
+    payload.timestamp.nanos = int((t - seconds) * 1e9)
+    return payload
+
+
+def make_samples(sources, seconds, imu_hz, noise_m, rnd):
+    """(entity, subject, source, payload) in arrival order, plus the true positions per fix."""
+    fixes, imu, truth = [], [], []
+    for idx in range(sources):
+        entity = f"vessel-{idx}"
+        lat, lon = rnd.uniform(56.0, 59.0), rnd.uniform(10.0, 13.0)
+        speed = rnd.uniform(3, 10)
+        course = rnd.uniform(0, 2 * math.pi)
+        turn = math.radians(rnd.choice((0.0, 0.5, -0.5)))
+        for step in range(seconds):
+            t = START_S + step
+            course += turn
+            lat += speed * math.cos(course) / METERS_PER_DEGREE
+            lon += speed * math.sin(course) / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+            fix = stamp(LocationFix(), t)
+            fix.latitude = lat + rnd.gauss(0, noise_m) / METERS_PER_DEGREE
+            fix.longitude = lon + rnd.gauss(0, noise_m) / (METERS_PER_DEGREE * math.cos(math.radians(lat)))
+            accuracy = stamp(TimestampedFloat(), t)
+            accuracy.value = noise_m
+            fixes.append((entity, "location_fix", "gnss", fix))
+            fixes.append((entity, "location_fix_accuracy_horizontal_m", "gnss", accuracy))
+            truth.append((lat, lon))
+            for k in range(imu_hz):
+                ti = t + k / imu_hz
+                for subject, x, y, z in (
+                    ("gravity_mpss", 0.0, 0.0, 9.81),
+                    ("angular_velocity_radps", 0.0, 0.0, turn + rnd.gauss(0, 0.002)),
+                    ("linear_acceleration_mpss", rnd.gauss(0, 0.05), rnd.gauss(0, 0.05), rnd.gauss(0, 0.05)),
+                ):
+                    vector = stamp(Decomposed3DVector(), ti)
+                    vector.vector.x, vector.vector.y, vector.vector.z = x, y, z
+                    imu.append((entity, subject, "gnss", vector))
+    return fixes, imu, truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sources", type=int, default=2000)
+    parser.add_argument("--seconds", type=int, default=60, help="Fixes per source (1 Hz)")
+    parser.add_argument("--imu-hz", type=int, default=5, help="Samples per second of each IMU sensor")
+    parser.add_argument("--noise", type=float, default=5.0, help="Fix noise (m, 1 sigma)")
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    fixes, imu, truth = make_samples(args.sources, args.seconds, args.imu_hz, args.noise, rnd)
+    estimator = MotionEstimator()
+
+    start = time.perf_counter()
+    for sample in imu:
+        estimator.observe(*sample)
+    per_imu = (time.perf_counter() - start) / max(1, len(imu)) * 1e6
+
+    estimates = []
+    start = time.perf_counter()
+    for sample in fixes:
+        estimate = estimator.observe(*sample)
+        if estimate is not None:
+            estimates.append(estimate)
+    # The accuracy payloads are part of the fix path: one fix costs both
+    per_fix = (time.perf_counter() - start) / max(1, len(truth)) * 1e6
+
+    raw_sq = filtered_sq = 0.0
+    counted = 0
+    for (_, _, _, fix), estimate, (lat, lon) in zip(fixes[::2], estimates, truth):
+        if int(fix.timestamp.seconds) - START_S < 10:
+            continue
+        kx = METERS_PER_DEGREE * math.cos(math.radians(lat))
+        raw_sq += ((fix.latitude - lat) * METERS_PER_DEGREE) ** 2 + ((fix.longitude - lon) * kx) ** 2
+        filtered_sq += ((estimate[1] - lat) * METERS_PER_DEGREE) ** 2 + ((estimate[2] - lon) * kx) ** 2
+        counted += 1
+
+    stats = estimator.stats()
+    print(f"sources={stats['sources']} fixes={stats['fixes']} imu samples={stats['imu_samples']} "
+          f"estimates={stats['estimates']} rejected={stats['rejected']} restarts={stats['restarts']}")
+    print(f"per fix            : {per_fix:8.2f} us  ({1e6 / per_fix:,.0f} fixes/s)")
+    print(f"per IMU sample     : {per_imu:8.2f} us  ({1e6 / per_imu:,.0f} samples/s)")
+    print(f"state              : {stats['state_bytes'] / 1e6:8.2f} MB  "
+          f"({stats['state_bytes'] / max(1, stats['sources']):.0f} bytes per source)")
+    if counted:
+        print(f"position RMS error : {math.sqrt(raw_sq / counted):8.2f} m raw, "
+              f"{math.sqrt(filtered_sq / counted):.2f} m filtered")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Benchmark: NMEA 0183 receivers streaming to the listeners over loopback sockets.
+
+The app runs in-process with a fake Zenoh session and its NMEA listeners bound to
+127.0.0.1. Simulated receivers, each with its own loopback address, send one epoch
+(RMC, VTG, GGA, two GSA, HDT) every 1/--hz seconds from a separate thread, half of
+them over UDP and half over TCP:
+
+    python benchmarks/bench_nmea.py [--receivers 1 10 50] [--hz 10] [--duration 5]
+
+Reported per run: sentences received and rejected, messages queued, event-loop time per
+sentence (parse, map, envelope, queue) and the event-loop lag (how late a 1 ms timer fires), which is what every
+HTTP request on the same worker would wait on top of its own handling.
+"""
+import argparse
+import asyncio
+import functools
+import operator
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_ingest import load_app  # noqa: E402
+
+
+def sentence(body):
+    checksum = functools.reduce(operator.xor, body.encode(), 0)
+    return f"${body}*{checksum:02X}\r\n".encode()
+
+
+def epoch(seq):
+    t = time.gmtime()
+    fix_time = f"{t.tm_hour:02d}{t.tm_min:02d}{t.tm_sec:02d}.{seq % 10}0"
+    date = f"{t.tm_mday:02d}{t.tm_mon:02d}{t.tm_year % 100:02d}"
+    minutes = 43 + (seq % 1000) / 1000
+    return b"".join((
+        sentence(f"GPRMC,{fix_time},A,57{minutes:07.4f},N,01158.0000,E,5.5,123.4,{date},,,A"),
+        sentence("GPVTG,123.4,T,,M,5.5,N,10.2,K,A"),
+        sentence(f"GPGGA,{fix_time},57{minutes:07.4f},N,01158.0000,E,1,09,0.9,12.5,M,40.1,M,,"),
+        sentence("GNGSA,A,3,01,02,03,04,05,,,,,,,,1.8,0.9,1.5"),
+        sentence("GNGSA,A,3,65,66,67,68,,,,,,,,,1.8,0.9,1.5"),
+        sentence(f"HEHDT,{120 + seq % 10}.0,T"),
+    ))
+
+
+SENTENCES_PER_EPOCH = 6
+
+
+def send(args, receivers, stop, sent):
+    """Sender thread: every receiver emits one epoch per tick."""
+    sockets = []
+    for idx in range(receivers):
+        host = f"127.0.{1 + idx // 250}.{1 + idx % 250}"
+        if idx % 2 == 0:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((host, 0))
+            sockets.append((sock, True))
+        else:
+            sock = socket.create_connection(("127.0.0.1", args.port), source_address=(host, 0))
+            sockets.append((sock, False))
+    seq = 0
+    next_tick = time.perf_counter()
+    while not stop.is_set():
+        burst = epoch(seq)
+        for sock, udp in sockets:
+            if udp:
+                sock.sendto(burst, ("127.0.0.1", args.port))
+            else:
+                sock.sendall(burst)
+            sent[0] += SENTENCES_PER_EPOCH
+        seq += 1
+        next_tick += 1.0 / args.hz
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+    for sock, _ in sockets:
+        sock.close()
+
+
+async def run_receivers(main, args, receivers):
+    stats_before = dict(main.NMEA.counts)
+    stop = threading.Event()
+    sent = [0]
+    lags = []
+    thread = threading.Thread(target=send, args=(args, receivers, stop, sent), daemon=True)
+    busy_before = BUSY[0]
+    thread.start()
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+    stop.set()
+    await asyncio.to_thread(thread.join)
+    await asyncio.sleep(0.2)
+    busy = BUSY[0] - busy_before
+    main.PUBLISH_QUEUE.flush()
+    counts = {key: value - stats_before[key] for key, value in main.NMEA.counts.items()}
+    lags.sort()
+    return {
+        "sent": sent[0],
+        "counts": counts,
+        "us_per_sentence": busy / counts["sentences"] * 1e6 if counts["sentences"] else None,
+        "lag_p50_ms": statistics.median(lags) * 1e3,
+        "lag_p99_ms": lags[int(len(lags) * 0.99)] * 1e3,
+        "lag_max_ms": lags[-1] * 1e3,
+    }
+
+
+# Seconds the event loop spent in NmeaIngest.feed_lines (parse, map, envelope, queue)
+BUSY = [0.0]
+
+
+def timed(feed_lines):
+    def wrapper(peer, lines):
+        start = time.perf_counter()
+        feed_lines(peer, lines)
+        BUSY[0] += time.perf_counter() - start
+
+    return wrapper
+
+
+async def run(args):
+    os.environ["NMEA_UDP"] = os.environ["NMEA_TCP"] = f"127.0.0.1:{args.port}"
+    main = load_app("fake")
+    main.NMEA.feed_lines = timed(main.NMEA.feed_lines)
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        while main.zenoh_session is None:
+            await asyncio.sleep(0.01)
+        for receivers in args.receivers:
+            results[receivers] = await run_receivers(main, args, receivers)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--receivers", type=int, nargs="+", default=[1, 10, 50], help="Simulated receivers per run")
+    parser.add_argument("--hz", type=float, default=10.0, help="Epochs per second per receiver")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per run")
+    parser.add_argument("--port", type=int, default=10110, help="Loopback port for both listeners")
+    args = parser.parse_args()
+
+    print(f"{'receivers':>9} {'sent':>8} {'received':>8} {'rejected':>8} {'queued':>8} "
+          f"{'us/sent.':>8} {'lag p50':>8} {'lag p99':>8} {'lag max':>8}")
+    for receivers, r in asyncio.run(run(args)).items():
+        counts = r["counts"]
+        rejected = counts["malformed"] + counts["bad_checksum"] + counts["unsupported"] + counts["overflow"]
+        cpu = "n/a" if r["us_per_sentence"] is None else f"{r['us_per_sentence']:.1f}"
+        print(f"{receivers:>9} {r['sent']:>8} {counts['sentences']:>8} {rejected:>8} {counts['published']:>8} "
+              f"{cpu:>8} {r['lag_p50_ms']:>6.2f}ms {r['lag_p99_ms']:>6.2f}ms {r['lag_max_ms']:>6.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark: latest-state store updates and spatial queries.
+
+Tracks N devices scattered over a sea area, then times position updates, bounding-box
+and k-nearest queries against the grid index:
+
+    python benchmarks/bench_state.py [--devices 5000] [--cell 0.05]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from keelson.payloads.foxglove.LocationFix_pb2 import LocationFix  # noqa: E402
+from keelson.payloads.Primitives_pb2 import TimestampedFloat  # noqa: E402
+
+from state import StateStore  # noqa: E402
+
+
+def best_of(fn, number, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=5000)
+    parser.add_argument("--cell", type=float, default=0.05, help="Grid cell size in degrees")
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    store = StateStore(cell_deg=args.cell)
+    fix = LocationFix()
+    speed = TimestampedFloat()
+    positions = [(rnd.uniform(55.0, 60.0), rnd.uniform(10.0, 20.0)) for _ in range(args.devices)]
+
+    start = time.perf_counter()
+    for idx, (lat, lon) in enumerate(positions):
+        fix.latitude = lat
+        fix.longitude = lon
+        store.observe(f"vessel-{idx}", "location_fix", "gnss", fix)
+        speed.value = 5.0
+        store.observe(f"vessel-{idx}", "speed_over_ground_knots", "gnss", speed)
+    update = (time.perf_counter() - start) / (2 * args.devices) * 1e6
+
+    print(f"devices={args.devices} cells={store.stats()['cells']} cell={args.cell} deg")
+    print(f"update               : {update:8.2f} us")
+    print(f"unrelated subject    : {best_of(lambda: store.observe('vessel-1', 'yaw_deg', 'gnss', speed), 10000):8.2f} us")
+    print(f"bbox 0.5 x 1 deg     : {best_of(lambda: store.within(57.0, 12.0, 57.5, 13.0), 200):8.2f} us")
+    print(f"bbox whole area      : {best_of(lambda: store.within(55.0, 10.0, 60.0, 20.0), 20):8.2f} us")
+    for k in (1, 10, 100):
+        print(f"nearest k={k:<4}       : {best_of(lambda: store.nearest(57.5, 15.0, k=k), 200):8.2f} us")
+    print(f"latest(entity)       : {best_of(lambda: store.latest('vessel-42'), 10000):8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
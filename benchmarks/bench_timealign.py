@@ -0,0 +1,105 @@
+"""Benchmark: time alignment of high-rate IMU streams.
+
+Simulates --devices phones uploading --hz samples per second in one batch per second,
+with a share of batches delayed and delivered out of order, on a virtual clock ticked
+like the service's release loop. Reports CPU time per sample, the peak number of held
+envelopes, the longest time one was held and the late-sample counts:
+
+    python benchmarks/bench_timealign.py [--devices 200] [--hz 100] [--seconds 30]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from timealign import TimeAligner  # noqa: E402
+
+S = 1_000_000_000
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def run(args, budget):
+    rnd = random.Random(1)
+    clock = VirtualClock()
+    aligner = TimeAligner(budget=budget, max_pending=args.max_pending, clock=clock)
+    tick = min(0.1, max(0.005, budget / 4)) * S
+    step = S // args.hz
+    # Per device: clock offset (some phones are off by up to a minute) and the batches
+    # still in flight as (arrival, first sample time)
+    offsets = [rnd.choice((0, 0, 0, rnd.randint(-60, 60) * S)) for _ in range(args.devices)]
+    inflight = []
+    for second in range(args.seconds):
+        for device in range(args.devices):
+            delay = rnd.randint(0, 300_000_000)
+            if rnd.random() < args.reorder:
+                delay += S + rnd.randint(0, S)
+            inflight.append(((second + 1) * S + delay, device, second * S + offsets[device]))
+    inflight.sort()
+
+    pushed = released = peak = 0
+    held_max = 0
+    cpu = 0.0
+    idx = 0
+    end = (args.seconds + 3) * S
+    while clock.now < end:
+        clock.now += int(tick)
+        start = time.perf_counter()
+        while idx < len(inflight) and inflight[idx][0] <= clock.now:
+            _, device, first = inflight[idx]
+            idx += 1
+            stream = aligner.begin(f"device-{device}", "phone", first + (args.hz - 1) * step)
+            offset = stream.offset_ns
+            for n in range(args.hz):
+                ts = first + n * step + offset
+                if aligner.accept(stream, "linear_acceleration_mpss", ts):
+                    aligner.push(stream, "linear_acceleration_mpss", ts, clock.now)
+                    pushed += 1
+        peak = max(peak, aligner.pending())
+        for arrived in aligner.release():
+            held_max = max(held_max, clock.now - arrived)
+            released += 1
+        cpu += time.perf_counter() - start
+    stats = aligner.stats(top=0)
+    samples = args.devices * args.hz * args.seconds
+    return {
+        "us_per_sample": cpu / samples * 1e6,
+        "peak_pending": peak,
+        "held_max_ms": held_max / 1e6,
+        "late_dropped": stats["late_dropped"],
+        "forced": stats["forced"],
+        "skewed_streams": stats["skewed_streams"],
+        "released": released,
+        "samples": samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--hz", type=int, default=100, help="IMU samples per second per device")
+    parser.add_argument("--seconds", type=int, default=30)
+    parser.add_argument("--reorder", type=float, default=0.05, help="Share of batches delivered a second late")
+    parser.add_argument("--max-pending", type=int, default=20000)
+    parser.add_argument("--budget-ms", type=float, nargs="+", default=[20, 100, 500])
+    args = parser.parse_args()
+
+    print(f"devices={args.devices} hz={args.hz} seconds={args.seconds} reorder={args.reorder:.0%}")
+    print(f"{'budget ms':>10}{'us/sample':>10}{'peak held':>10}{'held max ms':>12}{'late':>9}{'forced':>8}{'skewed':>7}")
+    for budget_ms in args.budget_ms:
+        r = run(args, budget_ms / 1000)
+        print(f"{budget_ms:>10.0f}{r['us_per_sample']:>10.2f}{r['peak_pending']:>10}{r['held_max_ms']:>12.0f}"
+              f"{r['late_dropped']:>9}{r['forced']:>8}{r['skewed_streams']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark: track history appends, range queries, simplification and encoding.
+
+Fills one (entity, source) track with a long, wandering 1 Hz trajectory and times the
+append path and each stage of a /track request on it:
+
+    python benchmarks/bench_tracks.py [--points 86400] [--tolerance 5]
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from keelson.payloads.foxglove.LocationFix_pb2 import LocationFix  # noqa: E402
+from keelson.payloads.Primitives_pb2 import TimestampedFloat  # noqa: E402
+
+import tracks  # noqa: E402
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=86_400, help="Fixes in the track (1 Hz)")
+    parser.add_argument("--tolerance", type=float, default=5.0, help="Simplification tolerance in meters")
+    args = parser.parse_args()
+
+    rnd = random.Random(1)
+    store = tracks.TrackStore(max_points=args.points)
+    fix = LocationFix()
+    speed = TimestampedFloat()
+    lat, lon, heading = 57.7, 11.9, 0.0
+
+    start = time.perf_counter()
+    for n in range(args.points):
+        heading += rnd.gauss(0.0, 2.0)
+        lat += 3e-5 * math.cos(math.radians(heading))
+        lon += 5e-5 * math.sin(math.radians(heading))
+        fix.timestamp.seconds = 1_700_000_000 + n
+        fix.latitude = lat
+        fix.longitude = lon
+        store.observe("vessel", "location_fix", "gnss", fix)
+        speed.timestamp.seconds = fix.timestamp.seconds
+        speed.value = 6.0
+        store.observe("vessel", "speed_over_ground_knots", "gnss", speed)
+    append = (time.perf_counter() - start) / (2 * args.points) * 1e6
+
+    track = store.sources("vessel")["gnss"]
+    stats = store.stats()
+    print(f"points={args.points} bytes={stats['bytes']} tolerance={args.tolerance} m")
+    print(f"observe (fix + sog)     : {append:9.2f} us/payload")
+
+    last_hour = (track.last_time() - 3600 * 1_000_000_000, None)
+    for label, bounds in (("slice all", (None, None)), ("slice last hour", last_hour)):
+        ms, columns = timed(lambda: track.slice(*bounds))
+        print(f"{label:<24}: {ms:9.2f} ms  {len(columns[0]):>7} points")
+
+    columns = track.slice()
+    for label, fn in (
+        ("decimate 10 s", lambda: tracks.simplify(columns, interval_s=10)),
+        ("douglas-peucker", lambda: tracks.simplify(columns, args.tolerance, "dp")),
+        ("visvalingam", lambda: tracks.simplify(columns, args.tolerance, "vw")),
+    ):
+        ms, simplified = timed(fn)
+        print(f"{label:<24}: {ms:9.2f} ms  {len(simplified[0]):>7} points")
+
+    simplified = tracks.simplify(columns, args.tolerance, "dp")
+    for label, data in (("full", columns), ("simplified", simplified)):
+        ms, body = timed(lambda: json.dumps(tracks.to_geojson_feature("vessel", "gnss", data)).encode())
+        print(f"geojson {label:<16}: {ms:9.2f} ms  {len(body):>9} bytes")
+        ms, body = timed(lambda: tracks.encode_binary(data))
+        print(f"binary {label:<17}: {ms:9.2f} ms  {len(body):>9} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Throughput vs. uvicorn worker count.
+
+Starts `uvicorn main:app --workers N` for each N (Zenoh in peer mode with no endpoint,
+so nothing leaves the host) and drives it over real HTTP from several load-generating
+processes posting Sensor Logger batches:
+
+    python benchmarks/bench_workers.py                     # N = 1, 2, 4
+    python benchmarks/bench_workers.py --workers 1 2 4 8 --duration 20
+
+The load generators share the machine with the server; leave them enough cores
+(--clients) or the numbers flatten out because the client saturates first.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from payloads import sensorlogger_batch  # noqa: E402
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(workers, port):
+    env = dict(
+        os.environ,
+        ZENOH_CONNECT="",
+        # Bodies repeat across clients; keep them all flowing through the mapping path
+        DEDUP_WINDOW="0",
+        PUBLISH_POLICIES="off",
+        TIME_ALIGN="false",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=REPO,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_until_up(port, workers, timeout=60.0):
+    """Wait until `workers` distinct worker pids have an open Zenoh session."""
+    import httpx
+
+    pids = set()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            # A new connection per probe, so the kernel spreads them over the workers
+            body = httpx.get(f"http://127.0.0.1:{port}/ready").json()
+            if body["zenoh"]["session"]:
+                pids.add(body["pid"])
+                if len(pids) >= workers:
+                    return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"Server with {workers} workers did not come up (saw {len(pids)})")
+
+
+def client_process(port, batch_size, concurrency, duration, seed, results):
+    import httpx
+
+    bodies = [
+        json.dumps(sensorlogger_batch(batch_size, seed=seed * 100 + idx, message_id=idx)).encode()
+        for idx in range(8)
+    ]
+
+    async def run():
+        done = 0
+        errors = 0
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+            deadline = time.monotonic() + duration
+
+            async def loop(idx):
+                nonlocal done, errors
+                while time.monotonic() < deadline:
+                    response = await client.post(
+                        "/sensorlogger/bench",
+                        content=bodies[idx % len(bodies)],
+                        headers={"content-type": "application/json"},
+                    )
+                    if response.status_code == 200:
+                        done += 1
+                    else:
+                        errors += 1
+                    idx += 1
+
+            await asyncio.gather(*(loop(idx) for idx in range(concurrency)))
+        return done, errors
+
+    results.put(asyncio.run(run()))
+
+
+def measure(workers, args):
+    server = start_server(workers, args.port)
+    try:
+        wait_until_up(args.port, workers)
+        results = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(
+                target=client_process,
+                args=(args.port, args.batch, args.concurrency, args.duration, seed, results),
+            )
+            for seed in range(args.clients)
+        ]
+        for process in clients:
+            process.start()
+        totals = [results.get() for _ in clients]
+        for process in clients:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    done = sum(d for d, _ in totals)
+    errors = sum(e for _, e in totals)
+    return {
+        "requests_per_s": done / args.duration,
+        "entries_per_s": done * args.batch / args.duration,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Load-generating processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="In-flight requests per client")
+    parser.add_argument("--batch", type=int, default=100, help="Sensor Logger entries per request")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per worker count")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} client processes, {args.batch} entries/request")
+    header = f"{'workers':>8}{'req/s':>10}{'entries/s':>12}{'speedup':>9}{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    base = None
+    for workers in args.workers:
+        result = measure(workers, args)
+        base = base or result["requests_per_s"] or 1.0
+        print(
+            f"{workers:>8}{result['requests_per_s']:>10.0f}{result['entries_per_s']:>12.0f}"
+            f"{result['requests_per_s'] / base:>8.2f}x{result['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Realistic request payloads shared by the benchmarks."""
+import random
+from datetime import datetime, timezone
+
+# Sample bodies from the README (GPSLogger custom URL, POST form body)
+GPSLOGGER_BODIES = [
+    b"lat=57.43587153498083&lon=12.032563565298915&sat=0&desc=&alt=72.0&acc=7.0&dir=0.0&prov=gps"
+    b"&spd_kph=0.2520000010728836&spd=0.07&timestamp=1742503647"
+    b"&timeoffset=2025-03-20T21:47:27.834%2B01:00&time=2025-03-20T20:47:27.834Z"
+    b"&starttimestamp=1742499925&date=2025-03-20&batt=54.0&ischarging=false&aid=089db14317f6af11"
+    b"&ser=089db14317f6af11&act=&filename=20250320&profile=Default+Profile&hdop=0.4&vdop=0.8"
+    b"&pdop=1.0&dist=1062&",
+    b"lat=57.43596067652106&lon=12.032632464542985&sat=27&desc=&alt=74.0&acc=4.0&dir=0.0&prov=gps"
+    b"&spd_kph=0.0&spd=0.0&timestamp=1743335495&timeoffset=2025-03-30T13:51:35.000%2B02:00"
+    b"&time=2025-03-30T11:51:35.000Z&starttimestamp=1743235240&date=2025-03-30&batt=45.0"
+    b"&ischarging=true&aid=089db14317f6af11&ser=089db14317f6af11&act=&filename=20250330"
+    b"&profile=Default+Profile&hdop=0.4&vdop=0.6&pdop=0.8&dist=11432",
+]
+
+
+
+def gpslogger_bodies(n, t0=1742503647.834):
+    """`n` GPSLogger bodies alternating between the samples above, with fix times 1 s
+    apart so none of them is a retry or a late sample."""
+    bodies = []
+    for idx in range(n):
+        body = GPSLOGGER_BODIES[idx % len(GPSLOGGER_BODIES)]
+        start = body.index(b"&time=") + 6
+        end = body.index(b"&", start)
+        fix_time = datetime.fromtimestamp(t0 + idx, timezone.utc).isoformat(timespec="milliseconds")
+        bodies.append(body[:start] + fix_time.replace("+00:00", "Z").encode() + body[end:])
+    return bodies
+
+
+# Rough share of entries per sensor in a Sensor Logger push with IMU at 100 Hz
+SENSOR_WEIGHTS = {
+    "accelerometer": 25,
+    "gyroscope": 25,
+    "magnetometer": 20,
+    "orientation": 20,
+    "gravity": 5,
+    "barometer": 2,
+    "location": 2,
+    "battery": 1,
+}
+
+
+def sensor_values(name, rnd):
+    if name in ("accelerometer", "gyroscope", "magnetometer", "gravity"):
+        return {"x": rnd.uniform(-1, 1), "y": rnd.uniform(-1, 1), "z": rnd.uniform(-1, 1)}
+    if name == "orientation":
+        return {
+            "qx": 0.0, "qy": 0.0, "qz": 0.0, "qw": 1.0,
+            "roll": rnd.uniform(-0.2, 0.2), "pitch": rnd.uniform(-0.2, 0.2), "yaw": rnd.uniform(-3, 3),
+        }
+    if name == "barometer":
+        return {"pressure": rnd.uniform(1000, 1020), "relativeAltitude": 0.0}
+    if name == "location":
+        return {
+            "latitude": 57.7 + rnd.uniform(-0.01, 0.01), "longitude": 11.9 + rnd.uniform(-0.01, 0.01),
+            "altitude": 12.0, "speed": rnd.uniform(0, 8), "bearing": rnd.uniform(0, 360),
+            "horizontalAccuracy": 4.0, "verticalAccuracy": 3.0, "altitudeAboveMeanSeaLevel": 10.0,
+        }
+    return {"level": 0.54, "state": "charging"}
+
+
+def sensorlogger_entries(n, seed=0, t0=1742503647834000000):
+    """A mixed list of `n` Sensor Logger payload entries, 10 ms apart."""
+    rnd = random.Random(seed)
+    names = rnd.choices(list(SENSOR_WEIGHTS), weights=list(SENSOR_WEIGHTS.values()), k=n)
+    return [
+        {"name": name, "time": t0 + idx * 10_000_000, "values": sensor_values(name, rnd)}
+        for idx, name in enumerate(names)
+    ]
+
+
+def sensorlogger_batch(n, seed=0, message_id=0, device_id="bench-device", t0=1742503647834000000):
+    """A complete Sensor Logger HTTP push body with `n` entries."""
+    return {
+        "messageId": message_id,
+        "sessionId": "bench-session",
+        "deviceId": device_id,
+        "payload": sensorlogger_entries(n, seed=seed, t0=t0),
+    }
@@ -0,0 +1,216 @@
+"""Sensor Logger request bodies: Content-Encoding and fast typed JSON decoding.
+
+Phones on cellular links can compress their uploads. `decompress` undoes
+`Content-Encoding: gzip`, `deflate` and (with the `zstandard` package) `zstd`, and
+refuses bodies that would inflate past a size limit.
+
+`sensorlogger_decoder(registry)` returns the fastest available body decoder:
+
+- msgspec: the body decodes straight into typed structs generated from the mapping
+  registry. Values no rule reads, which is everything an unknown sensor sends, are
+  skipped by the parser. A body that does not fit the schema (a string time, a null
+  payload...) is decoded again with the generic path below.
+- orjson, or the stdlib json module: full decode, then unknown sensors are dropped.
+
+Every decoder returns (body, skipped): body is a dict shaped like the Sensor Logger
+JSON ({messageId, sessionId, deviceId, payload: [{name, time, values}]}), with only
+known sensors in the payload, and skipped counts the entries left out. Entries are
+dicts, or with msgspec Structs that support the same `[key]` / `.get()` / `in` access.
+"""
+import io
+import json
+import zlib
+
+try:
+    import msgspec
+except ImportError:  # optional: pip install msgspec
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+
+class UnsupportedEncoding(ValueError):
+    """The request uses a Content-Encoding this server cannot decode."""
+
+
+class BodyTooLarge(ValueError):
+    """The decompressed body exceeds the configured limit."""
+
+
+# --- Content-Encoding ----------------------------------------------------------------
+def _inflate(body, wbits, max_size):
+    decompressor = zlib.decompressobj(wbits)
+    out = decompressor.decompress(body, max_size + 1)
+    if len(out) > max_size:
+        raise BodyTooLarge(f"body inflates past {max_size} bytes")
+    if not decompressor.eof:
+        raise zlib.error("truncated compressed body")
+    return out
+
+
+def _deflate(body, max_size):
+    # "deflate" is meant to be zlib-wrapped, but some clients send a raw stream
+    try:
+        return _inflate(body, zlib.MAX_WBITS, max_size)
+    except zlib.error:
+        return _inflate(body, -zlib.MAX_WBITS, max_size)
+
+
+def _zstd(body, max_size):
+    with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)) as reader:
+        out = reader.read(max_size + 1)
+    if len(out) > max_size:
+        raise BodyTooLarge(f"body inflates past {max_size} bytes")
+    return out
+
+
+CONTENT_DECODERS = {
+    "identity": lambda body, max_size: body,
+    "gzip": lambda body, max_size: _inflate(body, 16 + zlib.MAX_WBITS, max_size),
+    "x-gzip": lambda body, max_size: _inflate(body, 16 + zlib.MAX_WBITS, max_size),
+    "deflate": _deflate,
+}
+if zstandard is not None:
+    CONTENT_DECODERS["zstd"] = _zstd
+
+
+def decompress(body, content_encoding, max_size):
+    """Undo a Content-Encoding header (codings are listed in the order applied)."""
+    if not content_encoding:
+        return body
+    for coding in reversed(content_encoding.split(",")):
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        decoder = CONTENT_DECODERS.get(coding)
+        if decoder is None:
+            raise UnsupportedEncoding(coding)
+        body = decoder(body, max_size)
+    return body
+
+
+# --- JSON ----------------------------------------------------------------------------
+def _generic_decoder(loads, known):
+    def decode(raw):
+        body = loads(raw)
+        if not isinstance(body, dict):
+            raise ValueError("body is not a JSON object")
+        entries = body.get("payload") or []
+        kept = [entry for entry in entries if isinstance(entry, dict) and entry.get("name") in known]
+        body["payload"] = kept
+        return body, len(entries) - len(kept)
+
+    return decode
+
+
+# --- msgspec typed structs ------------------------------------------------------------
+# Entries and their values decode into Structs generated from the mapping registry:
+# one field per value the rules read, anything else is skipped by the parser without
+# building an object. Both Structs answer `[key]`, `.get()` and `in` like the dicts the
+# mapping handlers were written against; a missing or null value is absent.
+def _struct_getitem(self, key):
+    value = getattr(self, key, None)
+    if value is None:
+        raise KeyError(key)
+    return value
+
+
+def _struct_get(self, key, default=None):
+    value = getattr(self, key, None)
+    return default if value is None else value
+
+
+def _struct_contains(self, key):
+    return getattr(self, key, None) is not None
+
+
+_MAPPING_METHODS = {"__getitem__": _struct_getitem, "get": _struct_get, "__contains__": _struct_contains}
+
+
+def _value_fields(registry):
+    """{field: type} for every Sensor Logger value a rule reads."""
+    fields = {}
+    for rules in registry.values():
+        for rule in rules:
+            names = (rule["field"],) if "field" in rule else rule["fields"]
+            for name in names:
+                if rule["kind"] == "bool":
+                    # Charging state arrives as a word, a number or a boolean; keep it as sent
+                    fields[name] = object
+                else:
+                    fields.setdefault(name, float | None)
+    return fields
+
+
+def _msgspec_decoder(registry):
+    known = frozenset(registry)
+    values_struct = msgspec.defstruct(
+        "SensorLoggerValues",
+        [(name, kind, None) for name, kind in sorted(_value_fields(registry).items())],
+        namespace=_MAPPING_METHODS,
+        gc=False,
+    )
+    entry_struct = msgspec.defstruct(
+        "SensorLoggerEntry",
+        [("name", str), ("time", int), ("values", values_struct | None, None)],
+        namespace=_MAPPING_METHODS,
+        gc=False,
+    )
+    body_struct = msgspec.defstruct(
+        "SensorLoggerBody",
+        [
+            ("messageId", object, None),
+            ("sessionId", object, None),
+            ("deviceId", object, None),
+            ("payload", list[entry_struct], []),
+        ],
+        gc=False,
+    )
+    body_decoder = msgspec.json.Decoder(body_struct)
+    fallback = _generic_decoder(orjson.loads if orjson is not None else json.loads, known)
+
+    def decode(raw):
+        try:
+            body = body_decoder.decode(raw)
+        except msgspec.ValidationError:
+            # Valid JSON that does not fit the schema: let the per-entry handlers judge it
+            return fallback(raw)
+        entries = body.payload
+        kept = [entry for entry in entries if entry.name in known]
+        return {
+            "messageId": body.messageId,
+            "sessionId": body.sessionId,
+            "deviceId": body.deviceId,
+            "payload": kept,
+        }, len(entries) - len(kept)
+
+    return decode
+
+
+def available_decoders():
+    names = ["json"]
+    if orjson is not None:
+        names.append("orjson")
+    if msgspec is not None:
+        names.append("msgspec")
+    return names
+
+
+def sensorlogger_decoder(registry, kind="auto"):
+    """Body decoder for a Sensor Logger mapping registry. `kind` is "auto" (the fastest
+    installed), "msgspec", "orjson" or "json"; returns (decode, kind used)."""
+    if kind == "auto":
+        kind = available_decoders()[-1]
+    if kind not in available_decoders():
+        raise ValueError(f"JSON decoder '{kind}' is not available, expected one of {available_decoders()}")
+    if kind == "msgspec":
+        return _msgspec_decoder(registry), kind
+    return _generic_decoder(orjson.loads if kind == "orjson" else json.loads, frozenset(registry)), kind
@@ -0,0 +1,67 @@
+"""Bounded duplicate suppression for retried uploads.
+
+Phones on flaky links resend a batch when the response is lost. `DedupWindow` remembers
+the keys of recently accepted batches in a time-windowed LRU: a key is forgotten after
+`ttl` seconds or when more than `maxsize` newer keys arrived, so memory stays bounded no
+matter how many devices push. A lookup is one dict probe.
+
+The window is used from the event loop only and is not thread-safe.
+"""
+import collections
+import time
+
+
+class DedupWindow:
+    def __init__(self, maxsize=100_000, ttl=600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> accepted_at, ordered from oldest to newest
+        self._keys = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def seen(self, key):
+        """True if `key` was accepted within the window (a duplicate)."""
+        accepted_at = self._keys.get(key)
+        if accepted_at is not None and time.monotonic() - accepted_at < self.ttl:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, key):
+        """Record `key` as accepted; call once the batch was actually queued."""
+        now = time.monotonic()
+        keys = self._keys
+        keys[key] = now
+        keys.move_to_end(key)
+        while len(keys) > self.maxsize:
+            keys.popitem(last=False)
+            self.evicted += 1
+        # Expire from the old end; stops at the first live key, so amortized O(1)
+        horizon = now - self.ttl
+        while keys:
+            oldest = next(iter(keys.values()))
+            if oldest >= horizon:
+                break
+            keys.popitem(last=False)
+            self.expired += 1
+
+    def __len__(self):
+        return len(self._keys)
+
+    def stats(self):
+        checks = self.hits + self.misses
+        return {
+            "size": len(self._keys),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / checks if checks else 0.0,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,94 @@
+"""Low-allocation protobuf encoding helpers for the publish path.
+
+Three costs dominate turning a reading into bytes on the wire: allocating a fresh
+payload message, converting nanoseconds into a Timestamp, and `keelson.enclose`, which
+builds a second message, copies the payload into it and serializes it again.
+
+- `template(cls)` hands out one payload instance per thread and class. Builders fill
+  every field they use on each call, so no `Clear()` is needed; the instance must be
+  serialized before the next reading is built on the same thread.
+- `split_ns` remembers the last timestamp it split, so the ten GPSLogger subjects
+  sharing one fix time divide once.
+- `enclose` writes the keelson Envelope wire format directly: a cached
+  `enclosed_at` field followed by the payload, in a single concatenation. The output
+  is byte-identical to `keelson.enclose(payload, enclosed_at)`; `enclosed_at` is
+  refreshed at most every ENCLOSED_AT_RESOLUTION_NS (1 ms).
+"""
+import threading
+from time import time_ns
+
+
+ENCLOSED_AT_RESOLUTION_NS = 1_000_000
+
+
+# --- Payload templates -------------------------------------------------------------
+_templates = threading.local()
+
+
+def template(cls):
+    """Return this thread's reusable instance of the protobuf message class `cls`."""
+    try:
+        return _templates.__dict__[cls]
+    except KeyError:
+        message = _templates.__dict__[cls] = cls()
+        return message
+
+
+# --- Timestamps ------------------------------------------------------------------------
+_last_split = (None, 0, 0)
+
+
+def split_ns(ts_ns):
+    """Split epoch nanoseconds into (seconds, nanos), reusing the previous split."""
+    global _last_split
+    last = _last_split
+    if last[0] == ts_ns:
+        return last[1], last[2]
+    seconds, nanos = divmod(ts_ns, 1_000_000_000)
+    _last_split = (ts_ns, seconds, nanos)
+    return seconds, nanos
+
+
+# --- Envelope ----------------------------------------------------------------------------
+def _varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+# Envelope.payload (field 2, length delimited) tag + length, for common payload sizes
+_PAYLOAD_HEADERS = tuple(b"\x12" + _varint(size) for size in range(16384))
+
+
+def _enclosed_at_field(ts_ns):
+    """Envelope.enclosed_at (field 1) as encoded bytes."""
+    seconds, nanos = divmod(ts_ns, 1_000_000_000)
+    timestamp = (b"\x08" + _varint(seconds) if seconds else b"") + (b"\x10" + _varint(nanos) if nanos else b"")
+    return b"\x0a" + _varint(len(timestamp)) + timestamp
+
+
+_enclosed_at = (0, b"")
+
+
+def enclose(payload, enclosed_at=None):
+    """Wrap serialized `payload` bytes in a keelson Envelope and return its bytes."""
+    global _enclosed_at
+    if enclosed_at is None:
+        now = time_ns()
+        cached = _enclosed_at
+        if now - cached[0] < ENCLOSED_AT_RESOLUTION_NS:
+            prefix = cached[1]
+        else:
+            prefix = _enclosed_at_field(now)
+            _enclosed_at = (now, prefix)
+    else:
+        prefix = _enclosed_at_field(enclosed_at)
+
+    size = len(payload)
+    if not size:
+        return prefix
+    header = _PAYLOAD_HEADERS[size] if size < 16384 else b"\x12" + _varint(size)
+    return prefix + header + payload
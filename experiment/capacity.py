@@ -0,0 +1,179 @@
+"""Capacity report: how many phones the service sustains at a target p99 delay.
+
+Ramps a simulated fleet (fleet.py) through --devices steps against the service while a
+latency probe (probe.py) subscribes to `rise/@v0/**` in the same process. Each step
+warms up, then measures for --duration seconds:
+
+- post -> delivery delay of `location_fix` (p50/p99): from the moment a phone sends the
+  request to the moment the sample comes out of Zenoh
+- loss: location samples the service answered 200 for that never arrived
+- reordering, and requests refused with 429/503 or failed
+
+A step passes when its p99 is within --target-p99-ms, loss within --max-loss and no request
+failed. The ramp stops at the first step that does not pass; the report names the
+largest step that did.
+
+Everything can run on one machine. With --start-server the service is started here
+(`uvicorn main:app`, connected to the probe's Zenoh endpoint), otherwise point --url at
+a running one and give the probe the same router or peer:
+
+    python experiment/capacity.py --start-server -l tcp/127.0.0.1:7447 --devices 10 50 100 200
+    python experiment/capacity.py --url http://127.0.0.1:8000 -e tcp/127.0.0.1:7447
+
+The phones, the probe and the service compete for the same CPUs; on a small machine the
+figures are a lower bound.
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+import common
+from fleet import Stats, add_fleet_arguments, make_phones, run_fleet
+from probe import KEY, TRACER, LatencyProbe, print_report
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(args, endpoint):
+    port = httpx.URL(args.url).port or 8000
+    env = dict(
+        os.environ,
+        ZENOH_CONNECT=endpoint,
+        # Each phone's traffic is unique; policies would hide part of what is measured
+        PUBLISH_POLICIES=os.environ.get("PUBLISH_POLICIES", "off"),
+        LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--workers", str(args.server_workers), "--log-level", "warning", "--no-access-log"],
+        cwd=REPO,
+        env=env,
+    )
+    deadline = time.monotonic() + 60.0
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{args.url}/ready").status_code == 200:
+                return server
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Service at {args.url} did not become ready")
+
+
+async def run_step(devices, args, probe):
+    phones = make_phones(devices, args.sensorlogger_share, args.seed)
+    stats = Stats(track=True)
+    probe.begin(stats)
+    fleet = asyncio.create_task(run_fleet(phones, args, stats, args.warmup + args.duration))
+    await asyncio.sleep(args.warmup)
+
+    # Measurement window: forget what was sent while the fleet was ramping up
+    stats.reset()
+    probe.begin(stats)
+    started = time.monotonic()
+    await fleet
+    elapsed = time.monotonic() - started
+    await asyncio.sleep(args.grace)
+
+    report = probe.report()
+    tracer = report["subjects"].get(TRACER, {})
+    p99 = tracer.get("e2e_p99_ms")
+    ok = (
+        p99 is not None
+        and p99 <= args.target_p99_ms
+        and report["loss"] <= args.max_loss
+        and stats.rejected == 0
+        and stats.errors == 0
+    )
+    return {
+        "devices": devices,
+        "passed": ok,
+        "requests_per_s": stats.requests / elapsed,
+        "entries_per_s": stats.entries / elapsed,
+        "messages_per_s": sum(s["messages"] for s in report["subjects"].values()) / elapsed,
+        "rejected": stats.rejected,
+        "errors": stats.errors,
+        "p50_ms": tracer.get("e2e_p50_ms"),
+        "p99_ms": p99,
+        "max_ms": tracer.get("e2e_max_ms"),
+        "ingest_p99_ms": max((s["ingest_p99_ms"] for s in report["subjects"].values()), default=None),
+        "loss": report["loss"],
+        "reordered": sum(s["reordered"] for s in report["subjects"].values()),
+        "probe": report,
+    }
+
+
+def _ms(value):
+    return "-" if value is None else f"{value:.0f}"
+
+
+async def ramp(args, probe):
+    results = []
+    print(f"{'devices':>8}{'req/s':>8}{'entries/s':>10}{'msg/s':>9}{'p50 ms':>8}{'p99 ms':>8}"
+          f"{'max ms':>8}{'loss':>8}{'reord.':>7}{'refused':>8}{'errors':>7}  ")
+    for devices in args.devices:
+        r = await run_step(devices, args, probe)
+        results.append(r)
+        print(f"{devices:>8}{r['requests_per_s']:>8.0f}{r['entries_per_s']:>10.0f}{r['messages_per_s']:>9.0f}"
+              f"{_ms(r['p50_ms']):>8}{_ms(r['p99_ms']):>8}{_ms(r['max_ms']):>8}{r['loss']:>8.2%}"
+              f"{r['reordered']:>7}{r['rejected']:>8}{r['errors']:>7}  {'ok' if r['passed'] else 'FAIL'}",
+              flush=True)
+        if args.verbose:
+            print_report(r["probe"])
+        if not r["passed"]:
+            break
+    return results
+
+
+def main():
+    parser = common.argument_parser(__doc__)
+    add_fleet_arguments(parser)
+    parser.add_argument("--devices", type=int, nargs="+", default=[10, 25, 50, 100, 200, 400, 800],
+                        help="Fleet sizes to ramp through")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds at the start of a step")
+    parser.add_argument("--grace", type=float, default=2.0, help="Seconds to wait for late deliveries after a step")
+    parser.add_argument("--target-p99-ms", type=float, default=1000.0, help="Post -> delivery p99 a step must meet")
+    parser.add_argument("--max-loss", type=float, default=0.001, help="Share of accepted samples a step may lose")
+    parser.add_argument("--start-server", action="store_true", help="Start the service here with uvicorn")
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn workers with --start-server")
+    parser.add_argument("--save", metavar="FILE", help="Write the step results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Per-subject table after every step")
+    args = parser.parse_args()
+
+    probe = LatencyProbe()
+    server = None
+    with common.open_session(args) as session:
+        subscriber = session.declare_subscriber(KEY, probe)
+        try:
+            if args.start_server:
+                endpoints = (args.listen or []) + (args.connect or [])
+                if not endpoints:
+                    parser.error("--start-server needs the probe's --listen (or a router in --connect)")
+                server = start_server(args, endpoints[0])
+            results = asyncio.run(ramp(args, probe))
+        finally:
+            subscriber.undeclare()
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    passed = [r["devices"] for r in results if r["passed"]]
+    if passed:
+        print(f"Max sustainable: {max(passed)} devices at p99 <= {args.target_p99_ms:.0f} ms "
+              f"and loss <= {args.max_loss:.2%}")
+    else:
+        print(f"No step met p99 <= {args.target_p99_ms:.0f} ms and loss <= {args.max_loss:.2%}")
+    if args.save:
+        with open(args.save, "w") as fp:
+            json.dump({"args": {k: v for k, v in vars(args).items()}, "steps": results}, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
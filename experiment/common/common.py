@@ -4,6 +4,15 @@ import json
 import zenoh
 
 
+def argument_parser(doc: str, zenoh_config: bool = True) -> argparse.ArgumentParser:
+    """Parser described by the first line of a script's docstring, with the Zenoh
+    session arguments unless `zenoh_config` is false."""
+    parser = argparse.ArgumentParser(description=doc.splitlines()[0])
+    if zenoh_config:
+        add_config_arguments(parser)
+    return parser
+
+
 def add_config_arguments(parser: argparse.ArgumentParser):
     parser.add_argument(
         "--mode",
@@ -80,4 +89,10 @@ def get_config_from_args(args) -> zenoh.Config:
             raise
         conf.insert_json5(key, value)
 
-    return conf
\ No newline at end of file
+    return conf
+
+
+def open_session(args) -> zenoh.Session:
+    """Open a Zenoh session configured by the `add_config_arguments` arguments."""
+    zenoh.init_log_from_env_or("error")
+    return zenoh.open(get_config_from_args(args))
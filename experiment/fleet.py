@@ -0,0 +1,240 @@
+"""Fleet simulator: N virtual phones posting GPSLogger and Sensor Logger traffic.
+
+Every phone rides a simulated vessel (speed and heading wander, the position is dead
+reckoned from them) and runs one of the two apps:
+
+- GPSLogger: a form-encoded fix to `/log_all/{entity}` every 1/--gps-hz seconds
+- Sensor Logger: a JSON batch to `/sensorlogger/{entity}` every --batch-interval
+  seconds, with location and barometer at 1 Hz and accelerometer, gyroscope and
+  orientation at --imu-hz
+
+Sample times are the wall-clock times the samples were taken, so a subscriber on the
+same machine can tell how long each one took to come out of Zenoh (see probe.py).
+All phones share one pooled HTTP client on one asyncio loop:
+
+    python experiment/fleet.py --url http://127.0.0.1:8000 --devices 100 --duration 60
+"""
+import asyncio
+import json
+import math
+import random
+import time
+import urllib.parse
+
+import httpx
+
+# Start positions are spread over a box off Gothenburg
+ORIGIN_LAT, ORIGIN_LON, SPREAD_DEG = 57.6, 11.7, 0.2
+METERS_PER_DEG_LAT = 111_320.0
+
+
+class Vessel:
+    """Dead-reckoned vessel: rate of turn and speed wander, position follows."""
+
+    __slots__ = ("lat", "lon", "sog", "cog", "rot", "phase")
+
+    def __init__(self, rnd):
+        self.lat = ORIGIN_LAT + rnd.uniform(0, SPREAD_DEG)
+        self.lon = ORIGIN_LON + rnd.uniform(0, SPREAD_DEG)
+        self.sog = rnd.uniform(1.0, 8.0)  # m/s
+        self.cog = rnd.uniform(0.0, 360.0)
+        self.rot = 0.0  # deg/s
+        self.phase = rnd.uniform(0, 2 * math.pi)
+
+    def step(self, dt, rnd):
+        self.rot = max(-3.0, min(3.0, 0.95 * self.rot + rnd.gauss(0.0, 0.3) * math.sqrt(dt)))
+        self.cog = (self.cog + self.rot * dt) % 360.0
+        self.sog = max(0.0, min(15.0, self.sog + rnd.gauss(0.0, 0.1) * math.sqrt(dt)))
+        distance = self.sog * dt
+        course = math.radians(self.cog)
+        self.lat += distance * math.cos(course) / METERS_PER_DEG_LAT
+        self.lon += distance * math.sin(course) / (METERS_PER_DEG_LAT * math.cos(math.radians(self.lat)))
+
+    def motion(self, t, rnd):
+        """Roll, pitch (rad) and vertical acceleration from a swell with period ~6 s."""
+        wave = math.sin(2 * math.pi * t / 6.0 + self.phase)
+        return 0.08 * wave + rnd.gauss(0, 0.005), 0.03 * wave + rnd.gauss(0, 0.005), 0.6 * wave + rnd.gauss(0, 0.05)
+
+
+class Stats:
+    """Request outcomes shared by all phones. With `track`, `sent` maps (entity, sample ns)
+    of every posted location sample to the monotonic time its request was sent and
+    `accepted` holds those the service answered 200 for."""
+
+    def __init__(self, track=False):
+        self.track = track
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.ok = 0
+        self.rejected = 0  # 429/503: the service refused, the phone would retry later
+        self.errors = 0
+        self.entries = 0
+        self.sent = {}
+        self.accepted = set()
+
+
+def iso_ms(ts_ns):
+    seconds, nanos = divmod(ts_ns, 1_000_000_000)
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + f".{nanos // 1_000_000:03d}Z"
+
+
+class VirtualPhone:
+    def __init__(self, idx, app, rnd, entity_prefix="sim"):
+        self.idx = idx
+        self.app = app
+        self.rnd = rnd
+        self.entity_id = f"{entity_prefix}-{idx}"
+        self.device_id = f"sim{idx:06d}"
+        self.vessel = Vessel(rnd)
+        self.battery = rnd.uniform(30, 100)
+        # A new recording session per run, or the service's dedup window drops the
+        # message ids it saw from the previous run
+        self.session_id = f"sim-{idx}-{time.time_ns():x}"
+        self.message_id = 0
+
+    def gpslogger_body(self, ts_ns):
+        v = self.vessel
+        return urllib.parse.urlencode({
+            "lat": f"{v.lat:.7f}", "lon": f"{v.lon:.7f}", "alt": "2.0", "acc": f"{self.rnd.uniform(3, 8):.1f}",
+            "dir": f"{v.cog:.1f}", "spd": f"{v.sog:.2f}", "prov": "gps", "sat": str(self.rnd.randint(8, 20)),
+            "hdop": "0.6", "vdop": "0.9", "pdop": "1.1", "batt": f"{self.battery:.0f}", "ischarging": "false",
+            "timestamp": str(ts_ns // 1_000_000_000), "time": iso_ms(ts_ns),
+            "aid": self.device_id, "ser": self.device_id, "profile": self.device_id,
+        }).encode()
+
+    def sensorlogger_entries(self, start_ns, end_ns, imu_hz):
+        """Entries for the samples taken in [start_ns, end_ns)."""
+        v, rnd = self.vessel, self.rnd
+        entries = []
+        step = int(1e9 / imu_hz)
+        for ts in range(start_ns - start_ns % step + step, end_ns, step):
+            roll, pitch, heave = v.motion(ts / 1e9, rnd)
+            yaw = math.radians(v.cog)
+            cy, sy, cr, sr, cp, sp = (math.cos(yaw / 2), math.sin(yaw / 2), math.cos(roll / 2),
+                                      math.sin(roll / 2), math.cos(pitch / 2), math.sin(pitch / 2))
+            entries.append({"name": "accelerometer", "time": ts,
+                            "values": {"x": rnd.gauss(0, 0.05), "y": rnd.gauss(0, 0.05), "z": heave}})
+            entries.append({"name": "gyroscope", "time": ts,
+                            "values": {"x": rnd.gauss(0, 0.01), "y": rnd.gauss(0, 0.01), "z": math.radians(v.rot)}})
+            entries.append({"name": "orientation", "time": ts, "values": {
+                "qw": cr * cp * cy + sr * sp * sy, "qx": sr * cp * cy - cr * sp * sy,
+                "qy": cr * sp * cy + sr * cp * sy, "qz": cr * cp * sy - sr * sp * cy,
+                "roll": roll, "pitch": pitch, "yaw": yaw}})
+        for ts in range(start_ns - start_ns % 1_000_000_000 + 1_000_000_000, end_ns, 1_000_000_000):
+            entries.append({"name": "location", "time": ts, "values": {
+                "latitude": v.lat, "longitude": v.lon, "altitude": 20.0, "altitudeAboveMeanSeaLevel": 2.0,
+                "speed": v.sog, "bearing": v.cog, "horizontalAccuracy": rnd.uniform(3, 8), "verticalAccuracy": 4.0}})
+            entries.append({"name": "barometer", "time": ts,
+                            "values": {"pressure": 1013.0 + rnd.gauss(0, 0.05), "relativeAltitude": 0.0}})
+        return entries
+
+    def sensorlogger_body(self, entries):
+        self.message_id += 1
+        return json.dumps({"messageId": self.message_id, "sessionId": self.session_id,
+                           "deviceId": self.device_id, "payload": entries}).encode()
+
+
+async def post(client, stats, url, body, content_type, location_samples):
+    if stats.track:
+        sent_at = time.monotonic()
+        for key in location_samples:
+            stats.sent[key] = sent_at
+    stats.requests += 1
+    try:
+        response = await client.post(url, content=body, headers={"content-type": content_type})
+    except httpx.HTTPError:
+        stats.errors += 1
+        return
+    if response.status_code == 200:
+        stats.ok += 1
+        if stats.track:
+            # Requests sent before a reset() are not part of the window
+            stats.accepted.update(key for key in location_samples if key in stats.sent)
+    elif response.status_code in (429, 503):
+        stats.rejected += 1
+    else:
+        stats.errors += 1
+
+
+async def run_phone(phone, client, stats, args, stop):
+    rnd = phone.rnd
+    interval = 1.0 / args.gps_hz if phone.app == "gpslogger" else args.batch_interval
+    # Phones start out of phase, as a real fleet would
+    await asyncio.sleep(rnd.uniform(0, interval))
+    last_ns = time.time_ns()
+    last = time.monotonic()
+    while not stop.is_set():
+        now = time.monotonic()
+        phone.vessel.step(now - last, rnd)
+        last = now
+        now_ns = time.time_ns()
+        if phone.app == "gpslogger":
+            ts_ns = now_ns - now_ns % 1_000_000
+            await post(client, stats, f"/log_all/{phone.entity_id}", phone.gpslogger_body(ts_ns),
+                       "application/x-www-form-urlencoded", [(phone.entity_id, ts_ns)])
+            stats.entries += 1
+        else:
+            entries = phone.sensorlogger_entries(last_ns, now_ns, args.imu_hz)
+            last_ns = now_ns
+            if entries:
+                locations = [(phone.entity_id, e["time"]) for e in entries if e["name"] == "location"]
+                await post(client, stats, f"/sensorlogger/{phone.entity_id}", phone.sensorlogger_body(entries),
+                           "application/json", locations)
+                stats.entries += len(entries)
+        try:
+            await asyncio.wait_for(stop.wait(), max(0.0, interval - (time.monotonic() - now)))
+        except asyncio.TimeoutError:
+            pass
+
+
+def make_phones(devices, sensorlogger_share=0.5, seed=0, first=0):
+    phones = []
+    for idx in range(first, first + devices):
+        rnd = random.Random(seed * 1_000_003 + idx)
+        # Spread the apps evenly over the index range
+        app = "sensorlogger" if int((idx + 1) * sensorlogger_share) > int(idx * sensorlogger_share) else "gpslogger"
+        phones.append(VirtualPhone(idx, app, rnd))
+    return phones
+
+
+async def run_fleet(phones, args, stats, duration):
+    """Run `phones` for `duration` seconds against args.url."""
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    timeout = httpx.Timeout(args.timeout)
+    stop = asyncio.Event()
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout) as client:
+        tasks = [asyncio.create_task(run_phone(phone, client, stats, args, stop)) for phone in phones]
+        await asyncio.sleep(duration)
+        stop.set()
+        await asyncio.gather(*tasks)
+
+
+def add_fleet_arguments(parser):
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the service")
+    parser.add_argument("--gps-hz", type=float, default=1.0, help="GPSLogger fixes per second per phone")
+    parser.add_argument("--batch-interval", type=float, default=1.0, help="Seconds between Sensor Logger pushes")
+    parser.add_argument("--imu-hz", type=float, default=10.0, help="Sensor Logger IMU sample rate")
+    parser.add_argument("--sensorlogger-share", type=float, default=0.5, help="Share of phones running Sensor Logger")
+    parser.add_argument("--connections", type=int, default=64, help="HTTP connection pool size")
+    parser.add_argument("--timeout", type=float, default=10.0, help="HTTP request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+if __name__ == "__main__":
+    import common
+
+    parser = common.argument_parser(__doc__, zenoh_config=False)
+    add_fleet_arguments(parser)
+    parser.add_argument("--devices", type=int, default=100, help="Virtual phones")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to run")
+    args = parser.parse_args()
+
+    stats = Stats()
+    phones = make_phones(args.devices, args.sensorlogger_share, args.seed)
+    start = time.monotonic()
+    asyncio.run(run_fleet(phones, args, stats, args.duration))
+    elapsed = time.monotonic() - start
+    print(f"{args.devices} phones, {elapsed:.1f}s: {stats.requests / elapsed:.1f} req/s, "
+          f"{stats.entries / elapsed:.0f} entries/s, ok {stats.ok}, rejected {stats.rejected}, errors {stats.errors}")
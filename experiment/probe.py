@@ -0,0 +1,172 @@
+"""Latency probe: subscribes to `rise/@v0/**` and measures what comes out of Zenoh.
+
+For every keelson envelope received it records, per subject:
+
+- ingest delay: receive time minus the envelope's `enclosed_at` (service -> subscriber)
+- reordering: a sample older than the previous one on the same key expression
+- duplicates: the same sample timestamp twice on one key expression
+
+When it runs next to fleet.py (see capacity.py) it also knows when each location sample
+was posted, so for `location_fix` it reports the post -> delivery delay and the samples
+the service accepted but never delivered (loss). Standalone, it prints a table every
+--interval seconds:
+
+    python experiment/probe.py -e tcp/127.0.0.1:7447 --interval 5
+"""
+import threading
+import time
+
+import keelson
+
+KEY = "rise/@v0/**"
+TRACER = "location_fix"
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class SubjectStats:
+    __slots__ = ("count", "reordered", "duplicates", "ingest_ms", "e2e_ms")
+
+    def __init__(self):
+        self.count = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.ingest_ms = []
+        self.e2e_ms = []
+
+    def summary(self, elapsed):
+        ingest = sorted(self.ingest_ms)
+        e2e = sorted(self.e2e_ms)
+        return {
+            "messages": self.count,
+            "per_s": self.count / elapsed if elapsed else None,
+            "reordered": self.reordered,
+            "duplicates": self.duplicates,
+            "ingest_p50_ms": percentile(ingest, 0.5),
+            "ingest_p99_ms": percentile(ingest, 0.99),
+            "e2e_p50_ms": percentile(e2e, 0.5),
+            "e2e_p99_ms": percentile(e2e, 0.99),
+            "e2e_max_ms": e2e[-1] if e2e else None,
+        }
+
+
+class LatencyProbe:
+    """Subscriber callback; Zenoh calls it from its own threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # subject -> payload message class, resolved once per subject
+        self._classes = {}
+        # key expression -> last sample timestamp (ns)
+        self._last = {}
+        self.begin()
+
+    def begin(self, fleet_stats=None):
+        """Start a measurement window; `fleet_stats` is the fleet.Stats of the senders."""
+        with self._lock:
+            self.fleet = fleet_stats
+            self.subjects = {}
+            self.delivered = set()
+            self.undecodable = 0
+            self.started = time.monotonic()
+
+    def _sample_ts(self, subject, payload):
+        cls = self._classes.get(subject)
+        if cls is None:
+            cls = self._classes[subject] = keelson.get_protobuf_message_class_from_type_name(
+                keelson.get_subject_schema(subject))
+        message = cls.FromString(payload)
+        return message.timestamp.seconds * 1_000_000_000 + message.timestamp.nanos
+
+    def __call__(self, sample):
+        now = time.monotonic()
+        key = str(sample.key_expr)
+        try:
+            received_at, enclosed_at, payload = keelson.uncover(sample.payload.to_bytes())
+            parts = keelson.parse_pubsub_key(key)
+            subject = parts["subject"]
+            ts = self._sample_ts(subject, payload)
+        except Exception:
+            with self._lock:
+                self.undecodable += 1
+            return
+        fleet = self.fleet
+        with self._lock:
+            stats = self.subjects.get(subject)
+            if stats is None:
+                stats = self.subjects[subject] = SubjectStats()
+            stats.count += 1
+            stats.ingest_ms.append((received_at - enclosed_at) / 1e6)
+            last = self._last.get(key)
+            if last is not None:
+                if ts < last:
+                    stats.reordered += 1
+                elif ts == last:
+                    stats.duplicates += 1
+            if last is None or ts > last:
+                self._last[key] = ts
+            if subject == TRACER and fleet is not None:
+                sample_key = (parts["entity_id"], ts)
+                sent_at = fleet.sent.get(sample_key)
+                if sent_at is not None:
+                    stats.e2e_ms.append((now - sent_at) * 1e3)
+                    self.delivered.add(sample_key)
+
+    def report(self):
+        """Per-subject summaries of the window so far, plus loss if the senders are known."""
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            report = {
+                "elapsed_s": elapsed,
+                "undecodable": self.undecodable,
+                "subjects": {subject: stats.summary(elapsed) for subject, stats in sorted(self.subjects.items())},
+            }
+            if self.fleet is not None:
+                accepted = self.fleet.accepted
+                lost = len(accepted - self.delivered)
+                report["accepted"] = len(accepted)
+                report["lost"] = lost
+                report["loss"] = lost / len(accepted) if accepted else 0.0
+        return report
+
+
+def _ms(value):
+    return "-" if value is None else f"{value:.1f}"
+
+
+def print_report(report):
+    print(f"{'subject':<40}{'msgs':>9}{'msg/s':>9}{'ingest p50':>11}{'p99':>8}"
+          f"{'e2e p50':>9}{'p99':>8}{'reord.':>8}{'dup.':>6}")
+    for subject, s in report["subjects"].items():
+        print(f"{subject:<40}{s['messages']:>9}{s['per_s']:>9.1f}{_ms(s['ingest_p50_ms']):>11}"
+              f"{_ms(s['ingest_p99_ms']):>8}{_ms(s['e2e_p50_ms']):>9}{_ms(s['e2e_p99_ms']):>8}"
+              f"{s['reordered']:>8}{s['duplicates']:>6}")
+    if "lost" in report:
+        print(f"accepted location samples {report['accepted']}, lost {report['lost']} ({report['loss']:.2%})")
+
+
+if __name__ == "__main__":
+    import common
+
+    parser = common.argument_parser(__doc__)
+    parser.add_argument("--key", default=KEY, help="Key expression to subscribe to")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds per printed window")
+    args = parser.parse_args()
+
+    probe = LatencyProbe()
+    with common.open_session(args) as session:
+        subscriber = session.declare_subscriber(args.key, probe)
+        print(f"Subscribed to '{args.key}', press CTRL-C to quit...")
+        try:
+            while True:
+                time.sleep(args.interval)
+                report = probe.report()
+                probe.begin()
+                print_report(report)
+                print()
+        except KeyboardInterrupt:
+            pass
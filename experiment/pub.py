@@ -18,13 +18,9 @@ import zenoh
 
 
 def main(
-    conf: zenoh.Config, key: str, payload: str, iter: Optional[int], interval: int
+    session: zenoh.Session, key: str, payload: str, iter: Optional[int], interval: int
 ):
-    # initiate logging
-    zenoh.init_log_from_env_or("error")
-
-    print("Opening session...")
-    with zenoh.open(conf) as session:
+    with session:
 
         print(f"Declaring Publisher on '{key}'...")
         pub = session.declare_publisher(key)
@@ -41,7 +37,6 @@ def main(
 if __name__ == "__main__":
     import argparse
     import itertools
-    import json
 
     import common
 
@@ -75,6 +70,6 @@ if __name__ == "__main__":
     )
 
     args = parser.parse_args()
-    conf = common.get_config_from_args(args)
 
-    main(conf, args.key, args.payload, args.iter, args.interval)
\ No newline at end of file
+    print("Opening session...")
+    main(common.open_session(args), args.key, args.payload, args.iter, args.interval)
\ No newline at end of file
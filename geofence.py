@@ -0,0 +1,443 @@
+"""Geofences: zone enter/exit/dwell events from the location fixes on the publish path.
+
+Fences are GeoJSON Polygon or MultiPolygon features (holes allowed), loaded into a
+static R-tree bulk-loaded with Sort-Tile-Recursive packing. Point-in-polygon uses the
+even-odd rule over edges bucketed into horizontal bands, so a test only looks at the
+few edges near the fix's latitude, even for harbour outlines with thousands of vertices.
+
+Work per fix is incremental. The R-tree answers "which fence boxes overlap this grid
+cell" once per cell, and the answer is memoized on the index. Each (entity, source)
+remembers its last cell and candidate fences, so a fix in the same cell skips the tree
+and the memo. Out at sea, with no candidates and no zone to leave, a fix costs a couple
+of float operations. Only candidates whose box contains the fix get a polygon test.
+
+Each (entity, source) also keeps the zones it is in, with the time it entered. Comparing
+against that set gives the events:
+
+    geofence_entered, geofence_exited   on the first fix inside / outside a fence
+    geofence_dwell                      once, on the first fix after `dwell` seconds inside
+
+Fixes older than the last one seen for their source are ignored (`stale`), so out of
+order uploads do not make a vessel flap in and out of a zone.
+
+An index is immutable: a reload builds a new one (in a thread if wanted) and `load()`
+swaps it in. Sources keep their zones across a reload; fences that disappeared are
+exited on their next fix. Sources silent for `ttl` seconds are forgotten without an
+exit event. Used from the event loop only; not thread-safe.
+"""
+import json
+import math
+import re
+import time
+
+NODE_CAPACITY = 16
+# Edges per band in a ring's edge buckets (a ring with n edges gets n // 4 bands)
+EDGES_PER_BAND = 4
+# Memoized grid cells per index before the memo starts over
+MAX_CELLS = 65536
+
+ENTERED = "geofence_entered"
+EXITED = "geofence_exited"
+DWELL = "geofence_dwell"
+
+# A fence id becomes the source id of its events, i.e. one chunk of a key expression. A
+# chunk starting with "@" is verbatim in Zenoh and would not match wildcard selectors.
+_FENCE_ID = re.compile(r"^[^@/*$#?\s][^/*$#?\s]*$")
+_INVALID_ID = re.compile(r"^@|[/*$#?\s]+")
+
+
+# --- Geometry ------------------------------------------------------------------------
+class Ring:
+    """A closed ring with its edges bucketed by latitude for the even-odd test."""
+
+    __slots__ = ("y0", "band_height", "bands")
+
+    def __init__(self, coordinates):
+        points = [(float(point[0]), float(point[1])) for point in coordinates]
+        if len(points) > 1 and points[0] == points[-1]:
+            points.pop()
+        if len(points) < 3:
+            raise ValueError("a ring needs at least 3 distinct positions")
+        ys = [y for _, y in points]
+        self.y0 = min(ys)
+        count = max(1, len(points) // EDGES_PER_BAND)
+        self.band_height = (max(ys) - self.y0) / count or 1.0
+        self.bands = bands = [[] for _ in range(count)]
+        y0 = self.y0
+        height = self.band_height
+        top = count - 1
+        xa, ya = points[-1]
+        for xb, yb in points:
+            # Horizontal edges never straddle the ray
+            if ya != yb:
+                edge = (xa, ya, yb, (xb - xa) / (yb - ya))
+                low, high = (ya, yb) if ya < yb else (yb, ya)
+                first = min(top, int((low - y0) / height))
+                last = min(top, int((high - y0) / height))
+                if first == last:
+                    bands[first].append(edge)
+                else:
+                    for band in range(first, last + 1):
+                        bands[band].append(edge)
+            xa, ya = xb, yb
+
+    def _band(self, y):
+        return min(len(self.bands) - 1, max(0, int((y - self.y0) / self.band_height)))
+
+    def contains(self, x, y):
+        inside = False
+        for xa, ya, yb, slope in self.bands[self._band(y)]:
+            if (ya > y) != (yb > y) and x < xa + (y - ya) * slope:
+                inside = not inside
+        return inside
+
+
+def _bbox(coordinates):
+    xs = [float(point[0]) for point in coordinates]
+    ys = [float(point[1]) for point in coordinates]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+class Fence:
+    """One zone: polygons as (bbox, outer ring, holes), coordinates in (lon, lat)."""
+
+    __slots__ = ("id", "name", "dwell_ns", "bbox", "polygons", "vertices")
+
+    def __init__(self, fence_id, name, polygons, dwell=None):
+        if not _FENCE_ID.match(fence_id):
+            raise ValueError(f"fence id {fence_id!r} cannot be used in a key expression")
+        self.id = fence_id
+        self.name = name
+        self.dwell_ns = None if dwell is None else int(dwell * 1e9)
+        self.polygons = []
+        self.vertices = 0
+        for rings in polygons:
+            if not rings:
+                continue
+            self.polygons.append((_bbox(rings[0]), Ring(rings[0]), [Ring(hole) for hole in rings[1:]]))
+            self.vertices += sum(len(ring) for ring in rings)
+        if not self.polygons:
+            raise ValueError(f"fence {fence_id!r} has no polygon")
+        boxes = [box for box, _, _ in self.polygons]
+        self.bbox = (
+            min(box[0] for box in boxes),
+            min(box[1] for box in boxes),
+            max(box[2] for box in boxes),
+            max(box[3] for box in boxes),
+        )
+
+    def contains(self, lon, lat):
+        for (min_x, min_y, max_x, max_y), outer, holes in self.polygons:
+            if (
+                min_x <= lon <= max_x
+                and min_y <= lat <= max_y
+                and outer.contains(lon, lat)
+                and not any(hole.contains(lon, lat) for hole in holes)
+            ):
+                return True
+        return False
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "dwell_s": None if self.dwell_ns is None else self.dwell_ns / 1e9,
+            "bbox": list(self.bbox),
+            "polygons": len(self.polygons),
+            "vertices": self.vertices,
+        }
+
+
+def parse_geojson(document):
+    """Fences from a GeoJSON FeatureCollection, Feature or geometry (a dict or a JSON string).
+
+    The fence id is the feature's `id`, else `properties.id`, else `properties.name` with
+    spaces, key expression characters and a leading "@" replaced by "-", else `fence-<n>`.
+    `properties.name` and `properties.dwell_s` are optional. Features that are not
+    (Multi)Polygons are skipped; the second value returned is how many were."""
+    if isinstance(document, (str, bytes)):
+        document = json.loads(document)
+    kind = document.get("type")
+    if kind == "FeatureCollection":
+        features = document.get("features") or []
+    elif kind == "Feature":
+        features = [document]
+    else:
+        features = [{"type": "Feature", "geometry": document, "properties": {}}]
+
+    fences = []
+    skipped = 0
+    seen = set()
+    for idx, feature in enumerate(features):
+        geometry = feature.get("geometry") or {}
+        properties = feature.get("properties") or {}
+        if geometry.get("type") == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry.get("type") == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            skipped += 1
+            continue
+        fence_id = feature.get("id") or properties.get("id")
+        if fence_id is None:
+            fence_id = _INVALID_ID.sub("-", str(properties.get("name") or f"fence-{idx}"))
+        fence_id = str(fence_id)
+        if fence_id in seen:
+            raise ValueError(f"duplicate fence id {fence_id!r}")
+        seen.add(fence_id)
+        dwell = properties.get("dwell_s")
+        fences.append(
+            Fence(fence_id, str(properties.get("name") or fence_id), polygons, None if dwell is None else float(dwell))
+        )
+    return fences, skipped
+
+
+def load_geojson(path):
+    with open(path, "rb") as fp:
+        return parse_geojson(fp.read())
+
+
+# --- Spatial index -------------------------------------------------------------------
+def _str_pack(entries, capacity):
+    """One level of Sort-Tile-Recursive packing: sort by x center into vertical slices,
+    each slice by y center, and group runs of `capacity` into nodes."""
+    pages = math.ceil(len(entries) / capacity)
+    per_slice = math.ceil(math.sqrt(pages)) * capacity
+    entries = sorted(entries, key=lambda entry: entry[0] + entry[2])
+    nodes = []
+    for start in range(0, len(entries), per_slice):
+        column = sorted(entries[start:start + per_slice], key=lambda entry: entry[1] + entry[3])
+        for offset in range(0, len(column), capacity):
+            group = column[offset:offset + capacity]
+            nodes.append((
+                min(entry[0] for entry in group),
+                min(entry[1] for entry in group),
+                max(entry[2] for entry in group),
+                max(entry[3] for entry in group),
+                group,
+            ))
+    return nodes
+
+
+class RTree:
+    """Static R-tree over (bbox, value) items. Nodes are (min_x, min_y, max_x, max_y,
+    children) tuples; the children of a leaf are the items, as (*bbox, value)."""
+
+    def __init__(self, items, capacity=NODE_CAPACITY):
+        level = [(*bbox, value) for bbox, value in items]
+        self.size = len(level)
+        self.height = 0
+        self.root = None
+        if not level:
+            return
+        level = _str_pack(level, capacity)
+        while len(level) > 1:
+            level = _str_pack(level, capacity)
+            self.height += 1
+        self.root = level[0]
+
+    def search(self, min_x, min_y, max_x, max_y):
+        """Values whose box intersects the given box."""
+        found = []
+        if self.root is None:
+            return found
+        stack = [(self.root, self.height)]
+        while stack:
+            node, depth = stack.pop()
+            for child in node[4]:
+                if child[0] <= max_x and child[2] >= min_x and child[1] <= max_y and child[3] >= min_y:
+                    if depth:
+                        stack.append((child, depth - 1))
+                    else:
+                        found.append(child[4])
+        return found
+
+
+class GeofenceIndex:
+    """Fences, their R-tree and the per-cell candidate memo. Immutable once built."""
+
+    def __init__(self, fences, cell_deg=0.01, source=None, skipped=0):
+        self.fences = {fence.id: fence for fence in fences}
+        self.tree = RTree((fence.bbox, fence) for fence in fences)
+        self.cell_deg = cell_deg
+        self.source = source
+        self.skipped = skipped
+        self.loaded_at = time.time()
+        self._cells = {}
+
+    @classmethod
+    def from_file(cls, path, cell_deg=0.01):
+        fences, skipped = load_geojson(path)
+        return cls(fences, cell_deg=cell_deg, source=path, skipped=skipped)
+
+    def cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def candidates(self, cell):
+        """Fences whose box overlaps a grid cell."""
+        found = self._cells.get(cell)
+        if found is None:
+            if len(self._cells) >= MAX_CELLS:
+                self._cells.clear()
+            i, j = cell
+            size = self.cell_deg
+            found = self._cells[cell] = tuple(
+                self.tree.search(j * size, i * size, (j + 1) * size, (i + 1) * size)
+            )
+        return found
+
+    def containing(self, lat, lon):
+        """Fences containing a point, straight from the tree (no memo)."""
+        return [fence for fence in self.tree.search(lon, lat, lon, lat) if fence.contains(lon, lat)]
+
+
+# --- Zone events ---------------------------------------------------------------------
+class ZoneState:
+    """Zones one (entity, source) is in: fence id -> [entered_ns, dwell reported]."""
+
+    __slots__ = ("cell", "candidates", "index", "inside", "last_ns", "last_seen")
+
+    def __init__(self):
+        self.cell = None
+        self.candidates = ()
+        self.index = None
+        self.inside = {}
+        self.last_ns = None
+        self.last_seen = 0.0
+
+
+def _timestamp_ns(payload):
+    timestamp = payload.timestamp
+    return timestamp.seconds * 1_000_000_000 + timestamp.nanos
+
+
+class GeofenceEngine:
+    def __init__(self, index=None, dwell=300.0, ttl=86400.0, sweep_interval=60.0):
+        self.index = index if index is not None else GeofenceIndex([])
+        self.dwell_ns = int(dwell * 1e9)
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        # (entity_id, source_id) -> ZoneState
+        self._states = {}
+        self._next_sweep = time.monotonic() + sweep_interval
+
+        self.fixes = 0
+        self.tests = 0
+        self.stale = 0
+        self.expired = 0
+        self.events = {ENTERED: 0, EXITED: 0, DWELL: 0}
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error = None
+
+    def load(self, index):
+        self.index = index
+        self.reloads += 1
+
+    def observe(self, entity_id, subject, source_id, payload):
+        """Events caused by a payload as (subject, fence id, fence name, ts_ns), or None. Only
+        `location_fix` payloads are looked at."""
+        if subject != "location_fix":
+            return None
+        return self.locate(entity_id, source_id, payload.latitude, payload.longitude, _timestamp_ns(payload))
+
+    def locate(self, entity_id, source_id, lat, lon, ts_ns):
+        self.fixes += 1
+        key = (entity_id, source_id)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = ZoneState()
+        elif ts_ns < state.last_ns:
+            self.stale += 1
+            return None
+        state.last_ns = ts_ns
+        now = time.monotonic()
+        state.last_seen = now
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            self.sweep()
+
+        index = self.index
+        cell = index.cell(lat, lon)
+        if cell != state.cell or state.index is not index:
+            state.cell = cell
+            state.index = index
+            state.candidates = index.candidates(cell)
+        candidates = state.candidates
+        inside = state.inside
+        if not candidates and not inside:
+            return None
+
+        events = None
+        seen = None
+        for fence in candidates:
+            min_x, min_y, max_x, max_y = fence.bbox
+            if not (min_x <= lon <= max_x and min_y <= lat <= max_y):
+                continue
+            self.tests += 1
+            if not fence.contains(lon, lat):
+                continue
+            if seen is None:
+                seen = set()
+            seen.add(fence.id)
+            zone = inside.get(fence.id)
+            if zone is None:
+                inside[fence.id] = [ts_ns, False]
+                events = events or []
+                events.append((ENTERED, fence.id, fence.name, ts_ns))
+            elif not zone[1]:
+                dwell_ns = fence.dwell_ns if fence.dwell_ns is not None else self.dwell_ns
+                if ts_ns - zone[0] >= dwell_ns:
+                    zone[1] = True
+                    events = events or []
+                    events.append((DWELL, fence.id, fence.name, ts_ns))
+        if len(inside) != (len(seen) if seen else 0):
+            for fence_id in [fence_id for fence_id in inside if seen is None or fence_id not in seen]:
+                del inside[fence_id]
+                # A fence removed by a reload is exited under its id
+                fence = index.fences.get(fence_id)
+                events = events or []
+                events.append((EXITED, fence_id, fence.name if fence is not None else fence_id, ts_ns))
+        if events:
+            for event in events:
+                self.events[event[0]] += 1
+        return events
+
+    def sweep(self):
+        deadline = time.monotonic() - self.ttl
+        for key in [key for key, state in self._states.items() if state.last_seen < deadline]:
+            del self._states[key]
+            self.expired += 1
+
+    def occupants(self):
+        """fence id -> [{"entity_id", "source_id", "since_ns", "dwell"}]"""
+        found = {}
+        for (entity_id, source_id), state in self._states.items():
+            for fence_id, (entered_ns, dwelled) in state.inside.items():
+                found.setdefault(fence_id, []).append(
+                    {"entity_id": entity_id, "source_id": source_id, "since_ns": entered_ns, "dwell": dwelled}
+                )
+        return found
+
+    def stats(self):
+        index = self.index
+        return {
+            "fences": len(index.fences),
+            "vertices": sum(fence.vertices for fence in index.fences.values()),
+            "tree_height": index.tree.height + 1 if index.tree.root is not None else 0,
+            "source": index.source,
+            "skipped_features": index.skipped,
+            "loaded_at": index.loaded_at,
+            "cell_deg": index.cell_deg,
+            "cells_cached": len(index._cells),
+            "tracked_sources": len(self._states),
+            "inside": sum(len(state.inside) for state in self._states.values()),
+            "fixes": self.fixes,
+            "polygon_tests": self.tests,
+            "stale": self.stale,
+            "expired": self.expired,
+            "events": dict(self.events),
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,218 @@
+"""Decoder for GPSLogger (mendhak) custom URL form bodies.
+
+GPSLogger posts an application/x-www-form-urlencoded body such as
+
+    lat=57.43&lon=12.03&sat=0&alt=72.0&...&time=2025-03-20T20:47:27.834Z&profile=Default+Profile
+
+`parse_gpslogger` walks the body once, URL-decodes only the fields that are mapped to
+keelson subjects and returns a typed `GpsLoggerFix`. Malformed or missing fields raise
+`GpsLoggerParseError` naming the offending field, except the OPTIONAL ones. Those are
+kept as text and only parsed when `time` is missing and one of them has to stand in for
+it; if that one is malformed it is named in `fix.ignored` and the next one is tried.
+"""
+import datetime
+from urllib.parse import unquote_plus
+
+
+class GpsLoggerParseError(ValueError):
+    """A GPSLogger field is missing or malformed."""
+
+    def __init__(self, field, message):
+        super().__init__(f"{field}: {message}")
+        self.field = field
+        self.message = message
+
+
+# --- Timestamps ------------------------------------------------------------------
+_EPOCH = datetime.datetime(1970, 1, 1)
+_EPOCH_UTC = _EPOCH.replace(tzinfo=datetime.timezone.utc)
+_FRACTION_SCALE = tuple(10 ** (9 - digits) for digits in range(10))
+
+
+def _local_ns(text, end):
+    """Epoch nanoseconds of 'YYYY-MM-DDTHH:MM:SS[.fffffffff]' in text[:end], read as UTC."""
+    delta = datetime.datetime.fromisoformat(text[:19]) - _EPOCH
+    nanos = 0
+    if end > 19:
+        fraction = text[20:end]
+        if text[19] != "." or not fraction.isdigit() or len(fraction) > 9:
+            raise ValueError(f"invalid fractional seconds in '{text}'")
+        nanos = int(fraction) * _FRACTION_SCALE[len(fraction)]
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + nanos
+
+
+def parse_iso8601_utc_ns(text):
+    """Parse 'YYYY-MM-DDTHH:MM:SS[.fffffffff]Z' to UTC epoch nanoseconds.
+
+    Only the fixed UTC layout GPSLogger emits is accepted. The seconds part goes
+    through the C ISO parser and the fraction is scaled by hand, so sub-microsecond
+    digits are kept and strptime is never involved.
+    """
+    if len(text) < 20 or text[-1] != "Z" or text[10] != "T" or text[19] not in ".Z":
+        raise ValueError(f"expected YYYY-MM-DDTHH:MM:SS[.f]Z, got '{text}'")
+    return _local_ns(text, len(text) - 1)
+
+
+def parse_iso8601_offset_ns(text):
+    """Parse 'YYYY-MM-DDTHH:MM:SS[.f]+HH:MM' (GPSLogger's `timeoffset`, e.g.
+    '2025-03-20T21:47:27.834+01:00') to UTC epoch nanoseconds. The offset is read from its
+    fixed position at the end."""
+    if text[-1:] == "Z":
+        return parse_iso8601_utc_ns(text)
+    if len(text) < 25 or text[10] != "T" or text[-6] not in "+-" or text[-3] != ":":
+        raise ValueError(f"expected YYYY-MM-DDTHH:MM:SS[.f]+HH:MM, got '{text}'")
+    offset = int(text[-5:-3]) * 3600 + int(text[-2:]) * 60
+    if text[-6] == "+":
+        offset = -offset
+    return _local_ns(text, len(text) - 6) + offset * 1_000_000_000
+
+
+# --- Body decoding -----------------------------------------------------------------
+# field name in the form body -> (attribute, converter); everything else is skipped
+FIELDS = {
+    "lat": ("lat", float),
+    "lon": ("lon", float),
+    "alt": ("alt", float),
+    "acc": ("acc", float),
+    "hdop": ("hdop", float),
+    "vdop": ("vdop", float),
+    "pdop": ("pdop", float),
+    "sat": ("sat", int),
+    "dir": ("dir", float),
+    "spd": ("spd", float),
+    "batt": ("batt", float),
+    "ischarging": ("ischarging", "true".__eq__),
+    "time": ("time", str),
+    "timestamp": ("timestamp", str),
+    "timeoffset": ("timeoffset", str),
+    "starttimestamp": ("starttimestamp", str),
+    "profile": ("profile", str),
+    "aid": ("aid", str),
+    "ser": ("ser", str),
+}
+
+REQUIRED = ("lat", "lon", "alt", "acc", "hdop", "vdop", "pdop", "sat", "dir", "spd", "batt")
+
+# Form fields that only back up `time` or tag the recording, in the order they stand in
+# for a missing `time`
+OPTIONAL = ("timeoffset", "timestamp", "starttimestamp")
+_FALLBACKS = (
+    ("timeoffset", parse_iso8601_offset_ns),
+    ("timestamp", lambda text: int(text) * 1_000_000_000),
+)
+
+# Attribute name -> form field name, for error messages
+FORM_NAMES = {attr: name for name, (attr, _) in FIELDS.items()}
+
+
+class GpsLoggerFix:
+    """One decoded GPSLogger fix.
+
+    Supports `fix[field]` and `fix.get(field)` with the original form field names so it
+    can be fed straight to the mapping engine. `time_ns` is the fix time in epoch
+    nanoseconds; `time` and the OPTIONAL fields hold the text that was posted.
+    """
+
+    __slots__ = (
+        "lat",
+        "lon",
+        "alt",
+        "acc",
+        "hdop",
+        "vdop",
+        "pdop",
+        "sat",
+        "dir",
+        "spd",
+        "batt",
+        "ischarging",
+        "time",
+        "time_ns",
+        "timestamp",
+        "timeoffset",
+        "starttimestamp",
+        "profile",
+        "aid",
+        "ser",
+        "ignored",
+    )
+
+    def __init__(self):
+        self.lat = None
+        self.lon = None
+        self.alt = None
+        self.acc = None
+        self.hdop = None
+        self.vdop = None
+        self.pdop = None
+        self.sat = None
+        self.dir = None
+        self.spd = None
+        self.batt = None
+        self.ischarging = False
+        self.time = None
+        self.time_ns = None
+        self.timestamp = None
+        self.timeoffset = None
+        self.starttimestamp = None
+        self.profile = None
+        self.aid = None
+        self.ser = None
+        # Form names of OPTIONAL fields that were malformed when needed for the time
+        self.ignored = ()
+
+    def __getitem__(self, field):
+        value = getattr(self, field)
+        if value is None:
+            raise KeyError(field)
+        return value
+
+    def get(self, field, default=None):
+        value = getattr(self, field, None)
+        return default if value is None else value
+
+    def as_dict(self):
+        """The decoded fields under their form names."""
+        return {name: getattr(self, attr) for attr, name in FORM_NAMES.items()}
+
+
+def parse_gpslogger(body):
+    """Decode a GPSLogger form body (bytes) into a GpsLoggerFix."""
+    fix = GpsLoggerFix()
+    fields = FIELDS
+    for item in body.decode("utf-8", "replace").split("&"):
+        name, _, text = item.partition("=")
+        spec = fields.get(name)
+        if spec is None:
+            continue
+        if "%" in text or "+" in text:
+            text = unquote_plus(text)
+        try:
+            setattr(fix, spec[0], spec[1](text))
+        except ValueError as e:
+            raise GpsLoggerParseError(name, str(e)) from None
+
+    if fix.time is not None:
+        try:
+            fix.time_ns = parse_iso8601_utc_ns(fix.time)
+        except ValueError as e:
+            raise GpsLoggerParseError("time", str(e)) from None
+    else:
+        # URL templates without %TIME: the same instant in local time, or epoch seconds
+        for name, parse in _FALLBACKS:
+            text = getattr(fix, name)
+            if text is None:
+                continue
+            try:
+                fix.time_ns = parse(text)
+                break
+            except ValueError:
+                fix.ignored += (name,)
+        else:
+            raise GpsLoggerParseError("time", "missing")
+
+    for attr in REQUIRED:
+        if getattr(fix, attr) is None:
+            raise GpsLoggerParseError(FORM_NAMES[attr], "missing")
+
+    return fix
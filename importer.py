@@ -0,0 +1,491 @@
+"""Bulk import of recorded GPSLogger and Sensor Logger files into Zenoh.
+
+Tracks that never reached the live endpoints (no coverage at sea, app misconfigured)
+can be replayed from the files the apps write:
+
+- GPSLogger CSV (`time,lat,lon,elevation,accuracy,bearing,speed,...`) and GPX
+- Sensor Logger export archives (a zip of per-sensor CSVs such as Location.csv and
+  Accelerometer.csv) or a single per-sensor CSV
+
+    python importer.py --entity boat1 voyage.csv voyage.gpx export.zip
+    python importer.py --entity boat1 --speed 10 --connect tcp/localhost:7447 export.zip
+
+Files are read chunk by chunk (`--chunk-rows` lines at a time, only a bounded number of
+chunks in flight per file), so exports of many GB stream through in constant memory.
+Chunks are parsed in a process pool and mapped with the same rules as `log_post` and
+`sensorlogger_post` (mapping.py); the resulting payloads keep their original
+timestamps. Rows are expected in time order within a file, as the apps write them;
+streams are merged by timestamp and put through cached Zenoh publishers as
+fast as possible or, with `--speed N`, at N times real time. Progress and throughput
+go to stderr every `--progress` seconds.
+
+Imported messages do not pass through the service's dedup window, publish policies,
+latest state or track history; they only go to Zenoh.
+"""
+import argparse
+import concurrent.futures
+import collections
+import csv
+import datetime
+import heapq
+import io
+import multiprocessing
+import os
+import re
+import sys
+import time
+import zipfile
+
+from encoding import enclose
+from gpslogger import parse_iso8601_utc_ns
+from mapping import (
+    GPSLOGGER_MAPPING,
+    SENSORLOGGER_BATCH_HANDLERS,
+    SENSORLOGGER_HANDLERS,
+    compile_rules,
+)
+
+
+# --- Parsing (runs in the worker processes) -------------------------------------------
+def _optional(rule):
+    # Recorded files leave fields empty that a live GPSLogger post always carries
+    rule = dict(rule)
+    if "required" in rule:
+        rule["required"] = False
+    if "altitude_required" in rule:
+        rule["altitude_required"] = False
+    return rule
+
+
+GPSLOGGER_FILE_HANDLER = compile_rules([_optional(rule) for rule in GPSLOGGER_MAPPING])
+
+# GPSLogger CSV column -> (GpsLoggerFix field, converter)
+GPSLOGGER_CSV_FIELDS = {
+    "lat": ("lat", float),
+    "lon": ("lon", float),
+    "elevation": ("alt", float),
+    "accuracy": ("acc", float),
+    "bearing": ("dir", float),
+    "speed": ("spd", float),
+    "satellites": ("sat", int),
+    "hdop": ("hdop", float),
+    "vdop": ("vdop", float),
+    "pdop": ("pdop", float),
+    "battery": ("batt", float),
+    "battery_charging": ("ischarging", lambda value: value.lower() == "true"),
+}
+
+# GPX 1.0 trkpt child element -> (GpsLoggerFix field, converter)
+GPX_FIELDS = {
+    "ele": ("alt", float),
+    "course": ("dir", float),
+    "speed": ("spd", float),
+    "sat": ("sat", int),
+    "hdop": ("hdop", float),
+    "vdop": ("vdop", float),
+    "pdop": ("pdop", float),
+}
+
+_TRKPT = re.compile(r"<trkpt\s+([^>]*)>(.*?)</trkpt>", re.S)
+_ATTRIBUTE = re.compile(r'(\w+)\s*=\s*["\']([^"\']*)["\']')
+_CHILD = re.compile(r"<(\w+)>\s*([^<]*?)\s*</\1>")
+
+
+def parse_time(text):
+    """ISO 8601 to UTC epoch nanoseconds; GPSLogger's own layout takes the fast path."""
+    try:
+        return parse_iso8601_utc_ns(text)
+    except ValueError:
+        moment = datetime.datetime.fromisoformat(text.replace("Z", "+00:00"))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=datetime.timezone.utc)
+        return int(moment.timestamp()) * 1_000_000_000 + moment.microsecond * 1000
+
+
+class _Collector:
+    """`publish` callback that keeps (ts_ns, subject, source_id, serialized payload)."""
+
+    def __init__(self):
+        self.messages = []
+
+    def __call__(self, entity_id, subject, source_id, payload):
+        timestamp = payload.timestamp
+        self.messages.append((
+            timestamp.seconds * 1_000_000_000 + timestamp.nanos,
+            subject,
+            source_id,
+            payload.SerializeToString(),
+        ))
+
+
+def _gpslogger_csv_rows(header, lines, default_source):
+    """(ts_ns, GpsLoggerFix fields, source_id) per row; None for a row that does not parse."""
+    columns = {name: idx for idx, name in enumerate(header)}
+    time_idx = columns.get("time")
+    millis_idx = columns.get("timestamp_ms")
+    profile_idx = columns.get("profile_name")
+    fields = [(columns[name], attr, convert) for name, (attr, convert) in GPSLOGGER_CSV_FIELDS.items() if name in columns]
+    for row in csv.reader(lines):
+        if not row:
+            continue
+        try:
+            if time_idx is not None and row[time_idx]:
+                ts = parse_time(row[time_idx])
+            else:
+                ts = int(row[millis_idx]) * 1_000_000
+            values = {attr: convert(row[idx]) for idx, attr, convert in fields if idx < len(row) and row[idx]}
+        except (IndexError, TypeError, ValueError):
+            yield None
+            continue
+        source = row[profile_idx] if profile_idx is not None and profile_idx < len(row) and row[profile_idx] else default_source
+        yield ts, values, source
+
+
+def _gpx_points(text, default_source):
+    for attributes, body in _TRKPT.findall(text):
+        try:
+            values = {name: float(value) for name, value in _ATTRIBUTE.findall(attributes) if name in ("lat", "lon")}
+            ts = None
+            for name, value in _CHILD.findall(body):
+                if name == "time":
+                    ts = parse_time(value)
+                elif name in GPX_FIELDS and value:
+                    attr, convert = GPX_FIELDS[name]
+                    values[attr] = convert(value)
+        except ValueError:
+            yield None
+            continue
+        # A point without <time> cannot be placed in the replay
+        yield (ts, values, default_source) if ts is not None else None
+
+
+def _sensorlogger_entries(sensor, header, lines):
+    """Sensor Logger message entries for the rows, and the number of rows without a time."""
+    time_idx = header.index("time")
+    value_columns = [(idx, name) for idx, name in enumerate(header) if name not in ("time", "seconds_elapsed")]
+    entries = []
+    failed = 0
+    for row in csv.reader(lines):
+        if not row:
+            continue
+        try:
+            ts = int(row[time_idx])
+        except (IndexError, ValueError):
+            failed += 1
+            continue
+        values = {}
+        for idx, name in value_columns:
+            if idx < len(row) and row[idx] != "":
+                value = row[idx]
+                try:
+                    value = float(value)
+                except ValueError:
+                    pass
+                values[name] = value
+        entries.append({"name": sensor, "time": ts, "values": values})
+    return entries, failed
+
+
+def parse_chunk(task):
+    """Map one chunk: returns (messages sorted by time, rows, failed rows)."""
+    kind, entity_id, source_id, meta, data = task
+    collect = _Collector()
+    rows = failed = 0
+    if kind == "sensorlogger":
+        sensor, header = meta
+        entries, failed = _sensorlogger_entries(sensor, header, data)
+        rows = len(entries) + failed
+        batch = SENSORLOGGER_BATCH_HANDLERS.get(sensor)
+        if batch is None or not batch(entity_id, source_id, entries, collect):
+            handler = SENSORLOGGER_HANDLERS[sensor]
+            for entry in entries:
+                try:
+                    handler(entity_id, source_id, entry["time"], entry["values"], collect)
+                except (KeyError, TypeError, ValueError):
+                    failed += 1
+    else:
+        points = _gpslogger_csv_rows(meta, data, source_id) if kind == "gpslogger_csv" else _gpx_points(data, source_id)
+        for point in points:
+            rows += 1
+            if point is None:
+                failed += 1
+                continue
+            ts, values, source = point
+            try:
+                GPSLOGGER_FILE_HANDLER(entity_id, source, ts, values, collect)
+            except (KeyError, TypeError, ValueError):
+                failed += 1
+    collect.messages.sort(key=lambda message: message[0])
+    return collect.messages, rows, failed
+
+
+# --- Reading (main process) ---------------------------------------------------------------
+class Stream:
+    """One recorded series: yields (task, size in bytes) chunks for parse_chunk. The sizes
+    are file positions read past, header included, so they add up to `size`."""
+
+    def __init__(self, label, size, chunks):
+        self.label = label
+        self.size = size
+        self.chunks = chunks
+
+
+def _line_chunks(fp, kind, entity_id, source_id, meta, chunk_rows):
+    # Decoded line lengths are neither bytes nor include the header: measure the file
+    position = 0
+    while True:
+        lines = [line for _, line in zip(range(chunk_rows), fp)]
+        if not lines:
+            return
+        read = fp.buffer.tell()
+        yield (kind, entity_id, source_id, meta, lines), read - position
+        position = read
+
+
+def _gpx_chunks(fp, entity_id, source_id, block_size):
+    pending = ""
+    position = 0
+    while True:
+        block = fp.read(block_size)
+        if not block:
+            break
+        pending += block
+        end = pending.rfind("</trkpt>")
+        if end < 0:
+            continue
+        end += len("</trkpt>")
+        read = fp.buffer.tell()
+        yield ("gpx", entity_id, source_id, None, pending[:end]), read - position
+        position = read
+        pending = pending[end:]
+    if "<trkpt" in pending:
+        yield ("gpx", entity_id, source_id, None, pending), fp.buffer.tell() - position
+
+
+def _csv_header(fp):
+    return next(csv.reader([fp.readline()]), [])
+
+
+def _sensor_name(filename):
+    return os.path.splitext(os.path.basename(filename))[0].lower()
+
+
+def _open_csv(path):
+    return open(path, newline="", encoding="utf-8", errors="replace")
+
+
+def open_streams(path, entity_id, source_id, chunk_rows, known_sensors):
+    """Streams for one input file, by extension (and CSV header)."""
+    size = os.path.getsize(path)
+    lower = path.lower()
+    if lower.endswith(".gpx"):
+        def chunks():
+            with open(path, encoding="utf-8", errors="replace") as fp:
+                yield from _gpx_chunks(fp, entity_id, source_id or "gpslogger", 1024 * 1024)
+        return [Stream(path, size, chunks())]
+
+    if lower.endswith(".zip"):
+        return _zip_streams(path, entity_id, source_id, chunk_rows, known_sensors)
+
+    if lower.endswith(".csv"):
+        with _open_csv(path) as fp:
+            header = _csv_header(fp)
+        if "seconds_elapsed" in header:
+            sensor = _sensor_name(path)
+            if sensor not in known_sensors:
+                print(f"{path}: sensor '{sensor}' is not mapped, skipped", file=sys.stderr)
+                return []
+
+            def chunks():
+                with _open_csv(path) as fp:
+                    fp.readline()
+                    yield from _line_chunks(fp, "sensorlogger", entity_id, source_id or "sensorlogger", (sensor, header), chunk_rows)
+            return [Stream(path, size, chunks())]
+        if "lat" in header and "lon" in header:
+            def chunks():
+                with _open_csv(path) as fp:
+                    fp.readline()
+                    yield from _line_chunks(fp, "gpslogger_csv", entity_id, source_id or "gpslogger", header, chunk_rows)
+            return [Stream(path, size, chunks())]
+
+    raise ValueError(f"{path}: not a GPSLogger CSV/GPX file or a Sensor Logger export")
+
+
+def _zip_streams(path, entity_id, source_id, chunk_rows, known_sensors):
+    archive = zipfile.ZipFile(path)
+    members = [info for info in archive.infolist() if info.filename.lower().endswith(".csv")]
+    if source_id is None:
+        source_id = _export_device_id(archive, members) or "sensorlogger"
+    streams = []
+    for info in members:
+        sensor = _sensor_name(info.filename)
+        if sensor not in known_sensors:
+            continue
+
+        def chunks(info=info, sensor=sensor):
+            with archive.open(info) as raw:
+                fp = io.TextIOWrapper(raw, encoding="utf-8", errors="replace", newline="")
+                header = _csv_header(fp)
+                if "time" not in header:
+                    return
+                yield from _line_chunks(fp, "sensorlogger", entity_id, source_id, (sensor, header), chunk_rows)
+        streams.append(Stream(f"{path}:{info.filename}", info.file_size, chunks()))
+    skipped = sorted({_sensor_name(info.filename) for info in members} - set(known_sensors) - {"metadata"})
+    if skipped:
+        print(f"{path}: unmapped sensors skipped: {', '.join(skipped)}", file=sys.stderr)
+    return streams
+
+
+def _export_device_id(archive, members):
+    """The device id from an export's Metadata.csv, if there is one."""
+    for info in members:
+        if _sensor_name(info.filename) == "metadata":
+            with archive.open(info) as raw:
+                rows = list(csv.reader(io.TextIOWrapper(raw, encoding="utf-8", errors="replace")))
+            if len(rows) >= 2:
+                for name, value in zip(rows[0], rows[1]):
+                    if name.replace(" ", "").lower() == "deviceid" and value:
+                        return value
+    return None
+
+
+# --- Import -----------------------------------------------------------------------------
+class Progress:
+    def __init__(self, total_bytes, interval):
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.next_report = self.started + interval
+        self.bytes = 0
+        self.rows = 0
+        self.failed = 0
+        self.messages = 0
+
+    def maybe_report(self, behind_s=None):
+        now = time.perf_counter()
+        if now >= self.next_report:
+            self.next_report = now + self.interval
+            self.report(now, behind_s)
+
+    def report(self, now=None, behind_s=None, final=False):
+        now = now or time.perf_counter()
+        elapsed = max(now - self.started, 1e-9)
+        done = self.bytes / self.total_bytes if self.total_bytes else 1.0
+        line = (
+            f"[{done * 100:5.1f}%] {self.bytes / 1e6:,.0f}/{self.total_bytes / 1e6:,.0f} MB  "
+            f"rows {self.rows:,}  failed {self.failed:,}  messages {self.messages:,}  "
+            f"{self.messages / elapsed:,.0f} msg/s  {self.bytes / 1e6 / elapsed:,.1f} MB/s"
+        )
+        if behind_s is not None:
+            line += f"  behind {behind_s:.1f}s"
+        if final:
+            line += f"  in {elapsed:.1f}s"
+        elif 0 < done < 1:
+            line += f"  eta {elapsed / done - elapsed:,.0f}s"
+        print(line, file=sys.stderr, flush=True)
+
+
+def _parsed(executor, stream, progress, ahead):
+    """Messages of one stream in file order, with at most `ahead` chunks in flight."""
+    in_flight = collections.deque()
+    chunks = iter(stream.chunks)
+    exhausted = False
+    while True:
+        while not exhausted and len(in_flight) < ahead:
+            try:
+                task, size = next(chunks)
+            except StopIteration:
+                exhausted = True
+                break
+            in_flight.append((executor.submit(parse_chunk, task), size))
+        if not in_flight:
+            return
+        future, size = in_flight.popleft()
+        messages, rows, failed = future.result()
+        progress.bytes += size
+        progress.rows += rows
+        progress.failed += failed
+        yield from messages
+
+
+def run_import(streams, entity_id, put, executor, speed=0.0, ahead=4, progress_interval=2.0):
+    """Publish every message of `streams`, merged by timestamp, through `put(entity_id,
+    subject, source_id, envelope)`. With `speed` > 0 messages are paced at that multiple
+    of real time. Returns the final Progress."""
+    progress = Progress(sum(stream.size for stream in streams), progress_interval)
+    merged = heapq.merge(*(_parsed(executor, stream, progress, ahead) for stream in streams), key=lambda message: message[0])
+    first_ts = None
+    behind = None
+    for ts, subject, source_id, payload in merged:
+        if speed > 0:
+            now = time.perf_counter()
+            if first_ts is None:
+                first_ts, started = ts, now
+            due = started + (ts - first_ts) / 1e9 / speed
+            if due > now + 0.001:
+                time.sleep(due - now)
+            behind = max(0.0, now - due)
+        put(entity_id, subject, source_id, enclose(payload))
+        progress.messages += 1
+        if speed > 0 or not progress.messages & 1023:
+            progress.maybe_report(behind)
+    # Every stream was read to its end, including any trailer no chunk accounted for
+    progress.bytes = progress.total_bytes
+    progress.report(behind_s=behind, final=True)
+    return progress
+
+
+def main(argv=None):
+    from experiment.common import add_config_arguments, get_config_from_args
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="+", help="GPSLogger .csv/.gpx files, Sensor Logger .zip exports or sensor .csv files")
+    parser.add_argument("--entity", required=True, help="Entity id to publish under")
+    parser.add_argument("--source", help="Source id (default: profile name / export device id / app name)")
+    parser.add_argument("--base-path", default="rise", help="Keelson base path")
+    parser.add_argument("--speed", type=float, default=0.0, help="Multiple of real time to replay at; 0 = as fast as possible")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parser processes")
+    parser.add_argument("--chunk-rows", type=int, default=5000, help="Lines per parsed chunk")
+    parser.add_argument("--progress", type=float, default=2.0, help="Seconds between progress lines")
+    parser.add_argument("--settle", type=float, default=1.0, help="Seconds to let the session learn remote subscribers before publishing")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and map only, publish nothing")
+    add_config_arguments(parser)
+    args = parser.parse_args(argv)
+
+    streams = []
+    for path in args.files:
+        streams.extend(open_streams(path, args.entity, args.source, args.chunk_rows, SENSORLOGGER_HANDLERS))
+    if not streams:
+        parser.error("nothing to import")
+
+    # Workers are spawned, not forked, from a process that holds a Zenoh session
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(args.workers, mp_context=context) as executor:
+        if args.dry_run:
+            run_import(streams, args.entity, lambda *message: None, executor, args.speed, args.workers * 2, args.progress)
+            return
+
+        import zenoh
+        from publishing import PublisherCache
+
+        with zenoh.open(get_config_from_args(args)) as session:
+            # Back-pressure instead of dropping: an import has no deadline, only a backlog
+            publishers = PublisherCache(
+                session,
+                base_path=args.base_path,
+                declare_options={"congestion_control": zenoh.CongestionControl.BLOCK},
+            )
+            # Puts made before the subscribers' declarations have arrived go nowhere
+            time.sleep(args.settle)
+
+            def put(entity_id, subject, source_id, envelope):
+                publishers.get(entity_id, subject, source_id).put(envelope)
+
+            try:
+                run_import(streams, args.entity, put, executor, args.speed, args.workers * 2, args.progress)
+            finally:
+                publishers.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Last published envelope per key expression, answered to Zenoh `get` queries.
+
+Consumers that start late (dashboards, autopilot adapters) would otherwise wait for the
+next phone push to learn where a vessel is. The publish workers record every envelope
+they put in a bounded `LastValueCache`; a queryable declared over `rise/@v0/**` answers
+gets from it, including wildcard selectors such as `rise/@v0/boat1/**` or
+`rise/@v0/*/pubsub/location_fix/*`.
+
+Keys are also indexed in a trie of key chunks. A selector without wildcards is a dict
+lookup; a wildcard selector walks the trie, so `rise/@v0/boat1/**` only visits boat1's
+keys however many vessels are cached. As in Zenoh, wildcards never match verbatim
+chunks (starting with "@", like "@v0").
+"""
+import collections
+import logging
+import re
+import threading
+
+
+class LastValueCache:
+    """Bounded map (entity, subject, source) -> [key_expr, envelope], least recently
+    updated first. Written by the publish workers, read by the Zenoh queryable."""
+
+    def __init__(self, key_expr, maxsize=100_000):
+        self.key_expr = key_expr
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        # key_expr -> entry, for exact selectors
+        self._by_key_expr = {}
+        # key chunk -> child node; a node's _LEAF item is the entry of the key ending there
+        self._trie = {}
+        self._lock = threading.Lock()
+        self.updates = 0
+        self.evicted = 0
+        self.queries = 0
+        self.replies = 0
+
+    def update(self, entity_id, subject, source_id, envelope):
+        cache_key = (entity_id, subject, source_id)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                entry[1] = envelope
+                self._entries.move_to_end(cache_key)
+            else:
+                key_expr = self.key_expr(entity_id, subject, source_id)
+                entry = self._entries[cache_key] = [key_expr, envelope]
+                self._by_key_expr[key_expr] = entry
+                node = self._trie
+                for chunk in key_expr.split("/"):
+                    node = node.setdefault(chunk, {})
+                node[_LEAF] = entry
+                while len(self._entries) > self.maxsize:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._remove_locked(evicted[0])
+                    self.evicted += 1
+            self.updates += 1
+
+    def _remove_locked(self, key_expr):
+        del self._by_key_expr[key_expr]
+        path = [self._trie]
+        for chunk in key_expr.split("/"):
+            path.append(path[-1][chunk])
+        del path[-1][_LEAF]
+        # Prune the branch back up to the first node still in use
+        for parent, chunk in zip(reversed(path[:-1]), reversed(key_expr.split("/"))):
+            if parent[chunk]:
+                break
+            del parent[chunk]
+
+    def match(self, selector):
+        """[(key_expr, envelope)] for every cached key matching the key expression `selector`."""
+        with self._lock:
+            if "*" not in selector:
+                entry = self._by_key_expr.get(selector)
+                return [tuple(entry)] if entry is not None else []
+            found = {}
+            _walk(self._trie, selector.split("/"), 0, found)
+            return list(found.items())
+
+    def reply(self, query):
+        """Zenoh queryable handler: answer a get from the cache."""
+        try:
+            found = self.match(str(query.key_expr))
+            for key, envelope in found:
+                query.reply(key, envelope)
+        except Exception as e:
+            logging.error(f"Last-value query {query.key_expr} failed: {e}")
+            return
+        self.queries += 1
+        self.replies += len(found)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "updates": self.updates,
+            "evicted": self.evicted,
+            "queries": self.queries,
+            "replies": self.replies,
+        }
+
+
+_LEAF = None
+
+
+def _walk(node, chunks, index, found):
+    """Collect every leaf under `node` matching chunks[index:] into `found`."""
+    if index == len(chunks):
+        entry = node.get(_LEAF)
+        if entry is not None:
+            found[entry[0]] = entry[1]
+        return
+    chunk = chunks[index]
+    if chunk == "**":
+        # Zero chunks, or one more chunk with "**" still pending
+        _walk(node, chunks, index + 1, found)
+        for name, child in node.items():
+            if name is not _LEAF and name[0] != "@":
+                _walk(child, chunks, index, found)
+    elif chunk == "*":
+        for name, child in node.items():
+            if name is not _LEAF and name[0] != "@":
+                _walk(child, chunks, index + 1, found)
+    elif "$*" in chunk:
+        pattern = _chunk_pattern(chunk)
+        for name, child in node.items():
+            if name is not _LEAF and name[0] != "@" and pattern.fullmatch(name):
+                _walk(child, chunks, index + 1, found)
+    else:
+        child = node.get(chunk)
+        if child is not None:
+            _walk(child, chunks, index + 1, found)
+
+
+_chunk_patterns = {}
+
+
+def _chunk_pattern(chunk):
+    """Regex for a chunk containing `$*` (any run of characters within the chunk)."""
+    pattern = _chunk_patterns.get(chunk)
+    if pattern is None:
+        pattern = re.compile(".*".join(re.escape(part) for part in chunk.split("$*")))
+        if len(_chunk_patterns) < 1024:
+            _chunk_patterns[chunk] = pattern
+    return pattern
@@ -0,0 +1,311 @@
+"""Logging off the event loop: queue handler, lazy formatting, sampling and rate limits.
+
+`configure_logging` replaces the root handlers with a `QueueHandler`, so a log call on
+the event loop or a publish worker only builds a LogRecord and appends it to a queue.
+A `QueueListener` thread formats the records and writes them to stdout. Records whose
+arguments are plain values (str, numbers, bytes, None) are queued unformatted, so the
+%-formatting happens on the listener thread too. Anything else, such as a reused
+protobuf template, is formatted before it is queued.
+
+Hot paths log under categories (logger names): `gnss.ingest` for per-request lines,
+`gnss.publish` for per-message lines, `gnss.nmea` for per-sentence lines. For each
+category (and its children) a `LogSampler` can keep 1 DEBUG/INFO record in N
+(LOG_SAMPLE) and/or at most R records per second (LOG_RATE_LIMIT). Dropped records are counted, not
+written. Loggers from `category_logger` drop them before a LogRecord is even built:
+
+    LOG_SAMPLE="gnss.publish=100,gnss.ingest=10"  LOG_RATE_LIMIT="gnss.nmea=5"
+
+uvicorn's loggers are routed through the same queue, so access lines can be sampled
+too (`uvicorn.access=100`).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(lineno)d] : %(message)s"
+
+# Loggers uvicorn configures with its own synchronous handlers
+ROUTED_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+_PLAIN_TYPES = frozenset((str, int, float, bool, bytes, type(None)))
+
+# LogRecord attributes; anything else on a record came from `extra=`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, plus any `extra=` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value if type(value) in _PLAIN_TYPES and type(value) is not bytes else repr(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves %-formatting to the listener thread when it is safe.
+
+    The queue is a SimpleQueue (a lock-free C deque), so the handler skips its own lock
+    too. Above `maxsize` queued records new ones are dropped rather than waited for: a
+    stalled stdout must not stall the event loop.
+    """
+
+    def __init__(self, records, maxsize):
+        super().__init__(records)
+        self.maxsize = maxsize
+        self.overflowed = 0
+
+    def handle(self, record):
+        if not self.filter(record):
+            return False
+        try:
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+        return True
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.maxsize:
+            self.overflowed += 1
+            return
+        self.queue.put_nowait(record)
+
+    def prepare(self, record):
+        args = record.args
+        if args:
+            if type(args) is not tuple or any(type(arg) not in _PLAIN_TYPES for arg in args):
+                # Mutable arguments may change before the listener gets to them
+                record.msg = record.getMessage()
+                record.args = None
+        if record.exc_info:
+            # Tracebacks hold frames; render them now and let the frames go
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_rules(spec):
+    """"category=value,..." to {category: float}."""
+    rules = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        category, _, value = item.partition("=")
+        rules[category.strip()] = float(value)
+    return rules
+
+
+class _Rule:
+    __slots__ = ("every", "rate", "tokens", "refilled", "seen", "dropped")
+
+    def __init__(self, every, rate):
+        self.every = int(every) if every and every > 1 else 0
+        self.rate = rate or 0.0
+        self.tokens = self.rate
+        self.refilled = time.monotonic()
+        self.seen = 0
+        self.dropped = 0
+
+
+class LogSampler(logging.Filter):
+    """Per-category sampling (keep 1 in N) and rate limiting (token bucket per second).
+
+    A category is a logger name and covers its children; the longest matching category
+    applies. Rules are resolved once per logger name, so a record from an unlisted
+    logger costs one dict lookup.
+    """
+
+    def __init__(self, sample=None, rate=None):
+        super().__init__()
+        sample = sample or {}
+        rate = rate or {}
+        self.rules = {category: _Rule(sample.get(category), rate.get(category)) for category in {*sample, *rate}}
+        # logger name -> _Rule or None
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def _rule(self, name):
+        try:
+            return self._resolved[name]
+        except KeyError:
+            pass
+        rule = None
+        parts = name.split(".")
+        for end in range(len(parts), 0, -1):
+            rule = self.rules.get(".".join(parts[:end]))
+            if rule is not None:
+                break
+        self._resolved[name] = rule
+        return rule
+
+    def admit(self, name, level):
+        """True if a record from logger `name` should be kept. Sampling only thins
+        DEBUG and INFO; the rate limit applies to every level."""
+        rule = self._rule(name)
+        if rule is None:
+            return True
+        with self._lock:
+            rule.seen += 1
+            if rule.every and level < logging.WARNING and (rule.seen - 1) % rule.every:
+                rule.dropped += 1
+                return False
+            if rule.rate:
+                now = time.monotonic()
+                rule.tokens = min(rule.rate, rule.tokens + (now - rule.refilled) * rule.rate)
+                rule.refilled = now
+                if rule.tokens < 1.0:
+                    rule.dropped += 1
+                    return False
+                rule.tokens -= 1.0
+        return True
+
+    def filter(self, record):
+        # Category loggers were sampled before their record was built
+        return record.name in _CATEGORIES or self.admit(record.name, record.levelno)
+
+    def stats(self):
+        return {
+            category: {
+                "sample": rule.every or None,
+                "rate_limit": rule.rate or None,
+                "seen": rule.seen,
+                "dropped": rule.dropped,
+            }
+            for category, rule in self.rules.items()
+        }
+
+
+# The sampler of the configured pipeline, consulted by category loggers
+_sampler = None
+_CATEGORIES = set()
+
+
+class CategoryLogger(logging.LoggerAdapter):
+    """Logger for a hot-path category: a sampled-out call returns before a LogRecord is
+    built, so it costs about as much as a call below the log level."""
+
+    def __init__(self, logger):
+        super().__init__(logger, None)
+
+    def process(self, msg, kwargs):
+        return msg, kwargs
+
+    def log(self, level, msg, *args, **kwargs):
+        if self.logger.isEnabledFor(level) and (_sampler is None or _sampler.admit(self.logger.name, level)):
+            # Report the caller of debug()/info()..., not this frame
+            self.logger._log(level, msg, args, stacklevel=2, **kwargs)
+
+
+def category_logger(name):
+    """Logger for category `name`, sampled by LOG_SAMPLE / LOG_RATE_LIMIT."""
+    _CATEGORIES.add(name)
+    return CategoryLogger(logging.getLogger(name))
+
+
+class LogPipeline:
+    """The queue, its handler and sampler and the listener thread that writes records."""
+
+    def __init__(self, level, formatter, sampler, stream, maxsize=10000):
+        self.level = level
+        self.sampler = sampler
+        self.handler = LazyQueueHandler(queue.SimpleQueue(), maxsize)
+        self.handler.addFilter(sampler)
+        output = logging.StreamHandler(stream)
+        output.setFormatter(formatter)
+        self.listener = logging.handlers.QueueListener(self.handler.queue, output)
+
+    def start(self):
+        self.listener.start()
+
+    def stop(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def _after_fork(self):
+        # The listener thread does not survive fork; give the child its own
+        self.listener._thread = None
+        self.handler.queue = self.listener.queue = queue.SimpleQueue()
+        self.start()
+
+    def stats(self):
+        return {
+            "level": logging.getLevelName(self.level),
+            "queued": self.handler.queue.qsize(),
+            "overflowed": self.handler.overflowed,
+            "categories": self.sampler.stats(),
+        }
+
+
+# The pipeline the root logger currently writes to; replaced by each configure_logging
+_pipeline = None
+_hooks_registered = False
+
+
+def _stop_pipeline():
+    if _pipeline is not None:
+        _pipeline.stop()
+
+
+def _restart_pipeline_after_fork():
+    if _pipeline is not None:
+        _pipeline._after_fork()
+
+
+def configure_logging(level="INFO", fmt="text", sample=None, rate=None, stream=None):
+    """Route the root logger (and uvicorn's) through a background queue listener.
+
+    `level` is a level name or number, `fmt` "text" or "json", `sample` and `rate` are
+    {category: N} and {category: records per second}. Returns the started LogPipeline.
+
+    Calling it again (e.g. when main is imported again) replaces the previous pipeline:
+    its listener is stopped once the records it had queued are written, and the exit
+    and fork hooks, registered once, follow the current pipeline.
+    """
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper()) if not level.isdigit() else int(level)
+    formatter = JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+    global _sampler, _pipeline, _hooks_registered
+    pipeline = LogPipeline(level, formatter, LogSampler(sample, rate), stream or sys.stdout)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(pipeline.handler)
+    root.setLevel(level)
+    for name in ROUTED_LOGGERS:
+        routed = logging.getLogger(name)
+        for handler in routed.handlers[:]:
+            routed.removeHandler(handler)
+        routed.propagate = True
+    logging.captureWarnings(True)
+
+    pipeline.start()
+    previous, _pipeline = _pipeline, pipeline
+    _sampler = pipeline.sampler
+    if previous is not None:
+        previous.stop()
+    if not _hooks_registered:
+        atexit.register(_stop_pipeline)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_restart_pipeline_after_fork)
+        _hooks_registered = True
+    return pipeline
@@ -1,23 +1,48 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 import uvicorn
 import logging
 from fastapi import Request
 import zenoh
 import keelson
 from keelson.payloads.foxglove.LocationFix_pb2 import LocationFix
-from keelson.payloads.Primitives_pb2 import (
-    TimestampedFloat,
-    TimestampedInt,
-    TimestampedBool,
-    TimestampedQuaternion,
-)
-from keelson.payloads.Decomposed3DVector_pb2 import Decomposed3DVector
+from keelson.payloads.Primitives_pb2 import TimestampedFloat, TimestampedString
 import json
 import logging
-import datetime
-import math
 import os
+import pathlib
+import re
+from time import perf_counter, time_ns
+
+from admission import PRIORITY_CLASSES, AdmissionController, AdmissionRejected, sensor_priorities
+from decoding import BodyTooLarge, UnsupportedEncoding, decompress, sensorlogger_decoder
+from dedup import DedupWindow
+from encoding import enclose
+from geofence import GeofenceEngine, GeofenceIndex
+from gpslogger import GpsLoggerParseError, parse_gpslogger
+from lastvalue import LastValueCache
+from logconfig import category_logger, configure_logging, parse_rules
+from mapping import (
+    BATCH_MIN_ENTRIES,
+    GPSLOGGER_HANDLER,
+    KNOTS_PER_MPS,
+    NMEA_HANDLERS,
+    SENSORLOGGER_BATCH_HANDLERS,
+    SENSORLOGGER_HANDLERS,
+    SENSORLOGGER_MAPPINGS,
+)
+from metrics import MetricsMiddleware, Registry
+from motion import MotionEstimator
+from nmea import NmeaIngest, start_listeners, stop_listeners
+from policy import PolicyFilter, load_policies
+from publishing import PublishQueue, PublishQueueFull, PublisherCache
+from state import SUBJECT_UPDATERS, StateStore
+from spool import ConnectivityMonitor, Spool, SpoolReplayer, claim_directory
+from timealign import TimeAligner
+import tracks
 
 
 # Initialize Zenoh session
@@ -26,95 +51,724 @@ zenoh_session = None
 
 
 # Setup logger
-logging.basicConfig(
-    format="%(asctime)s %(levelname)s %(name)s [%(lineno)d] : %(message)s",
-    level=10,
+# Records go through a queue to a background writer thread (see logconfig.py). Per-request
+# and per-message lines are logged under gnss.ingest / gnss.publish / gnss.nmea and can be
+# sampled (LOG_SAMPLE) or rate limited (LOG_RATE_LIMIT) per category.
+LOGGING = configure_logging(
+    level=os.environ.get("LOG_LEVEL", "INFO"),
+    fmt=os.environ.get("LOG_FORMAT", "text"),
+    sample=parse_rules(os.environ.get("LOG_SAMPLE", "")),
+    rate=parse_rules(os.environ.get("LOG_RATE_LIMIT", "")),
 )
-logging.captureWarnings(True)
+ingest_log = category_logger("gnss.ingest")
+publish_log = category_logger("gnss.publish")
+
 
+# --- Zenoh session -------------------------------------------------------------
+# The session is opened by the lifespan, never at import: the Zenoh runtime does not
+# survive fork, so under `uvicorn --workers N` every worker process opens its own. It is
+# opened in the background so the app answers /ready (503) while the router is down.
+ZENOH_CONNECT = os.environ.get("ZENOH_CONNECT", "tcp/zenoh-router:7447")
+ZENOH_RETRY_INTERVAL = float(os.environ.get("ZENOH_RETRY_INTERVAL", "2.0"))
 
-# Construct session
-logging.info("Opening Zenoh session...")
-conf = zenoh.Config()
-# conf.insert_json5("mode", json.dumps("client"))
-zenoh_connect = os.environ.get("ZENOH_CONNECT", "tcp/zenoh-router:7447")
-conf.insert_json5("connect/endpoints", json.dumps([zenoh_connect]))
-zenoh_session = zenoh.open(conf)
 
+def open_zenoh_session():
+    conf = zenoh.Config()
+    # conf.insert_json5("mode", json.dumps("client"))
+    if ZENOH_CONNECT:
+        conf.insert_json5("connect/endpoints", json.dumps([ZENOH_CONNECT]))
+    return zenoh.open(conf)
 
-# if zenoh_session:
-#     info = zenoh_session.info
-#     logging.info(
-#         f"Zenoh session info: zid={info.zid()}, routers={info.routers_zid()}, peers={info.peers_zid()}"
-#     )
-# else:
-#     logging.error("Zenoh session is not initialized.")
 
-logging.info("Zenoh session successfully started.")
+async def connect_zenoh():
+    """Open the Zenoh session, retrying until it succeeds or the app shuts down."""
+    global zenoh_session, last_value_queryable
+    while True:
+        logging.info("Opening Zenoh session...")
+        try:
+            session = await asyncio.to_thread(open_zenoh_session)
+        except Exception as e:
+            logging.error(f"Failed to open Zenoh session: {e}, retrying in {ZENOH_RETRY_INTERVAL}s")
+            await asyncio.sleep(ZENOH_RETRY_INTERVAL)
+            continue
+        PUBLISHERS.session = session
+        if LAST_VALUES is not None:
+            last_value_queryable = session.declare_queryable(f"{BASE_PATH}/@v0/**", LAST_VALUES.reply)
+        zenoh_session = session
+        logging.info(f"Zenoh session successfully started in worker {os.getpid()}")
+        return
+
+
+def close_zenoh():
+    global zenoh_session, last_value_queryable
+    session, zenoh_session = zenoh_session, None
+    if last_value_queryable is not None:
+        last_value_queryable.undeclare()
+        last_value_queryable = None
+    if session is not None:
+        session.close()
 
 
 # --- Keelson publishing helpers -------------------------------------------
 # All pub/sub keys follow the keelson convention rise/@v0/{entity}/pubsub/{subject}/{source}.
 # Publishers are declared once and cached: SensorLogger streams IMU at high rate, so
-# reusing a declared publisher is cheaper than session.put() per message.
+# reusing a declared publisher is cheaper than session.put() per message. The source id
+# comes from the client, so the cache is bounded and idle publishers are undeclared.
 BASE_PATH = "rise"
-PUBLISHERS = {}
+PUBLISHERS = PublisherCache(
+    None,
+    base_path=BASE_PATH,
+    maxsize=int(os.environ.get("PUBLISHER_CACHE_SIZE", "4096")),
+    idle_ttl=float(os.environ.get("PUBLISHER_IDLE_TTL", "600")),
+)
+
+# Last envelope put per key expression, answered to Zenoh gets on rise/@v0/** so late
+# joiners learn the current state without waiting for the next push (see lastvalue.py).
+# LAST_VALUE_CACHE_SIZE=0 disables the cache and the queryable.
+_last_value_size = int(os.environ.get("LAST_VALUE_CACHE_SIZE", "100000"))
+LAST_VALUES = LastValueCache(PUBLISHERS.key_expr, maxsize=_last_value_size) if _last_value_size > 0 else None
+last_value_queryable = None
 
 
 def get_or_create_publisher(entity_id, subject, source_id):
-    cache_key = (entity_id, subject, source_id)
-    publisher = PUBLISHERS.get(cache_key)
-    if publisher is None:
-        key_expr = keelson.construct_pubsub_key(
-            base_path=BASE_PATH,
-            entity_id=entity_id,
-            subject=subject,
-            source_id=source_id,
-        )
-        publisher = zenoh_session.declare_publisher(key_expr)
-        PUBLISHERS[cache_key] = publisher
-    return publisher
+    return PUBLISHERS.get(entity_id, subject, source_id)
+
+
+# --- Metrics -----------------------------------------------------------------
+# Served on /metrics in Prometheus text format. METRICS_ENABLED=false turns every
+# metric into a no-op and skips all hot-path timing.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS = Registry(enabled=METRICS_ENABLED)
+
+HTTP_REQUESTS = METRICS.counter(
+    "gnss_http_requests_total", "HTTP requests by route and status", ("endpoint", "status")
+)
+HTTP_LATENCY = METRICS.histogram(
+    "gnss_http_request_duration_seconds", "HTTP request latency by route", ("endpoint",)
+)
+STAGE_LATENCY = METRICS.histogram(
+    "gnss_stage_duration_seconds",
+    "Time spent per pipeline stage (decompress/parse/build/serialize/enclose per request, publish per message)",
+    ("stage",),
+)
+PUBLISHED_MESSAGES = METRICS.counter(
+    "gnss_published_messages_total", "Messages put to Zenoh by subject", ("subject",)
+)
+PUBLISHED_BYTES = METRICS.counter(
+    "gnss_published_bytes_total", "Envelope bytes put to Zenoh by subject", ("subject",)
+)
+INGEST_ENTRIES = METRICS.counter(
+    "gnss_ingest_entries_total",
+    "Ingested entries by endpoint and outcome (published, unmapped, failed, invalid, late)",
+    ("endpoint", "outcome"),
+)
+
+# Serialize and enclose time accumulated by encode_payload. Handlers read the delta
+# over a request to observe both stages once per request and to report the remaining
+# payload construction time as the "build" stage.
+ENCODE_SECONDS = [0.0, 0.0]
+
+
+# --- Latest state --------------------------------------------------------------
+# Position, SOG/COG, accuracy and battery per (entity, source), taken from the payloads
+# on their way to the publish queue and served on /entities.
+STATE = StateStore(
+    cell_deg=float(os.environ.get("STATE_CELL_DEG", "0.05")),
+    ttl=float(os.environ.get("STATE_TTL", "86400")),
+)
+
+# Recent trajectory per (entity, source) in fixed-size NumPy ring buffers, served on
+# /entities/{entityid}/track.
+TRACKS = tracks.TrackStore(
+    max_points=int(os.environ.get("TRACK_MAX_POINTS", "86400")),
+    max_bytes=int(float(os.environ.get("TRACK_MAX_MB", "256")) * 1024 * 1024),
+)
+
 
+# --- Derived subjects ------------------------------------------------------------------
+# Geofence events and the motion estimate are computed from payloads on their way to the
+# publish queue and queued right after the payload that caused them, under subjects of
+# their own (subjects.yaml). Those are registered with keelson so get_subject_schema()
+# & co. know them in this process, along with the IMU subjects keelson lacks.
+keelson.add_well_known_subjects_and_proto_definitions(pathlib.Path(__file__).with_name("subjects.yaml"))
+
+
+# --- Geofences -----------------------------------------------------------------------
+# With GEOFENCES pointing at a GeoJSON file, every location_fix on its way to the publish
+# queue is tested against the fence polygons (see geofence.py), and zone changes are
+# published as geofence_entered / geofence_exited / geofence_dwell per entity, with the
+# fence id as source id. The file is re-read when it changes (GEOFENCE_RELOAD_INTERVAL)
+# or on POST /geofences/reload; a file that fails to load keeps the previous fences.
+GEOFENCES_FILE = os.environ.get("GEOFENCES", "")
+GEOFENCE_CELL_DEG = float(os.environ.get("GEOFENCE_CELL_DEG", "0.01"))
+GEOFENCE_RELOAD_INTERVAL = float(os.environ.get("GEOFENCE_RELOAD_INTERVAL", "5"))
+GEOFENCES = (
+    GeofenceEngine(
+        GeofenceIndex.from_file(GEOFENCES_FILE, cell_deg=GEOFENCE_CELL_DEG),
+        dwell=float(os.environ.get("GEOFENCE_DWELL", "300")),
+        ttl=float(os.environ.get("STATE_TTL", "86400")),
+    )
+    if GEOFENCES_FILE
+    else None
+)
+GEOFENCE_EVENTS = METRICS.counter(
+    "gnss_geofence_events_total", "Geofence events published by subject", ("subject",)
+)
+# Reused for every event, like the mapping handlers' payload templates
+_ZONE_EVENT = TimestampedString()
+
+
+def publish_zone_events(entity_id, events, batch):
+    for subject, fence_id, name, ts_ns in events:
+        timestamp = _ZONE_EVENT.timestamp
+        timestamp.seconds, timestamp.nanos = divmod(ts_ns, 1_000_000_000)
+        _ZONE_EVENT.value = name
+        batch.append((entity_id, subject, fence_id, encode_payload(_ZONE_EVENT)))
+        GEOFENCE_EVENTS.inc(subject)
+
+
+def _fences_file_version():
+    status = os.stat(GEOFENCES_FILE)
+    return (status.st_mtime_ns, status.st_size)
+
+
+async def reload_geofences():
+    """Re-read GEOFENCES in a thread and swap the new index in; the old one stays on error."""
+    try:
+        index = await asyncio.to_thread(GeofenceIndex.from_file, GEOFENCES_FILE, cell_deg=GEOFENCE_CELL_DEG)
+    except (OSError, ValueError, KeyError, TypeError, IndexError) as exc:
+        GEOFENCES.reload_errors += 1
+        GEOFENCES.last_error = f"{type(exc).__name__}: {exc}"
+        logging.error("Keeping the previous geofences, %s failed to load: %s", GEOFENCES_FILE, exc)
+        return False
+    GEOFENCES.load(index)
+    GEOFENCES.last_error = None
+    logging.info("Loaded %d geofences from %s", len(index.fences), GEOFENCES_FILE)
+    return True
+
+
+async def watch_geofences():
+    version = _fences_file_version()
+    while True:
+        await asyncio.sleep(GEOFENCE_RELOAD_INTERVAL)
+        try:
+            current = _fences_file_version()
+        except OSError:
+            continue
+        if current != version:
+            version = current
+            await reload_geofences()
+
+
+if GEOFENCES is not None:
+    for _metric, _name, _documentation, _key in (
+        (METRICS.gauge, "gnss_geofence_fences", "Loaded geofences", "fences"),
+        (METRICS.gauge, "gnss_geofence_tracked_sources", "Entity sources with geofence state", "tracked_sources"),
+        (METRICS.gauge, "gnss_geofence_inside", "Entity sources inside a fence, summed over fences", "inside"),
+        (METRICS.callback_counter, "gnss_geofence_stale_fixes_total", "Fixes older than their source's last one, not tested", "stale"),
+        (METRICS.callback_counter, "gnss_geofence_reload_errors_total", "GEOFENCES reloads that failed", "reload_errors"),
+    ):
+        _metric(_name, _documentation, lambda key=_key: GEOFENCES.stats()[key])
+
+
+# --- Motion estimate -------------------------------------------------------------------
+# MOTION_FILTER=true runs a constant-velocity Kalman filter per (entity, source) over the
+# location fixes, with the IMU samples adapting it (see motion.py). Each accepted fix
+# publishes location_fix_filtered, speed_over_ground_filtered_knots,
+# course_over_ground_filtered_deg and rate_of_turn_degpm under the fix's source id.
+MOTION = (
+    MotionEstimator(
+        process_noise=float(os.environ.get("MOTION_PROCESS_NOISE", "0.3")),
+        min_speed=float(os.environ.get("MOTION_MIN_SPEED", "1.0")) / KNOTS_PER_MPS,
+        max_gap=float(os.environ.get("MOTION_MAX_GAP", "60")),
+        ttl=float(os.environ.get("STATE_TTL", "86400")),
+    )
+    if os.environ.get("MOTION_FILTER", "false").lower() in ("1", "true", "yes")
+    else None
+)
+# Reused for every estimate, like the mapping handlers' payload templates
+_FILTERED_FIX = LocationFix()
+_FILTERED_FIX.position_covariance_type = LocationFix.APPROXIMATED
+_FILTERED_VALUE = TimestampedFloat()
+
+
+def publish_motion(entity_id, source_id, estimate, batch):
+    ts_ns, lat, lon, alt, var_east, var_north, sog, cog, rot = estimate
+    seconds, nanos = divmod(ts_ns, 1_000_000_000)
+    fix = _FILTERED_FIX
+    fix.timestamp.seconds, fix.timestamp.nanos = seconds, nanos
+    fix.latitude = lat
+    fix.longitude = lon
+    fix.altitude = alt
+    # ENU, row-major; the filter does not estimate altitude, so up gets the larger variance
+    fix.position_covariance[:] = [var_east, 0.0, 0.0, 0.0, var_north, 0.0, 0.0, 0.0, max(var_east, var_north)]
+    batch.append((entity_id, "location_fix_filtered", source_id, encode_payload(fix)))
+    value = _FILTERED_VALUE
+    value.timestamp.seconds, value.timestamp.nanos = seconds, nanos
+    for subject, derived in (
+        ("speed_over_ground_filtered_knots", sog),
+        ("course_over_ground_filtered_deg", cog),
+        ("rate_of_turn_degpm", rot),
+    ):
+        if derived is not None:
+            value.value = derived
+            batch.append((entity_id, subject, source_id, encode_payload(value)))
+
+
+if MOTION is not None:
+    for _metric, _name, _documentation, _key in (
+        (METRICS.gauge, "gnss_motion_sources", "Entity sources with a motion filter", "sources"),
+        (METRICS.gauge, "gnss_motion_state_bytes", "Bytes of motion filter state", "state_bytes"),
+        (METRICS.callback_counter, "gnss_motion_rejected_total", "Fixes rejected by the motion filter's innovation gate", "rejected"),
+        (METRICS.callback_counter, "gnss_motion_restarts_total", "Motion filter restarts after a gap or repeated rejections", "restarts"),
+    ):
+        _metric(_name, _documentation, lambda key=_key: MOTION.stats()[key])
+
+
+# --- Publish policies ----------------------------------------------------------
+# Deadband, rate cap and heartbeat per subject (see policy.py), checked before encoding
+# so a suppressed payload costs neither protobuf work nor a Zenoh put. PUBLISH_POLICIES
+# is "" (built-in defaults), "off", or JSON overrides / a JSON file path. The defaults
+# only hold back unchanged values; PUBLISH_RATE_CAPS=true adds the rate caps. The filter
+# tracks the same keys as the publisher cache, so it shares its size and idle limits.
+_policies = load_policies(
+    os.environ.get("PUBLISH_POLICIES", ""),
+    rate_caps=os.environ.get("PUBLISH_RATE_CAPS", "false").lower() in ("1", "true", "yes"),
+)
+POLICIES = PolicyFilter(_policies, maxsize=PUBLISHERS.maxsize, idle_ttl=PUBLISHERS.idle_ttl) if _policies else None
 
-def publish_payload(entity_id, subject, source_id, payload):
-    """Enclose a protobuf payload in a keelson envelope and publish it."""
+POLICY_SUPPRESSED = METRICS.counter(
+    "gnss_policy_suppressed_total", "Payloads not published by subject and reason (rate, deadband)", ("subject", "reason")
+)
+if POLICIES is not None:
+    for _metric, _name, _documentation, _key in (
+        (METRICS.gauge, "gnss_policy_keys", "Keys whose last published value the policy filter remembers", "keys"),
+        (METRICS.callback_counter, "gnss_policy_evicted_size_total", "Policy filter keys evicted by the size bound", "evicted_size"),
+        (METRICS.callback_counter, "gnss_policy_evicted_idle_total", "Policy filter keys evicted after idling", "evicted_idle"),
+    ):
+        _metric(_name, _documentation, lambda key=_key: POLICIES.stats()[key])
+
+
+# --- Durable spool -------------------------------------------------------------
+# With SPOOL_DIR set, envelopes that cannot reach a router (no router/peer connected or
+# the put raises) are appended to an on-disk segment log and replayed at
+# SPOOL_REPLAY_RATE messages/s once Zenoh is reachable again. Each worker process locks
+# its own numbered subdirectory, so several workers never append to the same segment.
+def zenoh_connected():
+    if zenoh_session is None:
+        return False
+    info = zenoh_session.info
+    return bool(list(info.routers_zid())) or bool(list(info.peers_zid()))
+
+
+ZENOH_CONNECTED = ConnectivityMonitor(zenoh_connected, interval=float(os.environ.get("SPOOL_CHECK_INTERVAL", "1.0")))
+
+SPOOL_DIR = os.environ.get("SPOOL_DIR", "")
+SPOOL = None
+SPOOL_REPLAYER = None
+SPOOL_LOCK = None
+
+
+def open_spool():
+    global SPOOL, SPOOL_REPLAYER, SPOOL_LOCK
+    directory, SPOOL_LOCK = claim_directory(SPOOL_DIR)
+    SPOOL = Spool(
+        directory,
+        segment_size=int(float(os.environ.get("SPOOL_SEGMENT_MB", "16")) * 1024 * 1024),
+        max_bytes=int(float(os.environ.get("SPOOL_MAX_MB", "1024")) * 1024 * 1024),
+        fsync_every=int(os.environ.get("SPOOL_FSYNC_EVERY", "1000")),
+        fsync_interval=float(os.environ.get("SPOOL_FSYNC_INTERVAL", "1.0")),
+    )
+    SPOOL_REPLAYER = SpoolReplayer(
+        SPOOL,
+        lambda key_expr, envelope: zenoh_session.put(key_expr, envelope),
+        ZENOH_CONNECTED,
+        rate=float(os.environ.get("SPOOL_REPLAY_RATE", "1000")),
+    )
+    SPOOL_REPLAYER.start()
+    logging.info(f"Spooling undeliverable envelopes to {directory}")
+
+
+def close_spool():
+    global SPOOL, SPOOL_REPLAYER, SPOOL_LOCK
+    if SPOOL is None:
+        return
+    SPOOL_REPLAYER.stop()
+    SPOOL.close()
+    SPOOL_LOCK.close()
+    SPOOL = SPOOL_REPLAYER = SPOOL_LOCK = None
+
+
+# --- Publish pipeline --------------------------------------------------------
+# Handlers only build envelopes; a worker thread owns every Zenoh put so a slow or
+# unreachable router cannot stall the event loop. Backpressure policy is one of
+# "block" (the handler awaits room for up to PUBLISH_BLOCK_TIMEOUT seconds, then 503),
+# "drop_oldest" or "reject" (503). An upload is queued whole or not at all.
+def put_envelope(item):
+    entity_id, subject, source_id, envelope = item
+    if LAST_VALUES is not None:
+        LAST_VALUES.update(entity_id, subject, source_id, envelope)
     publisher = get_or_create_publisher(entity_id, subject, source_id)
-    publisher.put(keelson.enclose(payload.SerializeToString()))
+    if SPOOL is not None and not ZENOH_CONNECTED():
+        SPOOL.append(str(publisher.key_expr), envelope)
+        return
+    try:
+        if METRICS_ENABLED:
+            start = perf_counter()
+            publisher.put(envelope)
+            STAGE_LATENCY.observe(perf_counter() - start, "publish")
+            PUBLISHED_MESSAGES.inc(subject)
+            PUBLISHED_BYTES.inc(subject, amount=len(envelope))
+        else:
+            publisher.put(envelope)
+    except Exception:
+        if SPOOL is None:
+            raise
+        SPOOL.append(str(publisher.key_expr), envelope)
+
+
+PUBLISH_QUEUE = PublishQueue(
+    put_envelope,
+    maxsize=int(os.environ.get("PUBLISH_QUEUE_SIZE", "10000")),
+    policy=os.environ.get("PUBLISH_QUEUE_POLICY", "block"),
+    workers=int(os.environ.get("PUBLISH_WORKERS", "1")),
+    block_timeout=float(os.environ.get("PUBLISH_BLOCK_TIMEOUT", "1.0")),
+)
 
 
-def publish_float(entity_id, subject, source_id, value, ts_ns):
-    payload = TimestampedFloat()
-    payload.timestamp.FromNanoseconds(ts_ns)
-    payload.value = float(value)
-    publish_payload(entity_id, subject, source_id, payload)
+def encode_payload(payload):
+    """Serialize a protobuf payload and enclose it in a keelson envelope."""
+    if not METRICS_ENABLED:
+        return enclose(payload.SerializeToString())
+    start = perf_counter()
+    serialized = payload.SerializeToString()
+    serialized_at = perf_counter()
+    envelope = enclose(serialized)
+    ENCODE_SECONDS[0] += serialized_at - start
+    ENCODE_SECONDS[1] += perf_counter() - serialized_at
+    return envelope
+
+
+def build_envelope(entity_id, subject, source_id, payload, batch):
+    """Record a payload in the latest-state, track, geofence and motion stages and append
+    its publish queue item to `batch`, followed by the geofence events and motion estimate
+    it caused. A payload its subject's publish policy suppresses adds no item of its own."""
+    STATE.observe(entity_id, subject, source_id, payload)
+    TRACKS.observe(entity_id, subject, source_id, payload)
+    derived = None
+    if GEOFENCES is not None:
+        events = GEOFENCES.observe(entity_id, subject, source_id, payload)
+        if events:
+            derived = []
+            publish_zone_events(entity_id, events, derived)
+    if MOTION is not None:
+        estimate = MOTION.observe(entity_id, subject, source_id, payload)
+        if estimate is not None:
+            if derived is None:
+                derived = []
+            publish_motion(entity_id, source_id, estimate, derived)
+    reason = POLICIES.check(entity_id, subject, source_id, payload) if POLICIES is not None else None
+    if reason is None:
+        batch.append((entity_id, subject, source_id, encode_payload(payload)))
+    else:
+        POLICY_SUPPRESSED.inc(subject, reason)
+    if derived is not None:
+        batch.extend(derived)
+
+
+def batch_publisher(batch):
+    """`publish` callback for one upload: collects its envelopes in `batch`, which the
+    handler then queues in one go."""
+
+    def publish(entity_id, subject, source_id, payload):
+        build_envelope(entity_id, subject, source_id, payload, batch)
+
+    return publish
+
+
+def observe_build(started, encode_before):
+    serialize = ENCODE_SECONDS[0] - encode_before[0]
+    enclose = ENCODE_SECONDS[1] - encode_before[1]
+    STAGE_LATENCY.observe(perf_counter() - started - serialize - enclose, "build")
+    STAGE_LATENCY.observe(serialize, "serialize")
+    STAGE_LATENCY.observe(enclose, "enclose")
+
+
+# Gauges for levels; running totals are exported as counters
+for _metric, _name, _documentation, _key, _source in (
+    (METRICS.gauge, "gnss_publish_queue_depth", "Envelopes waiting for a publish worker", "depth", PUBLISH_QUEUE.stats),
+    (METRICS.callback_counter, "gnss_publish_queue_dropped_total", "Envelopes dropped by the drop_oldest policy", "dropped", PUBLISH_QUEUE.stats),
+    (METRICS.callback_counter, "gnss_publish_queue_rejected_total", "Envelopes rejected because the queue was full", "rejected", PUBLISH_QUEUE.stats),
+    (METRICS.callback_counter, "gnss_publish_queue_failed_total", "Envelopes whose Zenoh put raised", "failed", PUBLISH_QUEUE.stats),
+    (METRICS.gauge, "gnss_publisher_cache_size", "Declared Zenoh publishers", "size", PUBLISHERS.stats),
+    (METRICS.callback_counter, "gnss_publisher_cache_hits_total", "Publisher cache hits", "hits", PUBLISHERS.stats),
+    (METRICS.callback_counter, "gnss_publisher_cache_misses_total", "Publisher cache misses", "misses", PUBLISHERS.stats),
+    (METRICS.callback_counter, "gnss_publisher_cache_evicted_size_total", "Publishers evicted by the size bound", "evicted_size", PUBLISHERS.stats),
+    (METRICS.callback_counter, "gnss_publisher_cache_evicted_idle_total", "Publishers evicted after idling", "evicted_idle", PUBLISHERS.stats),
+):
+    _metric(_name, _documentation, lambda key=_key, stats=_source: stats()[key])
+
+
+# --- Time alignment --------------------------------------------------------------
+# GPSLogger and Sensor Logger uploads pass through a per-(entity, source) stage before
+# anything else (see timealign.py). The stage corrects a phone clock that is off by more
+# than CLOCK_SKEW_TOLERANCE seconds. It also holds every sample for up to
+# REORDER_BUDGET_MS and releases them in timestamp order. Released payloads then go
+# through build_envelope, so the latest state, tracks, geofences, motion filter and
+# publish policies all see each source's samples in order. Samples older than what
+# their source already released of the same subject are "late" and are dropped or
+# published anyway (LATE_SAMPLES). TIME_ALIGN=false publishes in arrival order with the
+# reported timestamps.
+ALIGNER = (
+    TimeAligner(
+        budget=float(os.environ.get("REORDER_BUDGET_MS", "100")) / 1000,
+        tolerance=float(os.environ.get("CLOCK_SKEW_TOLERANCE", "2.0")),
+        late=os.environ.get("LATE_SAMPLES", "drop"),
+        max_pending=int(os.environ.get("REORDER_MAX_PENDING", "20000")),
+    )
+    if os.environ.get("TIME_ALIGN", "true").lower() in ("1", "true", "yes")
+    else None
+)
+# Release check interval: a quarter of the budget, between 5 ms and 100 ms
+ALIGN_TICK = min(0.1, max(0.005, ALIGNER.budget_ns / 4e9)) if ALIGNER is not None else None
+
+# Subjects build_envelope does more with than encode. Only these have to wait in the
+# reorder buffer as payloads; every other one (the IMU streams) is encoded on arrival
+# and waits as its finished envelope.
+OBSERVED_SUBJECTS = (
+    frozenset(SUBJECT_UPDATERS)
+    | tracks.SUBJECTS
+    | (frozenset(("location_fix",)) if GEOFENCES is not None else frozenset())
+    | (MOTION.subjects if MOTION is not None else frozenset())
+    | (frozenset(POLICIES.policies) if POLICIES is not None else frozenset())
+)
 
 
-def publish_int(entity_id, subject, source_id, value, ts_ns):
-    payload = TimestampedInt()
-    payload.timestamp.FromNanoseconds(ts_ns)
-    payload.value = int(value)
-    publish_payload(entity_id, subject, source_id, payload)
+def aligned_publisher(stream):
+    """`publish` callback for one upload: shifts the payload time by the stream's clock
+    offset, drops late samples and parks the rest until `release_aligned`. Payloads of
+    OBSERVED_SUBJECTS are parked as a copy (the mapping handlers reuse theirs), all
+    others as their envelope."""
+    offset_ns = stream.offset_ns
+
+    def publish(entity_id, subject, source_id, payload):
+        timestamp = payload.timestamp
+        ts = timestamp.seconds * 1_000_000_000 + timestamp.nanos
+        if offset_ns:
+            ts += offset_ns
+            timestamp.seconds, timestamp.nanos = divmod(ts, 1_000_000_000)
+        if not ALIGNER.accept(stream, subject, ts):
+            return
+        if subject in OBSERVED_SUBJECTS:
+            parked = type(payload)()
+            parked.CopyFrom(payload)
+        else:
+            parked = encode_payload(payload)
+        ALIGNER.push(stream, subject, ts, (entity_id, subject, source_id, parked))
 
+    return publish
 
-def publish_bool(entity_id, subject, source_id, value, ts_ns):
-    payload = TimestampedBool()
-    payload.timestamp.FromNanoseconds(ts_ns)
-    payload.value = bool(value)
-    publish_payload(entity_id, subject, source_id, payload)
 
+def late_drops():
+    """Samples dropped as late so far; the difference over a handler call is its share."""
+    return ALIGNER.late_dropped if ALIGNER is not None else 0
 
-def publish_vector3(entity_id, subject, source_id, x, y, z, ts_ns, frame_id=None):
-    payload = Decomposed3DVector()
-    payload.timestamp.FromNanoseconds(ts_ns)
-    if frame_id:
-        payload.frame_id = frame_id
-    payload.vector.x = float(x)
-    payload.vector.y = float(y)
-    payload.vector.z = float(z)
-    publish_payload(entity_id, subject, source_id, payload)
 
+async def release_aligned(flush=False):
+    """Build and queue the payloads whose reorder delay is over (all of them with `flush`)."""
+    released = ALIGNER.flush() if flush else ALIGNER.release()
+    if not released:
+        return
+    batch = []
+    for item in released:
+        if type(item[3]) is bytes:
+            batch.append(item)
+        else:
+            build_envelope(*item, batch)
+    if ADMISSION is not None:
+        # Admitted while the queue had room; shed by class if it has filled up since
+        batch, shed = ADMISSION.shed_items(batch)
+        if any(shed):
+            publish_log.warning(
+                "Publish queue filling up: shed %s aligned envelopes",
+                ", ".join(f"{count} {name}" for name, count in zip(PRIORITY_CLASSES, shed) if count),
+            )
+    if not batch:
+        return
+    try:
+        await PUBLISH_QUEUE.put_many_async(batch)
+    except PublishQueueFull:
+        # The upload was already answered; nothing can be retried from here
+        ALIGNER.dropped_full += len(batch)
+        publish_log.warning("Publish queue full: %d aligned envelopes dropped", len(batch))
+
+
+async def release_aligned_loop():
+    while True:
+        await asyncio.sleep(ALIGN_TICK)
+        await release_aligned()
+
+
+if ALIGNER is not None:
+    for _metric, _name, _documentation, _key in (
+        (METRICS.gauge, "gnss_align_pending", "Payloads waiting in the reorder buffer", "pending"),
+        (METRICS.callback_counter, "gnss_align_late_dropped_total", "Samples dropped because their source had already published newer ones", "late_dropped"),
+        (METRICS.callback_counter, "gnss_align_late_published_total", "Samples published out of order (LATE_SAMPLES=publish)", "late_published"),
+        (METRICS.callback_counter, "gnss_align_forced_total", "Payloads released early because a source exceeded REORDER_MAX_PENDING", "forced"),
+        (METRICS.callback_counter, "gnss_align_corrected_uploads_total", "Uploads whose timestamps were shifted by a clock-skew correction", "corrected_uploads"),
+        (METRICS.gauge, "gnss_align_skewed_streams", "Sources with an active clock-skew correction", "skewed_streams"),
+    ):
+        _metric(_name, _documentation, lambda key=_key: ALIGNER.stats(top=0)[key])
+
+if SPOOL_DIR:
+    for _metric, _name, _documentation, _key in (
+        (METRICS.callback_counter, "gnss_spool_appended_total", "Envelopes written to the spool", "appended"),
+        (METRICS.callback_counter, "gnss_spool_replayed_total", "Spooled envelopes replayed to Zenoh", "replayed"),
+        (METRICS.gauge, "gnss_spool_bytes", "Bytes allocated by spool segments", "bytes"),
+        (METRICS.callback_counter, "gnss_spool_dropped_records_total", "Spooled envelopes lost to the retention cap", "dropped_records"),
+    ):
+        _metric(_name, _documentation, lambda key=_key: SPOOL.stats()[key] if SPOOL else 0)
+
+
+# --- Duplicate suppression ---------------------------------------------------
+# Retried uploads are recognised by (entity, sessionId, messageId) for Sensor Logger and
+# (entity, aid|ser, fix time) for GPSLogger, checked right after decoding so a duplicate
+# never reaches the mapping or protobuf code. DEDUP_WINDOW=0 disables it.
+DEDUP_WINDOW = float(os.environ.get("DEDUP_WINDOW", "600"))
+DEDUP = DedupWindow(maxsize=int(os.environ.get("DEDUP_MAX_KEYS", "100000")), ttl=DEDUP_WINDOW) if DEDUP_WINDOW > 0 else None
+
+DEDUP_CHECKS = METRICS.counter(
+    "gnss_dedup_checks_total", "Duplicate checks by endpoint and result (unique, duplicate)", ("endpoint", "result")
+)
+DEDUP_SUPPRESSED = METRICS.counter(
+    "gnss_dedup_suppressed_entries_total", "Entries not republished because their upload was a retry", ("endpoint",)
+)
+
+
+def is_duplicate(endpoint, key, entries):
+    """True if `key` was already accepted; counts the suppressed entries."""
+    if DEDUP is None or key is None:
+        return False
+    if DEDUP.seen(key):
+        DEDUP_CHECKS.inc(endpoint, "duplicate")
+        DEDUP_SUPPRESSED.inc(endpoint, amount=entries)
+        return True
+    DEDUP_CHECKS.inc(endpoint, "unique")
+    return False
+
+
+def sensorlogger_key(entityid, body):
+    message_id = body.get("messageId")
+    if message_id is None:
+        return None
+    return (entityid, body.get("sessionId"), message_id)
+
+
+# --- Admission control ---------------------------------------------------------
+# Sensor Logger pushes are admitted per priority class (position > navigation > motion >
+# housekeeping, see admission.py): low classes are shed first as the publish queue
+# fills, and 429 + Retry-After is only answered when position entries do not fit or
+# ADMISSION_MAX_INFLIGHT requests are already in progress. Samples held by the time
+# alignment count as queued, and are shed by class again when they are released.
+# ADMISSION_ENABLED=false admits everything.
+ADMISSION = (
+    AdmissionController(
+        PUBLISH_QUEUE,
+        sensor_priorities(SENSORLOGGER_MAPPINGS),
+        max_inflight=int(os.environ.get("ADMISSION_MAX_INFLIGHT", "64")),
+        retry_after=float(os.environ.get("ADMISSION_RETRY_AFTER", "1")),
+        pending=ALIGNER.pending if ALIGNER is not None else None,
+    )
+    if os.environ.get("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+    else None
+)
+
+ADMISSION_ENTRIES = METRICS.counter(
+    "gnss_admission_entries_total", "Sensor Logger entries by priority class and outcome (accepted, shed)", ("class", "outcome")
+)
+ADMISSION_REJECTED = METRICS.counter(
+    "gnss_admission_rejected_total", "Requests answered 429 by reason (inflight, queue)", ("reason",)
+)
+
+
+def reject_admission(rejected):
+    ADMISSION_REJECTED.inc(rejected.reason)
+    raise HTTPException(
+        status_code=429,
+        detail="Ingest is overloaded, retry later",
+        headers={"Retry-After": str(max(1, round(rejected.retry_after)))},
+    )
+
+
+# --- NMEA 0183 listeners ---------------------------------------------------------
+# GNSS receivers on the vessel network stream NMEA sentences over UDP (NMEA_UDP) and/or
+# TCP (NMEA_TCP), e.g. "0.0.0.0:10110". Sentences are parsed on the event loop and go
+# through the same envelope and publish path as the HTTP endpoints. With several
+# workers only the first one to bind an address listens on it.
+NMEA_UDP = os.environ.get("NMEA_UDP", "")
+NMEA_TCP = os.environ.get("NMEA_TCP", "")
 
-app = FastAPI( title="FastAPI")
+
+def queue_nmea(items):
+    """Queue the messages of one datagram or TCP read; never blocks the event loop.
+
+    A live stream has no retries: when the publish queue cannot take the messages
+    they are dropped (and counted) instead of waiting for room.
+    """
+    if zenoh_session is None:
+        INGEST_ENTRIES.inc("nmea", "dropped", amount=len(items))
+        return False
+    try:
+        PUBLISH_QUEUE.put_many(items)
+    except PublishQueueFull:
+        INGEST_ENTRIES.inc("nmea", "dropped", amount=len(items))
+        return False
+    INGEST_ENTRIES.inc("nmea", "published", amount=len(items))
+    return True
+
+
+NMEA = (
+    NmeaIngest(
+        os.environ.get("NMEA_ENTITY_ID", "nmea"),
+        NMEA_HANDLERS,
+        build_envelope,
+        queue_nmea,
+        source_id=os.environ.get("NMEA_SOURCE_ID", "nmea-{host}"),
+    )
+    if NMEA_UDP or NMEA_TCP
+    else None
+)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Everything with threads or sockets starts here, after uvicorn forked the worker
+    if SPOOL_DIR:
+        open_spool()
+    PUBLISH_QUEUE.start()
+    connecting = asyncio.create_task(connect_zenoh())
+    nmea_listeners = await start_listeners(NMEA, NMEA_UDP, NMEA_TCP) if NMEA is not None else []
+    releasing = asyncio.create_task(release_aligned_loop()) if ALIGNER is not None else None
+    watching = (
+        asyncio.create_task(watch_geofences()) if GEOFENCES is not None and GEOFENCE_RELOAD_INTERVAL > 0 else None
+    )
+    yield
+    await stop_listeners(nmea_listeners)
+    connecting.cancel()
+    if watching is not None:
+        watching.cancel()
+    if releasing is not None:
+        releasing.cancel()
+        await release_aligned(flush=True)
+    # Flush whatever the handlers already accepted, then undeclare and close
+    PUBLISH_QUEUE.close(timeout=float(os.environ.get("PUBLISH_FLUSH_TIMEOUT", "5.0")))
+    close_spool()
+    PUBLISHERS.clear()
+    close_zenoh()
+    logging.info(f"Worker {os.getpid()} shut down")
+
+
+app = FastAPI( title="FastAPI", lifespan=lifespan)
 
 # Allow external GET requests from 192.168.0.5
 origins = ["*", "192.168.0.5"]
@@ -127,9 +781,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, requests=HTTP_REQUESTS, latency=HTTP_LATENCY)
+
 logger = logging.getLogger("fastapi")
 
 
+def require_zenoh():
+    """Answer 503 while this worker's Zenoh session is still being opened."""
+    if zenoh_session is None:
+        logging.warning("Zenoh session is not initialized.")
+        raise HTTPException(status_code=503, detail="Zenoh session not ready, retry later")
+
+
 @app.get(
     "/",
     summary="Test endpoint",
@@ -141,6 +805,235 @@ async def root():
     return {"message": "Hello World"}
 
 
+@app.get("/ready", summary="Readiness probe")
+async def ready():
+    """200 once this worker can deliver: session open and a router or peer connected.
+
+    With the spool enabled a disconnected worker is still ready, since it keeps data.
+    """
+    session_open = zenoh_session is not None
+    info = zenoh_session.info if session_open else None
+    routers = [str(zid) for zid in info.routers_zid()] if session_open else []
+    peers = [str(zid) for zid in info.peers_zid()] if session_open else []
+    connected = bool(routers or peers)
+    is_ready = session_open and (connected or SPOOL is not None)
+    body = {
+        "ready": is_ready,
+        "pid": os.getpid(),
+        "zenoh": {"session": session_open, "connected": connected, "routers": routers, "peers": peers},
+        "spool": SPOOL is not None,
+    }
+    return JSONResponse(body, status_code=200 if is_ready else 503)
+
+
+@app.get("/stats/publish", summary="Publish queue statistics")
+async def publish_stats():
+    return PUBLISH_QUEUE.stats()
+
+
+@app.get("/stats/publishers", summary="Publisher cache statistics")
+async def publisher_stats():
+    return PUBLISHERS.stats()
+
+
+@app.get("/stats/spool", summary="Durable spool statistics")
+async def spool_stats():
+    if SPOOL is None:
+        return {"enabled": False}
+    return {"enabled": True, "connected": ZENOH_CONNECTED(), **SPOOL.stats()}
+
+
+@app.get("/stats/dedup", summary="Duplicate suppression statistics")
+async def dedup_stats():
+    if DEDUP is None:
+        return {"enabled": False}
+    return {"enabled": True, **DEDUP.stats()}
+
+
+if METRICS_ENABLED:
+
+    @app.get("/metrics", summary="Prometheus metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/entities", summary="Latest state of every tracked entity source")
+async def list_entities(bbox: str = None):
+    """All (entity, source) states, optionally only those inside
+    ?bbox=min_lat,min_lon,max_lat,max_lon."""
+    if bbox is None:
+        return [state.as_dict() for sources in STATE.entities().values() for state in sources.values()]
+    try:
+        min_lat, min_lon, max_lat, max_lon = (float(part) for part in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="bbox must be min_lat,min_lon,max_lat,max_lon")
+    return [state.as_dict() for state in STATE.within(min_lat, min_lon, max_lat, max_lon)]
+
+
+@app.get("/entities/nearest", summary="Entity sources closest to a point")
+async def nearest_entities(lat: float, lon: float, k: int = 5, max_distance_m: float = None):
+    return [
+        {"distance_m": distance, **state.as_dict()}
+        for distance, state in STATE.nearest(lat, lon, k=k, max_distance_m=max_distance_m)
+    ]
+
+
+@app.get("/entities/{entityid}/latest", summary="Latest state of one entity, per source")
+async def entity_latest(entityid: str):
+    sources = STATE.latest(entityid)
+    if not sources:
+        raise HTTPException(status_code=404, detail=f"Unknown entity '{entityid}'")
+    return {"entity_id": entityid, "sources": {source: state.as_dict() for source, state in sources.items()}}
+
+
+@app.get("/entities/{entityid}/track", summary="Recent trajectory of one entity")
+async def entity_track(
+    entityid: str,
+    since: float = None,
+    until: float = None,
+    tolerance: float = 0.0,
+    method: str = "dp",
+    interval: float = 0.0,
+    source_id: str = None,
+    format: str = "geojson",
+):
+    """Fixes between `since` and `until` (epoch seconds; negative means seconds before
+    now), thinned to one per `interval` seconds and simplified with Douglas-Peucker
+    (`method=dp`) or Visvalingam-Whyatt (`method=vw`) at `tolerance` meters.
+
+    `format=geojson` returns a FeatureCollection with one LineString per source;
+    `format=binary` returns one source (`source_id`, or the most recently updated) in
+    the layout documented at `tracks.encode_binary`."""
+    if method not in tracks.SIMPLIFIERS:
+        raise HTTPException(status_code=422, detail=f"method must be one of {sorted(tracks.SIMPLIFIERS)}")
+    if format not in ("geojson", "binary"):
+        raise HTTPException(status_code=422, detail="format must be geojson or binary")
+    if tolerance < 0 or interval < 0:
+        raise HTTPException(status_code=422, detail="tolerance and interval must not be negative")
+
+    sources = TRACKS.sources(entityid)
+    if source_id is not None:
+        sources = {source_id: sources[source_id]} if sources and source_id in sources else None
+    if not sources:
+        detail = f"No track for entity '{entityid}'" + (f" source '{source_id}'" if source_id else "")
+        raise HTTPException(status_code=404, detail=detail)
+
+    now_ns = time_ns()
+
+    def bound(value):
+        if value is None:
+            return None
+        return now_ns + int(value * 1e9) if value < 0 else int(value * 1e9)
+
+    since_ns, until_ns = bound(since), bound(until)
+
+    # Slice (a copy) on the event loop, which owns the store; simplify and encode in a
+    # thread so a long history does not stall ingest
+    if format == "binary":
+        source, track = max(sources.items(), key=lambda item: item[1].last_time() or 0)
+        columns = track.slice(since_ns, until_ns)
+        body = await asyncio.to_thread(
+            lambda: tracks.encode_binary(tracks.simplify(columns, tolerance, method, interval))
+        )
+        return Response(body, media_type="application/octet-stream", headers={"X-Source-Id": source})
+
+    sliced = [(source, track.slice(since_ns, until_ns)) for source, track in sources.items()]
+    features = await asyncio.to_thread(
+        lambda: [
+            tracks.to_geojson_feature(entityid, source, tracks.simplify(columns, tolerance, method, interval))
+            for source, columns in sliced
+        ]
+    )
+    return {"type": "FeatureCollection", "features": features}
+
+
+@app.get("/geofences", summary="Loaded geofences and the entity sources inside them")
+async def list_geofences():
+    if GEOFENCES is None:
+        return {"enabled": False}
+    occupants = GEOFENCES.occupants()
+    return {
+        "enabled": True,
+        "fences": [
+            {**fence.as_dict(), "inside": occupants.get(fence.id, [])}
+            for fence in GEOFENCES.index.fences.values()
+        ],
+    }
+
+
+@app.post("/geofences/reload", summary="Re-read the GEOFENCES file")
+async def reload_geofences_now():
+    if GEOFENCES is None:
+        raise HTTPException(status_code=404, detail="Geofences are not enabled (GEOFENCES is empty)")
+    if not await reload_geofences():
+        raise HTTPException(status_code=422, detail=GEOFENCES.last_error)
+    return {"fences": len(GEOFENCES.index.fences)}
+
+
+@app.get("/stats/geofence", summary="Geofence index and zone event statistics")
+async def geofence_stats():
+    if GEOFENCES is None:
+        return {"enabled": False}
+    return {"enabled": True, **GEOFENCES.stats()}
+
+
+@app.get("/stats/motion", summary="Motion filter statistics")
+async def motion_stats():
+    if MOTION is None:
+        return {"enabled": False}
+    return {"enabled": True, **MOTION.stats()}
+
+
+@app.get("/stats/lastvalue", summary="Last-value cache statistics")
+async def last_value_stats():
+    if LAST_VALUES is None:
+        return {"enabled": False}
+    return {"enabled": True, "queryable": last_value_queryable is not None, **LAST_VALUES.stats()}
+
+
+@app.get("/stats/logging", summary="Log queue and sampling statistics")
+async def logging_stats():
+    return LOGGING.stats()
+
+
+@app.get("/stats/nmea", summary="NMEA 0183 listener statistics")
+async def nmea_stats():
+    if NMEA is None:
+        return {"enabled": False}
+    return {"enabled": True, "udp": NMEA_UDP or None, "tcp": NMEA_TCP or None, **NMEA.stats()}
+
+
+@app.get("/stats/timealign", summary="Clock-skew correction and reorder buffer statistics")
+async def timealign_stats():
+    if ALIGNER is None:
+        return {"enabled": False}
+    return {"enabled": True, **ALIGNER.stats()}
+
+
+@app.get("/stats/admission", summary="Admission control statistics")
+async def admission_stats():
+    if ADMISSION is None:
+        return {"enabled": False}
+    return {"enabled": True, **ADMISSION.stats()}
+
+
+@app.get("/stats/policies", summary="Publish policy statistics")
+async def policy_stats():
+    if POLICIES is None:
+        return {"enabled": False}
+    return {"enabled": True, **POLICIES.stats()}
+
+
+@app.get("/stats/state", summary="Latest-state store statistics")
+async def state_stats():
+    return STATE.stats()
+
+
+@app.get("/stats/tracks", summary="Track history statistics")
+async def track_stats():
+    return TRACKS.stats()
+
+
 @app.get("/log_minimal", summary="Minimal log endpoint", description="Logs minimal data")
 async def log(
     request: Request, lat: float = None, long: float = None, time: str = None
@@ -162,321 +1055,383 @@ async def log_post(
     entityid, request: Request, lat: float = None, long: float = None, time: str = None
 ):
 
-    logging.debug(f"Received POST LOGG at time: {time}")
+    ingest_log.debug("Received POST LOGG at time: %s", time)
+    require_zenoh()
 
+    body = await request.body()
+    started = perf_counter()
     try:
-        body = await request.body()
-        data = body.decode("utf-8").split("&")
-        parsed_data = {}
-        for item in data:
-            if "=" in item:
-                key, value = item.split("=", 1)
-                parsed_data[key] = value
-
-        logging.debug(f"Parsed data: {parsed_data}")
-
-        datetime_fix = datetime.datetime.strptime(
-            parsed_data.get("time"), "%Y-%m-%dT%H:%M:%S.%fZ"
-        )
+        fix = parse_gpslogger(body)
+    except GpsLoggerParseError as e:
+        ingest_log.warning("GPSLogger: rejected body for %s: %s", entityid, e)
+        INGEST_ENTRIES.inc("gpslogger", "invalid")
+        raise HTTPException(status_code=422, detail={"field": e.field, "error": e.message})
 
+    STAGE_LATENCY.observe(perf_counter() - started, "parse")
 
-        # PositionFix
-        payload_fix = LocationFix()
-        payload_fix.timestamp.FromDatetime(datetime_fix)
-        payload_fix.latitude = float(parsed_data.get("lat"))
-        payload_fix.longitude = float(parsed_data.get("lon"))
-        payload_fix.altitude = float(parsed_data.get("alt"))
-
-        # Accuracy
-        payload_accuracy = TimestampedFloat()
-        payload_accuracy.timestamp.FromDatetime(datetime_fix)
-        payload_accuracy.value = float(parsed_data.get("acc"))
-
-        # HDOP
-        payload_hdop = TimestampedFloat()
-        payload_hdop.timestamp.FromDatetime(datetime_fix)
-        payload_hdop.value = float(parsed_data.get("hdop"))
-
-        # VDOP
-        payload_vdop = TimestampedFloat()
-        payload_vdop.timestamp.FromDatetime(datetime_fix)
-        payload_vdop.value = float(parsed_data.get("vdop"))
-        
-        # PDOP
-        payload_pdop = TimestampedFloat()
-        payload_pdop.timestamp.FromDatetime(datetime_fix)
-        payload_pdop.value = float(parsed_data.get("pdop"))
-        
-        # Satellites
-        payload_satellites = TimestampedInt()
-        payload_satellites.timestamp.FromDatetime(datetime_fix)
-        payload_satellites.value = int(parsed_data.get("sat"))
-        
-        # course_over_ground_deg
-        payload_heading = TimestampedFloat()
-        payload_heading.timestamp.FromDatetime(datetime_fix)
-        payload_heading.value = float(parsed_data.get("dir"))
-
-        # speed_over_ground_knots
-        payload_speed = TimestampedFloat()
-        payload_speed.timestamp.FromDatetime(datetime_fix)
-        knots =  float(parsed_data.get("spd")) * 1.94384 # convert to knots
-        payload_speed.value = float(knots)
-        
-        # Battery (battery_state_of_charge_pct)
-        payload_battery = TimestampedFloat()
-        payload_battery.timestamp.FromDatetime(datetime_fix)
-        payload_battery.value = float(parsed_data.get("batt"))
-
-        # Battery is charging
-        payload_is_charging = TimestampedBool()
-        payload_is_charging.timestamp.FromDatetime(datetime_fix)
-        if parsed_data.get("ischarging") == "true":
-            payload_is_charging.value = True
+    device = fix.aid or fix.ser
+    dedup_key = (entityid, device, fix.time_ns) if device else None
+    if is_duplicate("gpslogger", dedup_key, 1):
+        ingest_log.debug("GPSLogger: duplicate fix from %s at %s skipped", device, fix.time_ns)
+        return fix.as_dict()
+
+    if fix.ignored:
+        ingest_log.warning("GPSLogger: ignored malformed %s for %s", ", ".join(fix.ignored), entityid)
+
+    try:
+        if ingest_log.isEnabledFor(logging.DEBUG):
+            ingest_log.debug("Parsed data: %s", fix.as_dict())
+        ts = fix.time_ns
+
+        # Build every payload before queueing any, so a bad field publishes nothing
+        source = fix.profile or "gpslogger"
+        batch = []
+        if ALIGNER is None:
+            publish = batch_publisher(batch)
         else:
-            payload_is_charging.value = False
+            publish = aligned_publisher(ALIGNER.begin(entityid, source, ts, session=fix.starttimestamp or None))
+        started, encode_before = perf_counter(), tuple(ENCODE_SECONDS)
+        late_before = late_drops()
+        GPSLOGGER_HANDLER(entityid, source, ts, fix, publish)
+        observe_build(started, encode_before)
+        if late_drops() != late_before:
+            INGEST_ENTRIES.inc("gpslogger", "late")
+            return fix.as_dict()
+        if ALIGNER is None:
+            await PUBLISH_QUEUE.put_many_async(batch)
+        else:
+            await release_aligned()
+        INGEST_ENTRIES.inc("gpslogger", "published")
+        if DEDUP is not None and dedup_key is not None:
+            DEDUP.add(dedup_key)
 
+        return fix.as_dict()
 
-        # Publish data using Zenoh
-        if zenoh_session:
+    except PublishQueueFull:
+        raise HTTPException(status_code=503, detail="Publish queue is full, retry later")
+    except Exception as e:
+        ingest_log.error("GPSLogger: failed to map fix for %s: %s", entityid, e)
+        INGEST_ENTRIES.inc("gpslogger", "failed")
+        raise HTTPException(status_code=422, detail={"error": str(e)})
 
-            # PositionFix
-            key_expr_location_fix = keelson.construct_pubsub_key(
-                base_path="rise",
-                entity_id=entityid,
-                subject="location_fix",
-                source_id=parsed_data.get("profile"),
-            )
-            serialized_position_fix = payload_fix.SerializeToString()
-            envelope = keelson.enclose(serialized_position_fix)
-            zenoh_session.put(key_expr=key_expr_location_fix,payload=envelope)
-            logging.debug(f"Published PositionFix to Zenoh with key: {key_expr_location_fix}")
-
-
-            # Accuracy
-            key_expr_accuracy = keelson.construct_pubsub_key(
-                base_path="rise",
-                entity_id=entityid,
-                subject="location_fix_accuracy_horizontal_m",
-                source_id=parsed_data.get("profile"),
-            )
-            serialized_accuracy = payload_accuracy.SerializeToString()
-            envelope = keelson.enclose(serialized_accuracy)
-            zenoh_session.put(key_expr=key_expr_accuracy, payload=envelope)
-            logging.debug(f"Published Accuracy to Zenoh with key: {key_expr_accuracy}")
-
-            # HDOP
-            key_expr_hdop = keelson.construct_pubsub_key(
-                base_path="rise",
-                entity_id=entityid,
-                subject="location_fix_hdop",
-                source_id=parsed_data.get("profile"),
-            )
-            serialized_hdop = payload_hdop.SerializeToString()
-            envelope = keelson.enclose(serialized_hdop)
-            zenoh_session.put(key_expr=key_expr_hdop, payload=envelope)
-            logging.debug(f"Published HDOP to Zenoh with key: {key_expr_hdop}")
-
-            # VDOP
-            key_expr_vdop = keelson.construct_pubsub_key(
-                base_path="rise",
-                entity_id=entityid,
-                subject="location_fix_vdop",
-                source_id=parsed_data.get("profile"),
-            )
-            serialized_vdop = payload_vdop.SerializeToString()
-            envelope = keelson.enclose(serialized_vdop)
-            zenoh_session.put(key_expr=key_expr_vdop, payload=envelope)
-            logging.debug(f"Published VDOP to Zenoh with key: {key_expr_vdop}")
-
-            # PDOP  
-            key_expr_pdop = keelson.construct_pubsub_key(
-                base_path="rise",
-                entity_id=entityid,
-                subject="location_fix_pdop",
-                source_id=parsed_data.get("profile"),
-            )
-            serialized_pdop = payload_pdop.SerializeToString()
-            envelope = keelson.enclose(serialized_pdop)
-            zenoh_session.put(key_expr=key_expr_pdop, payload=envelope)
-            logging.debug(f"Published PDOP to Zenoh with key: {key_expr_pdop}")
-
-            # Satellites
-            key_expr_satellites = keelson.construct_pubsub_key(
-                base_path="rise",
-                entity_id=entityid,
-                subject="location_fix_satellites_used",
-                source_id=parsed_data.get("profile"),
-            )
-            serialized_satellites = payload_satellites.SerializeToString()
-            envelope = keelson.enclose(serialized_satellites)
-            zenoh_session.put(key_expr=key_expr_satellites, payload=envelope)
-            logging.debug(f"Published Satellites to Zenoh with key: {key_expr_satellites}")
-
-            # course_over_ground_deg
-            key_expr_heading = keelson.construct_pubsub_key(    
-                base_path="rise",
-                entity_id=entityid,
-                subject="course_over_ground_deg",
-                source_id=parsed_data.get("profile"),
-            )
-            serialized_heading = payload_heading.SerializeToString()
-            envelope = keelson.enclose(serialized_heading)
-            zenoh_session.put(key_expr=key_expr_heading, payload=envelope)
-            logging.debug(f"Published course_over_ground_deg to Zenoh with key: {key_expr_heading}")
-
-            # speed_over_ground_knots
-            key_expr_speed = keelson.construct_pubsub_key(
-                base_path="rise",
-                entity_id=entityid,
-                subject="speed_over_ground_knots",
-                source_id=parsed_data.get("profile"),
-            )
-            serialized_speed = payload_speed.SerializeToString()
-            envelope = keelson.enclose(serialized_speed)
-            zenoh_session.put(key_expr=key_expr_speed, payload=envelope)
-            logging.debug(f"Published speed_over_ground_knots to Zenoh with key: {key_expr_speed}")
-            
-            # Battery
-            key_expr_battery = keelson.construct_pubsub_key(
-                base_path="rise",
-                entity_id=entityid,
-                subject="battery_state_of_charge_pct",
-                source_id=parsed_data.get("profile"),
-            )
-            serialized_battery = payload_battery.SerializeToString()
-            envelope = keelson.enclose(serialized_battery)
-            zenoh_session.put(key_expr=key_expr_battery, payload=envelope)
-            logging.debug(f"Published battery_state_of_charge_pct to Zenoh with key: {key_expr_battery}")
-
-            # Battery is charging
-            key_expr_is_charging = keelson.construct_pubsub_key(
-                base_path="rise",
-                entity_id=entityid,
-                subject="battery_is_charging",
-                source_id=parsed_data.get("profile"),
-            )
-            serialized_is_charging = payload_is_charging.SerializeToString()
-            envelope = keelson.enclose(serialized_is_charging)
-            zenoh_session.put(key_expr=key_expr_is_charging, payload=envelope)
-            logging.debug(f"Published battery_is_charging to Zenoh with key: {key_expr_is_charging}")
+
+def newest_time_ns(entries):
+    """Time of the newest entry in a Sensor Logger payload list, or None."""
+    newest = None
+    for entry in entries:
+        try:
+            ts = int(entry["time"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if newest is None or ts > newest:
+            newest = ts
+    return newest
 
 
+async def ingest_sensorlogger(entityid, source, entries, session=None):
+    """Map and queue one Sensor Logger payload list; returns (received, unmapped, failed,
+    late), `late` being the entries dropped by the time alignment as late.
+
+    Shared by the HTTP and WebSocket endpoints. The envelopes of the list are queued
+    together once all are built; PublishQueueFull propagates to the caller.
+    """
+    received = 0
+    unmapped = 0
+    failed = 0
+    late = 0
+    started, encode_before = perf_counter(), tuple(ENCODE_SECONDS)
+    batch = []
+    if ALIGNER is not None:
+        publish = aligned_publisher(ALIGNER.begin(entityid, source, newest_time_ns(entries), session))
+    else:
+        publish = batch_publisher(batch)
+
+    # High-rate sensors are grouped by name and converted in one NumPy pass per group;
+    # groups that are small or fail batch conversion go through the per-entry handlers.
+    groups = {}
+    singles = []
+    for entry in entries:
+        name = entry.get("name")
+        if name in SENSORLOGGER_BATCH_HANDLERS:
+            groups.setdefault(name, []).append(entry)
         else:
-            logging.warning("Zenoh session is not initialized.")
+            singles.append(entry)
 
-        return parsed_data
+    for name, group in groups.items():
+        late_before = late_drops()
+        batched = len(group) >= BATCH_MIN_ENTRIES and SENSORLOGGER_BATCH_HANDLERS[name](
+            entityid, source, group, publish
+        )
+        if batched:
+            # One message per rule and entry; the messages of one entry share its time,
+            # so they are late together
+            dropped = (late_drops() - late_before) // len(SENSORLOGGER_MAPPINGS[name])
+            late += dropped
+            received += len(group) - dropped
+        else:
+            singles.extend(group)
 
-    except Exception as e:
-        logging.error(f"{e}")
+    for entry in singles:
+        name = entry.get("name")
+        try:
+            ts = int(entry["time"])  # UTC epoch nanoseconds
+            values = entry.get("values", {}) or {}
+
+            handler = SENSORLOGGER_HANDLERS.get(name)
+            if handler is None:
+                ingest_log.debug("SensorLogger: unmapped sensor '%s' skipped", name)
+                unmapped += 1
+                continue
+            late_before = late_drops()
+            handler(entityid, source, ts, values, publish)
+
+            if late_drops() != late_before:
+                late += 1
+            else:
+                received += 1
+        except Exception as e:
+            failed += 1
+            ingest_log.error("SensorLogger: failed to process entry '%s': %s", name, e)
+
+    if METRICS_ENABLED:
+        observe_build(started, encode_before)
+    if ALIGNER is not None:
+        await release_aligned()
+    else:
+        await PUBLISH_QUEUE.put_many_async(batch)
+
+    if METRICS_ENABLED:
+        INGEST_ENTRIES.inc("sensorlogger", "published", amount=received)
+        INGEST_ENTRIES.inc("sensorlogger", "unmapped", amount=unmapped)
+        INGEST_ENTRIES.inc("sensorlogger", "failed", amount=failed)
+        INGEST_ENTRIES.inc("sensorlogger", "late", amount=late)
+
+    ingest_log.debug("SensorLogger: published %d/%d entries for %s/%s", received, len(entries), entityid, source)
+    return received, unmapped, failed, late
+
+
+# Body decoding: msgspec typed structs when installed, else orjson, else stdlib json
+# (SENSORLOGGER_JSON_DECODER picks one explicitly). Compressed bodies may inflate to at
+# most SENSORLOGGER_MAX_BODY_MB.
+decode_sensorlogger, SENSORLOGGER_JSON_DECODER = sensorlogger_decoder(
+    SENSORLOGGER_MAPPINGS, os.environ.get("SENSORLOGGER_JSON_DECODER", "auto")
+)
+SENSORLOGGER_MAX_BODY = int(float(os.environ.get("SENSORLOGGER_MAX_BODY_MB", "64")) * 1024 * 1024)
 
 
 @app.post("/sensorlogger/{entityid}")
 async def sensorlogger_post(entityid, request: Request, source_id: str = None):
     """Ingest a Sensor Logger (tszheichoi) real-time HTTP Push batch and republish to keelson.
 
-    Body is JSON: {messageId, sessionId, deviceId, userId?, payload: [{name, time(ns), values}]}.
-    Each payload entry is mapped to one or more well-known keelson subjects. Per-entry errors
-    are isolated so a single bad reading never drops the rest of the batch.
+    Body is JSON: {messageId, sessionId, deviceId, userId?, payload: [{name, time(ns), values}]},
+    optionally gzip, deflate or zstd compressed (Content-Encoding). Entries of unknown sensors are
+    dropped while decoding. Each remaining entry is mapped to one or more well-known keelson
+    subjects. Per-entry errors are isolated so a single bad reading never drops the rest of the batch.
     """
-    if zenoh_session is None:
-        logging.warning("Zenoh session is not initialized.")
-        return {"received": 0}
+    require_zenoh()
 
+    if ADMISSION is None:
+        return await ingest_sensorlogger_request(entityid, request, source_id)
     try:
-        body = await request.json()
+        ADMISSION.enter()
+    except AdmissionRejected as rejected:
+        reject_admission(rejected)
+    try:
+        return await ingest_sensorlogger_request(entityid, request, source_id)
+    finally:
+        ADMISSION.leave()
+
+
+async def ingest_sensorlogger_request(entityid, request, source_id):
+    body = await request.body()
+    started = perf_counter()
+    content_encoding = request.headers.get("content-encoding")
+    if content_encoding:
+        try:
+            body = decompress(body, content_encoding, SENSORLOGGER_MAX_BODY)
+        except UnsupportedEncoding as e:
+            raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding '{e}'")
+        except BodyTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            ingest_log.error("SensorLogger: invalid %s body: %s", content_encoding, e)
+            INGEST_ENTRIES.inc("sensorlogger", "invalid")
+            return {"received": 0}
+        decompressed = perf_counter()
+        STAGE_LATENCY.observe(decompressed - started, "decompress")
+        started = decompressed
+    try:
+        body, skipped = decode_sensorlogger(body)
     except Exception as e:
-        logging.error(f"SensorLogger: invalid JSON body: {e}")
+        ingest_log.error("SensorLogger: invalid JSON body: %s", e)
+        INGEST_ENTRIES.inc("sensorlogger", "invalid")
         return {"received": 0}
+    STAGE_LATENCY.observe(perf_counter() - started, "parse")
+    if skipped:
+        INGEST_ENTRIES.inc("sensorlogger", "unmapped", amount=skipped)
 
     # Sensor Logger has no "profile"; identify the source by deviceId (override via ?source_id=).
     source = source_id or body.get("deviceId") or "sensorlogger"
     entries = body.get("payload", []) or []
-    received = 0
+    dedup_key = sensorlogger_key(entityid, body)
+    if is_duplicate("sensorlogger", dedup_key, len(entries)):
+        return {"received": 0, "duplicate": True}
 
-    for entry in entries:
-        name = entry.get("name")
+    shed = None
+    if ADMISSION is not None:
         try:
-            ts = int(entry["time"])  # UTC epoch nanoseconds
-            values = entry.get("values", {}) or {}
+            entries, admitted, shed = ADMISSION.admit(entries)
+        except AdmissionRejected as rejected:
+            reject_admission(rejected)
+    try:
+        received, _, _, late = await ingest_sensorlogger(entityid, source, entries, body.get("sessionId"))
+    except PublishQueueFull:
+        raise HTTPException(status_code=503, detail="Publish queue is full, retry later")
+    if DEDUP is not None and dedup_key is not None:
+        DEDUP.add(dedup_key)
+    response = {"received": received, "late": late} if late else {"received": received}
+    if shed is None:
+        return response
+
+    if METRICS_ENABLED:
+        for name, accepted_count, shed_count in zip(PRIORITY_CLASSES, admitted, shed):
+            if accepted_count:
+                ADMISSION_ENTRIES.inc(name, "accepted", amount=accepted_count)
+            if shed_count:
+                ADMISSION_ENTRIES.inc(name, "shed", amount=shed_count)
+    return {
+        **response,
+        "accepted": len(entries),
+        "shed": sum(shed),
+        "shed_by_class": {name: count for name, count in zip(PRIORITY_CLASSES, shed) if count},
+    }
 
-            if name == "location":
-                fix = LocationFix()
-                fix.timestamp.FromNanoseconds(ts)
-                fix.latitude = float(values["latitude"])
-                fix.longitude = float(values["longitude"])
-                if values.get("altitude") is not None:
-                    fix.altitude = float(values["altitude"])
-                publish_payload(entityid, "location_fix", source, fix)
-
-                if values.get("horizontalAccuracy") is not None:
-                    publish_float(entityid, "location_fix_accuracy_horizontal_m", source, values["horizontalAccuracy"], ts)
-                if values.get("verticalAccuracy") is not None:
-                    publish_float(entityid, "location_fix_accuracy_vertical_m", source, values["verticalAccuracy"], ts)
-                if values.get("speed") is not None:
-                    # Sensor Logger speed is m/s -> knots
-                    publish_float(entityid, "speed_over_ground_knots", source, float(values["speed"]) * 1.94384, ts)
-                if values.get("bearing") is not None:
-                    publish_float(entityid, "course_over_ground_deg", source, values["bearing"], ts)
-                if values.get("altitudeAboveMeanSeaLevel") is not None:
-                    publish_float(entityid, "altitude_above_msl_m", source, values["altitudeAboveMeanSeaLevel"], ts)
-
-            elif name == "accelerometer":
-                publish_vector3(entityid, "linear_acceleration_mpss", source, values["x"], values["y"], values["z"], ts, frame_id=source)
-
-            elif name == "gyroscope":
-                publish_vector3(entityid, "angular_velocity_radps", source, values["x"], values["y"], values["z"], ts, frame_id=source)
-
-            elif name == "magnetometer":
-                # Sensor Logger magnetometer is microtesla; keelson wants gauss (1 G = 100 uT)
-                publish_vector3(entityid, "magnetic_field_gauss", source, values["x"] / 100.0, values["y"] / 100.0, values["z"] / 100.0, ts, frame_id=source)
-
-            elif name == "orientation":
-                if all(k in values for k in ("qx", "qy", "qz", "qw")):
-                    quat = TimestampedQuaternion()
-                    quat.timestamp.FromNanoseconds(ts)
-                    quat.value.x = float(values["qx"])
-                    quat.value.y = float(values["qy"])
-                    quat.value.z = float(values["qz"])
-                    quat.value.w = float(values["qw"])
-                    publish_payload(entityid, "orientation_quaternion", source, quat)
-                # Sensor Logger roll/pitch/yaw are radians -> degrees
-                if values.get("roll") is not None:
-                    publish_float(entityid, "roll_deg", source, math.degrees(values["roll"]), ts)
-                if values.get("pitch") is not None:
-                    publish_float(entityid, "pitch_deg", source, math.degrees(values["pitch"]), ts)
-                if values.get("yaw") is not None:
-                    publish_float(entityid, "yaw_deg", source, math.degrees(values["yaw"]), ts)
-
-            elif name == "barometer":
-                # Sensor Logger barometer pressure is hPa; keelson wants Pa (x100)
-                if values.get("pressure") is not None:
-                    publish_float(entityid, "air_pressure_pa", source, float(values["pressure"]) * 100.0, ts)
-
-            elif name == "battery":
-                # Best-effort; confirm field names/units against a real capture.
-                if values.get("level") is not None:
-                    level = float(values["level"])
-                    publish_float(entityid, "battery_state_of_charge_pct", source, level * 100.0 if level <= 1.0 else level, ts)
-                if values.get("state") is not None:
-                    publish_bool(entityid, "battery_is_charging", source, str(values["state"]).lower() in ("charging", "full", "2"), ts)
 
-            else:
-                logging.debug(f"SensorLogger: unmapped sensor '{name}' skipped")
-                continue
+# --- Sensor Logger WebSocket ----------------------------------------------------
+# A long-lived connection skips per-batch HTTP, CORS and header overhead. Frames are fed
+# to an incremental JSON decoder, so a message may span frames and a frame may hold
+# several (newline separated or concatenated) messages. Flow control is per connection:
+# the next frame is only read once the previous one is queued, and while the publish
+# queue is above WS_PAUSE_FILL the reader pauses so TCP backpressure reaches the phone.
+# A message is queued whole or not at all, so one answered "busy" can be resent as is.
+WS_PAUSE_FILL = float(os.environ.get("WS_PAUSE_FILL", "0.8"))
+WS_PAUSE_SECONDS = float(os.environ.get("WS_PAUSE_SECONDS", "0.05"))
+WS_MAX_BUFFER = int(os.environ.get("WS_MAX_BUFFER", str(4 * 1024 * 1024)))
 
-            received += 1
-        except Exception as e:
-            logging.error(f"SensorLogger: failed to process entry '{name}': {e}")
+_JSON_DECODER = json.JSONDecoder()
+# Anything that ends a JSON token: an error followed by one of these is not a truncation
+_JSON_TOKEN_END = re.compile(r'[\s,:\[\]{}"]')
 
-    logging.debug(f"SensorLogger: published {received}/{len(entries)} entries for {entityid}/{source}")
-    return {"received": received}
+
+def truncated(buffer, error):
+    """True if `error` may just be `buffer` ending mid-document, e.g. a frame split inside
+    a string, number or literal. Then the error is in the last, unfinished token."""
+    return error.msg.startswith("Unterminated string") or not _JSON_TOKEN_END.search(buffer, error.pos)
+
+
+def decode_json_stream(buffer):
+    """Decode every complete JSON document in `buffer`; returns (documents, remainder).
+
+    A document cut short by the end of `buffer` is returned as the remainder, to be
+    completed by the next frame; WS_MAX_BUFFER bounds how long it can grow.
+    """
+    documents = []
+    index = 0
+    end = len(buffer)
+    while True:
+        while index < end and buffer[index] in " \t\r\n":
+            index += 1
+        if index == end:
+            return documents, ""
+        try:
+            document, index = _JSON_DECODER.raw_decode(buffer, index)
+        except json.JSONDecodeError as e:
+            if e.pos >= end or truncated(buffer, e):
+                # Truncated: wait for the rest of the message in the next frame
+                return documents, buffer[index:]
+            raise
+        documents.append(document)
+
+
+@app.websocket("/sensorlogger/{entityid}/ws")
+async def sensorlogger_ws(websocket: WebSocket, entityid: str, source_id: str = None, ack: bool = False):
+    """Ingest Sensor Logger messages streamed over a WebSocket.
+
+    Accepts the same JSON messages as the HTTP endpoint. With ?ack=true every message is
+    answered with {"messageId", "received"} (or {"messageId", "error"}).
+    """
+    await websocket.accept()
+    if zenoh_session is None:
+        await websocket.close(code=1013, reason="Zenoh session not ready")
+        return
+    buffer = ""
+    try:
+        while True:
+            while PUBLISH_QUEUE.fill() >= WS_PAUSE_FILL:
+                await asyncio.sleep(WS_PAUSE_SECONDS)
+
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            frame = message.get("text")
+            if frame is None:
+                frame = (message.get("bytes") or b"").decode("utf-8", "replace")
+
+            started = perf_counter()
+            try:
+                documents, buffer = decode_json_stream(buffer + frame if buffer else frame)
+            except json.JSONDecodeError as e:
+                ingest_log.error("SensorLogger WS: invalid JSON frame from %s: %s", entityid, e)
+                INGEST_ENTRIES.inc("sensorlogger", "invalid")
+                buffer = ""
+                if ack:
+                    await websocket.send_json({"messageId": None, "error": "invalid JSON"})
+                continue
+            if len(buffer) > WS_MAX_BUFFER:
+                await websocket.close(code=1009, reason="Message too big")
+                break
+            STAGE_LATENCY.observe(perf_counter() - started, "parse")
+
+            for body in documents:
+                if not isinstance(body, dict):
+                    INGEST_ENTRIES.inc("sensorlogger", "invalid")
+                    continue
+                source = source_id or body.get("deviceId") or "sensorlogger"
+                entries = body.get("payload", []) or []
+                dedup_key = sensorlogger_key(entityid, body)
+                if is_duplicate("sensorlogger", dedup_key, len(entries)):
+                    if ack:
+                        await websocket.send_json({"messageId": body.get("messageId"), "duplicate": True})
+                    continue
+                try:
+                    received, _, _, late = await ingest_sensorlogger(entityid, source, entries, body.get("sessionId"))
+                except PublishQueueFull:
+                    if ack:
+                        await websocket.send_json({"messageId": body.get("messageId"), "error": "busy"})
+                    await asyncio.sleep(WS_PAUSE_SECONDS)
+                    continue
+                if DEDUP is not None and dedup_key is not None:
+                    DEDUP.add(dedup_key)
+                if ack:
+                    answer = {"messageId": body.get("messageId"), "received": received}
+                    if late:
+                        answer["late"] = late
+                    await websocket.send_json(answer)
+    except WebSocketDisconnect:
+        pass
+    ingest_log.debug("SensorLogger WS: %s disconnected", entityid)
 
 
 def main():
 
     try:
-        uvicorn.run(app, host="0.0.0.0", port=8001)
+        # Each worker is a separate process with its own Zenoh session (see lifespan)
+        workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+        if workers > 1:
+            uvicorn.run("main:app", host="0.0.0.0", port=8001, workers=workers, log_config=None)
+        else:
+            # log_config=None keeps uvicorn's loggers on the queue set up by configure_logging
+            uvicorn.run(app, host="0.0.0.0", port=8001, log_config=None)
 
     except Exception as e:
         logging.error(f"Failed to start Zenoh session: {e}")
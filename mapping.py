@@ -0,0 +1,444 @@
+"""Declarative mapping from phone sensor fields to keelson subjects.
+
+Both ingest endpoints describe their sources as plain rule lists: GPSLogger as a flat
+list of form fields, SensorLogger as a registry keyed by sensor name. At import the
+rules are compiled into closures, so per-entry dispatch is a single dict lookup
+followed by straight-line payload construction.
+
+Every compiled handler has the signature
+
+    handler(entity_id, source_id, ts_ns, values, publish) -> None
+
+and calls `publish(entity_id, subject, source_id, payload)` once per produced message.
+Payloads are per-thread templates (see encoding.py) refilled for every message, so
+`publish` must serialize the payload before returning and never keep a reference.
+Adding a sensor means adding a registry entry; no endpoint code changes.
+
+High-rate sensors additionally get a batch handler (see "Batched conversion" below)
+that converts a whole group of same-sensor entries with NumPy column operations.
+"""
+import math
+
+import numpy as np
+
+from keelson.payloads.foxglove.LocationFix_pb2 import LocationFix
+from keelson.payloads.Primitives_pb2 import (
+    TimestampedFloat,
+    TimestampedInt,
+    TimestampedBool,
+    TimestampedQuaternion,
+)
+from keelson.payloads.Decomposed3DVector_pb2 import Decomposed3DVector
+
+from encoding import split_ns, template
+
+
+# --- Unit conversions ---------------------------------------------------------
+KNOTS_PER_MPS = 1.94384
+
+
+def mps_to_knots(value):
+    return float(value) * KNOTS_PER_MPS
+
+
+def microtesla_to_gauss(value):
+    # 1 G = 100 uT
+    return float(value) / 100.0
+
+
+def hpa_to_pa(value):
+    return float(value) * 100.0
+
+
+def rad_to_deg(value):
+    return math.degrees(value)
+
+
+def fraction_to_pct(value):
+    # Sensor Logger reports battery level as 0..1 on some platforms and 0..100 on others
+    level = float(value)
+    return level * 100.0 if level <= 1.0 else level
+
+
+def is_charging_state(value):
+    return str(value).lower() in ("charging", "full", "2")
+
+
+# --- Rule constructors ----------------------------------------------------------
+# Rules are plain dicts so a registry can also be loaded from JSON/YAML config;
+# "convert" may then be given as the name of one of the functions above.
+def scalar(field, subject, kind="float", convert=None, required=False, default=None):
+    return {
+        "kind": kind,
+        "field": field,
+        "subject": subject,
+        "convert": convert,
+        "required": required,
+        "default": default,
+    }
+
+
+def vector3(subject, fields=("x", "y", "z"), convert=None, frame_from_source=True):
+    return {
+        "kind": "vector3",
+        "fields": fields,
+        "subject": subject,
+        "convert": convert,
+        "frame_from_source": frame_from_source,
+    }
+
+
+def quaternion(subject, fields=("qx", "qy", "qz", "qw")):
+    return {"kind": "quaternion", "fields": fields, "subject": subject}
+
+
+def location_fix(latitude, longitude, altitude, subject="location_fix", altitude_required=False):
+    return {
+        "kind": "location_fix",
+        "fields": (latitude, longitude, altitude),
+        "subject": subject,
+        "altitude_required": altitude_required,
+    }
+
+
+# --- Registries -------------------------------------------------------------------
+SENSORLOGGER_MAPPINGS = {
+    "location": [
+        location_fix("latitude", "longitude", "altitude"),
+        scalar("horizontalAccuracy", "location_fix_accuracy_horizontal_m"),
+        scalar("verticalAccuracy", "location_fix_accuracy_vertical_m"),
+        scalar("speed", "speed_over_ground_knots", convert=mps_to_knots),
+        scalar("bearing", "course_over_ground_deg"),
+        scalar("altitudeAboveMeanSeaLevel", "altitude_above_msl_m"),
+    ],
+    "accelerometer": [vector3("linear_acceleration_mpss")],
+    "gyroscope": [vector3("angular_velocity_radps")],
+    "magnetometer": [vector3("magnetic_field_gauss", convert=microtesla_to_gauss)],
+    "gravity": [vector3("gravity_mpss")],
+    "totalacceleration": [vector3("total_acceleration_mpss")],
+    "orientation": [
+        quaternion("orientation_quaternion"),
+        scalar("roll", "roll_deg", convert=rad_to_deg),
+        scalar("pitch", "pitch_deg", convert=rad_to_deg),
+        scalar("yaw", "yaw_deg", convert=rad_to_deg),
+    ],
+    "barometer": [scalar("pressure", "air_pressure_pa", convert=hpa_to_pa)],
+    # Best-effort; confirm field names/units against a real capture.
+    "battery": [
+        scalar("level", "battery_state_of_charge_pct", convert=fraction_to_pct),
+        scalar("state", "battery_is_charging", kind="bool", convert=is_charging_state),
+    ],
+}
+
+# GPSLogger posts every field on every fix, so all of them are required. Values come
+# from gpslogger.GpsLoggerFix and are already typed.
+GPSLOGGER_MAPPING = [
+    location_fix("lat", "lon", "alt", altitude_required=True),
+    scalar("acc", "location_fix_accuracy_horizontal_m", required=True),
+    scalar("hdop", "location_fix_hdop", required=True),
+    scalar("vdop", "location_fix_vdop", required=True),
+    scalar("pdop", "location_fix_pdop", required=True),
+    scalar("sat", "location_fix_satellites_used", kind="int", required=True),
+    scalar("dir", "course_over_ground_deg", required=True),
+    scalar("spd", "speed_over_ground_knots", convert=mps_to_knots, required=True),
+    scalar("batt", "battery_state_of_charge_pct", required=True),
+    scalar("ischarging", "battery_is_charging", kind="bool", required=True),
+]
+
+# NMEA 0183 sentences, decoded by nmea.NmeaDecoder into the fields below (empty fields
+# are None and skipped). The position comes from GGA, which carries the altitude; RMC
+# adds the date. RMC and VTG both give speed and course and GGA and GSA both give HDOP:
+# nmea.NmeaIngest publishes each subject once per epoch, whichever sentence comes first.
+NMEA_MAPPINGS = {
+    "GGA": [
+        location_fix("lat", "lon", "alt"),
+        scalar("alt_msl", "altitude_above_msl_m"),
+        scalar("sat", "location_fix_satellites_used", kind="int"),
+        scalar("hdop", "location_fix_hdop"),
+    ],
+    "RMC": [
+        scalar("sog", "speed_over_ground_knots"),
+        scalar("cog", "course_over_ground_deg"),
+    ],
+    "VTG": [
+        scalar("sog", "speed_over_ground_knots"),
+        scalar("cog", "course_over_ground_deg"),
+    ],
+    "GSA": [
+        scalar("hdop", "location_fix_hdop"),
+        scalar("vdop", "location_fix_vdop"),
+        scalar("pdop", "location_fix_pdop"),
+    ],
+    "HDT": [scalar("heading", "heading_true_north_deg")],
+}
+
+
+# --- Compilation --------------------------------------------------------------------
+SCALAR_TYPES = {
+    "float": (TimestampedFloat, float),
+    "int": (TimestampedInt, int),
+    "bool": (TimestampedBool, bool),
+}
+
+
+def _resolve_convert(convert):
+    if convert is None or callable(convert):
+        return convert
+    return globals()[convert]
+
+
+def _compile_scalar(rule):
+    payload_cls, cast = SCALAR_TYPES[rule["kind"]]
+    field = rule["field"]
+    subject = rule["subject"]
+    convert = _resolve_convert(rule["convert"])
+    required = rule["required"]
+    default = rule["default"]
+
+    def build(entity_id, source_id, ts_ns, values, publish):
+        value = values[field] if required else values.get(field, default)
+        if value is None:
+            return
+        value = cast(convert(value) if convert else value)
+        payload = template(payload_cls)
+        timestamp = payload.timestamp
+        timestamp.seconds, timestamp.nanos = split_ns(ts_ns)
+        payload.value = value
+        publish(entity_id, subject, source_id, payload)
+
+    return build
+
+
+def _compile_vector3(rule):
+    fx, fy, fz = rule["fields"]
+    subject = rule["subject"]
+    convert = _resolve_convert(rule["convert"]) or float
+    frame_from_source = rule["frame_from_source"]
+
+    def build(entity_id, source_id, ts_ns, values, publish):
+        x, y, z = convert(values[fx]), convert(values[fy]), convert(values[fz])
+        payload = template(Decomposed3DVector)
+        timestamp = payload.timestamp
+        timestamp.seconds, timestamp.nanos = split_ns(ts_ns)
+        payload.frame_id = source_id if frame_from_source and source_id else ""
+        vector = payload.vector
+        vector.x = x
+        vector.y = y
+        vector.z = z
+        publish(entity_id, subject, source_id, payload)
+
+    return build
+
+
+def _compile_quaternion(rule):
+    fields = rule["fields"]
+    fx, fy, fz, fw = fields
+    subject = rule["subject"]
+
+    def build(entity_id, source_id, ts_ns, values, publish):
+        if not all(k in values for k in fields):
+            return
+        x, y, z, w = float(values[fx]), float(values[fy]), float(values[fz]), float(values[fw])
+        payload = template(TimestampedQuaternion)
+        timestamp = payload.timestamp
+        timestamp.seconds, timestamp.nanos = split_ns(ts_ns)
+        value = payload.value
+        value.x = x
+        value.y = y
+        value.z = z
+        value.w = w
+        publish(entity_id, subject, source_id, payload)
+
+    return build
+
+
+def _compile_location_fix(rule):
+    f_lat, f_lon, f_alt = rule["fields"]
+    subject = rule["subject"]
+    altitude_required = rule["altitude_required"]
+
+    def build(entity_id, source_id, ts_ns, values, publish):
+        latitude = float(values[f_lat])
+        longitude = float(values[f_lon])
+        altitude = values[f_alt] if altitude_required else values.get(f_alt)
+        altitude = 0.0 if altitude is None else float(altitude)
+        payload = template(LocationFix)
+        timestamp = payload.timestamp
+        timestamp.seconds, timestamp.nanos = split_ns(ts_ns)
+        payload.latitude = latitude
+        payload.longitude = longitude
+        payload.altitude = altitude
+        publish(entity_id, subject, source_id, payload)
+
+    return build
+
+
+RULE_COMPILERS = {
+    "float": _compile_scalar,
+    "int": _compile_scalar,
+    "bool": _compile_scalar,
+    "vector3": _compile_vector3,
+    "quaternion": _compile_quaternion,
+    "location_fix": _compile_location_fix,
+}
+
+
+def compile_rules(rules):
+    """Compile a list of rules into a single handler closure."""
+    builders = tuple(RULE_COMPILERS[rule["kind"]](rule) for rule in rules)
+
+    if len(builders) == 1:
+        return builders[0]
+
+    def handler(entity_id, source_id, ts_ns, values, publish):
+        for build in builders:
+            build(entity_id, source_id, ts_ns, values, publish)
+
+    return handler
+
+
+def compile_registry(registry):
+    """Compile a {sensor name: rules} registry into {sensor name: handler}."""
+    return {name: compile_rules(rules) for name, rules in registry.items()}
+
+
+SENSORLOGGER_HANDLERS = compile_registry(SENSORLOGGER_MAPPINGS)
+GPSLOGGER_HANDLER = compile_rules(GPSLOGGER_MAPPING)
+NMEA_HANDLERS = compile_registry(NMEA_MAPPINGS)
+
+
+# --- Batched conversion -------------------------------------------------------------
+# A Sensor Logger push carries hundreds of IMU entries. For those sensors the values of
+# a whole group are pulled into one float64 matrix, converted column-wise and then
+# emitted in a tight loop. Only float, vector3 and quaternion rules with an array-capable
+# conversion can be batched; other sensors keep the per-entry handlers.
+#
+# A batch handler has the signature
+#
+#     batch_handler(entity_id, source_id, entries, publish) -> bool
+#
+# and returns False, without publishing anything, when the group cannot be converted
+# as a whole (missing field, bad time, ...). Callers then fall back to the per-entry
+# handlers so a single bad reading still only costs that reading.
+ARRAY_CONVERSIONS = {
+    None: None,
+    mps_to_knots: lambda column: column * KNOTS_PER_MPS,
+    microtesla_to_gauss: lambda column: column / 100.0,
+    hpa_to_pa: lambda column: column * 100.0,
+    rad_to_deg: np.degrees,
+}
+
+BATCH_KINDS = ("float", "vector3", "quaternion")
+
+# Below this many entries per sensor the NumPy setup costs more than it saves
+BATCH_MIN_ENTRIES = 16
+
+
+def _batch_fields(rule):
+    return (rule["field"],) if rule["kind"] == "float" else tuple(rule["fields"])
+
+
+def _compile_batch_emitter(rule, offset):
+    subject = rule["subject"]
+    kind = rule["kind"]
+    convert = ARRAY_CONVERSIONS[_resolve_convert(rule.get("convert"))]
+
+    if kind == "float":
+
+        def emit(entity_id, source_id, seconds, nanos, columns, publish):
+            column = columns[:, offset]
+            payload = template(TimestampedFloat)
+            timestamp = payload.timestamp
+            for sec, nsec, value in zip(seconds, nanos, (convert(column) if convert else column).tolist()):
+                timestamp.seconds = sec
+                timestamp.nanos = nsec
+                payload.value = value
+                publish(entity_id, subject, source_id, payload)
+
+    elif kind == "vector3":
+        frame_from_source = rule["frame_from_source"]
+
+        def emit(entity_id, source_id, seconds, nanos, columns, publish):
+            block = columns[:, offset:offset + 3]
+            payload = template(Decomposed3DVector)
+            timestamp = payload.timestamp
+            vector = payload.vector
+            payload.frame_id = source_id if frame_from_source and source_id else ""
+            for sec, nsec, (x, y, z) in zip(seconds, nanos, (convert(block) if convert else block).tolist()):
+                timestamp.seconds = sec
+                timestamp.nanos = nsec
+                vector.x = x
+                vector.y = y
+                vector.z = z
+                publish(entity_id, subject, source_id, payload)
+
+    else:
+
+        def emit(entity_id, source_id, seconds, nanos, columns, publish):
+            payload = template(TimestampedQuaternion)
+            timestamp = payload.timestamp
+            value = payload.value
+            for sec, nsec, (x, y, z, w) in zip(seconds, nanos, columns[:, offset:offset + 4].tolist()):
+                timestamp.seconds = sec
+                timestamp.nanos = nsec
+                value.x = x
+                value.y = y
+                value.z = z
+                value.w = w
+                publish(entity_id, subject, source_id, payload)
+
+    return emit
+
+
+def compile_batch_rules(rules):
+    """Compile rules into a batch handler, or return None if they cannot be batched."""
+    for rule in rules:
+        if rule["kind"] not in BATCH_KINDS:
+            return None
+        if _resolve_convert(rule.get("convert")) not in ARRAY_CONVERSIONS:
+            return None
+
+    fields = []
+    emitters = []
+    for rule in rules:
+        emitters.append(_compile_batch_emitter(rule, len(fields)))
+        fields.extend(_batch_fields(rule))
+    fields = tuple(fields)
+    emitters = tuple(emitters)
+
+    def batch_handler(entity_id, source_id, entries, publish):
+        try:
+            times = np.fromiter(
+                (entry["time"] for entry in entries), dtype=np.int64, count=len(entries)
+            )
+            columns = np.array(
+                [[values[field] for field in fields] for values in (entry["values"] for entry in entries)],
+                dtype=np.float64,
+            ).reshape(len(entries), len(fields))
+        except (KeyError, TypeError, ValueError):
+            return False
+        # None values become NaN; the per-entry handlers decide what to do with them
+        if np.isnan(columns).any():
+            return False
+
+        # Split the timestamps once for the whole group instead of FromNanoseconds per message
+        seconds, nanos = np.divmod(times, 1_000_000_000)
+        seconds = seconds.tolist()
+        nanos = nanos.tolist()
+        for emit in emitters:
+            emit(entity_id, source_id, seconds, nanos, columns, publish)
+        return True
+
+    return batch_handler
+
+
+def compile_batch_registry(registry):
+    handlers = {}
+    for name, rules in registry.items():
+        handler = compile_batch_rules(rules)
+        if handler is not None:
+            handlers[name] = handler
+    return handlers
+
+
+SENSORLOGGER_BATCH_HANDLERS = compile_batch_registry(SENSORLOGGER_MAPPINGS)
@@ -0,0 +1,260 @@
+"""Minimal Prometheus text-format metrics for the ingest hot path.
+
+Only counters, gauges and fixed-bucket histograms are provided (counters and gauges
+can also be read from a callback at scrape time); that is all the
+service needs and it keeps an observation to a dict lookup and an increment. Each
+thread writes to its own shard, so the event loop and the publish workers never
+contend on a lock; shards are summed at scrape time. When metrics are disabled every
+metric is a no-op so instrumented code pays nothing more than a method call.
+"""
+import bisect
+import threading
+import time
+
+
+# Latency buckets in seconds, from 10 us (single protobuf) to 2.5 s (huge batch)
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+
+def _format_labels(labelnames, labelvalues, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Sharded:
+    """Per-thread {labels: value} shards, merged on collect."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _new_shard(self):
+        shard = self._local.values = {}
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+    def _snapshot(self):
+        with self._lock:
+            shards = list(self._shards)
+        # list(dict.items()) is a single C call, safe against concurrent writers
+        return [list(shard.items()) for shard in shards]
+
+
+class Counter(_Sharded):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__()
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, *labelvalues, amount=1):
+        try:
+            values = self._local.values
+        except AttributeError:
+            values = self._new_shard()
+        values[labelvalues] = values.get(labelvalues, 0) + amount
+
+    def collect(self):
+        totals = {}
+        for items in self._snapshot():
+            for labels, value in items:
+                totals[labels] = totals.get(labels, 0) + value
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in totals.items()
+        ]
+
+
+class Gauge:
+    """A gauge whose value is read from `callback` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def collect(self):
+        return [f"{self.name} {_format_value(self.callback())}"]
+
+
+class CallbackCounter(Gauge):
+    """A counter whose running total is read from `callback` at scrape time, for totals a
+    component already keeps (e.g. in its stats()). Name it with a `_total` suffix."""
+
+    kind = "counter"
+
+
+class Histogram(_Sharded):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__()
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labelvalues):
+        try:
+            values = self._local.values
+        except AttributeError:
+            values = self._new_shard()
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        series = values.get(labelvalues)
+        if series is None:
+            series = values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *labelvalues):
+        return _Timer(self, labelvalues)
+
+    def collect(self):
+        merged = {}
+        for items in self._snapshot():
+            for labels, series in items:
+                total = merged.get(labels)
+                if total is None:
+                    merged[labels] = list(series)
+                else:
+                    merged[labels] = [a + b for a, b in zip(total, series)]
+        lines = []
+        for labels, series in merged.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            plain = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{plain} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{plain} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labelvalues", "start")
+
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+
+
+class _NullMetric:
+    """Stands in for every metric type when metrics are disabled."""
+
+    def inc(self, *labelvalues, amount=1):
+        pass
+
+    def observe(self, value, *labelvalues):
+        pass
+
+    def time(self, *labelvalues):
+        return _NULL_TIMER
+
+    def collect(self):
+        return []
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Registry:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = []
+
+    def _register(self, metric):
+        if not self.enabled:
+            return _NullMetric()
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, callback):
+        return self._register(Gauge(name, documentation, callback))
+
+    def callback_counter(self, name, documentation, callback):
+        return self._register(CallbackCounter(name, documentation, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request count and latency per route template.
+
+    The route template (e.g. /sensorlogger/{entityid}) is used as label so entity ids
+    never explode the label cardinality.
+    """
+
+    def __init__(self, app, requests, latency):
+        self.app = app
+        self.requests = requests
+        self.latency = latency
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            self.latency.observe(time.perf_counter() - start, endpoint)
+            self.requests.inc(endpoint, str(status[0]))
@@ -0,0 +1,324 @@
+"""Per-(entity, source) motion estimate: smoothed position and derived SOG/COG/rate of turn.
+
+Phone fixes are jittery, and GPSLogger reports `spd=0.0`/`dir=0.0` whenever the phone
+has no speed, so the raw speed_over_ground_knots/course_over_ground_deg are not usable
+as they are. This stage runs a constant-velocity Kalman filter per source, in a local
+east/north frame in meters. Its origin is the source's first fix, moved along when the
+estimate drifts more than RECENTER_M away. Both axes are filtered independently (2-state,
+3-value covariance each). Every sample is O(1):
+
+location_fix
+    Predict to the fix time and update with the fix. The measurement noise is the last
+    location_fix_accuracy_horizontal_m of the source, which the mappers publish right
+    after each fix. A fix more than `gate` standard deviations off is rejected. After
+    MAX_REJECTS rejections in a row, or a gap longer than `max_gap`, the filter restarts
+    at the fix. The estimate is returned for publishing.
+linear_acceleration_mpss
+    The horizontal part (with the gravity direction removed) feeds a running mean square
+    that raises the process noise while the vessel accelerates or turns.
+gravity_mpss, angular_velocity_radps
+    The gyroscope projected on the gravity direction is the device's rate of turn about
+    the vertical, whatever way the phone is mounted. Platforms disagree on the sign of
+    gravity, so the sign is learned from its agreement with the GNSS course changes.
+    Until it is known, the rate of turn comes from the filtered course alone.
+
+SOG and COG come from the filtered velocity. Below `min_speed` the course is held and
+the rate of turn is 0, instead of following the noise of a drifting stationary fix.
+
+All state lives in one flat array of doubles, SLOT values per source (216 bytes), so
+100 000 sources take about 22 MB plus the key dict. Sources silent for `ttl` seconds
+are dropped and their slot reused. Used from the event loop only; not thread-safe.
+"""
+import array
+import math
+import time
+
+from mapping import KNOTS_PER_MPS
+
+EARTH_RADIUS_M = 6_371_008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180.0
+
+# Slot layout (one double each)
+T, LAT0, LON0, KX = 0, 1, 2, 3                       # last fix time (s), frame origin, m per deg lon
+E, VE, PEE, PEV, PVE = 4, 5, 6, 7, 8                 # east: position, velocity, covariance
+N, VN, PNN, PNV, PVN = 9, 10, 11, 12, 13             # north
+ACC, AVAR, GX, GY, GZ = 14, 15, 16, 17, 18           # accuracy (m), horizontal accel mean square, gravity
+YAW, GYRO_T, COG, ROT, CORR = 19, 20, 21, 22, 23     # gyro yaw rate (rad/s) and its time, course, ROT, sign
+SEEN, FIXES, REJECTS = 24, 25, 26                    # monotonic last update, fix count, rejections in a row
+SLOT = 27
+_EMPTY_SLOT = array.array("d", [0.0]) * SLOT
+
+# Measurement noise before the source reported an accuracy (m)
+DEFAULT_ACCURACY_M = 10.0
+# Velocity variance of a (re)started filter: anything up to ~10 m/s
+INITIAL_VELOCITY_VAR = 100.0
+# Process noise cap (m^2/s^4), against phone handling shocks
+MAX_PROCESS_VAR = 9.0
+RECENTER_M = 5000.0
+MAX_REJECTS = 3
+# Per-sample smoothing of the IMU running means (at ~100 Hz: about a second)
+GYRO_ALPHA = 0.05
+GRAVITY_ALPHA = 0.05
+ACCEL_ALPHA = 0.02
+ROT_ALPHA = 0.5
+# Age (s) beyond which the gyro rate is too old to use for the rate of turn
+GYRO_MAX_AGE = 2.0
+
+
+def _seconds(payload):
+    timestamp = payload.timestamp
+    return timestamp.seconds + timestamp.nanos * 1e-9
+
+
+def _wrap_deg(angle):
+    return (angle + 180.0) % 360.0 - 180.0
+
+
+class MotionEstimator:
+    def __init__(self, process_noise=0.3, min_speed=0.5, max_gap=60.0, gate=5.0, ttl=86400.0,
+                 sweep_interval=60.0):
+        self.process_var = process_noise * process_noise
+        self.min_speed = min_speed
+        self.max_gap = max_gap
+        self.gate_sq = gate * gate
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._data = array.array("d")
+        # (entity_id, source_id) -> slot offset in _data
+        self._slots = {}
+        self._free = []
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._handlers = {
+            "location_fix": self._on_fix,
+            "location_fix_accuracy_horizontal_m": self._on_accuracy,
+            "linear_acceleration_mpss": self._on_acceleration,
+            "angular_velocity_radps": self._on_gyroscope,
+            "gravity_mpss": self._on_gravity,
+        }
+
+        self.fixes = 0
+        self.imu_samples = 0
+        self.estimates = 0
+        self.stale = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.expired = 0
+
+    @property
+    def subjects(self):
+        """Subjects `observe` looks at."""
+        return frozenset(self._handlers)
+
+    # --- Slots -------------------------------------------------------------------------
+    def _offset(self, key, now):
+        offset = self._slots.get(key)
+        if offset is None:
+            if self._free:
+                offset = self._free.pop()
+                self._data[offset:offset + SLOT] = _EMPTY_SLOT
+            else:
+                offset = len(self._data)
+                self._data.extend(_EMPTY_SLOT)
+            self._slots[key] = offset
+        self._data[offset + SEEN] = now
+        return offset
+
+    def sweep(self, now=None):
+        """Free the slots of sources silent for `ttl` seconds."""
+        deadline = (time.monotonic() if now is None else now) - self.ttl
+        data = self._data
+        for key in [key for key, offset in self._slots.items() if data[offset + SEEN] < deadline]:
+            self._free.append(self._slots.pop(key))
+            self.expired += 1
+
+    def __len__(self):
+        return len(self._slots)
+
+    # --- Samples -----------------------------------------------------------------------
+    def observe(self, entity_id, subject, source_id, payload):
+        """Feed one payload; returns an estimate for `location_fix` payloads (see
+        `_estimate`), None otherwise."""
+        handler = self._handlers.get(subject)
+        if handler is None:
+            return None
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            self.sweep(now)
+        return handler(self._offset((entity_id, source_id), now), payload)
+
+    def _on_accuracy(self, o, payload):
+        if payload.value > 0:
+            self._data[o + ACC] = payload.value
+
+    def _gravity_unit(self, d, o):
+        gx, gy, gz = d[o + GX], d[o + GY], d[o + GZ]
+        norm = math.sqrt(gx * gx + gy * gy + gz * gz)
+        if norm == 0.0:
+            # No gravity sensor: assume the phone lies flat
+            return 0.0, 0.0, 1.0
+        return gx / norm, gy / norm, gz / norm
+
+    def _on_gravity(self, o, payload):
+        d = self._data
+        vector = payload.vector
+        d[o + GX] += GRAVITY_ALPHA * (vector.x - d[o + GX])
+        d[o + GY] += GRAVITY_ALPHA * (vector.y - d[o + GY])
+        d[o + GZ] += GRAVITY_ALPHA * (vector.z - d[o + GZ])
+        self.imu_samples += 1
+
+    def _on_gyroscope(self, o, payload):
+        d = self._data
+        vector = payload.vector
+        ux, uy, uz = self._gravity_unit(d, o)
+        yaw = vector.x * ux + vector.y * uy + vector.z * uz
+        d[o + YAW] += GYRO_ALPHA * (yaw - d[o + YAW])
+        d[o + GYRO_T] = _seconds(payload)
+        self.imu_samples += 1
+
+    def _on_acceleration(self, o, payload):
+        d = self._data
+        vector = payload.vector
+        x, y, z = vector.x, vector.y, vector.z
+        ux, uy, uz = self._gravity_unit(d, o)
+        vertical = x * ux + y * uy + z * uz
+        horizontal_sq = max(0.0, x * x + y * y + z * z - vertical * vertical)
+        d[o + AVAR] += ACCEL_ALPHA * (horizontal_sq - d[o + AVAR])
+        self.imu_samples += 1
+
+    def _restart(self, d, o, t, lat, lon, variance):
+        d[o + T] = t
+        d[o + LAT0] = lat
+        d[o + LON0] = lon
+        d[o + KX] = METERS_PER_DEGREE * math.cos(math.radians(lat))
+        d[o + E] = d[o + VE] = d[o + PEV] = 0.0
+        d[o + N] = d[o + VN] = d[o + PNV] = 0.0
+        d[o + PEE] = d[o + PNN] = variance
+        d[o + PVE] = d[o + PVN] = INITIAL_VELOCITY_VAR
+        d[o + COG] = math.nan
+        d[o + ROT] = 0.0
+        d[o + REJECTS] = 0.0
+
+    def _on_fix(self, o, payload):
+        d = self._data
+        t = _seconds(payload)
+        lat = payload.latitude
+        lon = payload.longitude
+        self.fixes += 1
+        accuracy = d[o + ACC] or DEFAULT_ACCURACY_M
+        r = accuracy * accuracy
+        started = d[o + FIXES] > 0
+        if started and t <= d[o + T]:
+            self.stale += 1
+            return None
+        d[o + FIXES] += 1
+        if not started or t - d[o + T] > self.max_gap:
+            if started:
+                self.restarts += 1
+            self._restart(d, o, t, lat, lon, r)
+            return self._estimate(d, o, payload, moving=False)
+
+        dt = t - d[o + T]
+        q = min(MAX_PROCESS_VAR, max(self.process_var, d[o + AVAR]))
+        q_pp = q * dt * dt * dt / 3.0
+        q_pv = q * dt * dt / 2.0
+        q_vv = q * dt
+
+        # Predict both axes (constant velocity)
+        ve, vn = d[o + VE], d[o + VN]
+        e = d[o + E] + ve * dt
+        n = d[o + N] + vn * dt
+        pev, pve = d[o + PEV], d[o + PVE]
+        pee = d[o + PEE] + dt * (2.0 * pev + dt * pve) + q_pp
+        pev += dt * pve + q_pv
+        pve += q_vv
+        pnv, pvn = d[o + PNV], d[o + PVN]
+        pnn = d[o + PNN] + dt * (2.0 * pnv + dt * pvn) + q_pp
+        pnv += dt * pvn + q_pv
+        pvn += q_vv
+
+        # Innovation and gate
+        ye = (lon - d[o + LON0]) * d[o + KX] - e
+        yn = (lat - d[o + LAT0]) * METERS_PER_DEGREE - n
+        se = pee + r
+        sn = pnn + r
+        if ye * ye / se + yn * yn / sn > self.gate_sq:
+            self.rejected += 1
+            d[o + REJECTS] += 1
+            if d[o + REJECTS] >= MAX_REJECTS:
+                # Persistently off: the filter lost the vessel, not the other way around
+                self.restarts += 1
+                self._restart(d, o, t, lat, lon, r)
+                return self._estimate(d, o, payload, moving=False)
+            return None
+        d[o + REJECTS] = 0.0
+
+        # Update
+        ke, kev = pee / se, pev / se
+        d[o + E] = e + ke * ye
+        d[o + VE] = ve + kev * ye
+        d[o + PEE] = (1.0 - ke) * pee
+        d[o + PEV] = (1.0 - ke) * pev
+        d[o + PVE] = pve - kev * pev
+        kn, knv = pnn / sn, pnv / sn
+        d[o + N] = n + kn * yn
+        d[o + VN] = vn + knv * yn
+        d[o + PNN] = (1.0 - kn) * pnn
+        d[o + PNV] = (1.0 - kn) * pnv
+        d[o + PVN] = pvn - knv * pnv
+        d[o + T] = t
+
+        if abs(d[o + E]) > RECENTER_M or abs(d[o + N]) > RECENTER_M:
+            d[o + LAT0] += d[o + N] / METERS_PER_DEGREE
+            d[o + LON0] += d[o + E] / d[o + KX]
+            d[o + KX] = METERS_PER_DEGREE * math.cos(math.radians(d[o + LAT0]))
+            d[o + E] = d[o + N] = 0.0
+        return self._estimate(d, o, payload, moving=True, dt=dt)
+
+    def _estimate(self, d, o, payload, moving, dt=0.0):
+        """(ts_ns, lat, lon, alt, var_east, var_north, sog_knots, cog_deg, rot_degpm);
+        the last three are None until the filter has a velocity."""
+        self.estimates += 1
+        timestamp = payload.timestamp
+        ts_ns = timestamp.seconds * 1_000_000_000 + timestamp.nanos
+        lat = d[o + LAT0] + d[o + N] / METERS_PER_DEGREE
+        lon = d[o + LON0] + d[o + E] / d[o + KX]
+        if not moving:
+            return (ts_ns, lat, lon, payload.altitude, d[o + PEE], d[o + PNN], None, None, None)
+
+        ve, vn = d[o + VE], d[o + VN]
+        speed = math.hypot(ve, vn)
+        previous = d[o + COG]
+        if speed >= self.min_speed:
+            cog = math.degrees(math.atan2(ve, vn)) % 360.0
+            gnss_rot = 0.0 if previous != previous else _wrap_deg(cog - previous) / dt * 60.0
+            d[o + COG] = cog
+        else:
+            cog = None if previous != previous else previous
+            gnss_rot = 0.0
+
+        # Gyro yaw rate in deg/min, signed by its running agreement with the GNSS course
+        rot = gnss_rot
+        if d[o + GYRO_T] and abs(d[o + T] - d[o + GYRO_T]) <= GYRO_MAX_AGE:
+            gyro_rot = math.degrees(d[o + YAW]) * 60.0
+            if gnss_rot:
+                d[o + CORR] = 0.95 * d[o + CORR] + gyro_rot * gnss_rot
+            if d[o + CORR]:
+                rot = gyro_rot if d[o + CORR] > 0 else -gyro_rot
+        if speed < self.min_speed:
+            rot = 0.0
+        d[o + ROT] += ROT_ALPHA * (rot - d[o + ROT])
+        return (ts_ns, lat, lon, payload.altitude, d[o + PEE], d[o + PNN], speed * KNOTS_PER_MPS, cog, d[o + ROT])
+
+    def stats(self):
+        return {
+            "sources": len(self._slots),
+            "state_bytes": self._data.itemsize * len(self._data),
+            "fixes": self.fixes,
+            "imu_samples": self.imu_samples,
+            "estimates": self.estimates,
+            "stale": self.stale,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+            "expired": self.expired,
+        }
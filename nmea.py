@@ -0,0 +1,435 @@
+"""NMEA 0183 ingest over UDP and TCP.
+
+GNSS receivers and navigation gateways stream sentences such as
+
+    $GNGGA,092750.000,5321.6802,N,00630.3372,W,1,8,1.03,61.7,M,55.2,M,,*76
+
+either as UDP datagrams (often broadcast) or over a TCP connection. The listeners here
+run on the app's event loop: stream data is split into lines by `LineFramer`, every line
+is checksum-checked and split by `parse_sentence`, and a per-receiver `NmeaDecoder`
+turns GGA, RMC, VTG, GSA and HDT sentences into typed values for the rules in
+`mapping.NMEA_MAPPINGS`.
+
+NMEA times carry no date and most sentences carry no time at all. A receiver reports
+one epoch (one fix) as a burst of sentences, so the decoder tracks the current epoch:
+GGA and RMC set its time, with the date from the last RMC (or the host clock until one
+arrives), and VTG and GSA are stamped with it. HDT comes from heading sensors that often
+run faster than the fix rate; it is stamped with the receive time shifted by the
+receiver's clock offset seen at the last epoch. A subject is published once per epoch,
+so the speed in both RMC and VTG, or the DOPs repeated in one GSA per constellation,
+are not sent twice.
+"""
+import asyncio
+import datetime
+import logging
+from time import time_ns
+
+from logconfig import category_logger
+
+
+SUPPORTED_SENTENCES = ("GGA", "RMC", "VTG", "GSA", "HDT")
+
+# NMEA limits sentences to 82 characters; proprietary ones run a little longer
+MAX_LINE = 256
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+HALF_DAY_NS = NS_PER_DAY // 2
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# Per-sentence lines; sample or rate limit them with LOG_SAMPLE / LOG_RATE_LIMIT
+nmea_log = category_logger("gnss.nmea")
+
+
+class NmeaError(ValueError):
+    """A sentence was rejected; `reason` is one of the NmeaIngest counters."""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+# --- Sentences ------------------------------------------------------------------
+def parse_sentence(line):
+    """Split one sentence (bytes, without line ending) into its fields.
+
+    Returns the field strings with the talker stripped from the first one ("GGA" for
+    "$GNGGA"). Raises NmeaError for a missing or wrong checksum.
+    """
+    star = line.rfind(b"*")
+    if star < 0 or line[:1] not in (b"$", b"!") or len(line) - star < 3:
+        raise NmeaError("malformed", f"no checksum in {line[:20]!r}")
+    checksum = 0
+    for byte in line[1:star]:
+        checksum ^= byte
+    try:
+        expected = int(line[star + 1:star + 3], 16)
+    except ValueError:
+        raise NmeaError("malformed", f"bad checksum field in {line[:20]!r}") from None
+    if checksum != expected:
+        raise NmeaError("bad_checksum", f"checksum {checksum:02X} != {expected:02X} in {line[:20]!r}")
+    fields = line[1:star].decode("ascii", "replace").split(",")
+    address = fields[0]
+    # Talker IDs are two letters ("GP", "GN", "HE"...); proprietary sentences start with "P"
+    fields[0] = address[2:] if len(address) == 5 else address
+    return fields
+
+
+def _float(text):
+    return float(text) if text else None
+
+
+def _coordinate(value, hemisphere):
+    """ddmm.mmmm / dddmm.mmmm plus N/S/E/W to signed decimal degrees."""
+    if not value:
+        return None
+    dot = value.find(".")
+    if dot < 0:
+        dot = len(value)
+    degrees = int(value[:dot - 2]) + float(value[dot - 2:]) / 60.0
+    return -degrees if hemisphere in ("S", "W") else degrees
+
+
+def _time_of_day_ns(text):
+    """hhmmss[.sss] to nanoseconds since midnight."""
+    if len(text) < 6:
+        raise ValueError(f"bad time '{text}'")
+    seconds = int(text[0:2]) * 3600 + int(text[2:4]) * 60 + int(text[4:6])
+    nanos = round(float(text[6:]) * 1e9) if len(text) > 7 else 0
+    return seconds * 1_000_000_000 + nanos
+
+
+_date_cache = {}
+
+
+def _date_ns(text):
+    """ddmmyy to nanoseconds since the epoch at midnight UTC."""
+    value = _date_cache.get(text)
+    if value is None:
+        if len(text) != 6:
+            raise ValueError(f"bad date '{text}'")
+        year = int(text[4:6])
+        year += 2000 if year < 80 else 1900
+        ordinal = datetime.date(year, int(text[2:4]), int(text[0:2])).toordinal()
+        value = (ordinal - _EPOCH_ORDINAL) * NS_PER_DAY
+        if len(_date_cache) < 4096:
+            _date_cache[text] = value
+    return value
+
+
+# --- Decoding -------------------------------------------------------------------------
+class NmeaDecoder:
+    """Turns the sentences of one receiver into (sentence, ts_ns, values).
+
+    Values use the field names of `mapping.NMEA_MAPPINGS`; a field the sentence left
+    empty is None.
+    """
+
+    __slots__ = ("date_ns", "epoch_ns", "offset_ns")
+
+    def __init__(self):
+        # Midnight of the date reported by the last RMC, None until one arrives
+        self.date_ns = None
+        # Time of the current epoch, and receiver time minus receive time at that epoch
+        self.epoch_ns = None
+        self.offset_ns = 0
+
+    def decode(self, fields, received_ns):
+        """Decode parsed sentence fields; None for sentences without a usable fix.
+
+        Raises NmeaError for unsupported or malformed sentences.
+        """
+        decode = _DECODERS.get(fields[0])
+        if decode is None:
+            raise NmeaError("unsupported", f"unsupported sentence {fields[0]}")
+        try:
+            return decode(self, fields, received_ns)
+        except (IndexError, ValueError) as e:
+            raise NmeaError("malformed", f"malformed {fields[0]}: {e}") from None
+
+    def _start_epoch(self, time_field, received_ns):
+        time_ns_of_day = _time_of_day_ns(time_field)
+        if self.date_ns is not None:
+            ts = self.date_ns + time_ns_of_day
+            # GGA can roll over midnight before the next RMC moves the date on
+            if ts < (self.epoch_ns or 0) - HALF_DAY_NS:
+                ts += NS_PER_DAY
+        else:
+            # No date yet: take the day that puts the fix closest to the host clock
+            ts = received_ns - received_ns % NS_PER_DAY + time_ns_of_day
+            if ts - received_ns > HALF_DAY_NS:
+                ts -= NS_PER_DAY
+            elif received_ns - ts > HALF_DAY_NS:
+                ts += NS_PER_DAY
+        self.epoch_ns = ts
+        self.offset_ns = ts - received_ns
+        return ts
+
+    def _epoch(self, received_ns):
+        # Sentences without a time belong to the epoch in progress
+        if self.epoch_ns is None:
+            return received_ns
+        return self.epoch_ns
+
+    def _gga(self, fields, received_ns):
+        # GGA,time,lat,N,lon,E,quality,satellites,hdop,altitude,M,geoid separation,M,...
+        if not fields[6] or fields[6] == "0" or not fields[2]:
+            return None
+        ts = self._start_epoch(fields[1], received_ns)
+        altitude_msl = _float(fields[9])
+        separation = _float(fields[11])
+        return "GGA", ts, {
+            "lat": _coordinate(fields[2], fields[3]),
+            "lon": _coordinate(fields[4], fields[5]),
+            # LocationFix altitude is above the WGS 84 ellipsoid
+            "alt": altitude_msl + (separation or 0.0) if altitude_msl is not None else None,
+            "alt_msl": altitude_msl,
+            "sat": int(fields[7]) if fields[7] else None,
+            "hdop": _float(fields[8]),
+        }
+
+    def _rmc(self, fields, received_ns):
+        # RMC,time,status,lat,N,lon,E,sog knots,cog true,date,magnetic variation,E/W,...
+        if fields[9]:
+            self.date_ns = _date_ns(fields[9])
+        if fields[2] != "A" or not fields[1]:
+            return None
+        ts = self._start_epoch(fields[1], received_ns)
+        return "RMC", ts, {"sog": _float(fields[7]), "cog": _float(fields[8])}
+
+    def _vtg(self, fields, received_ns):
+        # VTG,cog true,T,cog magnetic,M,sog knots,N,sog km/h,K[,mode]; NMEA 2.0 and
+        # older omit the unit letters: VTG,cog true,cog magnetic,sog knots,sog km/h
+        if len(fields) > 9 and fields[9] == "N":
+            return None
+        if len(fields) >= 9:
+            cog, sog = fields[1], fields[5]
+        else:
+            cog, sog = fields[1], fields[3]
+        return "VTG", self._epoch(received_ns), {"sog": _float(sog), "cog": _float(cog)}
+
+    def _gsa(self, fields, received_ns):
+        # GSA,mode,fix type (1 = none),12 satellite IDs,pdop,hdop,vdop[,system]
+        if fields[2] in ("", "1"):
+            return None
+        return "GSA", self._epoch(received_ns), {
+            "pdop": _float(fields[15]),
+            "hdop": _float(fields[16]),
+            "vdop": _float(fields[17]),
+        }
+
+    def _hdt(self, fields, received_ns):
+        # HDT,heading,T
+        if not fields[1]:
+            return None
+        return "HDT", received_ns + self.offset_ns, {"heading": float(fields[1])}
+
+
+_DECODERS = {
+    "GGA": NmeaDecoder._gga,
+    "RMC": NmeaDecoder._rmc,
+    "VTG": NmeaDecoder._vtg,
+    "GSA": NmeaDecoder._gsa,
+    "HDT": NmeaDecoder._hdt,
+}
+
+
+# --- Framing ----------------------------------------------------------------------------
+class LineFramer:
+    """Splits a byte stream into lines; a partial line is kept for the next chunk.
+
+    Lines longer than `max_line` are dropped (counted in `overflows`), so a peer that
+    never sends a line ending cannot grow the buffer.
+    """
+
+    __slots__ = ("max_line", "_buffer", "_discarding", "overflows")
+
+    def __init__(self, max_line=MAX_LINE):
+        self.max_line = max_line
+        self._buffer = b""
+        self._discarding = False
+        self.overflows = 0
+
+    def feed(self, data):
+        lines = (self._buffer + data).split(b"\n") if self._buffer else data.split(b"\n")
+        self._buffer = lines.pop()
+        if self._discarding and lines:
+            # The rest of an oversized line
+            lines.pop(0)
+            self._discarding = False
+        if len(self._buffer) > self.max_line:
+            self._buffer = b""
+            if not self._discarding:
+                self.overflows += 1
+            self._discarding = True
+        return lines
+
+
+# --- Ingest ------------------------------------------------------------------------------
+class NmeaIngest:
+    """Maps sentences from any number of receivers to keelson payloads.
+
+    `handlers` are compiled `mapping.NMEA_MAPPINGS` rules. `build(entity_id, subject,
+    source_id, payload, items)` appends the payload's publish queue items (if any) to
+    `items` and `emit(items)` queues
+    the items of one datagram or TCP read; it returns False when they were dropped.
+    Receivers are told apart by host (and TCP connection): source ids come from
+    `source_id`, a format string with {host}. Used from the event loop only.
+    """
+
+    def __init__(self, entity_id, handlers, build, emit, source_id="nmea-{host}", max_peers=1024):
+        self.entity_id = entity_id
+        self.handlers = handlers
+        self.build = build
+        self.emit = emit
+        self.source_id = source_id
+        self.max_peers = max_peers
+        # peer -> [source_id, NmeaDecoder, {subject: ts_ns published}], oldest first
+        self._peers = {}
+        self.counts = {
+            "sentences": 0,
+            "published": 0,
+            "no_fix": 0,
+            "unsupported": 0,
+            "malformed": 0,
+            "bad_checksum": 0,
+            "overflow": 0,
+            "dropped": 0,
+        }
+
+    def _peer(self, peer):
+        state = self._peers.get(peer)
+        if state is None:
+            if len(self._peers) >= self.max_peers:
+                del self._peers[next(iter(self._peers))]
+            state = self._peers[peer] = [self.source_id.format(host=peer[0]), NmeaDecoder(), {}]
+        return state
+
+    def forget(self, peer):
+        self._peers.pop(peer, None)
+
+    def feed_lines(self, peer, lines):
+        """Decode, map and queue the complete sentences received from `peer`."""
+        received_ns = time_ns()
+        source_id, decoder, published = self._peer(peer)
+        entity_id = self.entity_id
+        counts = self.counts
+        items = []
+
+        def publish(entity_id, subject, source_id, payload):
+            timestamp = payload.timestamp
+            ts_ns = timestamp.seconds * 1_000_000_000 + timestamp.nanos
+            if published.get(subject) == ts_ns:
+                return
+            published[subject] = ts_ns
+            self.build(entity_id, subject, source_id, payload, items)
+
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            counts["sentences"] += 1
+            try:
+                decoded = decoder.decode(parse_sentence(line), received_ns)
+            except NmeaError as e:
+                counts[e.reason] += 1
+                nmea_log.debug("NMEA %s: %s", peer[0], e)
+                continue
+            if decoded is None:
+                counts["no_fix"] += 1
+                continue
+            sentence, ts_ns, values = decoded
+            try:
+                self.handlers[sentence](entity_id, source_id, ts_ns, values, publish)
+            except (TypeError, ValueError) as e:
+                counts["malformed"] += 1
+                nmea_log.debug("NMEA %s: malformed %s: %s", peer[0], sentence, e)
+
+        if items:
+            if self.emit(items):
+                counts["published"] += len(items)
+            else:
+                counts["dropped"] += len(items)
+
+    def stats(self):
+        return {"receivers": len(self._peers), **self.counts}
+
+
+class NmeaDatagramProtocol(asyncio.DatagramProtocol):
+    """One datagram holds one or more complete sentences."""
+
+    def __init__(self, ingest):
+        self.ingest = ingest
+
+    def datagram_received(self, data, addr):
+        # Some senders change port between datagrams; key the receiver by host
+        self.ingest.feed_lines((addr[0],), data.split(b"\n"))
+
+    def error_received(self, exc):
+        logging.warning(f"NMEA UDP listener error: {exc}")
+
+
+class NmeaStreamProtocol(asyncio.Protocol):
+    """One TCP connection from a receiver or gateway."""
+
+    def __init__(self, ingest):
+        self.ingest = ingest
+        self.framer = LineFramer()
+        self.peer = None
+
+    def connection_made(self, transport):
+        self.peer = transport.get_extra_info("peername")[:2]
+        logging.info(f"NMEA TCP: {self.peer[0]}:{self.peer[1]} connected")
+
+    def data_received(self, data):
+        overflows = self.framer.overflows
+        lines = self.framer.feed(data)
+        if self.framer.overflows != overflows:
+            self.ingest.counts["overflow"] += self.framer.overflows - overflows
+        if lines:
+            self.ingest.feed_lines(self.peer, lines)
+
+    def connection_lost(self, exc):
+        self.ingest.forget(self.peer)
+        logging.info(f"NMEA TCP: {self.peer[0]}:{self.peer[1]} disconnected")
+
+
+def parse_address(address, default_port=10110):
+    """"host:port", ":port" or "port" to (host, port); the host defaults to 0.0.0.0."""
+    host, _, port = address.rpartition(":")
+    return host.strip("[]") or "0.0.0.0", int(port or default_port)
+
+
+async def start_listeners(ingest, udp=None, tcp=None):
+    """Bind the UDP and/or TCP listeners; returns the transports and servers to close.
+
+    An address already in use (another uvicorn worker bound it first) is logged and
+    skipped, so exactly one worker receives each receiver's sentences.
+    """
+    loop = asyncio.get_running_loop()
+    opened = []
+    if udp:
+        host, port = parse_address(udp)
+        try:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: NmeaDatagramProtocol(ingest), local_addr=(host, port), allow_broadcast=True
+            )
+            opened.append(transport)
+            logging.info(f"NMEA: listening on udp/{host}:{port}")
+        except OSError as e:
+            logging.warning(f"NMEA: not listening on udp/{host}:{port}: {e}")
+    if tcp:
+        host, port = parse_address(tcp)
+        try:
+            server = await loop.create_server(lambda: NmeaStreamProtocol(ingest), host, port)
+            opened.append(server)
+            logging.info(f"NMEA: listening on tcp/{host}:{port}")
+        except OSError as e:
+            logging.warning(f"NMEA: not listening on tcp/{host}:{port}: {e}")
+    return opened
+
+
+async def stop_listeners(opened):
+    for listener in opened:
+        listener.close()
+        if isinstance(listener, asyncio.AbstractServer):
+            await listener.wait_closed()
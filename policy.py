@@ -0,0 +1,236 @@
+"""Per-subject publish policies: deadband, rate cap and heartbeat.
+
+Many subjects barely change between readings (battery level, DOP values, satellite
+count) or arrive far faster than anyone consumes them (barometer, orientation). A
+`PublishPolicy` decides per (entity, subject, source) whether a payload is worth
+publishing, comparing it with the last one that was:
+
+- `deadband`: publish only if a value moved by more than this much (absolute). 0 means
+  "publish on any change".
+- `relative`: as `deadband`, as a fraction of the last published value. With both set
+  the larger band applies.
+- `max_rate`: at most this many messages per second.
+- `heartbeat`: publish at least every this many seconds, whatever the other rules say,
+  so consumers can tell a steady value from a silent device.
+
+Time is the payload timestamp, so a batch of buffered readings is thinned the same way
+as a live stream. Each check is one dict lookup and a few comparisons against the
+[time, values] pair kept per key. Subjects without a policy always publish. Keys include
+the client supplied source id, so the filter keeps at most `maxsize` of them (least
+recently used first) and forgets keys idle for `idle_ttl` seconds; a forgotten key's next
+payload is simply published.
+
+Like the latest-state store, the filter is used from the event loop only.
+"""
+import collections
+import json
+import time
+
+from keelson.payloads.foxglove.LocationFix_pb2 import LocationFix
+from keelson.payloads.Primitives_pb2 import (
+    TimestampedBool,
+    TimestampedFloat,
+    TimestampedInt,
+    TimestampedQuaternion,
+)
+from keelson.payloads.Decomposed3DVector_pb2 import Decomposed3DVector
+
+
+class PublishPolicy:
+    __slots__ = ("deadband", "relative", "min_interval_ns", "heartbeat_ns")
+
+    def __init__(self, deadband=None, relative=None, max_rate=None, heartbeat=None):
+        self.deadband = deadband
+        self.relative = relative
+        self.min_interval_ns = int(1e9 / max_rate) if max_rate else 0
+        self.heartbeat_ns = int(heartbeat * 1e9) if heartbeat else 0
+
+    @property
+    def checks_value(self):
+        return self.deadband is not None or self.relative is not None
+
+    def as_dict(self):
+        return {
+            "deadband": self.deadband,
+            "relative": self.relative,
+            "max_rate": 1e9 / self.min_interval_ns if self.min_interval_ns else None,
+            "heartbeat": self.heartbeat_ns / 1e9 if self.heartbeat_ns else None,
+        }
+
+
+# Subjects that mostly repeat themselves. Only values that did not change are held back,
+# and heartbeats keep every one of them visible at least once a minute. Battery and DOP
+# values come in steps (1 %, 0.1), so any band would hold back a one-step change.
+DEFAULT_POLICIES = {
+    "battery_state_of_charge_pct": PublishPolicy(deadband=0, heartbeat=60),
+    "battery_is_charging": PublishPolicy(deadband=0, heartbeat=60),
+    "location_fix_hdop": PublishPolicy(deadband=0, heartbeat=60),
+    "location_fix_vdop": PublishPolicy(deadband=0, heartbeat=60),
+    "location_fix_pdop": PublishPolicy(deadband=0, heartbeat=60),
+    "location_fix_satellites_used": PublishPolicy(deadband=0, heartbeat=60),
+    "air_pressure_pa": PublishPolicy(deadband=1.0, heartbeat=10),
+}
+
+# Messages per second for subjects that arrive far faster than most consumers need. A
+# cap drops readings that did change, so it is opt-in (`rate_caps`).
+RATE_CAPS = {
+    "air_pressure_pa": 5,
+    "orientation_quaternion": 20,
+    "roll_deg": 20,
+    "pitch_deg": 20,
+    "yaw_deg": 20,
+}
+
+
+def load_policies(spec, rate_caps=False):
+    """Policies from a PUBLISH_POLICIES setting.
+
+    "" keeps DEFAULT_POLICIES, "off" disables every policy, anything else is a JSON
+    object (or the path of a JSON file) mapping subjects to policy keyword arguments,
+    e.g. {"air_pressure_pa": {"deadband": 2, "heartbeat": 30}}, that replace the default
+    for those subjects. null removes a subject's default policy. With `rate_caps` the
+    defaults include RATE_CAPS.
+    """
+    spec = spec.strip()
+    if spec.lower() == "off":
+        return {}
+    policies = dict(DEFAULT_POLICIES)
+    if rate_caps:
+        for subject, max_rate in RATE_CAPS.items():
+            options = policies[subject].as_dict() if subject in policies else {}
+            options["max_rate"] = max_rate
+            policies[subject] = PublishPolicy(**options)
+    if not spec:
+        return policies
+    if not spec.startswith("{"):
+        with open(spec) as fp:
+            spec = fp.read()
+    for subject, options in json.loads(spec).items():
+        if options is None:
+            policies.pop(subject, None)
+        else:
+            policies[subject] = PublishPolicy(**options)
+    return policies
+
+
+# --- Value extraction ------------------------------------------------------------
+def _scalar(payload):
+    return (payload.value,)
+
+
+def _vector3(payload):
+    vector = payload.vector
+    return (vector.x, vector.y, vector.z)
+
+
+def _quaternion(payload):
+    value = payload.value
+    return (value.x, value.y, value.z, value.w)
+
+
+def _location(payload):
+    return (payload.latitude, payload.longitude, payload.altitude)
+
+
+VALUE_EXTRACTORS = {
+    TimestampedFloat: _scalar,
+    TimestampedInt: _scalar,
+    TimestampedBool: _scalar,
+    Decomposed3DVector: _vector3,
+    TimestampedQuaternion: _quaternion,
+    LocationFix: _location,
+}
+
+
+def _changed(values, last, policy):
+    deadband = policy.deadband or 0.0
+    relative = policy.relative
+    for value, previous in zip(values, last):
+        band = deadband if relative is None else max(deadband, relative * abs(previous))
+        if abs(value - previous) > band:
+            return True
+    return False
+
+
+class PolicyFilter:
+    def __init__(self, policies, maxsize=4096, idle_ttl=600.0, sweep_interval=10.0):
+        self.policies = policies
+        self.maxsize = maxsize
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        # (entity_id, subject, source_id) -> [timestamp_ns, values, last_used]; ordered
+        # from least to most recently used
+        self._last = collections.OrderedDict()
+        self._next_sweep = time.monotonic() + sweep_interval
+        self.evicted_size = 0
+        self.evicted_idle = 0
+        self.passed = 0
+        # subject -> {"rate": n, "deadband": n}
+        self.suppressed = {}
+
+    def check(self, entity_id, subject, source_id, payload):
+        """None if the payload should be published (and remember it), otherwise the
+        reason it is suppressed: "rate" or "deadband"."""
+        policy = self.policies.get(subject)
+        if policy is None:
+            return None
+        timestamp = payload.timestamp
+        ts_ns = timestamp.seconds * 1_000_000_000 + timestamp.nanos
+        values = VALUE_EXTRACTORS[type(payload)](payload) if policy.checks_value else None
+
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            self._sweep(now)
+
+        key = (entity_id, subject, source_id)
+        last = self._last.get(key)
+        if last is not None:
+            last[2] = now
+            self._last.move_to_end(key)
+            elapsed = ts_ns - last[0]
+            if not (policy.heartbeat_ns and elapsed >= policy.heartbeat_ns):
+                reason = None
+                if elapsed < policy.min_interval_ns:
+                    reason = "rate"
+                elif values is not None and not _changed(values, last[1], policy):
+                    reason = "deadband"
+                if reason is not None:
+                    counts = self.suppressed.get(subject)
+                    if counts is None:
+                        counts = self.suppressed[subject] = {"rate": 0, "deadband": 0}
+                    counts[reason] += 1
+                    return reason
+            last[0] = ts_ns
+            last[1] = values
+        else:
+            self._last[key] = [ts_ns, values, now]
+            while len(self._last) > self.maxsize:
+                self._last.popitem(last=False)
+                self.evicted_size += 1
+        self.passed += 1
+        return None
+
+    def _sweep(self, now):
+        while self._last:
+            key, last = next(iter(self._last.items()))
+            if now - last[2] < self.idle_ttl:
+                break
+            del self._last[key]
+            self.evicted_idle += 1
+
+    def stats(self):
+        suppressed = sum(sum(counts.values()) for counts in self.suppressed.values())
+        checked = self.passed + suppressed
+        return {
+            "keys": len(self._last),
+            "maxsize": self.maxsize,
+            "idle_ttl": self.idle_ttl,
+            "evicted_size": self.evicted_size,
+            "evicted_idle": self.evicted_idle,
+            "passed": self.passed,
+            "suppressed": suppressed,
+            "suppressed_ratio": suppressed / checked if checked else 0.0,
+            "by_subject": self.suppressed,
+            "policies": {subject: policy.as_dict() for subject, policy in self.policies.items()},
+        }
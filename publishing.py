@@ -0,0 +1,363 @@
+"""Bounded publish pipeline between the HTTP handlers and Zenoh.
+
+The ingest handlers run on the uvicorn event loop, so they must never wait on the
+router. Instead they enqueue ready keelson envelopes here and a small pool of worker
+threads drains the queue to Zenoh. When the queue is full, a handler waits for room by
+awaiting `put_many_async`, which the workers wake; the event loop itself never blocks.
+"""
+import asyncio
+import collections
+import logging
+import threading
+import time
+
+import keelson
+
+from logconfig import category_logger
+
+
+publish_log = category_logger("gnss.publish")
+
+
+BACKPRESSURE_POLICIES = ("block", "drop_oldest", "reject")
+
+
+class PublishQueueFull(Exception):
+    """The queue is full and the backpressure policy refused the message."""
+
+
+class PublishQueue:
+    """Bounded FIFO of outgoing messages drained by worker threads.
+
+    `sink` is called with every queued item from a worker thread. When the queue is
+    full the behaviour depends on `policy`:
+
+    - "block": `put_many_async` waits up to `block_timeout` seconds for room, then
+      rejects. `put` and `put_many` never wait and reject at once, as with "reject".
+    - "drop_oldest": discard the oldest queued message to make room.
+    - "reject": raise PublishQueueFull immediately (handlers answer 503).
+
+    With "block" and "reject" a batch is queued whole or not at all, so a rejected
+    upload can be retried without publishing part of it twice. A batch larger than
+    the whole queue is taken once the queue is empty.
+
+    With more than one worker, messages for the same key may be put out of order.
+    """
+
+    def __init__(self, sink, maxsize=10000, policy="block", workers=1, block_timeout=1.0):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(
+                f"Unknown backpressure policy '{policy}', expected one of {BACKPRESSURE_POLICIES}"
+            )
+        self.sink = sink
+        self.maxsize = maxsize
+        self.policy = policy
+        self.workers = workers
+        self.block_timeout = block_timeout
+
+        self._items = collections.deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._all_done = threading.Condition(self._lock)
+        # (loop, future, room needed) of put_many_async calls waiting for room, oldest first
+        self._waiters = collections.deque()
+        self._unfinished = 0
+        self._threads = []
+        self._running = False
+
+        self.enqueued = 0
+        self.published = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.failed = 0
+        self.high_watermark = 0
+
+    # --- Producer side -------------------------------------------------------
+
+    def put(self, item):
+        """Enqueue a single item, applying the backpressure policy when full."""
+        self.put_many((item,))
+
+    def put_many(self, items):
+        """Enqueue several items under one lock acquisition; never waits."""
+        with self._lock:
+            if self.policy != "drop_oldest" and not self._fits_locked(len(items)):
+                self.rejected += len(items)
+                raise PublishQueueFull("publish queue is full")
+            self._append_locked(items)
+
+    async def put_many_async(self, items):
+        """`put_many` for the event loop: with the "block" policy, waits for room without
+        blocking the loop, up to `block_timeout` seconds, then raises PublishQueueFull."""
+        if self.policy != "block":
+            self.put_many(items)
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.block_timeout
+        needed = min(len(items), self.maxsize)
+        woken = False
+        while True:
+            with self._lock:
+                # Earlier waiters go first, so batches keep their order; a woken waiter
+                # has been taken off the front of the line
+                if (woken or not self._waiters) and self._fits_locked(len(items)):
+                    self._append_locked(items)
+                    return
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.rejected += len(items)
+                    raise PublishQueueFull("publish queue is full")
+                waiter = (loop, loop.create_future(), needed)
+                if woken:
+                    self._waiters.appendleft(waiter)
+                else:
+                    self._waiters.append(waiter)
+            woken = False
+            try:
+                await asyncio.wait_for(waiter[1], remaining)
+                woken = True
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                if not woken:
+                    # Timed out or cancelled: leave the line, and pass on a wake-up that
+                    # may have come too late to use
+                    with self._lock:
+                        if waiter in self._waiters:
+                            self._waiters.remove(waiter)
+                        self._wake_locked()
+
+    def _fits_locked(self, count):
+        queued = len(self._items)
+        return queued + count <= self.maxsize or (queued == 0 and count > self.maxsize)
+
+    def _append_locked(self, items):
+        queue = self._items
+        for item in items:
+            if len(queue) >= self.maxsize and self.policy == "drop_oldest":
+                queue.popleft()
+                self._unfinished -= 1
+                self.dropped += 1
+            queue.append(item)
+        self._unfinished += len(items)
+        self.enqueued += len(items)
+        if len(queue) > self.high_watermark:
+            self.high_watermark = len(queue)
+        self._not_empty.notify(len(items))
+
+    def _wake_locked(self):
+        """Wake the waiters, oldest first, whose batch fits the room there is now."""
+        room = self.maxsize - len(self._items)
+        while self._waiters:
+            loop, future, needed = self._waiters[0]
+            if needed > room:
+                break
+            self._waiters.popleft()
+            room -= needed
+            loop.call_soon_threadsafe(_resolve, future)
+
+    # --- Worker side ---------------------------------------------------------
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                while not self._items and self._running:
+                    self._not_empty.wait()
+                if not self._items:
+                    return
+                item = self._items.popleft()
+                if self._waiters:
+                    self._wake_locked()
+
+            try:
+                self.sink(item)
+                ok = True
+            except Exception as e:
+                ok = False
+                publish_log.error("Publish worker failed to put message: %s", e)
+
+            with self._lock:
+                if ok:
+                    self.published += 1
+                else:
+                    self.failed += 1
+                self._unfinished -= 1
+                if self._unfinished <= 0:
+                    self._all_done.notify_all()
+
+    # --- Lifecycle -----------------------------------------------------------
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        for idx in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker, name=f"zenoh-publisher-{idx}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def flush(self, timeout=None):
+        """Wait until every queued message has been handed to the sink.
+
+        Returns True if the queue drained within `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._unfinished > 0:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._all_done.wait(remaining)
+        return True
+
+    def close(self, timeout=5.0):
+        """Flush outstanding messages and stop the workers."""
+        drained = self.flush(timeout)
+        if not drained:
+            logging.warning(
+                f"Publish queue closed with {len(self._items)} message(s) still pending"
+            )
+        with self._lock:
+            self._running = False
+            self._not_empty.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        return drained
+
+    def fill(self):
+        """Fraction of the queue in use (0.0 - 1.0); lock-free, for flow control."""
+        return len(self._items) / self.maxsize
+
+    def depth(self):
+        """Number of queued items; lock-free, for admission control."""
+        return len(self._items)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "depth": len(self._items),
+                "maxsize": self.maxsize,
+                "high_watermark": self.high_watermark,
+                "policy": self.policy,
+                "workers": self.workers,
+                "enqueued": self.enqueued,
+                "published": self.published,
+                "dropped": self.dropped,
+                "rejected": self.rejected,
+                "failed": self.failed,
+            }
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class PublisherCache:
+    """Bounded cache of declared Zenoh publishers keyed by (entity, subject, source).
+
+    `source_id` is client supplied, so the cache is capped both by size (least recently
+    used first) and by idle time. Evicted publishers are undeclared. Key expressions are
+    built once per publisher, never on the hot path. `declare_options` are passed to
+    `declare_publisher` (e.g. a congestion control).
+    """
+
+    def __init__(self, session, base_path="rise", maxsize=4096, idle_ttl=600.0, sweep_interval=10.0,
+                 declare_options=None):
+        self.session = session
+        self.base_path = base_path
+        self.declare_options = declare_options or {}
+        self.maxsize = maxsize
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+
+        # cache_key -> [publisher, key_expr, last_used]; ordered from least to most recently used
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+        self.hits = 0
+        self.misses = 0
+        self.evicted_size = 0
+        self.evicted_idle = 0
+
+    def key_expr(self, entity_id, subject, source_id):
+        return keelson.construct_pubsub_key(
+            base_path=self.base_path,
+            entity_id=entity_id,
+            subject=subject,
+            source_id=source_id,
+        )
+
+    def get(self, entity_id, subject, source_id):
+        """Return the publisher for a key, declaring it on first use."""
+        cache_key = (entity_id, subject, source_id)
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self.hits += 1
+                entry[2] = now
+                self._entries.move_to_end(cache_key)
+                publisher = entry[0]
+            else:
+                self.misses += 1
+                key_expr = self.key_expr(entity_id, subject, source_id)
+                publisher = self.session.declare_publisher(key_expr, **self.declare_options)
+                self._entries[cache_key] = [publisher, key_expr, now]
+                while len(self._entries) > self.maxsize:
+                    expired.append(self._entries.popitem(last=False)[1][0])
+                    self.evicted_size += 1
+
+            if now >= self._next_sweep:
+                self._next_sweep = now + self.sweep_interval
+                expired.extend(self._pop_idle_locked(now))
+
+        for stale in expired:
+            self._undeclare(stale)
+        return publisher
+
+    def _pop_idle_locked(self, now):
+        expired = []
+        while self._entries:
+            cache_key, entry = next(iter(self._entries.items()))
+            if now - entry[2] < self.idle_ttl:
+                break
+            del self._entries[cache_key]
+            expired.append(entry[0])
+            self.evicted_idle += 1
+        return expired
+
+    def _undeclare(self, publisher):
+        try:
+            publisher.undeclare()
+        except Exception as e:
+            logging.warning(f"Failed to undeclare publisher: {e}")
+
+    def clear(self):
+        """Undeclare every cached publisher."""
+        with self._lock:
+            publishers = [entry[0] for entry in self._entries.values()]
+            self._entries.clear()
+        for publisher in publishers:
+            self._undeclare(publisher)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "idle_ttl": self.idle_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted_size": self.evicted_size,
+                "evicted_idle": self.evicted_idle,
+            }
@@ -0,0 +1,399 @@
+"""Durable on-disk spool for envelopes that could not be delivered to Zenoh.
+
+When the router is unreachable the publish worker appends messages here instead of
+putting them into the void. The spool is an append-only log split into fixed-size,
+memory-mapped segment files:
+
+    <dir>/segment-000000000001.log
+    <dir>/segment-000000000002.log
+    <dir>/cursor
+
+Every record is `<u32 length><u32 crc32>` followed by a serialized keelson
+`KeyEnvelopePair` (key expression, envelope, spool time). A zero length marks the end of
+the written part of a segment. Appends are memory copies; the mapping is msync'ed in
+batches (every `fsync_every` records or `fsync_interval` seconds). When the total size
+exceeds `max_bytes` the oldest segments are dropped.
+
+`SpoolReplayer` drains the spool back to Zenoh at a bounded rate once connectivity is
+back, persisting its read position in `cursor` so a restart resumes where it stopped.
+The closed segment being replayed stays mapped between reads, and each read checks the
+records from the cursor on only, so draining a segment is linear in its size.
+"""
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from keelson.Envelope_pb2 import KeyEnvelopePair
+
+
+HEADER = struct.Struct("<II")
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".log"
+CURSOR_FILE = "cursor"
+
+
+def _segment_name(seq):
+    return f"{SEGMENT_PREFIX}{seq:012d}{SEGMENT_SUFFIX}"
+
+
+def claim_directory(base, slots=256):
+    """Lock the first free `base/<n>` subdirectory for this process.
+
+    Returns (path, lock_file); the claim lasts until lock_file is closed or the process
+    exits. Lets every worker of a multi-process server own a spool of its own, and a
+    restarted worker pick up whatever a previous one left behind.
+    """
+    for slot in range(slots):
+        path = os.path.join(base, str(slot))
+        os.makedirs(path, exist_ok=True)
+        lock_file = open(os.path.join(path, "lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            continue
+        return path, lock_file
+    raise RuntimeError(f"All {slots} spool directories under {base} are in use")
+
+
+class Spool:
+    def __init__(
+        self,
+        directory,
+        segment_size=16 * 1024 * 1024,
+        max_bytes=1024 * 1024 * 1024,
+        fsync_every=1000,
+        fsync_interval=1.0,
+    ):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_bytes = max_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+        # Read-only mapping of the closed segment being replayed: (seq, mmap)
+        self._reader = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+        self.appended = 0
+        self.replayed = 0
+        self.dropped_segments = 0
+        self.dropped_records = 0
+
+        os.makedirs(directory, exist_ok=True)
+        segments = self._segments()
+        if segments:
+            self._open_segment(segments[-1])
+            self._write_offset = self._scan_end(self._map, 0)
+        else:
+            self._open_segment(1)
+            self._write_offset = 0
+        self._read_seq, self._read_offset = self._load_cursor()
+
+    # --- Segment management ----------------------------------------------------
+
+    def _segments(self):
+        seqs = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                seqs.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(seqs)
+
+    def _path(self, seq):
+        return os.path.join(self.directory, _segment_name(seq))
+
+    def _open_segment(self, seq):
+        path = self._path(seq)
+        self._file = open(path, "a+b")
+        if os.fstat(self._file.fileno()).st_size < self.segment_size:
+            self._file.truncate(self.segment_size)
+        self._map = mmap.mmap(self._file.fileno(), self.segment_size)
+        self._write_seq = seq
+
+    def _close_segment(self):
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+
+    def _rotate(self):
+        self._close_segment()
+        self._open_segment(self._write_seq + 1)
+        self._write_offset = 0
+        self._unsynced = 0
+        self._enforce_retention()
+
+    def _enforce_retention(self):
+        segments = self._segments()
+        while len(segments) > 1 and len(segments) * self.segment_size > self.max_bytes:
+            oldest = segments.pop(0)
+            if oldest >= self._read_seq:
+                self.dropped_records += self._count_records(oldest, self._read_offset if oldest == self._read_seq else 0)
+                self._read_seq, self._read_offset = segments[0], 0
+            self._release_reader(oldest)
+            os.remove(self._path(oldest))
+            self.dropped_segments += 1
+            logging.warning(f"Spool over {self.max_bytes} bytes, dropped segment {oldest}")
+
+    def _scan_end(self, buffer, offset):
+        """Return the offset just past the last valid record starting at `offset`."""
+        limit = len(buffer)
+        while offset + HEADER.size <= limit:
+            length, crc = HEADER.unpack_from(buffer, offset)
+            end = offset + HEADER.size + length
+            if length == 0 or end > limit or zlib.crc32(buffer[offset + HEADER.size:end]) != crc:
+                break
+            offset = end
+        return offset
+
+    def _count_records(self, seq, offset):
+        count = 0
+        for _ in self._iter_records(seq, offset):
+            count += 1
+        return count
+
+    def _iter_records(self, seq, offset):
+        if seq == self._write_seq:
+            buffer = self._map
+            limit = self._write_offset
+            while offset < limit:
+                length, _ = HEADER.unpack_from(buffer, offset)
+                start = offset + HEADER.size
+                offset = start + length
+                yield buffer[start:offset], offset
+            return
+
+        # A closed segment may end in a torn or unwritten record: stop at the first one
+        # whose length or CRC does not check out
+        buffer = self._map_segment(seq)
+        if buffer is None:
+            return
+        limit = len(buffer)
+        while offset + HEADER.size <= limit:
+            length, crc = HEADER.unpack_from(buffer, offset)
+            start = offset + HEADER.size
+            end = start + length
+            if length == 0 or end > limit:
+                return
+            data = buffer[start:end]
+            if zlib.crc32(data) != crc:
+                return
+            offset = end
+            yield data, offset
+
+    def _map_segment(self, seq):
+        """The read-only mapping of closed segment `seq`, kept until replay moves on."""
+        if self._reader is not None and self._reader[0] == seq:
+            return self._reader[1]
+        self._release_reader()
+        try:
+            with open(self._path(seq), "rb") as fh:
+                buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # Gone, or empty (ValueError: cannot mmap an empty file)
+            return None
+        self._reader = (seq, buffer)
+        return buffer
+
+    def _release_reader(self, seq=None):
+        if self._reader is not None and (seq is None or self._reader[0] == seq):
+            self._reader[1].close()
+            self._reader = None
+
+    # --- Cursor ----------------------------------------------------------------------
+
+    def _load_cursor(self):
+        segments = self._segments()
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE)) as fh:
+                seq, offset = (int(part) for part in fh.read().split())
+            if seq in segments:
+                return seq, offset
+        except (FileNotFoundError, ValueError):
+            pass
+        return segments[0], 0
+
+    def _save_cursor(self):
+        path = os.path.join(self.directory, CURSOR_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as fh:
+            fh.write(f"{self._read_seq} {self._read_offset}")
+        os.replace(tmp, path)
+
+    # --- Append ------------------------------------------------------------------------
+
+    def append(self, key_expr, envelope):
+        record = KeyEnvelopePair(key=key_expr, envelope=envelope)
+        record.timestamp.FromNanoseconds(time.time_ns())
+        data = record.SerializeToString()
+        size = HEADER.size + len(data)
+        if size > self.segment_size:
+            raise ValueError(f"Record of {size} bytes does not fit a {self.segment_size} byte segment")
+
+        with self._lock:
+            if self._write_offset + size > self.segment_size:
+                self._rotate()
+            offset = self._write_offset
+            HEADER.pack_into(self._map, offset, len(data), zlib.crc32(data))
+            self._map[offset + HEADER.size:offset + size] = data
+            self._write_offset = offset + size
+            self.appended += 1
+
+            self._unsynced += 1
+            now = time.monotonic()
+            if self._unsynced >= self.fsync_every or now - self._last_sync >= self.fsync_interval:
+                self._sync(now)
+
+    def _sync(self, now=None):
+        self._map.flush()
+        self._unsynced = 0
+        self._last_sync = now or time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            if self._unsynced:
+                self._sync()
+
+    # --- Replay ---------------------------------------------------------------------------
+
+    def pending(self):
+        with self._lock:
+            return (self._read_seq, self._read_offset) < (self._write_seq, self._write_offset)
+
+    def read(self, max_records):
+        """Return up to `max_records` [(key_expr, envelope, position)] from the cursor on.
+
+        `position` is what to pass to `commit` once that record has been delivered.
+        """
+        records = []
+        with self._lock:
+            seq, offset = self._read_seq, self._read_offset
+            while len(records) < max_records:
+                for data, next_offset in self._iter_records(seq, offset):
+                    record = KeyEnvelopePair.FromString(data)
+                    offset = next_offset
+                    records.append((record.key, record.envelope, (seq, offset)))
+                    if len(records) >= max_records:
+                        break
+                else:
+                    # Finished this segment; move on unless it is the one being written
+                    if seq >= self._write_seq:
+                        break
+                    later = [s for s in self._segments() if s > seq]
+                    if not later:
+                        break
+                    seq, offset = later[0], 0
+                    records.append((None, None, (seq, offset)))
+        return records
+
+    def commit(self, position):
+        """Advance the persisted replay cursor, deleting fully replayed segments."""
+        with self._lock:
+            seq, offset = position
+            for old in self._segments():
+                if old < seq and old != self._write_seq:
+                    self._release_reader(old)
+                    os.remove(self._path(old))
+            self._read_seq, self._read_offset = seq, offset
+            self._save_cursor()
+
+    def close(self):
+        with self._lock:
+            self._release_reader()
+            self._close_segment()
+            self._save_cursor()
+
+    def stats(self):
+        with self._lock:
+            segments = self._segments()
+            return {
+                "segments": len(segments),
+                "bytes": len(segments) * self.segment_size,
+                "write_position": [self._write_seq, self._write_offset],
+                "read_position": [self._read_seq, self._read_offset],
+                "appended": self.appended,
+                "replayed": self.replayed,
+                "dropped_segments": self.dropped_segments,
+                "dropped_records": self.dropped_records,
+            }
+
+
+class SpoolReplayer:
+    """Background thread putting spooled envelopes back to Zenoh at a bounded rate."""
+
+    def __init__(self, spool, sink, is_connected, rate=1000.0, poll_interval=1.0, commit_every=1.0):
+        self.spool = spool
+        self.sink = sink
+        self.is_connected = is_connected
+        self.rate = rate
+        self.poll_interval = poll_interval
+        self.commit_every = commit_every
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="spool-replay", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        # Replay in slices of ~100 ms worth of messages to keep the rate smooth
+        batch_size = max(1, int(self.rate / 10))
+        while not self._stop.is_set():
+            if not self.is_connected() or not self.spool.pending():
+                self._stop.wait(self.poll_interval)
+                continue
+
+            started = time.monotonic()
+            position = None
+            last_commit = started
+            try:
+                for key_expr, envelope, next_position in self.spool.read(batch_size):
+                    if key_expr is not None:
+                        self.sink(key_expr, envelope)
+                        self.spool.replayed += 1
+                    position = next_position
+                    if time.monotonic() - last_commit >= self.commit_every:
+                        self.spool.commit(position)
+                        last_commit = time.monotonic()
+            except Exception as e:
+                logging.warning(f"Spool replay interrupted: {e}")
+                self._stop.wait(self.poll_interval)
+            if position is not None:
+                self.spool.commit(position)
+
+            budget = batch_size / self.rate - (time.monotonic() - started)
+            if budget > 0:
+                self._stop.wait(budget)
+
+
+class ConnectivityMonitor:
+    """Caches a (possibly slow) connectivity check for `interval` seconds."""
+
+    def __init__(self, check, interval=1.0):
+        self.check = check
+        self.interval = interval
+        self._connected = True
+        self._checked_at = 0.0
+
+    def __call__(self):
+        now = time.monotonic()
+        if now - self._checked_at >= self.interval:
+            self._checked_at = now
+            try:
+                self._connected = bool(self.check())
+            except Exception:
+                self._connected = False
+        return self._connected
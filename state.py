@@ -0,0 +1,271 @@
+"""Latest known state per (entity, source), with a uniform grid for spatial queries.
+
+The store is fed from the publish path: `observe(entity_id, subject, source_id,
+payload)` sees every payload before it is encoded and picks out the handful of subjects
+that describe where a device is and how it is doing. Anything else (IMU, pressure...)
+costs one dict miss. Every update is O(1); a position update moves the record between
+grid cells only when it crosses a cell boundary.
+
+Queries walk the grid cells overlapping the area of interest, so with thousands of
+devices a bounding box or k-nearest lookup only touches the records nearby.
+
+The store is used from the event loop only and is not thread-safe.
+"""
+import heapq
+import math
+import time
+
+
+EARTH_RADIUS_M = 6_371_008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180.0
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class EntityState:
+    """Latest values reported by one source of one entity."""
+
+    __slots__ = (
+        "entity_id",
+        "source_id",
+        "latitude",
+        "longitude",
+        "altitude",
+        "fix_time_ns",
+        "sog_knots",
+        "cog_deg",
+        "accuracy_m",
+        "battery_pct",
+        "last_seen",
+        "cell",
+    )
+
+    def __init__(self, entity_id, source_id):
+        self.entity_id = entity_id
+        self.source_id = source_id
+        self.latitude = None
+        self.longitude = None
+        self.altitude = None
+        self.fix_time_ns = None
+        self.sog_knots = None
+        self.cog_deg = None
+        self.accuracy_m = None
+        self.battery_pct = None
+        self.last_seen = None
+        self.cell = None
+
+    def as_dict(self):
+        return {attr: getattr(self, attr) for attr in self.__slots__ if attr != "cell"}
+
+
+def _timestamp_ns(payload):
+    timestamp = payload.timestamp
+    return timestamp.seconds * 1_000_000_000 + timestamp.nanos
+
+
+def _set_location(store, state, payload):
+    state.altitude = payload.altitude
+    state.fix_time_ns = _timestamp_ns(payload)
+    store._move(state, payload.latitude, payload.longitude)
+
+
+def _setter(attr):
+    def update(store, state, payload):
+        setattr(state, attr, payload.value)
+
+    return update
+
+
+# subject -> updater(store, state, payload)
+SUBJECT_UPDATERS = {
+    "location_fix": _set_location,
+    "speed_over_ground_knots": _setter("sog_knots"),
+    "course_over_ground_deg": _setter("cog_deg"),
+    "location_fix_accuracy_horizontal_m": _setter("accuracy_m"),
+    "battery_state_of_charge_pct": _setter("battery_pct"),
+}
+
+
+class StateStore:
+    def __init__(self, cell_deg=0.05, ttl=86400.0, sweep_interval=60.0):
+        self.cell_deg = cell_deg
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        # (entity_id, source_id) -> EntityState
+        self._states = {}
+        # entity_id -> {source_id: EntityState}
+        self._entities = {}
+        # (lat_index, lon_index) -> {(entity_id, source_id): EntityState}
+        self._grid = {}
+        # Index range ever occupied [min_i, max_i, min_j, max_j]; bounds the ring search
+        self._extent = None
+        self._next_sweep = time.monotonic() + sweep_interval
+        self.expired = 0
+
+    # --- Updates -------------------------------------------------------------------
+
+    def observe(self, entity_id, subject, source_id, payload):
+        updater = SUBJECT_UPDATERS.get(subject)
+        if updater is None:
+            return
+        key = (entity_id, source_id)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = EntityState(entity_id, source_id)
+            self._entities.setdefault(entity_id, {})[source_id] = state
+        state.last_seen = time.time()
+        updater(self, state, payload)
+
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            self.sweep()
+
+    def _cell(self, latitude, longitude):
+        return (math.floor(latitude / self.cell_deg), math.floor(longitude / self.cell_deg))
+
+    def _move(self, state, latitude, longitude):
+        state.latitude = latitude
+        state.longitude = longitude
+        cell = self._cell(latitude, longitude)
+        if cell == state.cell:
+            return
+        key = (state.entity_id, state.source_id)
+        if state.cell is not None:
+            self._unindex(state.cell, key)
+        self._grid.setdefault(cell, {})[key] = state
+        state.cell = cell
+        extent = self._extent
+        if extent is None:
+            self._extent = [cell[0], cell[0], cell[1], cell[1]]
+        else:
+            extent[0] = min(extent[0], cell[0])
+            extent[1] = max(extent[1], cell[0])
+            extent[2] = min(extent[2], cell[1])
+            extent[3] = max(extent[3], cell[1])
+
+    def _unindex(self, cell, key):
+        members = self._grid.get(cell)
+        if members is not None:
+            members.pop(key, None)
+            if not members:
+                del self._grid[cell]
+
+    def sweep(self):
+        """Forget sources not heard from for `ttl` seconds."""
+        horizon = time.time() - self.ttl
+        stale = [key for key, state in self._states.items() if state.last_seen < horizon]
+        for key in stale:
+            self.remove(*key)
+        self.expired += len(stale)
+
+    def remove(self, entity_id, source_id):
+        state = self._states.pop((entity_id, source_id), None)
+        if state is None:
+            return
+        if state.cell is not None:
+            self._unindex(state.cell, (entity_id, source_id))
+        sources = self._entities.get(entity_id)
+        if sources is not None:
+            sources.pop(source_id, None)
+            if not sources:
+                del self._entities[entity_id]
+
+    # --- Queries -------------------------------------------------------------------
+
+    def __len__(self):
+        return len(self._states)
+
+    def entities(self):
+        """Every tracked entity with its sources."""
+        return self._entities
+
+    def latest(self, entity_id):
+        """{source_id: EntityState} for one entity, or None if unknown."""
+        return self._entities.get(entity_id)
+
+    def within(self, min_lat, min_lon, max_lat, max_lon):
+        """States positioned inside the bounding box (no antimeridian wrap)."""
+        lat0, lon0 = self._cell(min_lat, min_lon)
+        lat1, lon1 = self._cell(max_lat, max_lon)
+        found = []
+        if (lat1 - lat0 + 1) * (lon1 - lon0 + 1) > len(self._grid):
+            # Box spans more cells than are occupied: walk the occupied ones instead
+            cells = (
+                members for (i, j), members in self._grid.items()
+                if lat0 <= i <= lat1 and lon0 <= j <= lon1
+            )
+        else:
+            cells = (
+                self._grid[(i, j)]
+                for i in range(lat0, lat1 + 1)
+                for j in range(lon0, lon1 + 1)
+                if (i, j) in self._grid
+            )
+        for members in cells:
+            for state in members.values():
+                if min_lat <= state.latitude <= max_lat and min_lon <= state.longitude <= max_lon:
+                    found.append(state)
+        return found
+
+    def nearest(self, latitude, longitude, k=1, max_distance_m=None):
+        """The k positioned states closest to a point, as [(distance_m, state)]."""
+        if not self._grid or k <= 0:
+            return []
+        ci, cj = self._cell(latitude, longitude)
+        min_i, max_i, min_j, max_j = self._extent
+        max_ring = max(ci - min_i, max_i - ci, cj - min_j, max_j - cj, 0)
+
+        best = []  # max-heap of (-distance, tiebreak, state)
+
+        def consider(members):
+            for state in members.values():
+                distance = haversine_m(latitude, longitude, state.latitude, state.longitude)
+                if max_distance_m is not None and distance > max_distance_m:
+                    continue
+                item = (-distance, id(state), state)
+                if len(best) < k:
+                    heapq.heappush(best, item)
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, item)
+
+        probed = 0
+        for ring in range(max_ring + 1):
+            probed += 8 * ring or 1
+            if probed > 4 * len(self._grid):
+                # Far from everything: probing empty cells would cost more than a scan
+                best.clear()
+                for members in self._grid.values():
+                    consider(members)
+                break
+            for i in range(ci - ring, ci + ring + 1):
+                row = range(cj - ring, cj + ring + 1) if abs(i - ci) == ring else (cj - ring, cj + ring)
+                for j in row:
+                    members = self._grid.get((i, j))
+                    if members:
+                        consider(members)
+            # Cells beyond this ring are at least `ring` cells away; a cell is narrowest
+            # east-west, at the highest latitude the next ring reaches
+            edge_lat = min(abs(latitude) + (ring + 1) * self.cell_deg, 89.9)
+            reach = ring * self.cell_deg * METERS_PER_DEGREE * math.cos(math.radians(edge_lat))
+            if len(best) == k and -best[0][0] <= reach:
+                break
+            if max_distance_m is not None and reach > max_distance_m:
+                break
+        return [(-neg, state) for neg, _, state in sorted(best, reverse=True)]
+
+    def stats(self):
+        return {
+            "sources": len(self._states),
+            "entities": len(self._entities),
+            "cells": len(self._grid),
+            "cell_deg": self.cell_deg,
+            "expired": self.expired,
+        }
@@ -0,0 +1,66 @@
+import functools
+import operator
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def nmea(body):
+    """A sentence with its checksum and line ending, e.g. nmea("HEHDT,121.0,T")."""
+    checksum = functools.reduce(operator.xor, body.encode(), 0)
+    return f"${body}*{checksum:02X}\r\n".encode()
+
+
+class FakePublisher:
+    def __init__(self, session, key_expr):
+        self.session = session
+        self.key_expr = key_expr
+        self.undeclared = False
+
+    def put(self, payload):
+        self.session.put(self.key_expr, payload)
+
+    def undeclare(self):
+        self.undeclared = True
+
+
+class FakeQueryable:
+    def undeclare(self):
+        pass
+
+
+class FakeSession:
+    """Stand-in for a zenoh.Session that keeps (key_expr, payload bytes) of every put."""
+
+    def __init__(self):
+        self.puts = []
+
+    def declare_publisher(self, key_expr, **options):
+        return FakePublisher(self, str(key_expr))
+
+    def put(self, key_expr, payload):
+        self.puts.append((str(key_expr), bytes(payload)))
+
+    def declare_queryable(self, key_expr, handler):
+        return FakeQueryable()
+
+    def close(self):
+        pass
+
+
+def load_main(monkeypatch, fake_session=True, **env):
+    """A fresh import of main configured by `env`, publishing into a FakeSession
+    (`main.open_zenoh_session()` returns the same one every time) unless `fake_session`
+    is false."""
+    monkeypatch.setenv("ZENOH_CONNECT", "")
+    for name, value in env.items():
+        monkeypatch.setenv(name, str(value))
+    monkeypatch.delitem(sys.modules, "main", raising=False)
+    import main
+
+    if not fake_session:
+        return main
+    session = FakeSession()
+    main.open_zenoh_session = lambda: session
+    return main
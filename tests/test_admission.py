@@ -0,0 +1,99 @@
+"""Admission control: sensor classes, and a backlog flood against a stalled publish queue."""
+import threading
+import time
+
+import keelson
+from fastapi.testclient import TestClient
+
+from admission import PRIORITY_CLASSES, AdmissionController, sensor_priorities
+from conftest import load_main
+from mapping import SENSORLOGGER_MAPPINGS
+
+MOTION = PRIORITY_CLASSES.index("motion")
+
+
+class Queue:
+    def __init__(self, depth, maxsize=100):
+        self._depth = depth
+        self.maxsize = maxsize
+
+    def depth(self):
+        return self._depth
+
+
+def accelerometer(ts):
+    return {"name": "accelerometer", "time": ts, "values": {"x": 0.1, "y": 0.2, "z": 9.8}}
+
+
+def location(ts):
+    return {"name": "location", "time": ts, "values": {"latitude": 57.7, "longitude": 11.9, "speed": 1.0, "bearing": 90}}
+
+
+def test_sensors_are_classed_by_what_they_are():
+    priorities = sensor_priorities(SENSORLOGGER_MAPPINGS)
+    # Orientation maps to yaw_deg as well, but it is ~100 Hz motion data
+    assert priorities["orientation"] == (MOTION, 4)
+    assert priorities["location"][0] == PRIORITY_CLASSES.index("position")
+    assert priorities["battery"][0] == PRIORITY_CLASSES.index("housekeeping")
+
+
+def test_samples_held_for_alignment_count_as_queued():
+    entries = [accelerometer(step) for step in range(20)] + [location(20)]
+    controller = AdmissionController(Queue(0), sensor_priorities(SENSORLOGGER_MAPPINGS), pending=lambda: 60)
+    accepted, admitted, shed = controller.admit(entries)
+    # 60 + 20 motion messages would pass the motion limit of 70
+    assert accepted == [entries[-1]]
+    assert shed[MOTION] == 20
+
+
+def test_released_samples_shed_by_class_in_order():
+    controller = AdmissionController(Queue(68), {})
+    items = [("boat1", subject, "phone", b"") for subject in (
+        "linear_acceleration_mpss", "location_fix", "yaw_deg", "location_fix_accuracy_horizontal_m", "battery_is_charging",
+    )]
+    kept, shed = controller.shed_items(items)
+    assert kept == [items[1], items[3]]
+    assert shed[MOTION] == 2
+    assert controller.stats()["shed_released"]["housekeeping"] == 1
+
+
+def test_flood_keeps_position_fixes(monkeypatch):
+    main = load_main(
+        monkeypatch, PUBLISH_QUEUE_SIZE=200, PUBLISH_QUEUE_POLICY="reject", PUBLISH_POLICIES="off",
+        DEDUP_WINDOW=0, REORDER_BUDGET_MS=500,
+    )
+    gate = threading.Event()
+    put = main.open_zenoh_session().put
+    main.open_zenoh_session().put = lambda key_expr, payload: gate.wait() and put(key_expr, payload)
+    now = time.time_ns()
+
+    def backlog(device, count):
+        return {
+            "messageId": device, "sessionId": "s1", "deviceId": device,
+            "payload": [accelerometer(now + step * 1000) for step in range(count)] + [location(now)],
+        }
+
+    with TestClient(main.app) as client:
+        while main.zenoh_session is None:
+            time.sleep(0.01)
+        try:
+            # Held for alignment, so not in the queue yet: the second backlog must still see them
+            first = client.post("/sensorlogger/boat1", json=backlog("phone-1", 100)).json()
+            second = client.post("/sensorlogger/boat1", json=backlog("phone-2", 100)).json()
+            assert (first["received"], first["shed"]) == (101, 0)
+            assert (second["received"], second["shed_by_class"]) == (1, {"motion": 100})
+
+            # The queue fills up before the first backlog is released: its motion data goes
+            filler = [("boat1", "linear_acceleration_mpss", "filler", b"")] * 60
+            main.PUBLISH_QUEUE.put_many(filler)
+            time.sleep(1.0)
+            assert main.ALIGNER.pending() == 0
+            assert main.ADMISSION.stats()["shed_released"]["motion"] == 100
+        finally:
+            gate.set()
+        assert main.PUBLISH_QUEUE.flush(timeout=5.0)
+        puts = main.zenoh_session.puts
+
+    fixes = [key for key, _ in puts if keelson.get_subject_from_pubsub_key(key) == "location_fix"]
+    assert len(fixes) == 2
+    assert main.PUBLISH_QUEUE.stats()["rejected"] == 0
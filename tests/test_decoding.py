@@ -0,0 +1,98 @@
+"""Body decoding: Content-Encoding, the JSON decoders, and bodies that do not fit."""
+import gzip
+import json
+import zlib
+
+import pytest
+
+import decoding
+from decoding import BodyTooLarge, UnsupportedEncoding, decompress, sensorlogger_decoder
+from mapping import SENSORLOGGER_MAPPINGS
+
+BODY = json.dumps({
+    "messageId": 3,
+    "sessionId": "s1",
+    "deviceId": "phone",
+    "payload": [
+        {"name": "accelerometer", "time": 1742503647000000000, "values": {"x": 0.1, "y": 0.2, "z": 9.8}},
+        {"name": "microphone", "time": 1742503647000000001, "values": {"dBFS": -40.0}},
+        {"name": "battery", "time": 1742503647000000002, "values": {"level": 0.5, "state": "charging"}},
+    ],
+}).encode()
+
+
+def test_content_encodings():
+    raw_deflate = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    encoded = {
+        "gzip": gzip.compress(BODY),
+        "x-gzip": gzip.compress(BODY),
+        "deflate": zlib.compress(BODY),
+        "identity": BODY,
+    }
+    for coding, body in encoded.items():
+        assert decompress(body, coding, 1 << 20) == BODY, coding
+    # Raw deflate streams are accepted too, and stacked codings are undone in reverse
+    assert decompress(raw_deflate.compress(BODY) + raw_deflate.flush(), "deflate", 1 << 20) == BODY
+    assert decompress(gzip.compress(zlib.compress(BODY)), "deflate, gzip", 1 << 20) == BODY
+    assert decompress(BODY, None, 1 << 20) is BODY
+
+
+def test_zstd():
+    zstandard = pytest.importorskip("zstandard")
+    assert decompress(zstandard.ZstdCompressor().compress(BODY), "zstd", 1 << 20) == BODY
+    with pytest.raises(BodyTooLarge):
+        decompress(zstandard.ZstdCompressor().compress(b" " * 10_000), "zstd", 1000)
+
+
+def test_bad_bodies():
+    with pytest.raises(UnsupportedEncoding):
+        decompress(BODY, "br", 1 << 20)
+    with pytest.raises(BodyTooLarge):
+        decompress(gzip.compress(b" " * 100_000), "gzip", 1000)
+    with pytest.raises(zlib.error):
+        decompress(gzip.compress(BODY)[:-20], "gzip", 1 << 20)
+    with pytest.raises(zlib.error):
+        decompress(b"not compressed", "deflate", 1 << 20)
+
+
+def plain(body):
+    """A decoded body with msgspec Structs turned back into dicts."""
+    entries = []
+    for entry in body["payload"]:
+        values = entry["values"]
+        if not isinstance(values, dict):
+            values = {name: values[name] for name in values.__struct_fields__ if name in values}
+        entries.append({"name": entry["name"], "time": entry["time"], "values": values})
+    return {**body, "payload": entries}
+
+
+@pytest.mark.parametrize("kind", decoding.available_decoders())
+def test_json_decoders_agree(kind):
+    decode, used = sensorlogger_decoder(SENSORLOGGER_MAPPINGS, kind)
+    assert used == kind
+    body, skipped = decode(BODY)
+    assert skipped == 1
+    assert plain(body) == {
+        "messageId": 3,
+        "sessionId": "s1",
+        "deviceId": "phone",
+        "payload": [
+            {"name": "accelerometer", "time": 1742503647000000000, "values": {"x": 0.1, "y": 0.2, "z": 9.8}},
+            {"name": "battery", "time": 1742503647000000002, "values": {"level": 0.5, "state": "charging"}},
+        ],
+    }
+    with pytest.raises(ValueError):
+        decode(b"[1, 2, 3]")
+    with pytest.raises(ValueError):
+        decode(b'{"payload": [')
+
+
+def test_msgspec_falls_back_on_bodies_outside_the_schema():
+    if "msgspec" not in decoding.available_decoders():
+        pytest.skip("msgspec is not installed")
+    decode, _ = sensorlogger_decoder(SENSORLOGGER_MAPPINGS, "msgspec")
+    body, skipped = decode(b'{"payload": [{"name": "accelerometer", "time": "soon", "values": {"x": 1}}]}')
+    # Decoded generically; the handler rejects the string time later
+    assert skipped == 0 and body["payload"] == [{"name": "accelerometer", "time": "soon", "values": {"x": 1}}]
+    entry = decode(b'{"payload": [{"name": "accelerometer", "time": 1, "values": {"x": 1.5}}]}')[0]["payload"][0]
+    assert entry["values"]["x"] == 1.5 and "y" not in entry["values"] and entry["values"].get("y", 0) == 0
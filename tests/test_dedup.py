@@ -0,0 +1,65 @@
+"""Duplicate suppression: window hits, expiry and the size bound, and a retried upload."""
+import time
+
+from fastapi.testclient import TestClient
+
+import dedup
+from conftest import load_main
+from dedup import DedupWindow
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_keys_are_duplicates_within_the_window(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(dedup.time, "monotonic", clock)
+    window = DedupWindow(maxsize=100, ttl=60)
+
+    assert not window.seen(("boat1", "s1", 1))
+    window.add(("boat1", "s1", 1))
+    clock.now += 59
+    assert window.seen(("boat1", "s1", 1))
+    assert not window.seen(("boat1", "s1", 2))
+
+    # Past the ttl the key is no longer a duplicate, and the next add drops it
+    clock.now += 2
+    assert not window.seen(("boat1", "s1", 1))
+    window.add(("boat1", "s1", 2))
+    assert len(window) == 1
+    stats = window.stats()
+    assert (stats["hits"], stats["misses"], stats["expired"]) == (1, 3, 1)
+
+
+def test_size_bound_forgets_the_oldest_keys(monkeypatch):
+    monkeypatch.setattr(dedup.time, "monotonic", Clock())
+    window = DedupWindow(maxsize=3, ttl=60)
+    for message_id in range(5):
+        window.add(("boat1", "s1", message_id))
+    assert len(window) == 3 and window.stats()["evicted"] == 2
+    assert not window.seen(("boat1", "s1", 1))
+    assert window.seen(("boat1", "s1", 2))
+
+
+def test_retried_upload_is_not_republished(monkeypatch):
+    main = load_main(monkeypatch, PUBLISH_POLICIES="off", TIME_ALIGN="false")
+    body = {
+        "messageId": 7, "sessionId": "s1", "deviceId": "phone",
+        "payload": [{"name": "barometer", "time": time.time_ns(), "values": {"pressure": 1013.2}}],
+    }
+    with TestClient(main.app) as client:
+        while main.zenoh_session is None:
+            time.sleep(0.01)
+        assert client.post("/sensorlogger/boat1", json=body).json()["received"] == 1
+        assert client.post("/sensorlogger/boat1", json=body).json() == {"received": 0, "duplicate": True}
+        body["messageId"] = 8
+        assert client.post("/sensorlogger/boat1", json=body).json()["received"] == 1
+        assert main.PUBLISH_QUEUE.flush(timeout=5.0)
+        puts = main.zenoh_session.puts
+
+    assert [key for key, _ in puts] == ["rise/@v0/boat1/pubsub/air_pressure_pa/phone"] * 2
@@ -0,0 +1,65 @@
+"""Envelope encoding: byte-identical to keelson.enclose, with templates shared per thread."""
+import concurrent.futures
+import threading
+
+import keelson
+from keelson.payloads.Decomposed3DVector_pb2 import Decomposed3DVector
+from keelson.payloads.foxglove.LocationFix_pb2 import LocationFix
+
+from encoding import enclose, template
+from mapping import SENSORLOGGER_HANDLERS
+
+ENCLOSED_AT = 1742503647123456789
+T0 = 1742503647000000000
+
+
+def test_enclose_matches_keelson():
+    for payload in (b"", b"x", b"y" * 127, b"z" * 128, b"w" * 20_000):
+        for enclosed_at in (ENCLOSED_AT, 1742503647 * 10**9, 999):
+            assert enclose(payload, enclosed_at) == keelson.enclose(payload, enclosed_at)
+    # The cached enclosed_at of the default path is recent and decodes like keelson's
+    received_at, enclosed_at, payload = keelson.uncover(enclose(b"abc"))
+    assert payload == b"abc" and enclosed_at > T0
+
+
+def expected(thread, idx):
+    """The envelopes a fresh message per reading would give for entry `idx` of `thread`."""
+    ts = T0 + thread * 10**9 + idx * 10_000_000
+    vector = Decomposed3DVector(frame_id="phone")
+    vector.timestamp.FromNanoseconds(ts)
+    vector.vector.x, vector.vector.y, vector.vector.z = thread, idx, -idx
+    fix = LocationFix(latitude=57.0 + thread, longitude=11.0 + idx / 1000, altitude=0.0)
+    fix.timestamp.FromNanoseconds(ts)
+    return [
+        ("linear_acceleration_mpss", keelson.enclose(vector.SerializeToString(), ENCLOSED_AT)),
+        ("location_fix", keelson.enclose(fix.SerializeToString(), ENCLOSED_AT)),
+    ]
+
+
+def test_templates_shared_per_thread_give_keelson_bytes():
+    threads = 8
+    barrier = threading.Barrier(threads)
+
+    def run(thread):
+        out = []
+
+        def publish(entity_id, subject, source_id, payload):
+            out.append((subject, enclose(payload.SerializeToString(), ENCLOSED_AT)))
+
+        barrier.wait()
+        for idx in range(500):
+            ts = T0 + thread * 10**9 + idx * 10_000_000
+            SENSORLOGGER_HANDLERS["accelerometer"]("boat1", "phone", ts, {"x": thread, "y": idx, "z": -idx}, publish)
+            # No altitude: the template's field is reset, not left from the reading before
+            SENSORLOGGER_HANDLERS["location"](
+                "boat1", "phone", ts, {"latitude": 57.0 + thread, "longitude": 11.0 + idx / 1000}, publish
+            )
+        return out, template(LocationFix)
+
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        results = list(executor.map(run, range(threads)))
+
+    for thread, (out, location_template) in enumerate(results):
+        assert out == [envelope for idx in range(500) for envelope in expected(thread, idx)]
+    # Each thread filled its own template
+    assert len({id(location_template) for _, location_template in results}) == threads
@@ -0,0 +1,81 @@
+"""Geofences: fence ids, enter/exit/dwell events, and R-tree lookups."""
+import random
+
+import pytest
+
+from geofence import DWELL, ENTERED, EXITED, Fence, GeofenceEngine, GeofenceIndex, RTree, parse_geojson
+
+SECOND = 1_000_000_000
+
+
+def square(lon, lat, size):
+    return [[[lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size], [lon, lat]]]
+
+
+def test_fence_ids_never_start_with_at():
+    with pytest.raises(ValueError):
+        Fence("@harbour", "Harbour", [square(11.9, 57.7, 0.01)])
+    fences, skipped = parse_geojson({"type": "FeatureCollection", "features": [
+        {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": square(11.9, 57.7, 0.01)},
+         "properties": {"name": "@inner harbour"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [11.9, 57.7]}, "properties": {}},
+    ]})
+    assert [fence.id for fence in fences] == ["-inner-harbour"] and skipped == 1
+
+
+def test_enter_dwell_and_exit():
+    fence = Fence("harbour", "Harbour", [square(11.90, 57.70, 0.01)], dwell=60)
+    engine = GeofenceEngine(GeofenceIndex([fence]), dwell=300)
+    t0 = 1_700_000_000 * SECOND
+
+    def locate(lat, lon, seconds):
+        return [event[0] for event in engine.locate("boat1", "phone", lat, lon, t0 + seconds * SECOND) or ()]
+
+    assert locate(57.69, 11.905, 0) == []
+    assert locate(57.705, 11.905, 10) == [ENTERED]
+    assert locate(57.706, 11.906, 40) == []
+    # The fence's own dwell_s applies, and dwell is reported once
+    assert locate(57.707, 11.907, 70) == [DWELL]
+    assert locate(57.708, 11.908, 200) == []
+    # A fix older than the last one is ignored, wherever it is
+    assert locate(57.69, 11.905, 100) == []
+    assert engine.stale == 1
+    assert engine.occupants()["harbour"][0]["dwell"] is True
+    assert locate(57.69, 11.905, 210) == [EXITED]
+    assert engine.occupants() == {}
+    assert engine.events == {ENTERED: 1, EXITED: 1, DWELL: 1}
+
+
+def test_fences_removed_by_a_reload_are_exited():
+    engine = GeofenceEngine(GeofenceIndex([Fence("harbour", "Harbour", [square(11.90, 57.70, 0.01)])]))
+    assert engine.locate("boat1", "phone", 57.705, 11.905, SECOND)[0][0] == ENTERED
+    engine.load(GeofenceIndex([]))
+    # Its name went with it; the event carries the id in its place
+    assert engine.locate("boat1", "phone", 57.705, 11.905, 2 * SECOND) == [(EXITED, "harbour", "harbour", 2 * SECOND)]
+
+
+def test_rtree_search_matches_a_linear_scan():
+    rnd = random.Random(7)
+    boxes = []
+    for idx in range(500):
+        x, y = rnd.uniform(0, 10), rnd.uniform(50, 60)
+        boxes.append(((x, y, x + rnd.uniform(0, 0.5), y + rnd.uniform(0, 0.5)), idx))
+    tree = RTree(boxes, capacity=4)
+    assert tree.size == 500 and tree.height >= 2
+    for _ in range(200):
+        x, y = rnd.uniform(-1, 11), rnd.uniform(49, 61)
+        query = (x, y, x + rnd.uniform(0, 1), y + rnd.uniform(0, 1))
+        expected = {
+            value for (min_x, min_y, max_x, max_y), value in boxes
+            if min_x <= query[2] and max_x >= query[0] and min_y <= query[3] and max_y >= query[1]
+        }
+        assert set(tree.search(*query)) == expected
+    assert RTree([]).search(0, 0, 1, 1) == []
+
+
+def test_containing_respects_holes():
+    ring = square(11.90, 57.70, 0.02)[0]
+    hole = square(11.905, 57.705, 0.01)[0]
+    index = GeofenceIndex([Fence("marina", "Marina", [[ring, hole]])])
+    assert [fence.id for fence in index.containing(57.702, 11.902)] == ["marina"]
+    assert index.containing(57.71, 11.91) == []
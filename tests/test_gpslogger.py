@@ -0,0 +1,67 @@
+"""GPSLogger form posts: time fallbacks, malformed optional fields, and handler errors."""
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from conftest import load_main
+from gpslogger import GpsLoggerParseError, parse_gpslogger
+
+BODY = (
+    "lat=57.43587&lon=12.03256&sat=7&alt=72.0&acc=7.0&dir=90.0&spd=2.5&batt=54.0&ischarging=false"
+    "&hdop=0.4&vdop=0.8&pdop=1.0&aid=089db14317f6af11&profile=Default+Profile"
+)
+
+
+def test_optional_fields_are_only_parsed_without_time():
+    fix = parse_gpslogger(
+        (BODY + "&time=2025-03-20T20:47:27.834Z&timeoffset=garbage&timestamp=soon&starttimestamp=").encode()
+    )
+    assert fix.time_ns == 1742503647834000000
+    assert fix.ignored == ()
+    response = fix.as_dict()
+    assert response["time"] == "2025-03-20T20:47:27.834Z"
+    assert (response["timeoffset"], response["timestamp"]) == ("garbage", "soon")
+    assert response["lat"] == 57.43587 and response["profile"] == "Default Profile"
+    assert "ignored" not in response and "time_ns" not in response
+
+
+def test_timeoffset_stands_in_for_time():
+    for offset in ("2025-03-20T21:47:27.834%2B01:00", "2025-03-20T17:17:27.834-03:30", "2025-03-20T20:47:27.834Z"):
+        fix = parse_gpslogger(f"{BODY}&timeoffset={offset}".encode())
+        assert fix.time_ns == 1742503647834000000
+    fix = parse_gpslogger(f"{BODY}&timeoffset=2025-03-20T21:47:27%2B01:00".encode())
+    assert fix.time_ns == 1742503647000000000
+
+
+def test_malformed_optional_field_does_not_stand_in_for_time():
+    fix = parse_gpslogger((BODY + "&timeoffset=garbage&timestamp=1742503647").encode())
+    assert fix.time_ns == 1742503647 * 1_000_000_000
+    assert fix.ignored == ("timeoffset",)
+    with pytest.raises(GpsLoggerParseError) as error:
+        parse_gpslogger((BODY + "&timeoffset=garbage").encode())
+    assert error.value.field == "time"
+    with pytest.raises(GpsLoggerParseError) as error:
+        parse_gpslogger((BODY + "&time=2025-03-20T20:47:27.834Z&lat=north").encode())
+    assert error.value.field == "lat"
+
+
+def test_handler_errors_answer_422(monkeypatch):
+    main = load_main(monkeypatch, TIME_ALIGN="false", DEDUP_WINDOW=0)
+    form = {"content-type": "application/x-www-form-urlencoded"}
+    now = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+
+    def broken(*args):
+        raise ValueError("no rule for this fix")
+
+    with TestClient(main.app) as client:
+        while main.zenoh_session is None:
+            time.sleep(0.01)
+        response = client.post("/log_all/boat1", content=f"{BODY}&time={now}&starttimestamp=x", headers=form)
+        assert response.status_code == 200
+        assert response.json()["lat"] == 57.43587
+
+        monkeypatch.setattr(main, "GPSLOGGER_HANDLER", broken)
+        response = client.post("/log_all/boat1", content=f"{BODY}&time={now}", headers=form)
+        assert response.status_code == 422
+        assert response.json() == {"detail": {"error": "no rule for this fix"}}
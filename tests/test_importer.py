@@ -0,0 +1,98 @@
+"""Importer: chunk sizes add up to the file sizes, and files are published in time order."""
+import collections
+import concurrent.futures
+import zipfile
+
+import keelson
+
+from conftest import FakeSession
+from gpslogger import parse_iso8601_utc_ns
+from importer import open_streams, run_import
+from mapping import SENSORLOGGER_HANDLERS, SENSORLOGGER_MAPPINGS
+from publishing import PublisherCache
+
+
+def chunk_sizes(path):
+    return [(stream.size, sum(size for _, size in stream.chunks)) for stream in open_streams(
+        str(path), "boat1", None, 100, SENSORLOGGER_MAPPINGS
+    )]
+
+
+def test_chunk_sizes_add_up_to_the_file(tmp_path):
+    csv_path = tmp_path / "voyage.csv"
+    with open(csv_path, "w", newline="") as fp:
+        fp.write("time,lat,lon,elevation,accuracy,bearing,speed,provider\r\n")
+        for idx in range(1000):
+            fp.write(f"2025-03-20T20:{idx // 60 % 60:02d}:{idx % 60:02d}.000Z,57.{idx:05d},11.9,10,3,90,2.5,gps\r\n")
+
+    gpx_path = tmp_path / "voyage.gpx"
+    gpx_path.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?><gpx><trk><trkseg>\n'
+        + "".join(f'<trkpt lat="57.{idx:05d}" lon="11.9"><name>Göteborg</name></trkpt>\n' for idx in range(1000))
+        + "</trkseg></trk></gpx>\n",
+        encoding="utf-8",
+    )
+
+    zip_path = tmp_path / "export.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("Accelerometer.csv", "time,seconds_elapsed,z,y,x\n" + "".join(
+            f"{1742503647000000000 + idx * 10_000_000},{idx / 100},9.8,0.1,0.2\n" for idx in range(1000)
+        ))
+
+    for path in (csv_path, gpx_path, zip_path):
+        [(size, read)] = chunk_sizes(path)
+        assert read == size, path
+
+
+def test_import_publishes_every_row_in_time_order(tmp_path, capsys):
+    csv_path = tmp_path / "voyage.csv"
+    with open(csv_path, "w") as fp:
+        fp.write("time,lat,lon,elevation,accuracy,bearing,speed,provider\n")
+        for idx in range(3):
+            fp.write(f"2025-03-20T20:47:2{idx}.500Z,57.7{idx},11.9,10,3,90,2.5,gps\n")
+
+    zip_path = tmp_path / "export.zip"
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("Metadata.csv", "version,device id\n1,pixel7\n")
+        archive.writestr("Accelerometer.csv", "time,seconds_elapsed,z,y,x\n" + "".join(
+            f"{1742503647000000000 + idx * 10_000_000},{idx / 100},9.8,0.1,0.2\n" for idx in range(5)
+        ))
+        archive.writestr(
+            "Location.csv",
+            "time,seconds_elapsed,horizontalAccuracy,verticalAccuracy,speed,bearing,altitude,longitude,latitude\n"
+            "1742503647020000000,0.02,4,3,2.0,90,10,11.9,57.7\n",
+        )
+
+    session = FakeSession()
+    publishers = PublisherCache(session)
+
+    def put(entity_id, subject, source_id, envelope):
+        publishers.get(entity_id, subject, source_id).put(envelope)
+
+    streams = [stream for path in (csv_path, zip_path) for stream in open_streams(
+        str(path), "boat1", None, 2, SENSORLOGGER_HANDLERS
+    )]
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        progress = run_import(streams, "boat1", put, executor)
+
+    assert (progress.rows, progress.failed, progress.messages) == (9, 0, 22)
+    assert progress.bytes == progress.total_bytes
+    assert "[100.0%]" in capsys.readouterr().err
+
+    counts = collections.Counter(key for key, _ in session.puts)
+    assert counts["rise/@v0/boat1/pubsub/location_fix/gpslogger"] == 3
+    assert counts["rise/@v0/boat1/pubsub/speed_over_ground_knots/gpslogger"] == 3
+    assert counts["rise/@v0/boat1/pubsub/linear_acceleration_mpss/pixel7"] == 5
+    assert counts["rise/@v0/boat1/pubsub/location_fix/pixel7"] == 1
+    assert sum(counts.values()) == 22
+
+    times = []
+    for key, envelope in session.puts:
+        subject = keelson.get_subject_from_pubsub_key(key)
+        _, _, payload = keelson.uncover(envelope)
+        message = keelson.decode_protobuf_payload_from_type_name(payload, keelson.get_subject_schema(subject))
+        times.append(message.timestamp.ToNanoseconds())
+    # The recording's own times, merged across files
+    assert times == sorted(times)
+    assert times[0] == parse_iso8601_utc_ns("2025-03-20T20:47:20.500Z")
+    assert times[-1] == 1742503647000000000 + 4 * 10_000_000
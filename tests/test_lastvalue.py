@@ -0,0 +1,91 @@
+"""Last-value cache: selector matching, and gets answered over a local Zenoh peer."""
+import json
+import socket
+import time
+
+import keelson
+import zenoh
+
+from lastvalue import LastValueCache
+
+
+def key_expr(entity_id, subject, source_id):
+    return keelson.construct_pubsub_key(base_path="rise", entity_id=entity_id, subject=subject, source_id=source_id)
+
+
+def filled(maxsize=100):
+    cache = LastValueCache(key_expr, maxsize=maxsize)
+    for entity_id in ("boat1", "boat2"):
+        for subject in ("location_fix", "yaw_deg"):
+            cache.update(entity_id, subject, "phone", f"{entity_id} {subject}".encode())
+    return cache
+
+
+def test_exact_and_wildcard_selectors():
+    cache = filled()
+    assert cache.match("rise/@v0/boat1/pubsub/yaw_deg/phone") == [
+        ("rise/@v0/boat1/pubsub/yaw_deg/phone", b"boat1 yaw_deg")
+    ]
+    assert cache.match("rise/@v0/boat1/pubsub/yaw_deg/tablet") == []
+    assert sorted(cache.match("rise/@v0/*/pubsub/location_fix/*")) == [
+        ("rise/@v0/boat1/pubsub/location_fix/phone", b"boat1 location_fix"),
+        ("rise/@v0/boat2/pubsub/location_fix/phone", b"boat2 location_fix"),
+    ]
+    assert sorted(key for key, _ in cache.match("rise/@v0/boat2/**")) == [
+        "rise/@v0/boat2/pubsub/location_fix/phone",
+        "rise/@v0/boat2/pubsub/yaw_deg/phone",
+    ]
+    assert len(cache.match("rise/@v0/**")) == 4
+    assert len(cache.match("rise/@v0/boat$*/pubsub/yaw_deg/**")) == 2
+    # Wildcards never match verbatim chunks such as "@v0"
+    assert cache.match("rise/*/boat1/**") == [] and cache.match("rise/**") == []
+
+
+def test_update_overwrites_and_evicts_the_oldest_key():
+    cache = filled(maxsize=4)
+    cache.update("boat1", "location_fix", "phone", b"newer")
+    assert cache.match("rise/@v0/boat1/pubsub/location_fix/phone")[0][1] == b"newer"
+    assert len(cache) == 4
+
+    # boat1's location was refreshed, so boat1's yaw is now the least recently updated
+    cache.update("boat3", "yaw_deg", "phone", b"boat3 yaw_deg")
+    assert len(cache) == 4 and cache.stats()["evicted"] == 1
+    assert cache.match("rise/@v0/boat1/pubsub/yaw_deg/phone") == []
+    assert [key for key, _ in cache.match("rise/@v0/boat1/**")] == ["rise/@v0/boat1/pubsub/location_fix/phone"]
+
+
+def open_session(**options):
+    conf = zenoh.Config()
+    for key, value in options.items():
+        conf.insert_json5(key, json.dumps(value))
+    conf.insert_json5("scouting/multicast/enabled", "false")
+    return zenoh.open(conf)
+
+
+def test_get_from_a_peer_is_answered_from_the_cache():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        endpoint = f"tcp/127.0.0.1:{sock.getsockname()[1]}"
+    cache = filled()
+    service = open_session(**{"listen/endpoints": [endpoint]})
+    queryable = service.declare_queryable("rise/@v0/**", cache.reply)
+    consumer = open_session(**{"connect/endpoints": [endpoint]})
+    try:
+        deadline = time.monotonic() + 10
+        replies = []
+        while not replies and time.monotonic() < deadline:
+            replies = [
+                (str(reply.ok.key_expr), reply.ok.payload.to_bytes())
+                for reply in consumer.get("rise/@v0/boat1/**", timeout=1.0)
+                if reply.ok is not None
+            ]
+    finally:
+        consumer.close()
+        queryable.undeclare()
+        service.close()
+
+    assert sorted(replies) == [
+        ("rise/@v0/boat1/pubsub/location_fix/phone", b"boat1 location_fix"),
+        ("rise/@v0/boat1/pubsub/yaw_deg/phone", b"boat1 yaw_deg"),
+    ]
+    assert cache.stats()["replies"] >= 2
@@ -0,0 +1,92 @@
+"""Logging pipeline: sampling and rate limits, shutdown, and configuring it again."""
+import io
+import logging
+
+import logconfig
+from conftest import load_main
+from logconfig import category_logger, configure_logging
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def written(stream):
+    return stream.getvalue().splitlines()
+
+
+def test_sampling_and_rate_limits(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(logconfig.time, "monotonic", clock)
+    stream = io.StringIO()
+    pipeline = configure_logging(
+        "DEBUG", sample={"gnss.sampled": 10}, rate={"gnss.rated": 5}, stream=stream
+    )
+    # A category covers child loggers built the plain way, and shares their count
+    for idx in range(20):
+        logging.getLogger("gnss.sampled.child").debug("child %d", idx)
+    sampled = category_logger("gnss.sampled")
+    for idx in range(100):
+        sampled.info("sampled %d", idx)
+    # Sampling thins DEBUG and INFO only
+    for idx in range(3):
+        sampled.warning("warned %d", idx)
+    rated = category_logger("gnss.rated")
+    for idx in range(20):
+        rated.error("rated %d", idx)
+    clock.now += 1.0
+    for idx in range(20):
+        rated.error("refilled %d", idx)
+    logging.getLogger("gnss.other").info("unlisted")
+    pipeline.stop()
+
+    lines = written(stream)
+    assert [line.split(" : ")[1] for line in lines[:3]] == ["child 0", "child 10", "sampled 0"]
+    assert sum(" : sampled " in line for line in lines) == 10
+    assert sum(" : warned " in line for line in lines) == 3
+    assert sum(" : rated " in line for line in lines) == 5
+    assert sum(" : refilled " in line for line in lines) == 5
+    assert lines[-1].endswith(" : unlisted")
+    categories = pipeline.stats()["categories"]
+    assert categories["gnss.sampled"]["dropped"] == 108
+    assert categories["gnss.rated"] == {"sample": None, "rate_limit": 5.0, "seen": 40, "dropped": 30}
+
+
+def test_stop_writes_what_was_queued():
+    stream = io.StringIO()
+    pipeline = configure_logging("INFO", fmt="json", stream=stream)
+    log = logging.getLogger("gnss.shutdown")
+    for idx in range(2000):
+        log.info("record %d", idx, extra={"idx": idx})
+    pipeline.stop()
+    assert not pipeline.listener._thread and pipeline.handler.queue.qsize() == 0
+    lines = written(stream)
+    assert len(lines) == 2000 and '"idx": 1999' in lines[-1]
+    # Stopping twice (at exit, after an explicit stop) is harmless
+    pipeline.stop()
+
+
+def test_configuring_again_replaces_the_pipeline(monkeypatch):
+    hooks = []
+    monkeypatch.setattr(logconfig, "_hooks_registered", False)
+    monkeypatch.setattr(logconfig.atexit, "register", hooks.append)
+    monkeypatch.setattr(logconfig.os, "register_at_fork", lambda **kwargs: hooks.append(kwargs))
+
+    first = load_main(monkeypatch).LOGGING
+    first_stream = io.StringIO()
+    first.listener.handlers[0].setStream(first_stream)
+    logging.getLogger("gnss.reload").warning("before")
+    second = load_main(monkeypatch, LOG_SAMPLE="gnss.publish=10").LOGGING
+
+    # The first listener wrote what it had and stopped; one handler, one set of hooks
+    assert first_stream.getvalue().endswith(" : before\n")
+    assert first.listener._thread is None and second.listener._thread is not None
+    assert logging.getLogger().handlers == [second.handler]
+    assert hooks.count(logconfig._stop_pipeline) == 1
+    assert hooks.count({"after_in_child": logconfig._restart_pipeline_after_fork}) == 1
+    assert logconfig._sampler is second.sampler
+    second.stop()
@@ -0,0 +1,57 @@
+"""Sensor mappings: the batched NumPy handlers publish what the per-entry handlers do."""
+import collections
+import random
+
+import pytest
+
+from mapping import (
+    SENSORLOGGER_BATCH_HANDLERS,
+    SENSORLOGGER_HANDLERS,
+    SENSORLOGGER_MAPPINGS,
+    _batch_fields,
+)
+
+T0 = 1742503647000000000
+
+
+def entries(name, count=64, seed=5):
+    rnd = random.Random(seed)
+    fields = [field for rule in SENSORLOGGER_MAPPINGS[name] for field in _batch_fields(rule)]
+    out = []
+    for idx in range(count):
+        # JSON numbers arrive as ints too
+        values = {field: rnd.uniform(-1000, 1000) if idx % 5 else rnd.randint(-50, 50) for field in fields}
+        out.append({"name": name, "time": T0 + idx * 9_999_999 + rnd.randint(0, 999), "values": values})
+    return out
+
+
+def collect():
+    published = collections.defaultdict(list)
+
+    def publish(entity_id, subject, source_id, payload):
+        published[(entity_id, subject, source_id)].append(payload.SerializeToString())
+
+    return published, publish
+
+
+@pytest.mark.parametrize("name", sorted(SENSORLOGGER_BATCH_HANDLERS))
+def test_batch_matches_per_entry(name):
+    group = entries(name)
+    per_entry, publish = collect()
+    for entry in group:
+        SENSORLOGGER_HANDLERS[name]("boat1", "phone", entry["time"], entry["values"], publish)
+    batched, publish = collect()
+    assert SENSORLOGGER_BATCH_HANDLERS[name]("boat1", "phone", group, publish)
+
+    # The batch emits subject by subject, so only the order within a key is the same
+    assert batched == per_entry
+    assert sum(map(len, batched.values())) == len(group) * len(SENSORLOGGER_MAPPINGS[name])
+
+
+def test_batch_declines_groups_it_cannot_convert():
+    for broken in ({"x": 1.0, "y": 2.0}, {"x": 1.0, "y": None, "z": 3.0}, {"x": "a", "y": 2.0, "z": 3.0}):
+        group = entries("accelerometer", count=20)
+        group[7]["values"] = broken
+        published, publish = collect()
+        assert not SENSORLOGGER_BATCH_HANDLERS["accelerometer"]("boat1", "phone", group, publish)
+        assert not published
@@ -0,0 +1,33 @@
+"""Prometheus exposition: running totals are counters, levels are gauges."""
+import time
+
+from fastapi.testclient import TestClient
+
+from conftest import load_main
+
+
+def metric_types(text):
+    return dict(line.split()[2:4] for line in text.splitlines() if line.startswith("# TYPE "))
+
+
+def test_running_totals_are_counters(monkeypatch):
+    main = load_main(monkeypatch)
+    with TestClient(main.app) as client:
+        while main.zenoh_session is None:
+            time.sleep(0.01)
+        response = client.get("/metrics")
+    types = metric_types(response.text)
+
+    for name in (
+        "gnss_publish_queue_dropped_total",
+        "gnss_publish_queue_rejected_total",
+        "gnss_publish_queue_failed_total",
+        "gnss_publisher_cache_hits_total",
+        "gnss_publisher_cache_misses_total",
+        "gnss_align_late_dropped_total",
+    ):
+        assert types[name] == "counter"
+    assert types["gnss_publish_queue_depth"] == "gauge"
+    assert types["gnss_publisher_cache_size"] == "gauge"
+    assert not [name for name, kind in types.items() if kind == "gauge" and name.endswith("_total")]
+    assert "gnss_publish_queue_rejected_total 0" in response.text.splitlines()
@@ -0,0 +1,115 @@
+"""Motion filter: gating, restarts, the stationary course hold, recentering and slot reuse."""
+import math
+
+from keelson.payloads.foxglove.LocationFix_pb2 import LocationFix
+from keelson.payloads.Primitives_pb2 import TimestampedFloat
+
+import motion
+from motion import KNOTS_PER_MPS, METERS_PER_DEGREE, MotionEstimator
+
+T0 = 1_700_000_000
+LAT, LON = 57.7, 11.9
+
+
+def fix(seconds, north_m=0.0, east_m=0.0):
+    payload = LocationFix(
+        latitude=LAT + north_m / METERS_PER_DEGREE,
+        longitude=LON + east_m / (METERS_PER_DEGREE * math.cos(math.radians(LAT))),
+    )
+    payload.timestamp.FromNanoseconds(int((T0 + seconds) * 1e9))
+    return payload
+
+
+def feed(estimator, seconds, north_m=0.0, east_m=0.0, source="phone", accuracy=3.0):
+    if accuracy is not None:
+        sample = TimestampedFloat(value=accuracy)
+        estimator.observe("boat1", "location_fix_accuracy_horizontal_m", source, sample)
+    return estimator.observe("boat1", "location_fix", source, fix(seconds, north_m, east_m))
+
+
+def test_outlier_is_gated_on_a_straight_track():
+    estimator = MotionEstimator(min_speed=0.5)
+    estimates = []
+    for second in range(60):
+        north = 5.0 * second
+        if second == 30:
+            # One fix 300 m off to the east
+            estimates.append(feed(estimator, second, north, 300.0))
+        else:
+            estimates.append(feed(estimator, second, north))
+    assert estimates[30] is None
+    assert estimator.stats()["rejected"] == 1 and estimator.stats()["restarts"] == 0
+
+    ts_ns, lat, lon, _, _, _, sog, cog, rot = estimates[-1]
+    assert ts_ns == (T0 + 59) * 1_000_000_000
+    assert abs((lat - LAT) * METERS_PER_DEGREE - 5.0 * 59) < 3.0
+    assert abs(sog - 5.0 * KNOTS_PER_MPS) < 0.2
+    assert min(cog, 360.0 - cog) < 1.0
+    assert abs(rot) < 1.0
+
+
+def test_restart_after_repeated_rejections_and_after_a_gap():
+    estimator = MotionEstimator()
+    for second in range(10):
+        feed(estimator, second, 5.0 * second)
+    # The vessel "jumps" 2 km: rejected twice, the third fix restarts the filter there
+    assert feed(estimator, 10, 2000.0) is None
+    assert feed(estimator, 11, 2005.0) is None
+    restarted = feed(estimator, 12, 2010.0)
+    assert restarted[6:] == (None, None, None)
+    assert abs((restarted[1] - LAT) * METERS_PER_DEGREE - 2010.0) < 1e-6
+    assert estimator.stats()["restarts"] == 1
+    assert feed(estimator, 13, 2015.0)[6] is not None
+
+    # A fix after more than max_gap seconds also starts over
+    estimator = MotionEstimator(max_gap=60)
+    feed(estimator, 0)
+    feed(estimator, 1, 5.0)
+    assert feed(estimator, 100, 500.0)[6:] == (None, None, None)
+    assert estimator.stats()["restarts"] == 1
+
+
+def test_course_is_held_below_min_speed():
+    estimator = MotionEstimator(min_speed=1.0)
+    for second in range(30):
+        moving = feed(estimator, second, east_m=5.0 * second)
+    assert abs(moving[7] - 90.0) < 1.0
+    # Stopped: the velocity decays below min_speed and the last course stays
+    for second in range(30, 120):
+        stopped = feed(estimator, second, east_m=5.0 * 29)
+    assert stopped[6] < 1.0 * KNOTS_PER_MPS
+    assert stopped[7] == estimator._data[estimator._slots[("boat1", "phone")] + motion.COG]
+    assert abs(stopped[7] - 90.0) < 5.0
+    assert abs(stopped[8]) < 1e-6
+
+
+def test_frame_is_recentered():
+    estimator = MotionEstimator()
+    # 20 m/s north for 5 min: 6 km, past RECENTER_M from the first fix
+    for second in range(300):
+        last = feed(estimator, second, 20.0 * second)
+    assert estimator.stats()["rejected"] == 0
+    origin = estimator._data[estimator._slots[("boat1", "phone")] + motion.LAT0]
+    assert origin > LAT + 0.9 * motion.RECENTER_M / METERS_PER_DEGREE
+    assert abs((last[1] - LAT) * METERS_PER_DEGREE - 20.0 * 299) < 3.0
+    assert abs(last[2] - LON) * METERS_PER_DEGREE < 3.0
+    assert abs(last[6] - 20.0 * KNOTS_PER_MPS) < 0.2
+
+
+def test_silent_sources_are_swept_and_their_slot_reused():
+    estimator = MotionEstimator(ttl=3600, sweep_interval=3600)
+    feed(estimator, 0, source="a")
+    feed(estimator, 0, source="b")
+    size = len(estimator._data)
+    estimator._data[estimator._slots[("boat1", "a")] + motion.SEEN] -= 7200
+
+    # The sweep runs from observe on a known source, not only when a new one arrives
+    estimator._next_sweep = 0
+    feed(estimator, 1, 5.0, source="b")
+    assert ("boat1", "a") not in estimator._slots and estimator.stats()["expired"] == 1
+
+    # The freed slot is reused, and starts from scratch
+    first = feed(estimator, 0, source="c")
+    assert len(estimator._data) == size
+    assert first[6:] == (None, None, None)
+    assert estimator.stats()["sources"] == 2
@@ -0,0 +1,142 @@
+"""NMEA listeners on loopback sockets, fed the way receivers and gateways send."""
+import asyncio
+import datetime
+
+from conftest import nmea
+
+from mapping import NMEA_HANDLERS
+from nmea import NmeaIngest, start_listeners, stop_listeners
+
+
+def epoch(second, heading=True):
+    time_field = f"1227{second:02d}.00"
+    sentences = [
+        nmea(f"GPRMC,{time_field},A,5743.0000,N,01158.0000,E,5.5,123.4,181026,,,A"),
+        nmea("GPVTG,123.4,T,,M,5.5,N,10.2,K,A"),
+        nmea(f"GPGGA,{time_field},5743.{second:04d},N,01158.0000,E,1,09,0.9,12.5,M,40.1,M,,"),
+        nmea("GNGSA,A,3,01,02,03,,,,,,,,,,1.8,0.9,1.5"),
+        nmea("GNGSA,A,3,65,66,,,,,,,,,,,1.8,0.9,1.5"),
+    ]
+    if heading:
+        sentences.append(nmea("HEHDT,121.0,T"))
+    return b"".join(sentences)
+
+
+def epoch_ns(second):
+    return int(datetime.datetime(2026, 10, 18, 12, 27, second, tzinfo=datetime.timezone.utc).timestamp()) * 10**9
+
+
+class Recorder:
+    """`build`/`emit` pair for NmeaIngest that keeps (subject, source_id, ts_ns, payload copy)."""
+
+    def __init__(self):
+        self.published = []
+
+    def build(self, entity_id, subject, source_id, payload, items):
+        copy = type(payload)()
+        copy.CopyFrom(payload)
+        timestamp = payload.timestamp
+        items.append((subject, source_id, timestamp.seconds * 1_000_000_000 + timestamp.nanos, copy))
+
+    def emit(self, items):
+        self.published.extend(items)
+        return True
+
+    def subjects(self, subject):
+        return [item for item in self.published if item[0] == subject]
+
+
+async def until(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition() and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.01)
+    return condition()
+
+
+def run_listeners(exchange):
+    async def main():
+        recorder = Recorder()
+        ingest = NmeaIngest("boat1", NMEA_HANDLERS, recorder.build, recorder.emit)
+        opened = await start_listeners(ingest, udp="127.0.0.1:0", tcp="127.0.0.1:0")
+        try:
+            udp_port = opened[0].get_extra_info("sockname")[1]
+            tcp_port = opened[1].sockets[0].getsockname()[1]
+            await exchange(ingest, recorder, udp_port, tcp_port)
+        finally:
+            await stop_listeners(opened)
+        return ingest, recorder
+
+    return asyncio.run(main())
+
+
+def test_udp_epoch_publishes_each_subject_once():
+    async def exchange(ingest, recorder, udp_port, tcp_port):
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=("127.0.0.1", udp_port))
+        transport.sendto(epoch(0))
+        assert await until(lambda: recorder.subjects("heading_true_north_deg"))
+        transport.close()
+
+    ingest, recorder = run_listeners(exchange)
+
+    [(_, source_id, ts_ns, fix)] = recorder.subjects("location_fix")
+    assert source_id == "nmea-127.0.0.1"
+    assert ts_ns == epoch_ns(0)
+    assert abs(fix.latitude - 57.716666) < 1e-5 and abs(fix.longitude - 11.966666) < 1e-5
+    assert abs(fix.altitude - 52.6) < 1e-9
+    # RMC and VTG both carry speed and course, the two GSAs both carry the DOPs
+    assert [item[3].value for item in recorder.subjects("speed_over_ground_knots")] == [5.5]
+    assert len(recorder.subjects("course_over_ground_deg")) == 1
+    assert len(recorder.subjects("location_fix_hdop")) == 1
+    assert len(recorder.subjects("location_fix_pdop")) == 1
+    assert ingest.counts["sentences"] == 6
+
+
+def test_tcp_stream_split_across_reads():
+    async def exchange(ingest, recorder, udp_port, tcp_port):
+        _, writer = await asyncio.open_connection("127.0.0.1", tcp_port)
+        data = b"".join(epoch(second, heading=False) for second in range(10, 13))
+        # Sentences cut at arbitrary points, as a gateway's TCP segments do
+        for offset in range(0, len(data), 7):
+            writer.write(data[offset:offset + 7])
+            await writer.drain()
+        # A peer that never ends its line: the framer drops it instead of buffering it
+        writer.write(b"x" * 1000)
+        await writer.drain()
+        assert await until(lambda: ingest.counts["overflow"] == 1)
+        writer.write(b"\n$GPGGA,122713.00*00\r\n" + nmea("HEHDT,200.5,T"))
+        await writer.drain()
+        assert await until(lambda: recorder.subjects("heading_true_north_deg"))
+        writer.close()
+        await writer.wait_closed()
+        assert await until(lambda: ingest.stats()["receivers"] == 0)
+
+    ingest, recorder = run_listeners(exchange)
+
+    fixes = recorder.subjects("location_fix")
+    assert [ts_ns for _, _, ts_ns, _ in fixes] == [epoch_ns(second) for second in range(10, 13)]
+    assert [item[3].value for item in recorder.subjects("heading_true_north_deg")] == [200.5]
+    assert ingest.counts["overflow"] == 1
+    assert ingest.counts["bad_checksum"] == 1
+
+
+def test_bad_sentences_are_counted_not_published():
+    async def exchange(ingest, recorder, udp_port, tcp_port):
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=("127.0.0.1", udp_port))
+        transport.sendto(
+            b"$GPGGA,bad*00\r\n"
+            + nmea("GPGSV,1,1,00")
+            + nmea("GPGGA,122800.00,,,,,0,00,99.99,,,,,,")
+            + nmea("GPGGA,122801.00,57xx.0,N,01158.0000,E,1,09,0.9,12.5,M,40.1,M,,")
+        )
+        assert await until(lambda: ingest.counts["sentences"] == 4)
+        transport.close()
+
+    ingest, recorder = run_listeners(exchange)
+
+    assert recorder.published == []
+    assert ingest.counts["bad_checksum"] == 1
+    assert ingest.counts["unsupported"] == 1
+    assert ingest.counts["no_fix"] == 1
+    assert ingest.counts["malformed"] == 1
@@ -0,0 +1,58 @@
+"""Publish policies: what the defaults hold back, and the opt-in rate caps."""
+from keelson.payloads.Primitives_pb2 import TimestampedFloat
+
+from policy import PolicyFilter, load_policies
+
+
+def readings(subject, hz, seconds, step=0.5):
+    """(subject, payload) at `hz` whose value changes by `step` every reading."""
+    for idx in range(int(hz * seconds)):
+        payload = TimestampedFloat(value=1000 + idx * step)
+        payload.timestamp.FromNanoseconds(1_700_000_000 * 10**9 + idx * 10**9 // hz)
+        yield subject, payload
+
+
+def published(policies, samples):
+    policy_filter = PolicyFilter(policies)
+    return sum(policy_filter.check("boat1", subject, "phone", payload) is None for subject, payload in samples)
+
+
+def test_defaults_do_not_cap_rates():
+    policies = load_policies("")
+    assert all(not policy.min_interval_ns for policy in policies.values())
+    assert published(policies, readings("yaw_deg", 100, 2)) == 200
+    # Changing by 0.75 Pa per reading: the 1 Pa deadband passes every other one
+    assert published(policies, readings("air_pressure_pa", 20, 2, step=0.75)) == 20
+
+
+def test_rate_caps_are_opt_in():
+    policies = load_policies("", rate_caps=True)
+    assert published(policies, readings("yaw_deg", 100, 2)) == 40
+    assert policies["air_pressure_pa"].as_dict() == {"deadband": 1.0, "relative": None, "max_rate": 5.0, "heartbeat": 10.0}
+    assert load_policies("off", rate_caps=True) == {}
+    assert "yaw_deg" not in load_policies('{"yaw_deg": null}', rate_caps=True)
+
+
+def test_one_step_changes_are_published():
+    policies = load_policies("")
+    assert published(policies, readings("location_fix_hdop", 1, 10, step=0.1)) == 10
+    assert published(policies, readings("battery_state_of_charge_pct", 1, 10, step=1)) == 10
+    # Unchanged values wait for the heartbeat
+    assert published(policies, readings("location_fix_hdop", 1, 120, step=0)) == 2
+
+
+def test_keys_are_bounded():
+    policy_filter = PolicyFilter(load_policies(""), maxsize=3, idle_ttl=0.0, sweep_interval=3600.0)
+    for source in range(5):
+        for _, payload in readings("location_fix_hdop", 1, 2, step=0):
+            policy_filter.check("boat1", "location_fix_hdop", f"phone{source}", payload)
+    stats = policy_filter.stats()
+    assert stats["keys"] == 3 and stats["evicted_size"] == 2
+    # The second reading of each source was held back while its key was known
+    assert stats["suppressed"] == 5
+
+    policy_filter._next_sweep = 0
+    _, payload = next(readings("location_fix_hdop", 1, 1))
+    assert policy_filter.check("boat1", "location_fix_hdop", "phone0", payload) is None
+    stats = policy_filter.stats()
+    assert stats["evicted_idle"] == 3 and stats["keys"] == 1
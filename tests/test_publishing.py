@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import publishing
+from conftest import FakeSession
+from publishing import PublisherCache, PublishQueue, PublishQueueFull
+
+
+async def max_loop_lag(coroutine, tick=0.005):
+    """Run `coroutine` while measuring how late a ticker task wakes up."""
+    lag = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal lag
+        while not done:
+            started = time.perf_counter()
+            await asyncio.sleep(tick)
+            lag = max(lag, time.perf_counter() - started - tick)
+
+    task = asyncio.create_task(ticker())
+    try:
+        result = await coroutine
+    finally:
+        done = True
+        await task
+    return result, lag
+
+
+def test_block_waits_for_room_without_blocking_the_loop():
+    published = []
+
+    def slow_sink(item):
+        time.sleep(0.02)
+        published.append(item)
+
+    queue = PublishQueue(slow_sink, maxsize=4, policy="block", block_timeout=5.0)
+    queue.start()
+    batches = [[(batch, idx) for idx in range(4)] for batch in range(5)]
+
+    async def upload():
+        await asyncio.gather(*(queue.put_many_async(batch) for batch in batches))
+
+    _, lag = asyncio.run(max_loop_lag(upload()))
+    assert queue.flush(timeout=5.0)
+    queue.close()
+
+    # Twenty 20 ms puts took ~0.4 s; the loop kept running meanwhile
+    assert lag < 0.1
+    assert published == [item for batch in batches for item in batch]
+    assert queue.stats()["high_watermark"] <= 4
+
+
+def test_block_rejects_the_whole_batch_after_the_timeout():
+    release = threading.Event()
+    queue = PublishQueue(lambda item: release.wait(), maxsize=4, policy="block", block_timeout=0.1)
+    queue.start()
+
+    async def upload():
+        await queue.put_many_async([1, 2, 3])
+        with pytest.raises(PublishQueueFull):
+            await queue.put_many_async([4, 5, 6])
+
+    _, lag = asyncio.run(max_loop_lag(upload()))
+    stats = queue.stats()
+    release.set()
+    queue.close()
+
+    assert lag < 0.05
+    # The sink never returns, so at most one slot frees up: 4, 5 and 6 never fit together
+    assert stats["enqueued"] == 3
+    assert stats["rejected"] == 3
+
+
+def test_reject_is_all_or_nothing():
+    queue = PublishQueue(lambda item: None, maxsize=3, policy="reject")
+    queue.put_many([1, 2])
+    with pytest.raises(PublishQueueFull):
+        queue.put_many([3, 4])
+    assert queue.depth() == 2
+    assert queue.stats()["rejected"] == 2
+
+
+def test_batch_larger_than_the_queue_waits_for_an_empty_queue():
+    queue = PublishQueue(lambda item: None, maxsize=3, policy="reject")
+    queue.put_many(list(range(10)))
+    assert queue.depth() == 10
+    with pytest.raises(PublishQueueFull):
+        queue.put_many([10])
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_publisher_cache_undeclares_what_it_evicts(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(publishing.time, "monotonic", clock)
+    cache = PublisherCache(FakeSession(), maxsize=3, idle_ttl=60, sweep_interval=10)
+
+    first = [cache.get("boat1", "location_fix", f"phone{idx}") for idx in range(3)]
+    assert cache.get("boat1", "location_fix", "phone0") is first[0]
+    # Over maxsize: the least recently used one (phone1, not the one just reused) goes
+    fourth = cache.get("boat1", "location_fix", "phone3")
+    assert [publisher.undeclared for publisher in first] == [False, True, False]
+    assert first[1].key_expr == "rise/@v0/boat1/pubsub/location_fix/phone1"
+
+    # phone2 is left idle past the ttl and undeclared by the next sweep; the others were used
+    clock.now += 50
+    cache.get("boat1", "location_fix", "phone0")
+    cache.get("boat1", "location_fix", "phone3")
+    clock.now += 20
+    cache.get("boat1", "location_fix", "phone0")
+    assert first[2].undeclared and not first[0].undeclared and not fourth.undeclared
+    assert cache.get("boat1", "location_fix", "phone2") is not first[2]
+    stats = cache.stats()
+    assert (stats["evicted_size"], stats["evicted_idle"], stats["size"]) == (1, 1, 3)
+
+    cache.clear()
+    assert first[0].undeclared and fourth.undeclared and len(cache) == 0
@@ -0,0 +1,142 @@
+"""Spool: linear replay of closed segments, and delivery after a Zenoh peer restarts."""
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import spool as spool_module
+from conftest import load_main
+from spool import Spool
+
+
+def fill(spool, count):
+    for idx in range(count):
+        spool.append(f"rise/@v0/boat1/pubsub/x/{idx}", b"envelope %d" % idx)
+
+
+def test_replay_checks_each_record_once(tmp_path, monkeypatch):
+    spool = Spool(str(tmp_path), segment_size=4096, max_bytes=1 << 20)
+    fill(spool, 400)
+    spool.close()
+
+    checked = []
+    crc32 = spool_module.zlib.crc32
+    monkeypatch.setattr(spool_module.zlib, "crc32", lambda data: checked.append(len(data)) or crc32(data))
+    spool = Spool(str(tmp_path), segment_size=4096, max_bytes=1 << 20)
+    keys = []
+    while spool.pending():
+        records = spool.read(10)
+        keys.extend(key for key, _, _ in records if key is not None)
+        spool.commit(records[-1][2])
+    spool.close()
+
+    assert keys == [f"rise/@v0/boat1/pubsub/x/{idx}" for idx in range(400)]
+    # Reopening scans the segment being written once; replay checks every other record once
+    assert len(checked) <= 400 + 400 // 10
+
+
+def test_torn_record_ends_a_closed_segment(tmp_path):
+    spool = Spool(str(tmp_path), segment_size=4096, max_bytes=1 << 20)
+    fill(spool, 200)
+    spool.close()
+    first = tmp_path / "segment-000000000001.log"
+    data = bytearray(first.read_bytes())
+    data[spool_module.HEADER.size + 100] ^= 0xFF  # somewhere inside the second record
+    first.write_bytes(bytes(data))
+
+    spool = Spool(str(tmp_path), segment_size=4096, max_bytes=1 << 20)
+    records = spool.read(1000)
+    spool.close()
+    keys = [key for key, _, _ in records if key is not None]
+    assert keys[0] == "rise/@v0/boat1/pubsub/x/0"
+    # The rest of segment 1 is skipped; replay goes on with segment 2
+    assert keys[1] != "rise/@v0/boat1/pubsub/x/1"
+    assert keys[-1] == "rise/@v0/boat1/pubsub/x/199"
+
+
+PEER = """
+import json, sys, zenoh
+conf = zenoh.Config()
+conf.insert_json5("listen/endpoints", json.dumps([sys.argv[1]]))
+conf.insert_json5("scouting/multicast/enabled", "false")
+session = zenoh.open(conf)
+subscriber = session.declare_subscriber("rise/@v0/**", lambda sample: print(str(sample.key_expr), flush=True))
+print("ready", flush=True)
+sys.stdin.read()
+"""
+
+
+class Peer:
+    """A Zenoh peer in a child process, listening on `endpoint` and recording what it receives."""
+
+    def __init__(self, endpoint):
+        self.received = []
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", PEER, endpoint], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        assert self.process.stdout.readline().strip() == "ready"
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            self.received.append(line.strip())
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+
+
+def until(condition, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def sensorlogger(message_id, count):
+    now = time.time_ns()
+    return {
+        "messageId": message_id, "sessionId": "s1", "deviceId": "phone",
+        "payload": [
+            {"name": "barometer", "time": now + step * 1_000_000, "values": {"pressure": 1000 + step}}
+            for step in range(count)
+        ],
+    }
+
+
+def test_spooled_while_peer_is_down_replayed_after_restart(tmp_path, monkeypatch):
+    endpoint = f"tcp/127.0.0.1:{free_port()}"
+    peer = Peer(endpoint)
+    main = load_main(
+        monkeypatch, fake_session=False, ZENOH_CONNECT=endpoint, SPOOL_DIR=tmp_path, SPOOL_CHECK_INTERVAL=0.05,
+        PUBLISH_POLICIES="off", TIME_ALIGN="false", LAST_VALUE_CACHE_SIZE=0,
+    )
+    try:
+        with TestClient(main.app) as client:
+            assert until(lambda: main.ZENOH_CONNECTED())
+            assert client.post("/sensorlogger/boat1", json=sensorlogger(1, 5)).json()["received"] == 5
+            assert until(lambda: len(peer.received) == 5)
+
+            peer.kill()
+            assert until(lambda: not main.ZENOH_CONNECTED())
+            assert client.post("/sensorlogger/boat1", json=sensorlogger(2, 50)).json()["received"] == 50
+            assert main.PUBLISH_QUEUE.flush(timeout=5.0)
+            assert main.SPOOL.stats()["appended"] == 50
+
+            peer = Peer(endpoint)
+            assert until(lambda: len(peer.received) == 50)
+            assert until(lambda: not main.SPOOL.pending())
+            assert main.SPOOL.stats()["replayed"] == 50
+    finally:
+        peer.kill()
+    assert set(peer.received) == {"rise/@v0/boat1/pubsub/air_pressure_pa/phone"}
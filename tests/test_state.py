@@ -0,0 +1,77 @@
+"""Latest-state store: bounding-box and nearest queries against a linear scan."""
+import random
+
+from keelson.payloads.foxglove.LocationFix_pb2 import LocationFix
+from keelson.payloads.Primitives_pb2 import TimestampedFloat
+
+from state import StateStore, haversine_m
+
+
+def locate(store, entity_id, lat, lon, source_id="phone"):
+    fix = LocationFix(latitude=lat, longitude=lon, altitude=5.0)
+    fix.timestamp.FromNanoseconds(1_700_000_000 * 10**9)
+    store.observe(entity_id, "location_fix", source_id, fix)
+
+
+def fleet(seed=3, count=400):
+    rnd = random.Random(seed)
+    store = StateStore(cell_deg=0.05)
+    positions = {}
+    for idx in range(count):
+        lat, lon = rnd.uniform(57.0, 58.5), rnd.uniform(10.5, 12.5)
+        locate(store, f"boat{idx}", lat, lon)
+        positions[f"boat{idx}"] = (lat, lon)
+    # Move a quarter of them, most across a cell boundary
+    for idx in range(0, count, 4):
+        lat, lon = rnd.uniform(57.0, 58.5), rnd.uniform(10.5, 12.5)
+        locate(store, f"boat{idx}", lat, lon)
+        positions[f"boat{idx}"] = (lat, lon)
+    return store, positions, rnd
+
+
+def test_within_matches_a_linear_scan():
+    store, positions, rnd = fleet()
+    for _ in range(50):
+        lat, lon = rnd.uniform(56.9, 58.4), rnd.uniform(10.4, 12.4)
+        box = (lat, lon, lat + rnd.uniform(0, 0.5), lon + rnd.uniform(0, 0.5))
+        found = {state.entity_id for state in store.within(*box)}
+        expected = {
+            entity_id for entity_id, (plat, plon) in positions.items()
+            if box[0] <= plat <= box[2] and box[1] <= plon <= box[3]
+        }
+        assert found == expected
+    # A box over everything walks the occupied cells instead of the empty ones
+    assert len(store.within(-90, -180, 90, 180)) == len(positions)
+
+
+def test_nearest_matches_a_linear_scan():
+    store, positions, rnd = fleet()
+    queries = [(rnd.uniform(57.0, 58.5), rnd.uniform(10.5, 12.5)) for _ in range(30)]
+    # Far outside the fleet as well: falls back to a scan of the occupied cells
+    queries.append((-33.9, 151.2))
+    for lat, lon in queries:
+        distances = sorted(
+            (haversine_m(lat, lon, plat, plon), entity_id) for entity_id, (plat, plon) in positions.items()
+        )
+        found = store.nearest(lat, lon, k=5)
+        assert [state.entity_id for _, state in found] == [entity_id for _, entity_id in distances[:5]]
+        limited = store.nearest(lat, lon, k=50, max_distance_m=10_000)
+        assert [state.entity_id for _, state in limited] == [
+            entity_id for distance, entity_id in distances[:50] if distance <= 10_000
+        ]
+
+
+def test_updates_and_removal():
+    store = StateStore()
+    locate(store, "boat1", 57.7, 11.9)
+    speed = TimestampedFloat(value=6.5)
+    store.observe("boat1", "speed_over_ground_knots", "phone", speed)
+    # Subjects the store does not track are ignored
+    store.observe("boat1", "air_pressure_pa", "phone", TimestampedFloat(value=101325.0))
+    state = store.latest("boat1")["phone"]
+    assert (state.latitude, state.altitude, state.sog_knots) == (57.7, 5.0, 6.5)
+    assert "cell" not in state.as_dict()
+
+    store.remove("boat1", "phone")
+    assert store.latest("boat1") is None and store.within(57, 11, 58, 12) == []
+    assert store.nearest(57.7, 11.9) == [] and store.stats()["cells"] == 0
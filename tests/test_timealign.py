@@ -0,0 +1,78 @@
+"""Time alignment: per-subject lateness, in the aligner and through /sensorlogger."""
+import time
+
+import keelson
+from fastapi.testclient import TestClient
+
+from conftest import load_main
+from timealign import TimeAligner
+
+SECOND = 1_000_000_000
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_lateness_is_per_subject():
+    clock = Clock(100 * SECOND)
+    aligner = TimeAligner(budget=0.1, clock=clock)
+    stream = aligner.begin("boat1", "phone", clock.now)
+    for step in range(10):
+        ts = clock.now - SECOND + step * SECOND // 10
+        assert aligner.accept(stream, "linear_acceleration_mpss", ts)
+        aligner.push(stream, "linear_acceleration_mpss", ts, ("imu", ts))
+    clock.now += SECOND
+    assert len(aligner.release()) == 10
+
+    # The location trails the IMU it is uploaded with: not late, nothing of its kind was released
+    location_ts = clock.now - 3 * SECOND // 2
+    assert aligner.accept(stream, "location_fix", location_ts)
+    aligner.push(stream, "location_fix", location_ts, ("location", location_ts))
+    # An IMU sample older than released ones is
+    assert not aligner.accept(stream, "linear_acceleration_mpss", clock.now - 2 * SECOND)
+    clock.now += SECOND
+    assert aligner.release() == [("location", location_ts)]
+    assert not aligner.accept(stream, "location_fix", location_ts - 1)
+    assert aligner.stats()["late_dropped"] == 2
+
+
+def test_trailing_location_is_published_and_late_entries_are_not_received(monkeypatch):
+    main = load_main(monkeypatch, PUBLISH_POLICIES="off", DEDUP_WINDOW=0)
+    now = time.time_ns()
+
+    def accelerometer(ts):
+        return {"name": "accelerometer", "time": ts, "values": {"x": 0.1, "y": 0.2, "z": 9.8}}
+
+    location = {
+        "name": "location",
+        "time": now - 3 * SECOND // 2,
+        "values": {"latitude": 57.7, "longitude": 11.9, "altitude": 10, "speed": 1.0, "bearing": 90},
+    }
+    with TestClient(main.app) as client:
+        while main.zenoh_session is None:
+            time.sleep(0.01)
+        response = client.post("/sensorlogger/boat1", json={
+            "messageId": 1, "sessionId": "s1", "deviceId": "phone",
+            "payload": [accelerometer(now - SECOND + step * SECOND // 10) for step in range(10)],
+        })
+        assert response.json()["received"] == 10
+        time.sleep(0.3)
+        response = client.post("/sensorlogger/boat1", json={
+            "messageId": 2, "sessionId": "s1", "deviceId": "phone",
+            "payload": [location, accelerometer(now - 2 * SECOND), accelerometer(now)],
+        })
+        assert (response.json()["received"], response.json()["late"]) == (2, 1)
+        time.sleep(0.3)
+        assert main.PUBLISH_QUEUE.flush(timeout=5.0)
+        puts = main.zenoh_session.puts
+
+    subjects = [keelson.get_subject_from_pubsub_key(key) for key, _ in puts]
+    assert subjects.count("location_fix") == 1
+    assert subjects.count("linear_acceleration_mpss") == 11
+    # Released in sample-time order: the location goes out between the two IMU batches
+    assert subjects.index("location_fix") < len(subjects) - 1
@@ -0,0 +1,75 @@
+"""Track buffers: ring wraparound, time slicing, simplification and GeoJSON geometry."""
+import numpy as np
+from keelson.payloads.foxglove.LocationFix_pb2 import LocationFix
+from keelson.payloads.Primitives_pb2 import TimestampedFloat
+
+import tracks
+from tracks import TrackBuffer, TrackStore
+
+SECOND = 1_000_000_000
+
+
+def test_ring_wraps_around_oldest_first():
+    track = TrackBuffer(max_points=8, capacity=2)
+    for idx in range(20):
+        track.append(idx * SECOND, 57.0 + idx, 11.0)
+    assert (track.capacity, track.count) == (8, 8)
+    t, lat, _, _, _ = track.slice()
+    assert (t // SECOND).tolist() == list(range(12, 20))
+    assert lat.tolist() == [57.0 + idx for idx in range(12, 20)]
+    assert track.last_time() == 19 * SECOND
+
+
+def test_slice_by_time():
+    track = TrackBuffer(max_points=8)
+    for idx in range(12):
+        track.append(idx * SECOND, 57.0, 11.0 + idx)
+    t, _, lon, _, _ = track.slice(since_ns=8 * SECOND, until_ns=10 * SECOND)
+    assert (t // SECOND).tolist() == [8, 9, 10]
+    assert lon.tolist() == [19.0, 20.0, 21.0]
+    assert len(track.slice(since_ns=20 * SECOND)[0]) == 0
+
+
+def test_store_fills_speed_and_course_and_drops_old_fixes():
+    store = TrackStore()
+    for idx in (1, 2, 1):
+        fix = LocationFix(latitude=57.0 + idx / 1000, longitude=11.9)
+        fix.timestamp.FromNanoseconds(idx * SECOND)
+        store.observe("boat1", "location_fix", "phone", fix)
+        speed = TimestampedFloat(value=4.5)
+        speed.timestamp.FromNanoseconds(idx * SECOND)
+        store.observe("boat1", "speed_over_ground_knots", "phone", speed)
+    t, _, _, sog, cog = store.sources("boat1")["phone"].slice()
+    assert (t // SECOND).tolist() == [1, 2]
+    assert sog.tolist() == [4.5, 4.5] and np.isnan(cog).all()
+    assert store.stats()["out_of_order"] == 1
+
+
+def straight_track(points=101):
+    """A straight northbound line with one point pushed 50 m east halfway along."""
+    lat = 57.0 + np.arange(points) * 1e-4
+    lon = np.full(points, 11.9)
+    lon[points // 2] += 50 / (tracks.METERS_PER_DEGREE * np.cos(np.radians(57.0)))
+    t = np.arange(points, dtype=np.int64) * SECOND
+    nan = np.full(points, np.nan, dtype=np.float32)
+    return t, lat, lon, nan, nan.copy()
+
+
+def test_simplification_keeps_ends_and_the_detour():
+    columns = straight_track()
+    for method in ("dp", "vw"):
+        t = tracks.simplify(columns, tolerance_m=10, method=method)[0]
+        assert (t // SECOND).tolist() == [0, 49, 50, 51, 100], method
+    # With a tolerance wider than the detour only the ends are left
+    assert (tracks.simplify(columns, tolerance_m=100, method="dp")[0] // SECOND).tolist() == [0, 100]
+    assert (tracks.simplify(columns, interval_s=10)[0] // SECOND).tolist() == list(range(0, 101, 10))
+
+
+def test_short_tracks_are_not_line_strings():
+    columns = straight_track(3)
+    assert tracks.to_geojson_feature("boat1", "phone", columns)["geometry"]["type"] == "LineString"
+    point = tracks.to_geojson_feature("boat1", "phone", tuple(column[:1] for column in columns))
+    assert point["geometry"] == {"type": "Point", "coordinates": [11.9, 57.0]}
+    assert point["properties"]["times_ns"] == [0]
+    empty = tracks.to_geojson_feature("boat1", "phone", tuple(column[:0] for column in columns))
+    assert empty["geometry"] is None and empty["properties"]["times_ns"] == []
@@ -0,0 +1,79 @@
+"""Sensor Logger over a WebSocket: messages split across and packed into frames."""
+import json
+import threading
+import time
+
+import keelson
+from fastapi.testclient import TestClient
+
+from conftest import load_main
+
+
+def message(message_id, count, now):
+    return {
+        "messageId": message_id, "sessionId": "s1", "deviceId": "phone",
+        "payload": [
+            {"name": "accelerometer", "time": now + step * 1000, "values": {"x": 0.1, "y": -0.25, "z": 9.8}}
+            for step in range(count)
+        ],
+    }
+
+
+def connect(main, client):
+    while main.zenoh_session is None:
+        time.sleep(0.01)
+    return client.websocket_connect("/sensorlogger/boat1/ws?ack=true")
+
+
+def test_messages_split_across_frames(monkeypatch):
+    main = load_main(monkeypatch, PUBLISH_POLICIES="off")
+    session = main.open_zenoh_session()
+    now = time.time_ns()
+    first = json.dumps(message(1, 3, now))
+    second = json.dumps(message(2, 2, now + 10_000))
+    # Cut inside the "deviceId" string, inside a number and between the two messages
+    cuts = [first.index('"phone"') + 3, first.index("-0.25") + 2, len(first) + 1]
+    stream = first + "\n" + second + "\n" + json.dumps(message(3, 1, now + 20_000))
+    frames = [stream[start:end] for start, end in zip([0] + cuts, cuts + [len(stream)])]
+
+    with TestClient(main.app) as client, connect(main, client) as websocket:
+        for frame in frames:
+            websocket.send_text(frame)
+        answers = [websocket.receive_json() for _ in range(3)]
+        websocket.send_text('{"messageId": 4, "payload": nope}\n')
+        assert websocket.receive_json() == {"messageId": None, "error": "invalid JSON"}
+
+    assert answers == [{"messageId": 1, "received": 3}, {"messageId": 2, "received": 2}, {"messageId": 3, "received": 1}]
+    puts = session.puts
+    assert len(puts) == 6
+    assert {keelson.get_subject_from_pubsub_key(key) for key, _ in puts} == {"linear_acceleration_mpss"}
+
+
+def test_busy_message_is_not_partly_queued(monkeypatch):
+    main = load_main(
+        monkeypatch, PUBLISH_QUEUE_SIZE=8, PUBLISH_QUEUE_POLICY="reject", PUBLISH_POLICIES="off",
+        TIME_ALIGN="false", WS_PAUSE_FILL=2,
+    )
+    session = main.open_zenoh_session()
+    gate = threading.Event()
+    put = session.put
+    session.put = lambda key_expr, payload: gate.wait() and put(key_expr, payload)
+    now = time.time_ns()
+
+    with TestClient(main.app) as client, connect(main, client) as websocket:
+        try:
+            websocket.send_text(json.dumps(message(1, 5, now)))
+            assert websocket.receive_json() == {"messageId": 1, "received": 5}
+            # Five more do not fit next to the four left waiting: none of them is queued
+            websocket.send_text(json.dumps(message(2, 5, now + 10_000)))
+            assert websocket.receive_json() == {"messageId": 2, "error": "busy"}
+            assert main.PUBLISH_QUEUE.depth() == 4
+        finally:
+            gate.set()
+        assert main.PUBLISH_QUEUE.flush(timeout=5.0)
+        # The retry is not a duplicate and publishes each entry once
+        websocket.send_text(json.dumps(message(2, 5, now + 10_000)))
+        assert websocket.receive_json() == {"messageId": 2, "received": 5}
+        assert main.PUBLISH_QUEUE.flush(timeout=5.0)
+
+    assert len(session.puts) == 10
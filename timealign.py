@@ -0,0 +1,217 @@
+"""Per-(entity, source) time alignment: clock-skew correction and a bounded reorder buffer.
+
+Phone clocks drift and uploads arrive late, retried or out of order, so the payload
+timestamps of one source are neither trustworthy nor monotonic on arrival. Every upload
+goes through its stream's `begin()` before mapping, and every mapped payload through
+`accept()` / `push()` before anything else sees it:
+
+Clock skew
+    Each upload contributes one lag, receive time minus its newest sample time. That is
+    the clock offset plus the network delay, or much more for a backlog. The estimate is
+    the median of the last `window` lags, a constant amount of work per upload. A phone
+    clock ahead of ours by more than `tolerance` (samples from the future) is corrected
+    at once. A clock behind is only corrected once the window is full and its lags agree
+    within `tolerance`, because a steady lag is a clock offset while a draining backlog
+    has lags that shrink with every upload. A new session (Sensor Logger `sessionId`,
+    GPSLogger `starttimestamp`) starts the estimate over, and so does an upload the
+    current correction would place in the future (the phone's clock was set).
+
+Reordering
+    Items wait in a heap per stream, ordered by (corrected) sample time, and are
+    released in that order once they are older than now - `budget`, or have waited
+    `budget`. Only an item that arrived later but sorts first can hold one back past
+    that, so none waits more than twice `budget`. A sample older than one of the same
+    subject its stream already released is late: it is dropped (`late="drop"`) or
+    published out of order (`late="publish"`), and counted either way. Lateness is per
+    subject because a phone's sensors are not uploaded in step: location samples
+    routinely trail the IMU by a second or more. A stream holds at most `max_pending`
+    items; beyond that the oldest are released early. At most `max_streams` streams are
+    tracked; the least recently used are flushed and forgotten.
+
+Not thread-safe: it is used from the event loop only.
+"""
+import collections
+import heapq
+import itertools
+from time import time_ns
+
+
+class Stream:
+    """Alignment state of one (entity, source)."""
+
+    __slots__ = ("key", "session", "lags", "offset_ns", "heap", "released")
+
+    def __init__(self, key, session, window):
+        self.key = key
+        self.session = session
+        self.lags = collections.deque(maxlen=window)
+        self.offset_ns = 0
+        # (ts_ns, seq, arrived_ns, subject, item)
+        self.heap = []
+        # subject -> newest ts_ns released
+        self.released = {}
+
+
+class TimeAligner:
+    def __init__(self, budget=0.1, tolerance=2.0, window=8, late="drop", max_pending=20000, max_streams=10000,
+                 clock=time_ns):
+        if late not in ("drop", "publish"):
+            raise ValueError(f"late must be 'drop' or 'publish', not {late!r}")
+        self.budget_ns = int(budget * 1e9)
+        self.tolerance_ns = int(tolerance * 1e9)
+        self.window = window
+        self.late = late
+        self.max_pending = max_pending
+        self.max_streams = max_streams
+        self.clock = clock
+
+        self._streams = collections.OrderedDict()
+        # Streams with items in their heap
+        self._waiting = set()
+        # Items released early (stream evicted or over max_pending), in release order
+        self._ready = []
+        self._pending = 0
+        self._seq = itertools.count()
+
+        self.uploads = 0
+        self.corrected_uploads = 0
+        self.released = 0
+        self.late_dropped = 0
+        self.late_published = 0
+        self.forced = 0
+        self.dropped_full = 0
+        self.sessions = 0
+
+    # --- Clock skew ------------------------------------------------------------------
+    def begin(self, entity_id, source_id, newest_ns, session=None):
+        """Start an upload whose newest sample is `newest_ns` (None if unknown); returns the
+        stream, whose `offset_ns` is the correction to add to this upload's timestamps."""
+        key = (entity_id, source_id)
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = self._streams[key] = Stream(key, session, self.window)
+            if len(self._streams) > self.max_streams:
+                self._evict(self._streams.popitem(last=False)[1])
+        else:
+            self._streams.move_to_end(key)
+            if session is not None and session != stream.session:
+                # A new recording: the phone may have changed clocks in between
+                stream.session = session
+                stream.lags.clear()
+                stream.offset_ns = 0
+                self.sessions += 1
+
+        self.uploads += 1
+        if newest_ns is not None:
+            lags = stream.lags
+            lag = self.clock() - newest_ns
+            if lag - stream.offset_ns < -self.tolerance_ns:
+                # The correction would put this upload in the future: the phone's clock
+                # was set since; start the estimate over from this upload
+                lags.clear()
+                stream.offset_ns = 0
+            lags.append(lag)
+            ordered = sorted(lags)
+            median = ordered[len(ordered) // 2]
+            if median < -self.tolerance_ns:
+                stream.offset_ns = median
+            elif (
+                median > self.tolerance_ns
+                and len(lags) == lags.maxlen
+                and ordered[-1] - ordered[0] <= self.tolerance_ns
+            ):
+                stream.offset_ns = median
+            elif abs(median) <= self.tolerance_ns:
+                stream.offset_ns = 0
+        if stream.offset_ns:
+            self.corrected_uploads += 1
+        return stream
+
+    # --- Reordering ----------------------------------------------------------------------
+    def accept(self, stream, subject, ts_ns):
+        """False if a `subject` sample at `ts_ns` is late and should be dropped (counted)."""
+        released = stream.released.get(subject)
+        if released is None or ts_ns >= released:
+            return True
+        if self.late == "drop":
+            self.late_dropped += 1
+            return False
+        self.late_published += 1
+        return True
+
+    def push(self, stream, subject, ts_ns, item):
+        heap = stream.heap
+        heapq.heappush(heap, (ts_ns, next(self._seq), self.clock(), subject, item))
+        self._pending += 1
+        self._waiting.add(stream)
+        if len(heap) > self.max_pending:
+            self.forced += 1
+            self._release_top(stream, self._ready)
+
+    def _release_top(self, stream, out):
+        ts_ns, _, _, subject, item = heapq.heappop(stream.heap)
+        self._pending -= 1
+        newest = stream.released.get(subject)
+        if newest is None or ts_ns > newest:
+            stream.released[subject] = ts_ns
+        out.append(item)
+
+    def release(self):
+        """Items due for publishing, oldest first per stream."""
+        out, self._ready = self._ready, []
+        if not self._waiting:
+            return out
+        due_ns = self.clock() - self.budget_ns
+        for stream in list(self._waiting):
+            heap = stream.heap
+            while heap and (heap[0][0] <= due_ns or heap[0][2] <= due_ns):
+                self._release_top(stream, out)
+            if not heap:
+                self._waiting.discard(stream)
+        self.released += len(out)
+        return out
+
+    def flush(self):
+        """Every waiting item, regardless of its age (shutdown)."""
+        out, self._ready = self._ready, []
+        for stream in self._waiting:
+            while stream.heap:
+                self._release_top(stream, out)
+        self._waiting.clear()
+        self.released += len(out)
+        return out
+
+    def _evict(self, stream):
+        while stream.heap:
+            self._release_top(stream, self._ready)
+        self._waiting.discard(stream)
+
+    def pending(self):
+        return self._pending
+
+    def stats(self, top=10):
+        skewed = sorted(
+            (stream for stream in self._streams.values() if stream.offset_ns),
+            key=lambda stream: abs(stream.offset_ns),
+            reverse=True,
+        )
+        return {
+            "budget_ms": self.budget_ns / 1e6,
+            "tolerance_ms": self.tolerance_ns / 1e6,
+            "late_policy": self.late,
+            "streams": len(self._streams),
+            "pending": self._pending,
+            "uploads": self.uploads,
+            "corrected_uploads": self.corrected_uploads,
+            "new_sessions": self.sessions,
+            "released": self.released,
+            "late_dropped": self.late_dropped,
+            "late_published": self.late_published,
+            "forced": self.forced,
+            "dropped_full": self.dropped_full,
+            "skewed_streams": len(skewed),
+            "largest_offsets": [
+                {"entity_id": stream.key[0], "source_id": stream.key[1], "offset_ms": stream.offset_ns / 1e6}
+                for stream in skewed[:top]
+            ],
+        }
@@ -0,0 +1,326 @@
+"""Recent trajectory per (entity, source) in NumPy ring buffers, with simplification.
+
+Like the latest-state store, `TrackStore.observe` is fed every payload on its way to
+the publish queue. A `location_fix` appends a row (t, lat, lon, sog, cog); the speed and
+course payloads that follow for the same fix time fill in that row. Rows are kept in
+time order: a fix older than the newest one stored is dropped.
+
+Buffers start small and double up to `max_points`, after which the oldest rows are
+overwritten. When all buffers together exceed `max_bytes` the least recently updated
+tracks are dropped.
+
+Like the latest-state store, the store is used from the event loop only.
+
+Tracks are returned as column arrays and can be thinned with Douglas-Peucker or
+Visvalingam-Whyatt (tolerance in meters) and time decimation before encoding as
+GeoJSON or the compact binary layout described at `encode_binary`.
+"""
+import collections
+import heapq
+import math
+import struct
+
+import numpy as np
+
+
+METERS_PER_DEGREE = math.pi * 6_371_008.8 / 180.0
+INITIAL_POINTS = 256
+
+# Bytes per row: t int64, lat/lon float64, sog/cog float32
+ROW_BYTES = 8 + 8 + 8 + 4 + 4
+
+# Subjects `TrackStore.observe` looks at
+SUBJECTS = frozenset(("location_fix", "speed_over_ground_knots", "course_over_ground_deg"))
+
+
+class TrackBuffer:
+    """Ring buffer of one source's fixes, oldest first once unrolled."""
+
+    __slots__ = ("capacity", "max_points", "start", "count", "t", "lat", "lon", "sog", "cog")
+
+    def __init__(self, max_points, capacity=INITIAL_POINTS):
+        self.max_points = max_points
+        self.capacity = 0
+        self.start = 0
+        self.count = 0
+        self._allocate(min(capacity, max_points))
+
+    def _allocate(self, capacity):
+        t = np.empty(capacity, dtype=np.int64)
+        lat = np.empty(capacity, dtype=np.float64)
+        lon = np.empty(capacity, dtype=np.float64)
+        sog = np.empty(capacity, dtype=np.float32)
+        cog = np.empty(capacity, dtype=np.float32)
+        if self.count:
+            for new, old in ((t, self.t), (lat, self.lat), (lon, self.lon), (sog, self.sog), (cog, self.cog)):
+                new[:self.count] = self._unroll(old)
+        self.t, self.lat, self.lon, self.sog, self.cog = t, lat, lon, sog, cog
+        self.capacity = capacity
+        self.start = 0
+
+    def _unroll(self, column):
+        end = self.start + self.count
+        if end <= self.capacity:
+            return column[self.start:end]
+        return np.concatenate((column[self.start:], column[:end - self.capacity]))
+
+    @property
+    def nbytes(self):
+        return self.capacity * ROW_BYTES
+
+    def last_time(self):
+        if not self.count:
+            return None
+        return int(self.t[(self.start + self.count - 1) % self.capacity])
+
+    def append(self, t, lat, lon):
+        if self.count == self.capacity and self.capacity < self.max_points:
+            self._allocate(min(self.capacity * 2, self.max_points))
+        if self.count < self.capacity:
+            idx = (self.start + self.count) % self.capacity
+            self.count += 1
+        else:
+            idx = self.start
+            self.start = (self.start + 1) % self.capacity
+        self.t[idx] = t
+        self.lat[idx] = lat
+        self.lon[idx] = lon
+        self.sog[idx] = np.nan
+        self.cog[idx] = np.nan
+
+    def set_last(self, t, column, value):
+        """Set sog/cog of the newest row if it is the fix at time `t`."""
+        if self.count:
+            idx = (self.start + self.count - 1) % self.capacity
+            if self.t[idx] == t:
+                getattr(self, column)[idx] = value
+
+    def slice(self, since_ns=None, until_ns=None):
+        """(t, lat, lon, sog, cog) arrays for since_ns <= t <= until_ns, oldest first."""
+        t = self._unroll(self.t)
+        lo = 0 if since_ns is None else int(np.searchsorted(t, since_ns, side="left"))
+        hi = len(t) if until_ns is None else int(np.searchsorted(t, until_ns, side="right"))
+        return tuple(column[lo:hi].copy() for column in (
+            t, self._unroll(self.lat), self._unroll(self.lon), self._unroll(self.sog), self._unroll(self.cog)
+        ))
+
+
+def _timestamp_ns(payload):
+    timestamp = payload.timestamp
+    return timestamp.seconds * 1_000_000_000 + timestamp.nanos
+
+
+class TrackStore:
+    def __init__(self, max_points=86_400, max_bytes=256 * 1024 * 1024):
+        self.max_points = max_points
+        self.max_bytes = max_bytes
+        # (entity_id, source_id) -> TrackBuffer, least recently updated first
+        self._tracks = collections.OrderedDict()
+        # entity_id -> {source_id: TrackBuffer}
+        self._entities = {}
+        self._bytes = 0
+        self.out_of_order = 0
+        self.evicted = 0
+
+    def observe(self, entity_id, subject, source_id, payload):
+        if subject == "location_fix":
+            self._append(entity_id, source_id, payload)
+        elif subject == "speed_over_ground_knots":
+            self._set(entity_id, source_id, payload, "sog")
+        elif subject == "course_over_ground_deg":
+            self._set(entity_id, source_id, payload, "cog")
+
+    def _append(self, entity_id, source_id, payload):
+        key = (entity_id, source_id)
+        track = self._tracks.get(key)
+        if track is None:
+            track = self._tracks[key] = TrackBuffer(self.max_points)
+            self._entities.setdefault(entity_id, {})[source_id] = track
+            self._bytes += track.nbytes
+        else:
+            self._tracks.move_to_end(key)
+
+        t = _timestamp_ns(payload)
+        last = track.last_time()
+        if last is not None and t <= last:
+            if t < last:
+                self.out_of_order += 1
+            return
+        before = track.nbytes
+        track.append(t, payload.latitude, payload.longitude)
+        if track.nbytes != before:
+            self._bytes += track.nbytes - before
+        while self._bytes > self.max_bytes and len(self._tracks) > 1:
+            (evicted_entity, evicted_source), evicted = self._tracks.popitem(last=False)
+            sources = self._entities[evicted_entity]
+            del sources[evicted_source]
+            if not sources:
+                del self._entities[evicted_entity]
+            self._bytes -= evicted.nbytes
+            self.evicted += 1
+
+    def _set(self, entity_id, source_id, payload, column):
+        track = self._tracks.get((entity_id, source_id))
+        if track is not None:
+            track.set_last(_timestamp_ns(payload), column, payload.value)
+
+    def sources(self, entity_id):
+        """{source_id: TrackBuffer} for one entity, or None if unknown."""
+        return self._entities.get(entity_id)
+
+    def stats(self):
+        return {
+            "tracks": len(self._tracks),
+            "points": sum(track.count for track in self._tracks.values()),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "max_points": self.max_points,
+            "out_of_order": self.out_of_order,
+            "evicted": self.evicted,
+        }
+
+
+# --- Simplification ---------------------------------------------------------------
+def _project(lat, lon):
+    """Local equirectangular projection to meters around the track's mean latitude."""
+    scale = math.cos(math.radians(float(np.mean(lat)))) if len(lat) else 1.0
+    return lon * (METERS_PER_DEGREE * scale), lat * METERS_PER_DEGREE
+
+
+def douglas_peucker(lat, lon, tolerance_m):
+    """Indices of the points kept by Douglas-Peucker with `tolerance_m`."""
+    n = len(lat)
+    if n < 3:
+        return np.arange(n)
+    x, y = _project(lat, lon)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx = x[last] - x[first]
+        dy = y[last] - y[first]
+        px = x[first + 1:last] - x[first]
+        py = y[first + 1:last] - y[first]
+        length = math.hypot(dx, dy)
+        if length == 0.0:
+            distances = np.hypot(px, py)
+        else:
+            distances = np.abs(dx * py - dy * px) / length
+        idx = int(np.argmax(distances))
+        if distances[idx] > tolerance_m:
+            split = first + 1 + idx
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def visvalingam(lat, lon, tolerance_m):
+    """Indices kept by Visvalingam-Whyatt: drop points whose triangle area < tolerance_m**2."""
+    n = len(lat)
+    if n < 3:
+        return np.arange(n)
+    x, y = _project(lat, lon)
+    # Initial triangle areas in one vectorized pass; only neighbours of removed points
+    # are recomputed in the loop below
+    initial = np.abs((x[:-2] - x[1:-1]) * (y[2:] - y[1:-1]) - (x[2:] - x[1:-1]) * (y[:-2] - y[1:-1])) / 2.0
+    x = x.tolist()
+    y = y.tolist()
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+    removed = [False] * n
+    current = [0.0] + initial.tolist() + [0.0]
+    heap = [(current[i], i) for i in range(1, n - 1)]
+    heapq.heapify(heap)
+    threshold = tolerance_m * tolerance_m
+    floor = 0.0
+    while heap:
+        value, i = heapq.heappop(heap)
+        if removed[i] or value != current[i]:
+            continue
+        # Effective area never drops below that of an earlier removal
+        floor = max(floor, value)
+        if floor >= threshold:
+            break
+        removed[i] = True
+        a, c = prev[i], nxt[i]
+        nxt[a] = c
+        prev[c] = a
+        for j in (a, c):
+            if 0 < j < n - 1:
+                p, q = prev[j], nxt[j]
+                current[j] = abs((x[p] - x[j]) * (y[q] - y[j]) - (x[q] - x[j]) * (y[p] - y[j])) / 2.0
+                heapq.heappush(heap, (current[j], j))
+    return np.flatnonzero(~np.array(removed))
+
+
+def decimate(t, interval_ns):
+    """Indices of the first point in every `interval_ns` bucket."""
+    if not len(t) or interval_ns <= 0:
+        return np.arange(len(t))
+    _, first = np.unique(t // interval_ns, return_index=True)
+    return first
+
+
+SIMPLIFIERS = {"dp": douglas_peucker, "vw": visvalingam}
+
+
+def simplify(columns, tolerance_m=None, method="dp", interval_s=None):
+    """Apply time decimation, then geometric simplification, to (t, lat, lon, sog, cog)."""
+    if interval_s:
+        keep = decimate(columns[0], int(interval_s * 1e9))
+        columns = tuple(column[keep] for column in columns)
+    if tolerance_m:
+        keep = SIMPLIFIERS[method](columns[1], columns[2], tolerance_m)
+        columns = tuple(column[keep] for column in columns)
+    return columns
+
+
+# --- Encoding ------------------------------------------------------------------------
+def _nullable(values):
+    # float32 columns: three decimals is what they hold for speeds and courses
+    return [None if math.isnan(value) else round(value, 3) for value in values.tolist()]
+
+
+def to_geojson_feature(entity_id, source_id, columns):
+    """A LineString feature; a single fix is a Point, and no fixes a null geometry."""
+    t, lat, lon, sog, cog = columns
+    if len(t) >= 2:
+        geometry = {"type": "LineString", "coordinates": np.column_stack((lon, lat)).tolist()}
+    elif len(t) == 1:
+        geometry = {"type": "Point", "coordinates": [float(lon[0]), float(lat[0])]}
+    else:
+        geometry = None
+    return {
+        "type": "Feature",
+        "geometry": geometry,
+        "properties": {
+            "entity_id": entity_id,
+            "source_id": source_id,
+            "times_ns": t.tolist(),
+            "sog_knots": _nullable(sog),
+            "cog_deg": _nullable(cog),
+        },
+    }
+
+
+BINARY_MAGIC = b"TRK1"
+BINARY_HEADER = struct.Struct("<4sI")
+
+
+def encode_binary(columns):
+    """Compact little-endian track: b"TRK1", uint32 count, then the columns back to back:
+    t int64[count], lat float64[count], lon float64[count], sog float32[count],
+    cog float32[count]. Missing sog/cog are NaN."""
+    t, lat, lon, sog, cog = columns
+    return b"".join((
+        BINARY_HEADER.pack(BINARY_MAGIC, len(t)),
+        t.astype("<i8").tobytes(),
+        lat.astype("<f8").tobytes(),
+        lon.astype("<f8").tobytes(),
+        sog.astype("<f4").tobytes(),
+        cog.astype("<f4").tobytes(),
+    ))